@@ -0,0 +1,72 @@
+#  Compares how many lists an update rewrites under the sorted chunk layout and the consistent-hash bucket layout.
+#  Everything is computed offline from synthetic domains; nothing is sent to Cloudflare.
+#
+# Usage:
+#   python Benchmark_bucket_layout.py                                  (100k and 300k domains, 0.01% / 0.1% / 1% churn)
+#   python Benchmark_bucket_layout.py --sizes 300000 --churn 0.0001 0.05
+# Churn is the fraction of the domains changed per update, half removed and half added.
+
+
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gateway_guardian import DomainSet, DomainBuckets, MAX_DOMAINS_PER_LIST
+
+
+LETTERS = "abcdefghijklmnop"
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Lists written per update: sorted chunks vs. hash buckets.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 300_000], help="Rule sizes in domains (default: 100000 300000)")
+    parser.add_argument("--churn", type=float, nargs="+", default=[0.0001, 0.001, 0.01], help="Changed fraction per update (default: 0.0001 0.001 0.01)")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed (default: 7)")
+    return parser.parse_args(argv)
+
+
+def random_domains(rng, count, tag):
+    return [f"{''.join(rng.choices(LETTERS, k=8))}{i}.{tag}{i % 500}.com" for i in range(count)]
+
+
+def sorted_lists(domains): return [set(chunk) for chunk in domains.chunks(MAX_DOMAINS_PER_LIST)]
+
+
+def changed(old, new):
+    """Indexes whose contents differ between two list layouts (a missing list counts as empty)"""
+    return [i for i in range(max(len(old), len(new))) if (old[i] if i < len(old) else set()) != (new[i] if i < len(new) else set())]
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    for total in args.sizes:
+        rng = random.Random(args.seed)
+        base = random_domains(rng, total, "example")
+        old = DomainSet.from_iterable(base)
+        start = time.perf_counter(); num_buckets = DomainBuckets.bucket_count(len(old)); old_buckets = [set(b) for b in DomainBuckets.assign(old, num_buckets)]
+        assign_seconds = time.perf_counter() - start
+        old_sorted = sorted_lists(old)
+        print(f"\n{total:,} domains: sorted layout {len(old_sorted)} lists, bucket layout {num_buckets} lists (assigning took {assign_seconds:.2f}s)")
+        print(f"{'churn':>7} {'changes':>8} | {'sorted full':>11} {'sorted diff':>11} | {'bucket lists':>12} {'items sent':>10}")
+        for rate in args.churn:
+            k = max(1, int(total * rate / 2))
+            removed = set(rng.sample(base, k)); added = {f"{''.join(rng.choices(LETTERS, k=8))}n{i}.new.com" for i in range(k)}
+            new = DomainSet.from_iterable((set(base) - removed) | added)
+            new_sorted = sorted_lists(new)
+            new_count = DomainBuckets.bucket_count(len(new), num_buckets); new_buckets = [set(b) for b in DomainBuckets.assign(new, new_count)]
+            touched = changed(old_buckets, new_buckets)
+            items_sent = sum(len(new_buckets[i] ^ (old_buckets[i] if i < len(old_buckets) else set())) for i in touched)
+            print(f"{rate:>7.2%} {2 * k:>8,} | {len(new_sorted):>11} {len(changed(old_sorted, new_sorted)):>11} | {len(touched):>12} {items_sent:>10,}")
+        # Growing by one bucket should only move the domains that land in it
+        grown = [set(b) for b in DomainBuckets.assign(old, num_buckets + 1)]
+        moved = sum(len(old_buckets[i] - grown[i]) for i in range(num_buckets))
+        print(f"growing {num_buckets} -> {num_buckets + 1} buckets moves {moved:,} domains ({moved / total:.1%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+#  Compares memory and upload encoding time of parsed domains held as a sorted list of str vs. a DomainSet.
+#  Each container is measured in its own child process, so the resident set sizes do not mix.
+#  Everything runs offline on a synthetic hosts file; nothing is sent to Cloudflare.
+#
+# Usage:
+#   python Benchmark_domain_memory.py                    (300k domains)
+#   python Benchmark_domain_memory.py --domains 100000
+# RSS comes from /proc/self/statm (Linux); elsewhere only the peak from getrusage is shown.
+
+
+
+import argparse
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from array import array
+try:
+    import resource
+except ImportError:
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gateway_guardian import DomainSet, CloudflareAPI, parse_blocklist_lines, MAX_DOMAINS_PER_LIST
+
+
+VARIANTS = ("list", "domainset")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Memory held by parsed domains and time to encode their list bodies.")
+    parser.add_argument("--domains", type=int, default=300_000, help="Number of synthetic domains (default: 300000)")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed (default: 7)")
+    parser.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def rss_mib():
+    try:
+        with open("/proc/self/statm") as f: return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError): return float("nan")
+
+
+def peak_rss_mib():
+    if resource is None: return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def container_mib(domains):
+    """Bytes owned by the container itself: the list and its str objects, or the DomainSet blob and offsets"""
+    if isinstance(domains, DomainSet): return (sys.getsizeof(domains) + sys.getsizeof(domains.blob) + array("I").itemsize * (len(domains) + 1)) / 2**20
+    return (sys.getsizeof(domains) + sum(sys.getsizeof(domain) for domain in domains)) / 2**20
+
+
+def measure(variant, count, seed):
+    rng = random.Random(seed)
+    lines = [f"0.0.0.0 {''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randint(6, 14)))}{i}.example{i % 700}.com" for i in range(count)]
+    gc.collect(); baseline = rss_mib()
+    domains, _, _ = parse_blocklist_lines(lines)
+    # The list of str is what the parser returned before DomainSet
+    if variant == "list": domains = list(domains)
+    gc.collect(); held = rss_mib() - baseline
+    start = time.perf_counter(); body_bytes = 0
+    for i in range(0, len(domains), MAX_DOMAINS_PER_LIST):
+        body_bytes += len(CloudflareAPI._list_body({"name": f"bench_{i}", "type": "DOMAIN"}, domains[i:i + MAX_DOMAINS_PER_LIST]))
+    encode_seconds = time.perf_counter() - start
+    return {"variant": variant, "domains": len(domains), "container_mib": container_mib(domains), "held_mib": held,
+            "encode_seconds": encode_seconds, "body_mib": body_bytes / 2**20, "peak_mib": peak_rss_mib()}
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.variant:
+        print(json.dumps(measure(args.variant, args.domains, args.seed))); return 0
+    print(f"{'container':>10} {'domains':>9} | {'size MiB':>8} {'RSS held MiB':>12} | {'encode s':>8} {'bodies MiB':>10} | {'peak RSS MiB':>12}")
+    for variant in VARIANTS:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--variant", variant, "--domains", str(args.domains), "--seed", str(args.seed)],
+                                capture_output=True, text=True, check=True).stdout
+        r = json.loads(output)
+        print(f"{r['variant']:>10} {r['domains']:>9,} | {r['container_mib']:>8.1f} {r['held_mib']:>12.1f} | {r['encode_seconds']:>8.2f} {r['body_mib']:>10.1f} | {r['peak_mib']:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
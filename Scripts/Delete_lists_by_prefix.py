@@ -5,109 +5,93 @@
 # Created by TantalusDrive (https://github.com/TantalusDrive) – Feel free to use and share!
 # No official affiliation with Cloudflare or Gateway Gaurdian.
 # Licensed under the MIT License (see LICENSE for details)
-
-
-
-import requests
-
-# Configuration
-print("Enter Cloudflare data:")
-ACCOUNT_ID = input("Account ID: ").strip()
-API_TOKEN = input("API Token: ").strip()
-PREFIX = input("Prefix of lists (list names) to delete: ").strip()
-
-# Headers
-headers = {
-    "Authorization": f"Bearer {API_TOKEN}",
-    "Content-Type": "application/json"
-}
-
-# Correct endpoint for Zero Trust lists
-url_lists = f"https://api.cloudflare.com/client/v4/accounts/{ACCOUNT_ID}/gateway/lists"
-url_rules = f"https://api.cloudflare.com/client/v4/accounts/{ACCOUNT_ID}/gateway/rules"
-
-# Check active Gateway rules
-print("Checking rules in use...")
-try:
-    rules_response = requests.get(url_rules, headers=headers)
-    used_list_names = set()
-    if rules_response.status_code == 200:
-        try:
-            rules = rules_response.json().get("result", [])
-            for rule in rules:
-                expr = rule.get("filter", {}).get("expression", "")
-                for lst_name in [n.strip("$") for n in expr.split() if n.startswith("$")]:
-                    used_list_names.add(lst_name)
-            print(f"Found references to {len(used_list_names)} lists in rules.")
-        except requests.exceptions.JSONDecodeError:
-            print("Error: Non-JSON response from rules API.")
-    else:
-        print(f"Rules API error: {rules_response.status_code}")
-        print(f"Details: {rules_response.text}")
-except Exception as e:
-    print(f"Error fetching rules: {e}")
-
-# Delete lists with pagination
-deleted_count = 0
-page = 1
-per_page = 100
-
-print(f"Searching for lists with prefix '{PREFIX}'...")
-
-while True:
-    try:
-        params = {"page": page, "per_page": per_page}
-        response = requests.get(url_lists, headers=headers, params=params)
-        
-        print(f"Status: {response.status_code}")
-        print(f"Raw response: {response.text}")
-
-        if response.status_code != 200:
-            print("API request failed.")
-            break
-
-        try:
-            data = response.json()
-        except requests.exceptions.JSONDecodeError:
-            print("Error: Non-JSON response from lists API.")
-            break
-
-        if "result" not in data:
-            print("Error: 'result' field missing.")
-            break
-
-        lists = data["result"]
-        
-        if "result_info" not in data:
-            print("Warning: 'result_info' not present. Assuming single page.")
-            total_pages = 1
-        else:
-            total_pages = data["result_info"]["total_pages"]
-
-        for lst in lists:
-            if lst["name"].startswith(PREFIX):
-                if lst["name"] in used_list_names:
-                    print(f"⚠️  Skipped (in use): {lst['name']}")
-                    continue
-                list_id = lst["id"]
-                url_delete = f"{url_lists}/{list_id}"
-                delete_response = requests.delete(url_delete, headers=headers)
-                try:
-                    result = delete_response.json()
-                    if result.get("success"):
-                        print(f"✅ Deleted: {lst['name']}")
-                        deleted_count += 1
-                    else:
-                        print(f"❌ Error with {lst['name']}: {result.get('errors')}")
-                except requests.exceptions.JSONDecodeError:
-                    print(f"❌ Error: Non-JSON response after deleting {lst['name']}")
-
-        if page >= total_pages:
-            break
-        page += 1
-    except Exception as e:
-        print(f"Error in pagination loop: {e}")
-        break
-
-print(f"✅ Deleted {deleted_count} lists with prefix '{PREFIX}'.")
-input("Press ENTER to exit...")   
+#
+# Usage:
+#   python Delete_lists_by_prefix.py --prefix myblock_ --dry-run      (show the plan only)
+#   python Delete_lists_by_prefix.py --prefix myblock_ --yes          (delete without prompting)
+# Credentials come from --account-id/--api-token or the CLOUDFLARE_ACCOUNT_ID/CLOUDFLARE_API_TOKEN
+# environment variables, and are only prompted for when neither is set and a terminal is attached.
+
+
+
+import argparse
+import json
+import os
+import sys
+
+# Listing, reference checks and deletions go through Gateway Guardian's API client and bulk-delete engine
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gateway_guardian import (CloudflareAPI, BulkDeleter, BulkDeleteItem, build_list_reference_graph, ENV_ACCOUNT_ID, ENV_API_TOKEN,
+                              BULK_DELETE_WORKERS, BULK_DELETE_RATE_PER_SECOND)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Delete Cloudflare Gateway lists whose name starts with a prefix, skipping lists still used by a rule.")
+    parser.add_argument("--prefix", help="Prefix of list names to delete")
+    parser.add_argument("--account-id", default=os.environ.get(ENV_ACCOUNT_ID, ""), help=f"Cloudflare account ID (default: ${ENV_ACCOUNT_ID})")
+    parser.add_argument("--api-token", default=os.environ.get(ENV_API_TOKEN, ""), help=f"Cloudflare API token (default: ${ENV_API_TOKEN})")
+    parser.add_argument("--dry-run", action="store_true", help="Print the deletion plan without deleting anything")
+    parser.add_argument("--json", action="store_true", help="Print the plan and result as JSON on stdout")
+    parser.add_argument("--yes", "-y", action="store_true", help="Do not ask for confirmation")
+    parser.add_argument("--workers", type=int, default=BULK_DELETE_WORKERS, help=f"Parallel deletions (default: {BULK_DELETE_WORKERS})")
+    parser.add_argument("--rate", type=float, default=BULK_DELETE_RATE_PER_SECOND, help=f"Maximum delete requests per second (default: {BULK_DELETE_RATE_PER_SECOND})")
+    return parser.parse_args(argv)
+
+
+def prompt_missing(args):
+    interactive = sys.stdin.isatty()
+    for attr, label in (("account_id", "Account ID"), ("api_token", "API Token"), ("prefix", "Prefix of lists (list names) to delete")):
+        if getattr(args, attr): continue
+        if not interactive: sys.exit(f"Error: {label} is required (see --help).")
+        setattr(args, attr, input(f"{label}: ").strip())
+    if not args.prefix: sys.exit("Error: an empty prefix would match every list.")
+
+
+def build_plan(api, prefix):
+    """Split the matching lists into deletable ones and ones still referenced by a rule's traffic expression"""
+    references = build_list_reference_graph(api.get_rules())
+    to_delete, in_use = [], []
+    for lst in api.iter_lists(name_prefix=prefix):
+        rules = references.get(lst.get("id"))
+        if rules: in_use.append((lst, [rule.get("name", rule.get("id")) for rule in rules]))
+        else: to_delete.append(lst)
+    return to_delete, in_use
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    prompt_missing(args)
+    api = CloudflareAPI(args.api_token, args.account_id)
+    log = (lambda *a: print(*a, file=sys.stderr)) if args.json else print
+
+    log(f"Searching for lists with prefix '{args.prefix}'...")
+    try: to_delete, in_use = build_plan(api, args.prefix)
+    except ConnectionError as e: log(f"Error: {e}"); return 2
+
+    plan = {"prefix": args.prefix, "delete": [{"id": lst["id"], "name": lst.get("name"), "count": lst.get("count", 0)} for lst in to_delete],
+            "skip": [{"id": lst["id"], "name": lst.get("name"), "rules": rules} for lst, rules in in_use]}
+    for lst, rules in in_use: log(f"⚠️  Skipped (in use by {', '.join(rules)}): {lst.get('name')}")
+    for lst in to_delete: log(f"🗑️  Will delete: {lst.get('name')} ({lst.get('count', 0)} items)")
+    log(f"Plan: delete {len(to_delete)} list(s), skip {len(in_use)} in use.")
+
+    if args.dry_run or not to_delete:
+        if args.json: print(json.dumps({"plan": plan, "dry_run": args.dry_run}, indent=2))
+        return 0
+    if not args.yes:
+        if not sys.stdin.isatty(): log("Refusing to delete without --yes when not attached to a terminal."); return 2
+        if input(f"Delete {len(to_delete)} list(s)? [y/N] ").strip().lower() != "y": log("Aborted."); return 0
+
+    def report(item, error, done, total):
+        if error: log(f"❌ Error with {item.name}: {error}")
+        else: log(f"✅ Deleted: {item.name} ({done}/{total})")
+    deleter = BulkDeleter(api, max_workers=args.workers, rate_per_second=args.rate, on_result=report)
+    summary = deleter.run(BulkDeleteItem("list", lst["id"], lst.get("name", lst["id"])) for lst in to_delete)
+    log(f"{'✅' if not summary.failed else '⚠️ '} {summary.describe()} Prefix: '{args.prefix}'.")
+    if args.json:
+        print(json.dumps({"plan": plan, "deleted": [item.item_id for item in summary.deleted],
+                          "failed": [{"id": item.item_id, "name": item.name, "error": str(error)} for item, error in summary.failed]}, indent=2))
+    return 1 if summary.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,58 @@
-import wx
-import wx.adv
-import wx.html
-import wx.lib.mixins.listctrl as listmix
+import time
+APP_LAUNCH_TIME = time.perf_counter()  # taken before the heavy imports so startup timings include them
 import requests
+import urllib3
 import os
 import threading
 import json
-import time
 import re
-import string
-import traceback
 import io
 import datetime
 import hashlib
+import functools
+import zlib
+import base64
+import gzip
+import uuid
+import codecs
+import mmap
+import lzma
+import bz2
+import zipfile
+import tempfile
+import shutil
+import contextlib
+import copy
+from collections import namedtuple
+from array import array
+import bisect
+import math
+import sys
+import argparse
+import asyncio
+import getpass
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse
 try:
     import chardet
     HAS_CHARDET = True
 except ImportError:
     HAS_CHARDET = False
+try:
+    import httpx
+    HAS_HTTPX = True
+except ImportError:
+    HAS_HTTPX = False
+try:
+    import h2  # lets httpx negotiate HTTP/2
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+try:
+    import keyring  # keeps profile API tokens in the OS credential store
+    HAS_KEYRING = True
+except ImportError:
+    HAS_KEYRING = False
 APP_NAME = "Gateway Guardian"
 APP_VERSION = "1.0-alpha2"
 API_BASE_URL = "https://api.cloudflare.com/client/v4"
@@ -28,65 +62,865 @@ TOTAL_DOMAIN_LIMIT = MAX_DOMAINS_PER_LIST * MAX_LISTS
 LIST_CREATE_DELAY_SECONDS = 0.7
 LIST_CREATE_TIMEOUT_SECONDS = 120
 GET_ALL_LISTS_TIMEOUT_SECONDS = 90
-DELETE_DELAY_SECONDS = 0.7
-ID_TOOLBAR_LOAD_FILE = wx.NewIdRef()
-ID_TOOLBAR_LOAD_URL = wx.NewIdRef()
-ID_TOOLBAR_REFRESH = wx.NewIdRef()
-ID_TOOLBAR_APPLY = wx.NewIdRef()
-ID_TOOLBAR_EDIT = wx.NewIdRef()
-ID_TOOLBAR_UPDATE = wx.NewIdRef()
-ID_TOOLBAR_DELETE_RULE_LISTS = wx.NewIdRef()
-ID_TOOLBAR_CANCEL = wx.NewIdRef()
-ID_TOGGLE_LOG = wx.NewIdRef()
-ID_TOGGLE_STATUS_BAR = wx.NewIdRef()
-ID_LOAD_FILE = wx.NewIdRef()
-ID_LOAD_URL = wx.NewIdRef()
-ID_REFRESH = wx.NewIdRef()
-ID_APPLY = wx.NewIdRef()
-ID_UPDATE_RULE = wx.NewIdRef()
-ID_DELETE_RULE_LISTS = wx.NewIdRef()
-ID_CANCEL_OPERATION = wx.NewIdRef()
+# GET results are reused for this long; any create/update/delete through the client drops them
+API_GET_CACHE_SECONDS = 30.0
+LIST_PAGE_SIZE = 100
+# List bodies are gzip-compressed when the API accepts Content-Encoding: gzip (checked on first use)
+LIST_BODY_GZIP = True
+LIST_BODY_GZIP_MIN_BYTES = 4096
+LIST_BODY_GZIP_LEVEL = 6
+# Encoding detection only looks at the start of a source; the whole buffer is decoded once afterwards
+ENCODING_SAMPLE_BYTES = 256 * 1024
+ENCODING_DETECT_BLOCK_BYTES = 16 * 1024
+ENCODING_MIN_CONFIDENCE = 0.5
+SOURCE_READ_BLOCK_BYTES = 1024 * 1024
+SOURCE_SPOOL_MEMORY_BYTES = 16 * 1024 * 1024  # zip bodies from URLs are spooled (compressed) since zipfile needs to seek
+SOURCE_CACHE_ENABLED = True
+SOURCE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+SOURCE_CACHE_FRESH_SECONDS = 300  # reuse without revalidating when the server sends no Cache-Control max-age
+SOURCE_CACHE_STALE_SECONDS = 7 * 24 * 3600  # serve cached bodies this long while the upstream is unreachable
+COMPRESSION_MAGIC = ((b"\x1f\x8b", "gzip"), (b"\xfd7zXZ\x00", "xz"), (b"BZh", "bzip2"), (b"PK\x03\x04", "zip"))
+COMPRESSION_OPENERS = {"gzip": gzip.open, "xz": lzma.open, "bzip2": bz2.open}
+COMPRESSED_SUFFIXES = (".gz", ".xz", ".bz2", ".zip")
+SOURCE_READ_ERRORS = (requests.exceptions.RequestException, urllib3.exceptions.HTTPError, OSError, EOFError, lzma.LZMAError, zlib.error, zipfile.BadZipFile)
+UPSTREAM_DOWN_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError, urllib3.exceptions.HTTPError)
+UTF8_VALIDATE_BLOCK_BYTES = 1024 * 1024
+# Blue/green updates build the new lists under this prefix while the old rule keeps enforcing
+UPDATE_SWAP_MODE = True
+# Bucket layout: domains are placed by hash instead of by sort order, so upstream churn only rewrites the lists it touches
+LIST_LAYOUT_BUCKETS = False  # default layout for new rules
+BUCKET_TARGET_FILL = 0.8  # a bucket layout is sized for this average fill, leaving room to grow
+BUCKET_MAX_FILL = 0.95  # above this average fill an update adds buckets
+# Bulk deletes share one request budget (Cloudflare allows 1200 requests per 5 minutes)
+BULK_DELETE_WORKERS = 4
+BULK_DELETE_RATE_PER_SECOND = 4.0
+BULK_DELETE_MAX_RETRIES = 3
+BULK_DELETE_RETRY_BACKOFF_SECONDS = 1.0
+# Delete orphaned managed lists automatically after each refresh (toggle in the Actions menu)
+ORPHAN_GC_AUTO_DELETE = False
+LIST_REUSE = True  # share an existing managed list whose content digest matches a chunk instead of creating a duplicate
+HISTORY_KEYFRAME_INTERVAL = 20  # every Nth version of a rule's history is stored in full, the others as deltas
+HISTORY_MAX_VERSIONS = 50
+PERF_TRACE_EXPORT = False  # also write each operation's timings as a Chrome trace-event JSON file
+UPDATE_STAGING_PREFIX = "_staging_"
 METADATA_MARKER_PREFIX = "[CF_ADBLOCK_MGR_V1:"
 METADATA_MARKER_SUFFIX = "]"
 METADATA_URL_KEY = "URL="
 METADATA_PREFIX_KEY = "PREFIX="
 METADATA_HASH_KEY = "HASH="
+METADATA_MODE_KEY = "MODE="
+METADATA_V2_MARKER_PREFIX = "[CF_ADBLOCK_MGR_V2:"
+# Block contents never hold brackets, so a truncated block in the base text cannot run into the real one
+METADATA_BLOCK_PATTERN = re.compile(r'\[CF_ADBLOCK_MGR_V(\d+):([^\[\]]*)\]')
+METADATA_V2_ESCAPE_PATTERN = re.compile(r'\\(.)', re.S)
+METADATA_V1_URL_SPLIT_PATTERN = re.compile(r':(?=PREFIX=|HASH=|MODE=)')
+METADATA_V1_PREFIX_PATTERN = re.compile(r'PREFIX=([^:]+)')
+METADATA_V1_HASH_PATTERN = re.compile(r'HASH=([^:]+)')
+METADATA_V1_MODE_PATTERN = re.compile(r'MODE=([^:]+)')
+METADATA_CACHE_SIZE = 1024
+LIST_DIGEST_PATTERN = re.compile(r'\s*\[CF_ADBLOCK_DIGEST:([0-9a-f]{32})\]')
+MANAGED_DESCRIPTION = "Managed by Gateway Guardian"
+RULE_DESCRIPTION_MAX_LEN = 500
+LIST_UUID_PATTERN = re.compile(r'\$([a-fA-F0-9]{8}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{12})')
+APP_DATA_DIR = os.path.join(os.path.expanduser("~"), ".gateway_guardian")
+DOMAIN_INDEX_SYNC_WORKERS = 4
+ASYNC_API_MAX_CONCURRENCY = 8
+# The async client retries 429s (any method) and 5xx/network errors (GETs only) with exponential backoff
+ASYNC_API_MAX_RETRIES = 3
+ASYNC_API_RETRY_BACKOFF_SECONDS = 1.0
+ASYNC_CANCEL_POLL_SECONDS = 0.1
+FAN_OUT_MAX_ACCOUNTS = 8
+DOMAIN_INDEX_MAX_RESULTS = 500
+ENV_ACCOUNT_ID = "CLOUDFLARE_ACCOUNT_ID"
+ENV_API_TOKEN = "CLOUDFLARE_API_TOKEN"
 APP_ICON_URL = "https://raw.githubusercontent.com/john-holt4/Gateway-Gaurdian/refs/heads/main/logo/logo.png"
 LOGIN_ICON_URL = "https://raw.githubusercontent.com/john-holt4/Gateway-Gaurdian/refs/heads/main/logo/logo-full.png"
+ASSET_DIR = os.path.join(getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__))), "logo")
 class OperationCancelledError(Exception): pass
-class CloudflareAPI:
+class CancelToken(threading.Event):
+    """Cancel flag shared by the worker threads of an operation, cleared when the next operation starts.
+
+    Sleeps taken through it end as soon as it is set, and a blocking call made through run() is abandoned at
+    that moment (left to finish on its own daemon thread, result discarded), so Cancel needs no polling."""
+    def __init__(self):
+        super().__init__()
+        self._waiters, self._waiters_lock = set(), threading.Lock()
+    def set(self):
+        super().set()
+        with self._waiters_lock: waiters = list(self._waiters)
+        for waiter in waiters: waiter.set()
+    def check(self):
+        if self.is_set(): raise OperationCancelledError("Operation cancelled by user.")
+    def sleep(self, seconds):
+        if self.wait(seconds): raise OperationCancelledError("Operation cancelled by user.")
+    def run(self, func, *args, **kwargs):
+        """Return func(*args, **kwargs), or raise OperationCancelledError as soon as the token is set"""
+        self.check()
+        done, outcome = threading.Event(), {}
+        def call():
+            try: outcome["result"] = func(*args, **kwargs)
+            except BaseException as e: outcome["error"] = e
+            finally: done.set()
+        with self._waiters_lock: self._waiters.add(done)
+        try:
+            if self.is_set(): done.set()
+            else: threading.Thread(target=call, daemon=True, name="cancellable-call").start()
+            done.wait()
+        finally:
+            with self._waiters_lock: self._waiters.discard(done)
+        if "error" in outcome: raise outcome["error"]
+        if "result" in outcome: return outcome["result"]
+        raise OperationCancelledError("Operation cancelled by user.")
+def app_data_path(*parts):
+    """Return a path inside the per-user data directory, creating parent folders as needed"""
+    path = os.path.join(APP_DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+class DomainSet:
+    """Sorted, de-duplicated domains stored as one newline-joined ASCII blob plus an array of start offsets.
+
+    At 300k domains this is about 7 MB instead of roughly 25 MB of str objects. chunks() and slicing return
+    views sharing the same blob, and json_items() encodes a view straight into a list payload."""
+    __slots__ = ("blob", "_offsets", "_start", "_stop")
+    JSON_ITEM_SEPARATOR = b'"},{"value":"'
+    def __init__(self, blob=b"", offsets=None, start=0, stop=None):
+        if offsets is None:
+            # offsets[i] is where domain i starts; the final entry is len(blob) + 1 so domain i ends at offsets[i + 1] - 1
+            offsets = array('I', [0]) if blob else array('I')
+            pos = blob.find(b"\n")
+            while pos != -1: offsets.append(pos + 1); pos = blob.find(b"\n", pos + 1)
+            if blob: offsets.append(len(blob) + 1)
+        self.blob, self._offsets = blob, offsets
+        self._start, self._stop = start, (max(len(offsets) - 1, 0) if stop is None else stop)
+    @classmethod
+    def from_iterable(cls, domains):
+        if isinstance(domains, DomainSet): return domains
+        ordered = sorted(domains if isinstance(domains, (set, frozenset)) else set(domains))
+        offsets, pos = array('I'), 0
+        for domain in ordered: offsets.append(pos); pos += len(domain) + 1
+        if ordered: offsets.append(pos)
+        return cls("\n".join(ordered).encode("ascii"), offsets)
+    def __len__(self): return self._stop - self._start
+    def __repr__(self): return f"<DomainSet {len(self)} domains, {len(self.segment())} bytes>"
+    def _domain_bytes(self, index): return self.blob[self._offsets[index]:self._offsets[index + 1] - 1]
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1: raise ValueError("DomainSet slices must be contiguous.")
+            return DomainSet(self.blob, self._offsets, self._start + start, self._start + max(start, stop))
+        if index < 0: index += len(self)
+        if not 0 <= index < len(self): raise IndexError("DomainSet index out of range")
+        return self._domain_bytes(self._start + index).decode("ascii")
+    def segment(self):
+        """Zero-copy view of this set's part of the blob (domains joined by newlines)"""
+        if not len(self): return memoryview(b"")
+        return memoryview(self.blob)[self._offsets[self._start]:self._offsets[self._stop] - 1]
+    def __iter__(self):
+        if len(self): yield from bytes(self.segment()).decode("ascii").split("\n")
+    def __contains__(self, domain):
+        try: target = domain.encode("ascii")
+        except (AttributeError, UnicodeEncodeError): return False
+        low, high = self._start, self._stop
+        while low < high:
+            mid = (low + high) // 2
+            if self._domain_bytes(mid) < target: low = mid + 1
+            else: high = mid
+        return low < self._stop and self._domain_bytes(low) == target
+    def chunks(self, size):
+        for start in range(0, len(self), size): yield self[start:start + size]
+    def text_length(self):
+        """Length of the domains joined by newlines, without building that string"""
+        return len(self.segment())
+    def digest(self):
+        """Content digest of the set (sorted domains joined by newlines), as stored in list descriptions"""
+        return hashlib.sha256(self.segment()).hexdigest()[:32]
+    def json_items(self):
+        """The list-items JSON array ([{"value": ...}, ...]) as bytes; domains are plain ASCII so nothing needs escaping"""
+        if not len(self): return b"[]"
+        return b'[{"value":"' + bytes(self.segment()).replace(b"\n", self.JSON_ITEM_SEPARATOR) + b'"}]'
+class DomainBuckets:
+    """Hash placement of domains into a rule's lists ("buckets") for the bucket layout.
+
+    A domain's bucket depends only on the domain and the bucket count (jump consistent hash), so upstream churn
+    changes only the buckets of the added and removed domains, and adding buckets moves only the domains that land
+    in the new ones. Load is bounded: a bucket over capacity keeps its lowest-hash domains and the rest go to the
+    next bucket with room, in hash order, so the overflow placement is just as stable."""
+    @staticmethod
+    def domain_key(domain): return int.from_bytes(hashlib.blake2b(domain.encode("ascii"), digest_size=8).digest(), "big")
+    @staticmethod
+    def jump_hash(key, num_buckets):
+        """Lamping & Veach, "A Fast, Minimal Memory, Consistent Hash Algorithm" (2014)"""
+        bucket, j = -1, 0
+        while j < num_buckets:
+            bucket = j
+            key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+            j = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+        return bucket
+    @staticmethod
+    def bucket_count(num_domains, current=0):
+        """Keep the current bucket count while its average fill stays under BUCKET_MAX_FILL, else size for BUCKET_TARGET_FILL.
+
+        The account's list limit caps the headroom, so near TOTAL_DOMAIN_LIMIT buckets run fuller and overflow more."""
+        if current and num_domains <= current * MAX_DOMAINS_PER_LIST * BUCKET_MAX_FILL: return current
+        return max(current, min(math.ceil(num_domains / (MAX_DOMAINS_PER_LIST * BUCKET_TARGET_FILL)), MAX_LISTS), math.ceil(num_domains / MAX_DOMAINS_PER_LIST), 1)
+    @classmethod
+    def assign(cls, domains, num_buckets, capacity=MAX_DOMAINS_PER_LIST):
+        """Split domains into num_buckets DomainSets of at most capacity domains each"""
+        if len(domains) > num_buckets * capacity: raise ValueError(f"{len(domains):,} domains do not fit in {num_buckets} bucket(s) of {capacity:,}.")
+        buckets, blake2b, from_bytes = [[] for _ in range(num_buckets)], hashlib.blake2b, int.from_bytes
+        for domain in domains:
+            # domain_key() and jump_hash() inlined: this loop runs once per domain
+            key = seed = from_bytes(blake2b(domain.encode("ascii"), digest_size=8).digest(), "big"); bucket, j = -1, 0
+            while j < num_buckets:
+                bucket = j; seed = (seed * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+                j = int((bucket + 1) * ((1 << 31) / ((seed >> 33) + 1)))
+            buckets[bucket].append((key, domain))
+        overflow = []
+        for index, bucket in enumerate(buckets):
+            if len(bucket) > capacity:
+                bucket.sort(); overflow.extend((key, domain, index) for key, domain in bucket[capacity:]); del bucket[capacity:]
+        for key, domain, home in sorted(overflow):
+            index = next(slot % num_buckets for slot in range(home + 1, home + num_buckets + 1) if len(buckets[slot % num_buckets]) < capacity)
+            buckets[index].append((key, domain))
+        return [DomainSet.from_iterable({domain for _, domain in bucket}) for bucket in buckets]
+class ListDigest:
+    """Content digests in managed list descriptions ('... [CF_ADBLOCK_DIGEST:<hex>]').
+
+    Lists whose items change in place after creation (bucket layout) carry none, so they are never shared."""
+    @staticmethod
+    def of(items):
+        if isinstance(items, DomainSet): return items.digest()
+        return hashlib.sha256("\n".join(sorted(set(items))).encode("utf-8")).hexdigest()[:32]
+    @staticmethod
+    def read(description):
+        match = LIST_DIGEST_PATTERN.search(description or "")
+        return match.group(1) if match else None
+    @classmethod
+    def describe(cls, description, items):
+        """description with its digest set to that of items"""
+        return f"{LIST_DIGEST_PATTERN.sub('', description or '').rstrip()} [CF_ADBLOCK_DIGEST:{cls.of(items)}]".lstrip()
+class SourceDecoder:
+    """Decodes blocklist bytes: BOM first, then strict UTF-8, then chardet's incremental detector on a capped sample.
+
+    The encoding chosen for a source (URL or file path) is cached for the session, so refetches skip detection."""
+    BOMS = ((codecs.BOM_UTF32_LE, "utf-32"), (codecs.BOM_UTF32_BE, "utf-32"), (codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+    _cache = {}
+    @classmethod
+    def bom_encoding(cls, raw):
+        """Return (encoding, BOM length) when raw starts with a byte order mark, else (None, 0)"""
+        for bom, encoding in cls.BOMS:
+            if raw[:len(bom)] == bom: return encoding, len(bom)
+        return None, 0
+    @staticmethod
+    def is_utf8(buffer):
+        """Validate a (possibly memory-mapped) buffer as UTF-8 block by block, without keeping the decoded text"""
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        try:
+            for start in range(0, len(buffer), UTF8_VALIDATE_BLOCK_BYTES): decoder.decode(buffer[start:start + UTF8_VALIDATE_BLOCK_BYTES])
+            decoder.decode(b"", final=True); return True
+        except UnicodeDecodeError: return False
+    @classmethod
+    def _detect_sample(cls, raw):
+        if not HAS_CHARDET: return None, "chardet not installed"
+        detector = chardet.UniversalDetector()
+        for start in range(0, min(len(raw), ENCODING_SAMPLE_BYTES), ENCODING_DETECT_BLOCK_BYTES):
+            detector.feed(raw[start:start + ENCODING_DETECT_BLOCK_BYTES])
+            if detector.done: break
+        result = detector.close(); encoding, confidence = result.get("encoding"), result.get("confidence") or 0.0
+        # An ASCII verdict only means the sample was ASCII; UTF-8 already failed on the full buffer
+        if not encoding or encoding.lower() == "ascii" or confidence < ENCODING_MIN_CONFIDENCE: return None, f"low confidence ({encoding} @ {confidence:.2f})"
+        return encoding, f"chardet, confidence {confidence:.2f}"
+    @classmethod
+    def decode(cls, raw, source=None):
+        """Return (text, encoding, how the encoding was chosen)"""
+        encoding, _ = cls.bom_encoding(raw)
+        if encoding: return raw.decode(encoding, errors='ignore'), encoding, "byte order mark"
+        cached = cls._cache.get(source) if source else None
+        if cached and cached != "utf-8": return raw.decode(cached, errors='ignore'), cached, "cached for this source"
+        try: text, encoding, how = raw.decode("utf-8"), "utf-8", ("cached for this source" if cached else "valid UTF-8")
+        except UnicodeDecodeError:
+            encoding, how = cls._detect_sample(raw)
+            if encoding:
+                try: text = raw.decode(encoding, errors='ignore')
+                except LookupError: encoding, how = None, f"unknown codec {encoding}"
+            if not encoding: encoding, how = "latin-1", f"fallback, {how}"; text = raw.decode("latin-1")
+        if source: cls._cache[source] = encoding
+        return text, encoding, how
+def iter_text_lines(text):
+    """Yield the lines of text without building a list of them; '\\r' is left for the caller's strip()"""
+    separator = "\n" if "\n" in text[:65536] or "\r" not in text[:65536] else "\r"
+    start, size = 0, len(text)
+    while start < size:
+        end = text.find(separator, start)
+        if end == -1: end = size
+        yield text[start:end]; start = end + 1
+class MappedLineReader:
+    """Iterates the lines of a local file through mmap, decoding one line at a time.
+
+    Memory stays flat however large the file is. After iteration, text_length and line_count match
+    len(decoded text) and its line count, so the size-based content hash is unchanged."""
+    def __init__(self, path, source=None):
+        self.path, self.size, self.source = path, os.path.getsize(path), source or os.path.abspath(path)
+        self.encoding, self.how, self.text_length, self.line_count = None, "", 0, 0
+        self.compression = self.cache_status = self.cache_age = None
+    def _choose_encoding(self, mm):
+        source = self.source
+        encoding, bom_length = SourceDecoder.bom_encoding(mm)
+        if encoding: return (encoding, bom_length, "byte order mark") if encoding == "utf-8-sig" else (None, 0, "byte order mark")
+        cached = SourceDecoder._cache.get(source)
+        if cached and cached != "utf-8": encoding, how = cached, "cached for this source"
+        elif SourceDecoder.is_utf8(mm): encoding, how = "utf-8", ("cached for this source" if cached else "valid UTF-8")
+        else:
+            encoding, how = SourceDecoder._detect_sample(mm[:ENCODING_SAMPLE_BYTES])
+            if not encoding: encoding, how = "latin-1", f"fallback, {how}"
+        SourceDecoder._cache[source] = encoding
+        # Line scanning on raw bytes needs '\\n' to be the single byte 0x0A, which rules out UTF-16/32
+        try: ascii_compatible = "\n".encode(encoding) == b"\n"
+        except LookupError: encoding, ascii_compatible = "latin-1", True
+        return (encoding, 0, how) if ascii_compatible else (None, 0, how)
+    def __iter__(self):
+        self.text_length = self.line_count = 0
+        if self.size == 0: return
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            encoding, pos, self.how = self._choose_encoding(mm)
+            if encoding is None:
+                text, self.encoding, self.how = SourceDecoder.decode(mm[:], self.source)
+                self.text_length = len(text)
+                for line in iter_text_lines(text): self.line_count += 1; yield line
+                return
+            self.encoding = "utf-8-sig" if encoding == "utf-8-sig" else encoding
+            line_encoding = "utf-8" if encoding == "utf-8-sig" else encoding
+            separator = b"\n" if mm.find(b"\n", 0, 65536) != -1 or mm.find(b"\r", 0, 65536) == -1 else b"\r"
+            while pos < self.size:
+                end = mm.find(separator, pos)
+                if end == -1: end, newline = self.size, 0
+                else: newline = 1
+                line = mm[pos:end].decode(line_encoding, errors='ignore')
+                self.text_length += len(line) + newline; self.line_count += 1
+                yield line
+                pos = end + 1
+def detect_compression(head):
+    """Name the compression format from a source's first bytes ("gzip", "xz", "bzip2", "zip"), or None for plain text"""
+    for magic, kind in COMPRESSION_MAGIC:
+        if head[:len(magic)] == magic: return kind
+    return None
+def _open_zip_member(archive):
+    """Open the largest file in a zip archive; the member keeps the archive's file open until it is closed"""
+    with archive:
+        members = [info for info in archive.infolist() if not info.is_dir()]
+        if not members: raise zipfile.BadZipFile("Zip archive contains no files.")
+        return archive.open(max(members, key=lambda info: info.file_size))
+class StreamLineReader:
+    """Iterates the lines of a byte stream (a decompressor or an HTTP body) block by block, decoding one line at a time.
+
+    open_stream returns a context manager yielding a binary file object. Nothing holds the whole decompressed text;
+    text_length and line_count mean the same as in MappedLineReader. UTF-8 is assumed until a line fails to decode,
+    then the encoding is detected from the first block. buffered=True decodes the body in one go through SourceDecoder."""
+    def __init__(self, open_stream, source, size=0, compression=None, buffered=False):
+        self.open_stream, self.source, self.size, self.compression, self.buffered = open_stream, source, size, compression, buffered
+        self.encoding, self.how, self.text_length, self.line_count = None, "", 0, 0
+        self.cache_status = self.cache_age = None
+    def _iter_decoded(self, raw):
+        text, self.encoding, self.how = SourceDecoder.decode(raw, self.source)
+        self.text_length = len(text)
+        for line in iter_text_lines(text): self.line_count += 1; yield line
+    def _fallback_encoding(self, sample):
+        encoding, how = SourceDecoder._detect_sample(sample)
+        if not encoding: return "latin-1", f"fallback, {how}"
+        try: ascii_compatible = "\n".encode(encoding) == b"\n"
+        except LookupError: return "latin-1", f"fallback, unknown codec {encoding}"
+        return (encoding, how) if ascii_compatible else ("latin-1", f"fallback, {encoding} is not line-splittable")
+    def __iter__(self):
+        self.text_length = self.line_count = 0
+        with self.open_stream() as stream:
+            if self.buffered: yield from self._iter_decoded(stream.read()); return
+            block = stream.read(SOURCE_READ_BLOCK_BYTES)
+            if not block: return
+            encoding, bom_length = SourceDecoder.bom_encoding(block)
+            # UTF-16/32 cannot be split on single newline bytes, so those (rare) bodies are decoded whole
+            if encoding and encoding != "utf-8-sig": yield from self._iter_decoded(block + stream.read()); return
+            sample, cached = block[:ENCODING_SAMPLE_BYTES], SourceDecoder._cache.get(self.source)
+            if encoding: self.encoding, self.how, line_encoding, errors = encoding, "byte order mark", "utf-8", 'ignore'; block = block[bom_length:]
+            elif cached and cached != "utf-8": self.encoding = line_encoding = cached; self.how, errors = "cached for this source", 'ignore'
+            else: self.encoding = line_encoding = "utf-8"; self.how, errors = ("cached for this source" if cached else "valid UTF-8"), 'strict'
+            separator = b"\n" if b"\n" in block[:65536] or b"\r" not in block[:65536] else b"\r"
+            pending = b""
+            while True:
+                data, start = (pending + block if pending else block), 0
+                last = not block
+                while start < len(data):
+                    end = data.find(separator, start)
+                    if end == -1:
+                        if not last: break
+                        end, newline = len(data), 0
+                    else: newline = 1
+                    try: line = data[start:end].decode(line_encoding, errors)
+                    except UnicodeDecodeError:
+                        line_encoding, self.how = self._fallback_encoding(sample)
+                        self.encoding, errors = line_encoding, 'ignore'; line = data[start:end].decode(line_encoding, errors)
+                    self.text_length += len(line) + newline; self.line_count += 1
+                    yield line
+                    start = end + 1
+                if last: break
+                pending, block = data[start:], stream.read(SOURCE_READ_BLOCK_BYTES)
+        if self.source: SourceDecoder._cache[self.source] = self.encoding
+    def measure(self):
+        """Read the whole source without keeping any lines and return (text_length, line_count)"""
+        for _ in self: pass
+        return self.text_length, self.line_count
+def open_blocklist_file(path, source=None):
+    """Return a line source for a local blocklist: memory-mapped for plain text, streamed through a decompressor otherwise.
+
+    source is the key the detected encoding is remembered under (the file path by default)."""
+    with open(path, 'rb') as f: compression = detect_compression(f.read(8))
+    if not compression: return MappedLineReader(path, source)
+    if compression == "zip": open_stream = lambda: _open_zip_member(zipfile.ZipFile(path))
+    else: open_stream = functools.partial(COMPRESSION_OPENERS[compression], path, 'rb')
+    return StreamLineReader(open_stream, source or os.path.abspath(path), os.path.getsize(path), compression)
+class SourceCache:
+    """On-disk cache of blocklist bodies keyed by URL, stored as received (compressed sources stay compressed).
+
+    An entry is served without a request for its Cache-Control max-age (SOURCE_CACHE_FRESH_SECONDS when there is none),
+    then revalidated with If-None-Match/If-Modified-Since. While the upstream is unreachable or failing, entries younger
+    than SOURCE_CACHE_STALE_SECONDS are served as stale. Least recently used entries go once SOURCE_CACHE_MAX_BYTES is exceeded."""
+    _lock = threading.Lock()
+    def __init__(self, directory=None, max_bytes=SOURCE_CACHE_MAX_BYTES, stale_seconds=SOURCE_CACHE_STALE_SECONDS):
+        self.directory = directory or os.path.join(APP_DATA_DIR, "source_cache")
+        self.max_bytes, self.stale_seconds = max_bytes, stale_seconds
+    def _meta_path(self, url): return os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+    def body_path(self, entry): return os.path.join(self.directory, entry["body"])
+    @staticmethod
+    def cache_control(headers):
+        """Return (cacheable, max_age) from the response headers; max_age is None when the server gave none"""
+        directives = {}
+        for part in (headers.get("Cache-Control") or "").split(","):
+            name, _, value = part.strip().partition("=")
+            if name: directives[name.lower()] = value.strip('" ')
+        if "no-store" in directives: return False, None
+        if "no-cache" in directives: return True, 0
+        try: return True, max(int(directives["max-age"]), 0)
+        except (KeyError, ValueError): return True, None
+    def lookup(self, url):
+        try:
+            with open(self._meta_path(url), 'r', encoding='utf-8') as f: entry = json.load(f)
+            if entry.get("url") == url and os.path.exists(self.body_path(entry)): return entry
+        except (OSError, ValueError): pass
+        return None
+    def age(self, entry): return max(time.time() - entry.get("fetched_at", 0), 0)
+    def is_fresh(self, entry):
+        max_age = entry.get("max_age")
+        return self.age(entry) < (SOURCE_CACHE_FRESH_SECONDS if max_age is None else max_age)
+    def is_usable_stale(self, entry): return self.age(entry) < self.stale_seconds
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry.get("etag"): headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"): headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+    def _write_entry(self, entry):
+        meta_path = self._meta_path(entry["url"]); tmp_path = f"{meta_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f: json.dump(entry, f)
+        os.replace(tmp_path, meta_path)
+    def revalidated(self, entry, headers):
+        """Restart an entry's freshness after a 304, taking any validators the server sent along"""
+        entry = dict(entry, fetched_at=time.time())
+        entry["max_age"] = self.cache_control(headers)[1]
+        if headers.get("ETag"): entry["etag"] = headers["ETag"]
+        if headers.get("Last-Modified"): entry["last_modified"] = headers["Last-Modified"]
+        with self._lock: self._write_entry(entry)
+        return entry
+    def store(self, url, stream, headers):
+        """Copy a response body to disk and record it with its validators; the previous body is replaced"""
+        os.makedirs(self.directory, exist_ok=True)
+        key = os.path.basename(self._meta_path(url))[:-len(".json")]
+        body_name = f"{key}-{uuid.uuid4().hex[:12]}.body"; body_path = os.path.join(self.directory, body_name)
+        try:
+            with open(body_path, 'wb') as f: shutil.copyfileobj(stream, f, SOURCE_READ_BLOCK_BYTES)
+        except BaseException:
+            with contextlib.suppress(OSError): os.remove(body_path)
+            raise
+        entry = {"url": url, "body": body_name, "etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified"),
+                 "max_age": self.cache_control(headers)[1], "fetched_at": time.time(), "size": os.path.getsize(body_path)}
+        with self._lock:
+            previous = self.lookup(url)
+            self._write_entry(entry)
+            # A body that is still open elsewhere (Windows) cannot be removed yet; evict() sweeps it up later
+            if previous and previous["body"] != body_name:
+                with contextlib.suppress(OSError): os.remove(self.body_path(previous))
+            self.evict(keep=body_name)
+        return entry
+    def open(self, entry, status):
+        """Return a line source over a cached body, marking the entry as recently used"""
+        path = self.body_path(entry)
+        with contextlib.suppress(OSError): os.utime(path)
+        source = open_blocklist_file(path, source=entry["url"])
+        source.cache_status, source.cache_age = status, self.age(entry)
+        return source
+    def evict(self, keep=None):
+        """Delete unreferenced bodies, then least recently used entries (never the body named keep) until the cache fits in max_bytes"""
+        try: names = os.listdir(self.directory)
+        except OSError: return
+        entries, referenced = [], set()
+        for name in names:
+            if not name.endswith(".json"): continue
+            try:
+                with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f: entry = json.load(f)
+                stat = os.stat(self.body_path(entry))
+            except (OSError, ValueError, KeyError, TypeError):
+                with contextlib.suppress(OSError): os.remove(os.path.join(self.directory, name))
+                continue
+            referenced.add(entry["body"]); entries.append((stat.st_mtime, stat.st_size, name, entry["body"]))
+        for name in names:
+            if name.endswith(".body") and name not in referenced:
+                with contextlib.suppress(OSError): os.remove(os.path.join(self.directory, name))
+        total = sum(size for _, size, _, _ in entries)
+        for _, size, meta_name, body_name in sorted(entries):
+            if total <= self.max_bytes: break
+            if body_name == keep: continue
+            with contextlib.suppress(OSError): os.remove(os.path.join(self.directory, meta_name)); os.remove(os.path.join(self.directory, body_name))
+            total -= size
+def fetch_blocklist_url(url, timeout=30, cache=None):
+    """GET a blocklist and return a line source; compressed bodies are decompressed while they download.
+
+    Plain bodies are read and decoded whole, exactly as before, so the stored size hashes of existing rules still match.
+    With a SourceCache the body is stored on disk and parsed from there; the source's cache_status then says whether it
+    came from the network ("miss"), a fresh or revalidated entry, or a stale one because the upstream failed."""
+    entry = cache.lookup(url) if cache else None
+    if entry and cache.is_fresh(entry): return cache.open(entry, "fresh")
+    headers = {'User-Agent': 'Mozilla/5.0'}
+    if entry: headers.update(cache.conditional_headers(entry))
+    try: response = requests.get(url, timeout=timeout, headers=headers, allow_redirects=True, stream=True)
+    except UPSTREAM_DOWN_ERRORS:
+        if entry and cache.is_usable_stale(entry): return cache.open(entry, "stale")
+        raise
+    try:
+        if entry and response.status_code == 304: response.close(); return cache.open(cache.revalidated(entry, response.headers), "revalidated")
+        if entry and (response.status_code == 429 or response.status_code >= 500) and cache.is_usable_stale(entry): response.close(); return cache.open(entry, "stale")
+        response.raise_for_status()
+        response.raw.decode_content = True  # undo transport (Content-Encoding) compression; a .gz file itself stays compressed
+        response.raw.auto_close = False  # keep the body readable at EOF for the BufferedReader/decompressor wrapped around it
+        body = io.BufferedReader(response.raw, SOURCE_READ_BLOCK_BYTES)
+        if cache and cache.cache_control(response.headers)[0]:
+            with response: return cache.open(cache.store(url, body, response.headers), "miss")
+        compression, size = detect_compression(body.peek(8)[:8]), int(response.headers.get("Content-Length") or 0)
+        if compression == "zip":
+            spool = tempfile.SpooledTemporaryFile(max_size=SOURCE_SPOOL_MEMORY_BYTES)
+            shutil.copyfileobj(body, spool, SOURCE_READ_BLOCK_BYTES); size = spool.tell(); spool.seek(0); response.close()
+            return StreamLineReader(lambda: _open_zip_member(zipfile.ZipFile(spool)), url, size, compression)
+    except UPSTREAM_DOWN_ERRORS:
+        response.close()
+        if entry and cache.is_usable_stale(entry): return cache.open(entry, "stale")
+        raise
+    except Exception: response.close(); raise
+    @contextlib.contextmanager
+    def open_stream():
+        with response:
+            if not compression: yield body; return
+            with COMPRESSION_OPENERS[compression](body, 'rb') as stream: yield stream
+    return StreamLineReader(open_stream, url, size, compression, buffered=not compression)
+class PerfRecorder:
+    """Timing spans and counters for one operation, shared by its worker and pool threads.
+
+    API calls are recorded by CloudflareAPI._request as "METHOD /endpoint" with list/rule IDs collapsed, so summary()
+    reports count, total, p50 and p95 per endpoint next to the parse/chunk/phase spans, sleep time and counters."""
+    ID_PATTERN = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+    def __init__(self, operation):
+        self.operation, self.started, self.finished = operation, time.perf_counter(), None
+        self.spans, self.counters, self._lock = [], {}, threading.Lock()
+    @classmethod
+    def endpoint_name(cls, method, endpoint): return f"{method.upper()} {cls.ID_PATTERN.sub('{id}', endpoint)}"
+    def add_span(self, name, start, end, **args):
+        with self._lock: self.spans.append((name, start, end, threading.get_ident(), args))
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        """Time a block; the yielded dict can be filled with details that end up in the trace"""
+        start = time.perf_counter()
+        try: yield args
+        finally: self.add_span(name, start, time.perf_counter(), **args)
+    def count(self, name, amount=1):
+        with self._lock: self.counters[name] = self.counters.get(name, 0) + amount
+    def finish(self):
+        if self.finished is None: self.finished = time.perf_counter()
+        return self
+    @property
+    def elapsed(self): return (self.finished or time.perf_counter()) - self.started
+    def stats(self):
+        """{span name: (count, total, p50, p95)} in seconds, in order of first occurrence"""
+        durations = {}
+        with self._lock:
+            for name, start, end, _, _ in self.spans: durations.setdefault(name, []).append(end - start)
+        stats = {}
+        for name, values in durations.items():
+            ordered = sorted(values)
+            percentile = lambda pct: ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+            stats[name] = (len(ordered), sum(ordered), percentile(50), percentile(95))
+        return stats
+    def summary(self):
+        stats = self.stats()
+        width = max([len(name) for name in stats] + [4])
+        lines = [f"Timings for {self.operation} ({self.elapsed:.2f} s):", f"  {'span':<{width}}  {'n':>5}  {'total':>8}  {'p50':>8}  {'p95':>8}"]
+        lines += [f"  {name:<{width}}  {n:>5}  {total:>7.2f}s  {p50 * 1000:>6.0f}ms  {p95 * 1000:>6.0f}ms" for name, (n, total, p50, p95) in stats.items()]
+        with self._lock: counters = dict(self.counters)
+        sleep = counters.pop("sleep_seconds", 0.0)
+        extra = ", ".join(f"{name.replace('_', ' ')} {value:,}" for name, value in sorted(counters.items()))
+        lines.append(f"  sleep {sleep:.2f} s (all threads)" + (f"; {extra}" if extra else ""))
+        return "\n".join(lines)
+    def trace_events(self):
+        """Spans as Chrome trace events (load the JSON in chrome://tracing or Perfetto)"""
+        with self._lock: spans, counters = list(self.spans), dict(self.counters)
+        events = [{"name": name, "ph": "X", "ts": round((start - self.started) * 1e6), "dur": round((end - start) * 1e6), "pid": 1, "tid": tid, "args": args} for name, start, end, tid, args in spans]
+        return {"traceEvents": events, "otherData": {"operation": self.operation, "elapsed_seconds": self.elapsed, "counters": counters}}
+    def export(self, path):
+        with open(path, 'w', encoding='utf-8') as f: json.dump(self.trace_events(), f)
+        return path
+class CloudflareAPIBase:
+    """Transport-independent half of the Gateway API clients: credentials, request bodies, response parsing,
+    error classification and request timing. CloudflareAPI sends with requests from the calling thread,
+    AsyncCloudflareAPI with httpx on an event loop."""
+    STATUS_PATTERN = re.compile(r"Status: (\d{3})")
+    TRANSIENT_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, TimeoutError, ConnectionResetError, ConnectionRefusedError, ConnectionAbortedError) + ((httpx.TransportError,) if HAS_HTTPX else ())
     def __init__(self, api_token, account_id):
         if not api_token or not account_id: raise ValueError("API Token and Account ID cannot be empty.")
         self.api_token, self.account_id = api_token.strip(), account_id.strip()
         self.headers = {"Authorization": f"Bearer {self.api_token}", "Content-Type": "application/json", "User-Agent": f"Python-{APP_NAME}/{APP_VERSION} ({os.name})"}
         self.base_url = f"{API_BASE_URL}/accounts/{self.account_id}/gateway"
+        # None until the first compressed body succeeds or is rejected
+        self.gzip_bodies_accepted = None if LIST_BODY_GZIP else False
+    @classmethod
+    def error_status(cls, error):
+        """HTTP status quoted in an API error ('Status: NNN'), or None"""
+        match = cls.STATUS_PATTERN.search(str(error)); return int(match.group(1)) if match else None
+    @classmethod
+    def is_transient(cls, error):
+        """Whether a failed call is worth retrying: 429, 5xx, or a network failure or timeout under the ConnectionError wrapper"""
+        status = cls.error_status(error)
+        if status is not None: return status == 429 or status >= 500
+        while error is not None:
+            if isinstance(error, cls.TRANSIENT_ERRORS): return True
+            error = error.__cause__
+        return False
+    def _record_request(self, perf, method, endpoint, start, response, kwargs):
+        status = response.status_code if response is not None else None
+        sent = len(kwargs["data"]) if kwargs.get("data") is not None else len(json.dumps(kwargs["json"])) if kwargs.get("json") is not None else 0
+        perf.add_span(PerfRecorder.endpoint_name(method, endpoint), start, time.perf_counter(), status=status, sent=sent)
+        perf.count("api_requests"); perf.count("bytes_sent", sent)
+        if response is not None: perf.count("bytes_received", len(response.content or b""))
+        if status == 429: perf.count("http_429")
+        elif status is None or status >= 400: perf.count("api_errors")
+    @staticmethod
+    def _parse_response(method, endpoint, response):
+        """Turn a successful response into the API's JSON envelope (empty results normalised to [] for lists and rules)"""
+        if response.status_code == 204 or (response.status_code == 200 and not response.content and method.upper() in ('DELETE', 'PUT', 'PATCH')):
+            return {"success": True, "result": None}
+        content_type = response.headers.get('Content-Type', '')
+        if 'application/json' in content_type:
+            try:
+                json_response = response.json()
+                is_list_or_rule_endpoint = '/lists' in endpoint or '/rules' in endpoint
+                if json_response.get("success") and json_response.get("result") is None and is_list_or_rule_endpoint:
+                    return {"success": True, "result": []}
+                return json_response
+            except json.JSONDecodeError:
+                if not response.content:
+                    is_list_or_rule_endpoint = '/lists' in endpoint or '/rules' in endpoint
+                    return {"success": True, "result": [] if is_list_or_rule_endpoint else None}
+                else:
+                    raise ConnectionError(f"API ({method} {endpoint}) Invalid JSON: {response.text[:200]}")
+        elif not response.content and response.status_code == 200:
+            is_list_or_rule_endpoint = '/lists' in endpoint or '/rules' in endpoint
+            return {"success": True, "result": [] if is_list_or_rule_endpoint else None}
+        return {"success": True, "result": response.text}
+    @staticmethod
+    def _lists_result(response, name_prefix=""):
+        if not response or not response.get("success"):
+            if response and response.get("success") is True and response.get("result") is None: return []
+            raise ConnectionError(f"API call to get lists failed. Response: {response}")
+        lists = response.get("result", []) or []
+        if name_prefix and isinstance(name_prefix, str):
+            return [lst for lst in lists if lst.get("name", "").startswith(name_prefix)]
+        return lists
+    @staticmethod
+    def _list_body(fields, items):
+        """Encode a list payload directly to bytes; DomainSet items skip building one dict per domain"""
+        items_json = items.json_items() if isinstance(items, DomainSet) else json.dumps([{"value": item} for item in items]).encode("utf-8")
+        return json.dumps(fields).encode("utf-8")[:-1] + b', "items": ' + items_json + b"}"
+    def _create_list_body(self, name, domains, digest=True):
+        if not name: raise ValueError("List name cannot be empty.")
+        if not isinstance(domains, (list, DomainSet)): raise ValueError("Domains must be provided as a list or DomainSet.")
+        if self.perf: self.perf.count("items_uploaded", len(domains))
+        description = ListDigest.describe(MANAGED_DESCRIPTION, domains) if digest else MANAGED_DESCRIPTION
+        return self._list_body({"name": name, "description": description, "type": "DOMAIN"}, domains)
+    def _update_list_body(self, list_id, name, description, items):
+        if not list_id: raise ValueError("List ID cannot be empty.")
+        if not name: raise ValueError("List name cannot be empty.")
+        if not isinstance(items, (list, DomainSet)): raise ValueError("Items must be a list or DomainSet.")
+        if self.perf: self.perf.count("items_uploaded", len(items))
+        # A list that carried a digest keeps one that matches its new items
+        if ListDigest.read(description): description = ListDigest.describe(description, items)
+        return self._list_body({"name": name, "description": description}, items)
+    @staticmethod
+    def _list_items_patch(list_id, append, remove):
+        if not list_id: raise ValueError("List ID cannot be empty.")
+        payload = {}
+        if append: payload["append"] = [{"value": item} for item in append]
+        if remove: payload["remove"] = list(remove)
+        if not payload: raise ValueError("Nothing to patch (append or remove must be provided).")
+        return payload
+    @staticmethod
+    def _list_patch(list_id, name, description):
+        if not list_id: raise ValueError("List ID cannot be empty.")
+        payload = {}
+        if name is not None: payload["name"] = name
+        if description is not None: payload["description"] = description
+        if not payload: raise ValueError("Nothing to patch (name or description must be provided).")
+        return payload
+    @staticmethod
+    def _rules_result(response, rule_name=""):
+        if not response or not response.get("success"):
+            if response and response.get("success") is True and response.get("result") is None: return []
+            raise ConnectionError(f"API call to get rules failed. Response: {response}")
+        rules = response.get("result", []) or []
+        if rule_name and isinstance(rule_name, str):
+            return [rule for rule in rules if rule.get("name") == rule_name]
+        return rules
+    @classmethod
+    def _rule_payload(cls, name, list_ids, id_map, description, action, enabled, filters, source_url, list_prefix, content_hash, layout=None):
+        if not name: raise ValueError("Rule name cannot be empty.")
+        if not list_ids or not isinstance(list_ids, list): raise ValueError("Invalid list_ids provided.")
+        if id_map is None: raise ValueError("ID map cannot be None for rule creation.")
+        existing_metadata = RuleMetadataCodec.decode(description)
+        base_description = existing_metadata.base_description or MANAGED_DESCRIPTION
+        source_url = source_url or existing_metadata.url
+        list_prefix = list_prefix or existing_metadata.prefix
+        layout = layout or existing_metadata.mode
+        final_description = RuleMetadataCodec.compose_description(base_description, source_url, list_prefix, content_hash, mode=layout if layout == "buckets" else None)
+        expression_ids, missing_ids_in_map = [], []
+        for list_id in list_ids:
+            expression_id = id_map.get(list_id)
+            if not expression_id: missing_ids_in_map.append(list_id)
+            else: expression_ids.append(expression_id)
+        if missing_ids_in_map: raise ValueError(f"Cannot create rule: ID(s) missing in map for list ID(s): {', '.join(missing_ids_in_map)}.")
+        if len(expression_ids) != len(list_ids): raise ConnectionError("Internal Error: Mismatch between list IDs and expression IDs.")
+        return {"name": name, "description": final_description, "action": action, "enabled": enabled, "filters": filters or ["dns"], "traffic": cls.traffic_expression(expression_ids)}
+    @staticmethod
+    def traffic_expression(list_ids): return " or ".join(f'any(dns.domains[*] in ${list_id})' for list_id in list_ids)
+    @staticmethod
+    def _rule_patch(rule_id, name, description, enabled, traffic):
+        if not rule_id: raise ValueError("Rule ID cannot be empty.")
+        payload = {}
+        if name is not None: payload["name"] = name
+        
+        # If description is provided, ensure it has consistent metadata formatting
+        if description is not None:
+            # Just use the description as provided - don't try to clean it
+            # This ensures any HASH values added by the update process remain intact
+            payload["description"] = description
+            
+        if enabled is not None: payload["enabled"] = enabled
+        if traffic is not None: payload["traffic"] = traffic
+        if not payload: raise ValueError("Nothing to patch (name, description, enabled, or traffic must be provided).")
+        return payload
+class CloudflareAPI(CloudflareAPIBase):
+    def __init__(self, api_token, account_id):
+        super().__init__(api_token, account_id)
+        self._local = threading.local()
+        # Read-through GET cache and in-flight GETs, keyed by endpoint; _generation counts mutations
+        self._get_cache, self._get_flights, self._generation = {}, {}, 0
+        self._cache_lock = threading.Lock()
+        # Mutations abandoned by a cancel that have not finished yet; the callback runs (on the sending thread)
+        # once the last of them ends, after the cache was invalidated, so a caller can re-read what they changed
+        self._abandoned_mutations, self.on_abandoned_settled = 0, None
+    class _Flight:
+        __slots__ = ("done", "result", "error")
+        def __init__(self): self.done, self.result, self.error = threading.Event(), None, None
+    def invalidate_cache(self):
+        """Forget cached GET results; GETs already in flight finish but are neither cached nor shared with new callers"""
+        with self._cache_lock: self._generation += 1; self._get_cache.clear(); self._get_flights.clear()
+    @property
+    def abandoned_mutations(self):
+        with self._cache_lock: return self._abandoned_mutations
+    def _track_mutation(self, call, state):
+        """Note that a mutation has "started", been "abandoned" by a cancel, or "ended" (call is its set of states)"""
+        with self._cache_lock:
+            call.add(state)
+            # Counted from when it is both started and abandoned (in either order) until it ends
+            if state != "ended":
+                if call == {"started", "abandoned"}: self._abandoned_mutations += 1
+                return
+            if "abandoned" not in call: return
+            self._abandoned_mutations -= 1; settled = self._abandoned_mutations == 0
+        if settled and self.on_abandoned_settled: self.on_abandoned_settled()
+    def _cached(self, endpoint):
+        with self._cache_lock: entry = self._get_cache.get(endpoint)
+        return entry[1] if entry and entry[0] > time.monotonic() else None
+    def _cached_get(self, endpoint, timeout):
+        """GET through the cache; concurrent callers of the same endpoint share one request (single flight)"""
+        while True:
+            with self._cache_lock:
+                entry = self._get_cache.get(endpoint)
+                if entry and entry[0] > time.monotonic():
+                    if self.perf: self.perf.count("cache_hits")
+                    return copy.deepcopy(entry[1])
+                flight = self._get_flights.get(endpoint); leader = flight is None
+                if leader: flight = self._get_flights[endpoint] = self._Flight(); generation = self._generation
+            if not leader:
+                cancel_token = getattr(self._local, "cancel_token", None)
+                if cancel_token is not None: cancel_token.run(flight.done.wait)
+                else: flight.done.wait()
+                # A leader abandoned by its own cancel says nothing about this caller's request: issue it again
+                if isinstance(flight.error, OperationCancelledError): continue
+                if flight.error is not None: raise flight.error
+                if self.perf: self.perf.count("coalesced_requests")
+                return copy.deepcopy(flight.result)
+            try:
+                flight.result = self._request("GET", endpoint, timeout=timeout)
+                with self._cache_lock:
+                    if generation == self._generation and API_GET_CACHE_SECONDS > 0: self._get_cache[endpoint] = (time.monotonic() + API_GET_CACHE_SECONDS, flight.result)
+                return copy.deepcopy(flight.result)
+            except BaseException as e: flight.error = e; raise
+            finally:
+                with self._cache_lock:
+                    if self._get_flights.get(endpoint) is flight: del self._get_flights[endpoint]
+                flight.done.set()
+    def bind_cancel_token(self, token):
+        """Make requests from the calling thread return as soon as token (a CancelToken) is set; None unbinds"""
+        self._local.cancel_token = token if isinstance(token, CancelToken) else None
+    @property
+    def perf(self):
+        """PerfRecorder bound to the calling thread, if any; threads a worker starts must bind it themselves"""
+        return getattr(self._local, "perf", None)
+    def bind_perf(self, recorder):
+        """Time the requests made from the calling thread on recorder (a PerfRecorder); None unbinds"""
+        self._local.perf = recorder
+    def pause(self, seconds, event=None):
+        """Sleep between calls (or wait on event, returning whether it was set), booking the time to the attached recorder"""
+        start = time.perf_counter()
+        try: return event.wait(seconds) if event is not None else time.sleep(seconds)
+        finally:
+            if self.perf: self.perf.count("sleep_seconds", time.perf_counter() - start)
     def _request(self, method, endpoint, **kwargs):
         url = f"{self.base_url}{endpoint}"
         response = None
         timeout = kwargs.pop('timeout', 45)
+        extra_headers = kwargs.pop('headers', None)
+        headers = {**self.headers, **extra_headers} if extra_headers else self.headers
+        perf, start = self.perf, time.perf_counter()
+        cancel_token = getattr(self._local, "cancel_token", None)
+        mutation = method.upper() != "GET"
+        call = set()
+        def send():
+            if mutation: self._track_mutation(call, "started")
+            try: return requests.request(method, url, headers=headers, timeout=timeout, **kwargs)
+            finally:
+                # After the request really ends (the change may have landed even on error), which for a call abandoned
+                # by a cancel is later than _request returning, so nothing read in between stays cached
+                if mutation: self.invalidate_cache(); self._track_mutation(call, "ended")
+        # And before, so nothing fetched while the mutation is in flight is cached
+        if mutation: self.invalidate_cache()
         try:
-            response = requests.request(method, url, headers=self.headers, timeout=timeout, **kwargs)
+            response = cancel_token.run(send) if cancel_token is not None else send()
             response.raise_for_status()
-            if response.status_code == 204 or (response.status_code == 200 and not response.content and method.upper() in ('DELETE', 'PUT', 'PATCH')):
-                return {"success": True, "result": None}
-            content_type = response.headers.get('Content-Type', '')
-            if 'application/json' in content_type:
-                try:
-                    json_response = response.json()
-                    is_list_or_rule_endpoint = '/lists' in endpoint or '/rules' in endpoint
-                    if json_response.get("success") and json_response.get("result") is None and is_list_or_rule_endpoint:
-                        return {"success": True, "result": []}
-                    return json_response
-                except json.JSONDecodeError:
-                    if not response.content:
-                        is_list_or_rule_endpoint = '/lists' in endpoint or '/rules' in endpoint
-                        return {"success": True, "result": [] if is_list_or_rule_endpoint else None}
-                    else:
-                        raise ConnectionError(f"API ({method} {endpoint}) Invalid JSON: {response.text[:200]}")
-            elif not response.content and response.status_code == 200:
-                is_list_or_rule_endpoint = '/lists' in endpoint or '/rules' in endpoint
-                return {"success": True, "result": [] if is_list_or_rule_endpoint else None}
-            return {"success": True, "result": response.text}
+            return self._parse_response(method, endpoint, response)
         except requests.exceptions.ReadTimeout as e:
             error_body = response.text if response is not None else "N/A"
             status_code = response.status_code if response is not None else "N/A"
@@ -105,2098 +939,1640 @@ class CloudflareAPI:
             response_text = response.text if response is not None else 'N/A'
             status_code = response.status_code if response is not None else "N/A"
             raise ConnectionError(f"API returned invalid JSON ({method} {endpoint}) - Status: {status_code} - Error: {e}. Text: {response_text[:200]}") from e
+        except OperationCancelledError:
+            if perf: perf.count("requests_abandoned")
+            if mutation: self._track_mutation(call, "abandoned")
+            raise
         except Exception as e:
             raise ConnectionError(f"Unexpected error during API request ({method} {endpoint}): {e}") from e
+        finally:
+            if perf: self._record_request(perf, method, endpoint, start, response, kwargs)
     def get_lists(self, name_prefix="", timeout=GET_ALL_LISTS_TIMEOUT_SECONDS):
         try:
-            response = self._request("GET", "/lists", timeout=timeout)
-            if not response or not response.get("success"):
-                if response and response.get("success") is True and response.get("result") is None: return []
-                raise ConnectionError(f"API call to get lists failed. Response: {response}")
-            lists = response.get("result", []) or []
-            if name_prefix and isinstance(name_prefix, str):
-                return [lst for lst in lists if lst.get("name", "").startswith(name_prefix)]
-            return lists
+            return self._lists_result(self._cached_get("/lists", timeout), name_prefix)
+        except OperationCancelledError: raise
         except Exception as e:
             raise ConnectionError(f"Error getting lists: {e}") from e
+    def iter_lists(self, name_prefix="", per_page=LIST_PAGE_SIZE, timeout=GET_ALL_LISTS_TIMEOUT_SECONDS):
+        """Yield lists page by page, so callers can start working before the whole account is fetched"""
+        page, total_pages = 1, 1
+        while page <= total_pages:
+            response = self._request("GET", "/lists", params={"page": page, "per_page": per_page}, timeout=timeout)
+            if not response or not response.get("success"): raise ConnectionError(f"API call to get lists (page {page}) failed. Response: {response}")
+            for lst in response.get("result") or []:
+                if not name_prefix or lst.get("name", "").startswith(name_prefix): yield lst
+            total_pages = (response.get("result_info") or {}).get("total_pages", 1) or 1; page += 1
     def get_list_details(self, list_id, timeout=30):
         if not list_id: raise ValueError("List ID cannot be empty.")
-        return self._request("GET", f"/lists/{list_id}", timeout=timeout)
+        return self._cached_get(f"/lists/{list_id}", timeout)
     def get_list_items(self, list_id, timeout=60):
         if not list_id: raise ValueError("List ID cannot be empty.")
+        # Not cached: item pages are large, and the index sync reads each one once anyway
         return self._request("GET", f"/lists/{list_id}/items", timeout=timeout)
-    def create_list(self, name, domains, timeout=LIST_CREATE_TIMEOUT_SECONDS):
-        if not name: raise ValueError("List name cannot be empty.")
-        if not isinstance(domains, list): raise ValueError("Domains must be provided as a list.")
-        payload = {"name": name, "description": "Managed by Gateway Guardian", "type": "DOMAIN", "items": [{"value": domain} for domain in domains]}
-        return self._request("POST", "/lists", json=payload, timeout=timeout)
+    def _send_list_body(self, method, endpoint, body, timeout):
+        """Send a pre-encoded list body, gzip-compressed while the API accepts it.
+
+        A 400/415 on a compressed body is retried uncompressed; if that succeeds, compression stays off for this client."""
+        if self.gzip_bodies_accepted is False or len(body) < LIST_BODY_GZIP_MIN_BYTES: return self._request(method, endpoint, data=body, timeout=timeout)
+        try: response = self._request(method, endpoint, data=gzip.compress(body, LIST_BODY_GZIP_LEVEL), headers={"Content-Encoding": "gzip"}, timeout=timeout)
+        except ConnectionError as e:
+            if self.gzip_bodies_accepted or not ("Status: 400" in str(e) or "Status: 415" in str(e)): raise
+            if self.perf: self.perf.count("retries")
+            response = self._request(method, endpoint, data=body, timeout=timeout)
+            if self.gzip_bodies_accepted is None:
+                self.gzip_bodies_accepted = False
+                if self.perf: self.perf.count("gzip_bodies_rejected")
+            return response
+        self.gzip_bodies_accepted = True
+        return response
+    def create_list(self, name, domains, timeout=LIST_CREATE_TIMEOUT_SECONDS, digest=True):
+        """Create a managed list; with digest its description records the content digest, making it shareable"""
+        return self._send_list_body("POST", "/lists", self._create_list_body(name, domains, digest), timeout)
     def update_list(self, list_id, name, description, items, timeout=LIST_CREATE_TIMEOUT_SECONDS):
-        if not list_id: raise ValueError("List ID cannot be empty.")
-        if not name: raise ValueError("List name cannot be empty.")
-        if not isinstance(items, list): raise ValueError("Items must be a list.")
-        payload = {"name": name, "description": description, "items": [{"value": item} for item in items]}
-        return self._request("PUT", f"/lists/{list_id}", json=payload, timeout=timeout)
+        return self._send_list_body("PUT", f"/lists/{list_id}", self._update_list_body(list_id, name, description, items), timeout)
+    def patch_list_items(self, list_id, append=None, remove=None, timeout=LIST_CREATE_TIMEOUT_SECONDS):
+        return self._request("PATCH", f"/lists/{list_id}", json=self._list_items_patch(list_id, append, remove), timeout=timeout)
     def patch_list(self, list_id, name=None, description=None, timeout=30):
-        if not list_id: raise ValueError("List ID cannot be empty.")
-        payload = {}
-        if name is not None: payload["name"] = name
-        if description is not None: payload["description"] = description
-        if not payload: raise ValueError("Nothing to patch (name or description must be provided).")
-        return self._request("PATCH", f"/lists/{list_id}", json=payload, timeout=timeout)
+        return self._request("PATCH", f"/lists/{list_id}", json=self._list_patch(list_id, name, description), timeout=timeout)
     def delete_list(self, list_id):
         if not list_id: raise ValueError("List ID cannot be empty.")
         return self._request("DELETE", f"/lists/{list_id}")
     def get_rules(self, rule_name="", timeout=60):
         try:
-            response = self._request("GET", "/rules", timeout=timeout)
-            if not response or not response.get("success"):
-                if response and response.get("success") is True and response.get("result") is None: return []
-                raise ConnectionError(f"API call to get rules failed. Response: {response}")
-            rules = response.get("result", []) or []
-            if rule_name and isinstance(rule_name, str):
-                return [rule for rule in rules if rule.get("name") == rule_name]
-            return rules
+            return self._rules_result(self._cached_get("/rules", timeout), rule_name)
+        except OperationCancelledError: raise
         except Exception as e:
             raise ConnectionError(f"Error getting rules: {e}") from e
     def get_rule_details(self, rule_id, timeout=30):
         if not rule_id: raise ValueError("Rule ID cannot be empty.")
+        # The rules listing returns full rule objects, so a fresh one answers without a request
+        rules = (self._cached("/rules") or {}).get("result") or []
+        rule = next((rule for rule in rules if rule.get("id") == rule_id), None)
+        if rule is not None:
+            if self.perf: self.perf.count("cache_hits")
+            return {"success": True, "result": copy.deepcopy(rule)}
         try:
-            return self._request("GET", f"/rules/{rule_id}", timeout=timeout)
+            return self._cached_get(f"/rules/{rule_id}", timeout)
+        except OperationCancelledError: raise
         except Exception as e:
             raise ConnectionError(f"Error getting details for rule {rule_id}: {e}") from e
-    def create_rule(self, name, list_ids, id_map, description="Managed by Gateway Guardian", action="block", enabled=True, filters=None, source_url=None, list_prefix=None, content_hash=None):
-        if not name: raise ValueError("Rule name cannot be empty.")
-        if not list_ids or not isinstance(list_ids, list): raise ValueError("Invalid list_ids provided.")
-        if id_map is None: raise ValueError("ID map cannot be None for rule creation.")
-        
-        base_description = "Managed by Gateway Guardian"
-        
-        if description and description != base_description and METADATA_MARKER_PREFIX in description:
-            start_idx = description.find(METADATA_MARKER_PREFIX)
-            if start_idx > 0:
-                base_part = description[:start_idx].rstrip()
-                if base_part:
-                    base_description = base_part
-            
-            if not source_url or not list_prefix:
-                end_idx = description.find(METADATA_MARKER_SUFFIX)
-                if end_idx > start_idx:
-                    metadata_content = description[start_idx+len(METADATA_MARKER_PREFIX):end_idx]
-                    
-                    if not source_url and METADATA_URL_KEY in metadata_content:
-                        metadata_parts = metadata_content.split(':')
-                        for i, part in enumerate(metadata_parts):
-                            if part.startswith(METADATA_URL_KEY):
-                                url_value = part[len(METADATA_URL_KEY):]
-                                j = i + 1
-                                while j < len(metadata_parts) and not any(metadata_parts[j].startswith(key) for key in [METADATA_PREFIX_KEY, METADATA_HASH_KEY]):
-                                    url_value += ":" + metadata_parts[j]
-                                    j += 1
-                                source_url = url_value
-                                break
-                    
-                    if not list_prefix and METADATA_PREFIX_KEY in metadata_content:
-                        for part in metadata_content.split(':'):
-                            if part.startswith(METADATA_PREFIX_KEY):
-                                list_prefix = part[len(METADATA_PREFIX_KEY):]
-                                break
-        
-        final_description = base_description
-        if source_url and list_prefix:
-            metadata_parts = [f"{METADATA_URL_KEY}{source_url}", f"{METADATA_PREFIX_KEY}{list_prefix}"]
-            
-            if content_hash:
-                metadata_parts.append(f"{METADATA_HASH_KEY}{content_hash}")
-            
-            metadata = f"{METADATA_MARKER_PREFIX}{':'.join(metadata_parts)}{METADATA_MARKER_SUFFIX}"
-            
-            max_desc_len, max_metadata_len = 500, len(metadata)
-            allowed_desc_len = max_desc_len - max_metadata_len - 1
-            if allowed_desc_len < 0:
-                pass 
-            else:
-                final_description = base_description + " " + metadata
-        
-        expression_ids, missing_ids_in_map = [], []
-        for list_id in list_ids:
-            expression_id = id_map.get(list_id)
-            if not expression_id: missing_ids_in_map.append(list_id)
-            else: expression_ids.append(expression_id)
-        if missing_ids_in_map: raise ValueError(f"Cannot create rule: ID(s) missing in map for list ID(s): {', '.join(missing_ids_in_map)}.")
-        if len(expression_ids) != len(list_ids): raise ConnectionError("Internal Error: Mismatch between list IDs and expression IDs.")
-        expressions = [f'any(dns.domains[*] in ${expr_id})' for expr_id in expression_ids]
-        filter_expression = " or ".join(expressions)
-        payload = {"name": name, "description": final_description, "action": action, "enabled": enabled, "filters": filters or ["dns"], "traffic": filter_expression}
+    def create_rule(self, name, list_ids, id_map, description=MANAGED_DESCRIPTION, action="block", enabled=True, filters=None, source_url=None, list_prefix=None, content_hash=None, layout=None):
+        payload = self._rule_payload(name, list_ids, id_map, description, action, enabled, filters, source_url, list_prefix, content_hash, layout)
         try:
             return self._request("POST", "/rules", json=payload)
+        except OperationCancelledError: raise
         except Exception as e:
-            if isinstance(e, ConnectionError) and 'Status: 400' in str(e):
-                wx.CallAfter(wx.MessageBox, "Rule creation failed (400 Bad Request).\nLikely cause: Invalid syntax/UUIDs or description too long.", "API Error", wx.OK | wx.ICON_ERROR)
+            if isinstance(e, ConnectionError) and 'Status: 400' in str(e): raise ConnectionError(f"Error creating rule '{name}' (likely invalid syntax/UUIDs or description too long): {e}") from e
             raise ConnectionError(f"Error creating rule '{name}': {e}") from e
-    def patch_rule(self, rule_id, name=None, description=None, enabled=None, timeout=30):
-        if not rule_id: raise ValueError("Rule ID cannot be empty.")
-        payload = {}
-        if name is not None: payload["name"] = name
-        
-        # If description is provided, ensure it has consistent metadata formatting
-        if description is not None:
-            # Just use the description as provided - don't try to clean it
-            # This ensures any HASH values added by the update process remain intact
-            payload["description"] = description
-            
-        if enabled is not None: payload["enabled"] = enabled
-        if not payload: raise ValueError("Nothing to patch (name, description, or enabled must be provided).")
-        return self._request("PATCH", f"/rules/{rule_id}", json=payload, timeout=timeout)
+    def patch_rule(self, rule_id, name=None, description=None, enabled=None, traffic=None, timeout=30):
+        return self._request("PATCH", f"/rules/{rule_id}", json=self._rule_patch(rule_id, name, description, enabled, traffic), timeout=timeout)
     def delete_rule(self, rule_id):
         if not rule_id: raise ValueError("Rule ID cannot be empty.")
         return self._request("DELETE", f"/rules/{rule_id}")
-class LoginDialog(wx.Dialog):
-    def __init__(self, parent):
-        super().__init__(parent, title="Cloudflare Zero Trust Login", style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
-        self.account_id, self.api_token = "", ""
-        panel = wx.Panel(self)
-        main_sizer = wx.BoxSizer(wx.VERTICAL)
-        login_bitmap = self._load_bitmap_from_url(LOGIN_ICON_URL, 64)
-        app_icon_bitmap = self._load_bitmap_from_url(APP_ICON_URL)
-        if login_bitmap:
-            icon_ctrl = wx.StaticBitmap(panel, wx.ID_ANY, login_bitmap)
-            main_sizer.Add(icon_ctrl, 0, wx.ALIGN_CENTER | wx.TOP | wx.LEFT | wx.RIGHT, 15)
-        else: main_sizer.AddSpacer(15)
-        if app_icon_bitmap:
-            try:
-                dlg_icon = wx.Icon(); dlg_icon.CopyFromBitmap(app_icon_bitmap); self.SetIcon(dlg_icon)
-            except Exception as icon_err: print(f"Error setting dialog icon: {icon_err}")
-        grid_sizer = wx.FlexGridSizer(rows=2, cols=2, vgap=10, hgap=10)
-        grid_sizer.AddGrowableCol(1, 1)
-        lbl_account_id = wx.StaticText(panel, label="Account ID:")
-        self.txt_account_id = wx.TextCtrl(panel)
-        lbl_api_token = wx.StaticText(panel, label="API Token:")
-        self.txt_api_token = wx.TextCtrl(panel, style=wx.TE_PASSWORD)
-        grid_sizer.Add(lbl_account_id, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALIGN_RIGHT)
-        grid_sizer.Add(self.txt_account_id, 1, wx.EXPAND)
-        grid_sizer.Add(lbl_api_token, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALIGN_RIGHT)
-        grid_sizer.Add(self.txt_api_token, 1, wx.EXPAND)
-        main_sizer.Add(grid_sizer, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.TOP, 20)
-        main_sizer.Add(wx.StaticLine(panel), 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.TOP, 15)
-        main_sizer.AddSpacer(5)
-        btn_sizer = wx.StdDialogButtonSizer()
-        login_btn = wx.Button(panel, wx.ID_OK, "Login")
-        login_btn.SetDefault()
-        btn_sizer.AddButton(login_btn)
-        cancel_btn = wx.Button(panel, wx.ID_CANCEL)
-        btn_sizer.AddButton(cancel_btn)
-        btn_sizer.Realize()
-        main_sizer.Add(btn_sizer, 0, wx.ALIGN_CENTER | wx.TOP | wx.BOTTOM, 10)
-        panel.SetSizer(main_sizer)
-        self.Fit()
-        self.SetMinSize(wx.Size(400, 280))
-        self.CenterOnScreen()
-        self.Bind(wx.EVT_BUTTON, self.OnLogin, id=wx.ID_OK)
-    def _load_bitmap_from_url(self, icon_url, target_h=None):
-        try:
-            response = requests.get(icon_url, timeout=10)
-            response.raise_for_status()
-            image_data = io.BytesIO(response.content)
-            image = wx.Image(image_data)
-            if image.IsOk():
-                if target_h:
-                    W, H = image.GetWidth(), image.GetHeight()
-                    if H > target_h:
-                        new_w = int(W * target_h / H)
-                        image.Rescale(new_w, target_h, wx.IMAGE_QUALITY_HIGH)
-                return image.ConvertToBitmap()
-            else:
-                print(f"Error: Failed to load image data into wx.Image from {icon_url}.")
-                return None
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching icon from {icon_url}: {e}")
-            return None
-        except Exception as e:
-            print(f"Error processing icon from {icon_url}: {e}")
-            return None
-    def OnLogin(self, event):
-        acc_id, token = self.txt_account_id.GetValue().strip(), self.txt_api_token.GetValue().strip()
-        if not acc_id or not token:
-            wx.MessageBox("Please enter both Account ID and API Token.", "Input Required", wx.OK | wx.ICON_WARNING, self)
-            return
-        cursor = wx.BusyCursor()
-        try:
-            temp_api = CloudflareAPI(token, acc_id)
-            test_response = temp_api._request("GET", "/lists", params={"per_page": 1}, timeout=15)
-            if test_response and test_response.get("success"):
-                self.account_id, self.api_token = acc_id, token
-                self.EndModal(wx.ID_OK)
-            else:
-                wx.MessageBox("Login Failed: Invalid API response or credentials.", "Login Failed", wx.OK | wx.ICON_ERROR, self)
-        except ConnectionError as e:
-            err_msg = f"Login Failed: Connection error.\nCould not reach Cloudflare API.\nError: {e}"
-            title = "Connection Error"
-            if "Status: 401" in str(e) or "Status: 403" in str(e):
-                err_msg, title = "Login Failed: Invalid Credentials.\nPlease check your Account ID and API Token.", "Authentication Error"
-            elif "timed out" in str(e):
-                err_msg, title = f"Login Failed: Connection timed out.\nPlease check your network connection.\nError: {e}", "Timeout Error"
-            wx.MessageBox(err_msg, title, wx.OK | wx.ICON_ERROR, self)
-        except Exception as e:
-            wx.MessageBox(f"An unexpected error occurred during login:\n{e}", "Login Error", wx.OK | wx.ICON_ERROR, self)
-            traceback.print_exc()
-        finally:
-            if 'cursor' in locals() and cursor: del cursor
-class SortableListCtrl(wx.ListCtrl, listmix.ListCtrlAutoWidthMixin, listmix.ColumnSorterMixin):
-    def __init__(self, parent, id=wx.ID_ANY, *args, **kw):
-        wx.ListCtrl.__init__(self, parent, id, *args, **kw)
-        listmix.ListCtrlAutoWidthMixin.__init__(self)
-        self.itemDataMap = {}
-    def InitializeColumnSorter(self, numColumns):
-        try: listmix.ColumnSorterMixin.__init__(self, numColumns)
-        except Exception as e: print(f"Error initializing column sorter: {e}"); traceback.print_exc()
-    def GetListCtrl(self): return self
-    def SetItemDataMap(self, itemDataMap): self.itemDataMap = itemDataMap
-    def GetItemDataMap(self): return self.itemDataMap
-    def GetSortImages(self): return (-1, -1)
-class ListEditDialog(wx.Dialog):
-    def __init__(self, parent, api_client, list_id, list_name):
-        super().__init__(parent, title=f"Edit List: {list_name}", size=(600, 500), style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
-        self.main_frame = parent
-        self.api_client = api_client
-        self.list_id = list_id
-        self.original_name = list_name
-        self.original_description = ""
-        self.original_domains = []
-        panel = wx.Panel(self)
-        main_sizer = wx.BoxSizer(wx.VERTICAL)
-        info_sizer = wx.BoxSizer(wx.HORIZONTAL)
-        lbl_id = wx.StaticText(panel, label="ID:")
-        txt_id = wx.TextCtrl(panel, value=self.list_id, style=wx.TE_READONLY)
-        txt_id.SetForegroundColour(wx.SystemSettings.GetColour(wx.SYS_COLOUR_GRAYTEXT))
-        lbl_name = wx.StaticText(panel, label="Name:")
-        self.txt_name = wx.TextCtrl(panel, value=self.original_name)
-        info_sizer.Add(lbl_id, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
-        info_sizer.Add(txt_id, 1, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
-        info_sizer.Add(lbl_name, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
-        info_sizer.Add(self.txt_name, 2, wx.EXPAND)
-        main_sizer.Add(info_sizer, 0, wx.EXPAND | wx.ALL, 10)
-        lbl_domains = wx.StaticText(panel, label="Domains (one per line):")
-        main_sizer.Add(lbl_domains, 0, wx.LEFT | wx.RIGHT | wx.TOP, 10)
-        self.txt_domains = wx.TextCtrl(panel, style=wx.TE_MULTILINE | wx.HSCROLL)
-        main_sizer.Add(self.txt_domains, 1, wx.EXPAND | wx.ALL, 10)
-        btn_sizer = wx.StdDialogButtonSizer()
-        self.save_btn = wx.Button(panel, wx.ID_SAVE)
-        self.save_btn.SetDefault()
-        btn_sizer.AddButton(self.save_btn)
-        cancel_btn = wx.Button(panel, wx.ID_CANCEL)
-        btn_sizer.AddButton(cancel_btn)
-        btn_sizer.Realize()
-        main_sizer.Add(btn_sizer, 0, wx.ALIGN_CENTER | wx.BOTTOM, 10)
-        panel.SetSizer(main_sizer)
-        self.Bind(wx.EVT_BUTTON, self.OnSave, id=wx.ID_SAVE)
-        self.Bind(wx.EVT_INIT_DIALOG, self.OnInit)
-        self.CenterOnParent()
-    def OnInit(self, event):
-        self.save_btn.Disable()
-        wx.CallAfter(self.LoadListData)
-        event.Skip()
-    def LoadListData(self):
-        busy_cursor = wx.BusyCursor()
-        gauge = self.main_frame.progress_gauge
-        op_event = self.main_frame.operation_cancelled
-        wx.CallAfter(gauge.SetRange, 2)
-        wx.CallAfter(gauge.SetValue, 0)
-        wx.CallAfter(gauge.Show)
-        wx.CallAfter(self.main_frame.custom_status_bar.Layout)
-        wx.CallAfter(self.main_frame.UpdateStatusBar, "Loading List Data...")
-        wx.CallAfter(self.main_frame.EnableCancelButton, True)
-        thread = threading.Thread(target=self._LoadListDataWorker, args=(gauge, op_event))
-        thread.start()
-    def _LoadListDataWorker(self, gauge, op_event):
-        details_ok, items_ok = False, False
-        error_msg = ""
-        list_details, list_items_resp = None, None
-        try:
-            wx.CallAfter(gauge.SetValue, 0); wx.CallAfter(self.main_frame.UpdateStatusBar, "Fetching list details...")
-            self.main_frame._check_cancel_request(op_event)
-            list_details_resp = self.api_client.get_list_details(self.list_id)
-            if not list_details_resp or not list_details_resp.get("success"):
-                error_msg = f"Failed to fetch list details: {list_details_resp}"
-            else:
-                list_details = list_details_resp.get("result")
-                if list_details:
-                    self.original_description = list_details.get("description", "")
-                    details_ok = True
-                else: error_msg = "Failed to parse list details from API response."
-            if details_ok:
-                wx.CallAfter(gauge.SetValue, 1); wx.CallAfter(self.main_frame.UpdateStatusBar, "Fetching list items...")
-                self.main_frame._check_cancel_request(op_event)
-                list_items_resp = self.api_client.get_list_items(self.list_id)
-                if not list_items_resp or not list_items_resp.get("success"):
-                    error_msg = f"Failed to fetch list items: {list_items_resp}"
-                else:
-                    items_data = list_items_resp.get("result", [])
-                    self.original_domains = sorted([item.get("value") for item in items_data if item.get("value")])
-                    items_ok = True
-                    wx.CallAfter(gauge.SetValue, 2)
-        except OperationCancelledError:
-             wx.CallAfter(self.main_frame.LogMessage, "List data loading cancelled.", "orange")
-             wx.CallAfter(self.EndModal, wx.ID_CANCEL)
-             return
-        except Exception as e:
-            error_msg = f"An error occurred while loading list data:\n{e}"
-            traceback.print_exc()
-        finally:
-            wx.CallAfter(gauge.Hide)
-            wx.CallAfter(self.main_frame.custom_status_bar.Layout)
-            wx.CallAfter(gauge.SetValue, 0)
-            wx.CallAfter(self.main_frame.EnableCancelButton, False)
-            wx.CallAfter(self.main_frame.UpdateStatusBar, "Ready")
-            if details_ok and items_ok:
-                wx.CallAfter(self.txt_domains.SetValue, "\n".join(self.original_domains))
-                wx.CallAfter(self.save_btn.Enable)
-            elif not op_event.is_set():
-                wx.CallAfter(wx.MessageBox, f"Error loading list data:\n{error_msg}", "Error", wx.OK | wx.ICON_ERROR, self)
-                wx.CallAfter(self.EndModal, wx.ID_CANCEL)
-            if 'busy_cursor' in locals(): del busy_cursor
-    def OnSave(self, event):
-        new_name = self.txt_name.GetValue().strip()
-        if not new_name:
-            wx.MessageBox("List name cannot be empty.", "Validation Error", wx.OK | wx.ICON_WARNING, self)
-            self.txt_name.SetFocus()
-            return
-        new_domains_text = self.txt_domains.GetValue()
-        new_domains_list = sorted(list(set(line.strip() for line in new_domains_text.splitlines() if line.strip())))
-        if len(new_domains_list) > MAX_DOMAINS_PER_LIST:
-            wx.MessageBox(f"Error: Number of domains ({len(new_domains_list)}) exceeds the maximum limit of {MAX_DOMAINS_PER_LIST} per list.", "Limit Exceeded", wx.OK | wx.ICON_ERROR, self)
-            return
-        name_changed = (new_name != self.original_name)
-        domains_changed = (new_domains_list != self.original_domains)
-        if not name_changed and not domains_changed:
-            self.EndModal(wx.ID_CANCEL)
-            return
-        busy_cursor = wx.BusyCursor()
-        self.save_btn.Disable()
-        gauge = self.main_frame.progress_gauge
-        op_event = self.main_frame.operation_cancelled
-        wx.CallAfter(gauge.SetRange, 1)
-        wx.CallAfter(gauge.SetValue, 0)
-        wx.CallAfter(gauge.Show)
-        wx.CallAfter(self.main_frame.custom_status_bar.Layout)
-        wx.CallAfter(self.main_frame.UpdateStatusBar, "Saving List...")
-        wx.CallAfter(self.main_frame.EnableCancelButton, True)
-        thread = threading.Thread(target=self._SaveListDataWorker, args=(new_name, new_domains_list, name_changed, domains_changed, gauge, op_event))
-        thread.start()
-    def _SaveListDataWorker(self, new_name, new_domains_list, name_changed, domains_changed, gauge, op_event):
-        success = False
-        error_msg = ""
-        try:
-            self.main_frame._check_cancel_request(op_event)
-            if domains_changed:
-                wx.CallAfter(self.main_frame.UpdateStatusBar, f"Updating list '{new_name}' (PUT)...")
-                response = self.api_client.update_list(self.list_id, new_name, self.original_description, new_domains_list)
-            elif name_changed:
-                wx.CallAfter(self.main_frame.UpdateStatusBar, f"Renaming list to '{new_name}' (PATCH)...")
-                response = self.api_client.patch_list(self.list_id, name=new_name)
-            else:
-                 response = {"success": True}
-            self.main_frame._check_cancel_request(op_event)
-            wx.CallAfter(gauge.SetValue, 1)
-            if response and response.get("success"):
-                success = True
-            else:
-                error_msg = f"API call failed: {response}"
-        except OperationCancelledError:
-             wx.CallAfter(self.main_frame.LogMessage, "List saving cancelled.", "orange")
-             success = False
-        except Exception as e:
-            error_msg = f"An error occurred while saving:\n{e}"
-            traceback.print_exc()
+class AsyncCloudflareAPI(CloudflareAPIBase):
+    """asyncio counterpart of CloudflareAPI: the same methods as coroutines, sharing one httpx client.
+
+    With the h2 package installed the client speaks HTTP/2, so concurrent calls are multiplexed over one
+    connection instead of needing a thread and a socket each. Errors are the same ConnectionError messages
+    (including 'Status: NNN'), raised once the retries run out; cancellation is plain task cancellation.
+    Use as an async context manager."""
+    def __init__(self, api_token, account_id, max_connections=ASYNC_API_MAX_CONCURRENCY):
+        if not HAS_HTTPX: raise RuntimeError("AsyncCloudflareAPI requires the 'httpx' package (pip install 'httpx[http2]').")
+        super().__init__(api_token, account_id)
+        # PerfRecorder of the operation using this client, if any (one event loop, so one operation at a time)
+        self.perf = None
+        self.client = httpx.AsyncClient(http2=HAS_HTTP2, headers=self.headers, limits=httpx.Limits(max_connections=max_connections))
+    async def __aenter__(self): return self
+    async def __aexit__(self, *exc_info): await self.aclose()
+    async def aclose(self): await self.client.aclose()
+    async def pause(self, seconds):
+        start = time.perf_counter()
+        try: await asyncio.sleep(seconds)
         finally:
-            wx.CallAfter(gauge.Hide)
-            wx.CallAfter(self.main_frame.custom_status_bar.Layout)
-            wx.CallAfter(gauge.SetValue, 0)
-            wx.CallAfter(self.main_frame.EnableCancelButton, False)
-            wx.CallAfter(self.main_frame.UpdateStatusBar, "Ready")
-            wx.CallAfter(self.save_btn.Enable)
-            if 'busy_cursor' in locals(): del busy_cursor
-            if success:
-                wx.CallAfter(self.EndModal, wx.ID_OK)
-            elif not op_event.is_set():
-                wx.CallAfter(wx.MessageBox, f"Failed to save list:\n{error_msg}", "Error", wx.OK | wx.ICON_ERROR, self)
-class RuleEditDialog(wx.Dialog):
-    def __init__(self, parent, api_client, rule_id, rule_name, rule_enabled, rule_description):
-        super().__init__(parent, title=f"Edit Rule: {rule_name}", size=(500, 400), style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
-        self.main_frame = parent
-        self.api_client = api_client
-        self.rule_id = rule_id
-        self.original_name = rule_name
-        self.original_enabled = rule_enabled
-        self.original_description = rule_description
-        panel = wx.Panel(self)
-        main_sizer = wx.BoxSizer(wx.VERTICAL)
-        grid_sizer = wx.FlexGridSizer(rows=4, cols=2, vgap=10, hgap=10)
-        grid_sizer.AddGrowableCol(1, 1)
-        grid_sizer.AddGrowableRow(3, 1)
-        lbl_id = wx.StaticText(panel, label="ID:")
-        txt_id = wx.TextCtrl(panel, value=self.rule_id, style=wx.TE_READONLY)
-        txt_id.SetForegroundColour(wx.SystemSettings.GetColour(wx.SYS_COLOUR_GRAYTEXT))
-        lbl_name = wx.StaticText(panel, label="Name:")
-        self.txt_name = wx.TextCtrl(panel, value=self.original_name)
-        lbl_enabled = wx.StaticText(panel, label="Enabled:")
-        self.chk_enabled = wx.CheckBox(panel)
-        self.chk_enabled.SetValue(self.original_enabled)
-        lbl_desc = wx.StaticText(panel, label="Description:")
-        self.txt_desc = wx.TextCtrl(panel, value=self.original_description, style=wx.TE_MULTILINE)
-        grid_sizer.Add(lbl_id, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALIGN_RIGHT)
-        grid_sizer.Add(txt_id, 1, wx.EXPAND)
-        grid_sizer.Add(lbl_name, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALIGN_RIGHT)
-        grid_sizer.Add(self.txt_name, 1, wx.EXPAND)
-        enabled_sizer = wx.BoxSizer(wx.HORIZONTAL)
-        enabled_sizer.Add(self.chk_enabled, 0, wx.ALIGN_CENTER_VERTICAL)
-        grid_sizer.Add(lbl_enabled, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALIGN_RIGHT)
-        grid_sizer.Add(enabled_sizer, 0)
-        grid_sizer.Add(lbl_desc, 0, wx.ALIGN_TOP | wx.ALIGN_RIGHT | wx.TOP, 5)
-        grid_sizer.Add(self.txt_desc, 1, wx.EXPAND | wx.ALL, 0)
-        main_sizer.Add(grid_sizer, 1, wx.EXPAND | wx.ALL, 10)
-        btn_sizer = wx.StdDialogButtonSizer()
-        self.save_btn = wx.Button(panel, wx.ID_SAVE)
-        self.save_btn.SetDefault()
-        btn_sizer.AddButton(self.save_btn)
-        cancel_btn = wx.Button(panel, wx.ID_CANCEL)
-        btn_sizer.AddButton(cancel_btn)
-        btn_sizer.Realize()
-        main_sizer.Add(btn_sizer, 0, wx.ALIGN_CENTER | wx.BOTTOM, 10)
-        panel.SetSizer(main_sizer)
-        self.Bind(wx.EVT_BUTTON, self.OnSave, id=wx.ID_SAVE)
-        self.CenterOnParent()
-    def OnSave(self, event):
-        new_name = self.txt_name.GetValue().strip()
-        new_enabled = self.chk_enabled.GetValue()
-        new_description = self.txt_desc.GetValue()
-        if not new_name:
-            wx.MessageBox("Rule name cannot be empty.", "Validation Error", wx.OK | wx.ICON_WARNING, self)
-            self.txt_name.SetFocus()
-            return
-        name_changed = (new_name != self.original_name)
-        enabled_changed = (new_enabled != self.original_enabled)
-        desc_changed = (new_description != self.original_description)
-        if not name_changed and not enabled_changed and not desc_changed:
-            self.EndModal(wx.ID_CANCEL)
-            return
-        payload = {}
-        if name_changed: payload["name"] = new_name
-        if enabled_changed: payload["enabled"] = new_enabled
-        if desc_changed: payload["description"] = new_description
-        busy_cursor = wx.BusyCursor()
-        self.save_btn.Disable()
-        gauge = self.main_frame.progress_gauge
-        op_event = self.main_frame.operation_cancelled
-        wx.CallAfter(gauge.Pulse)
-        wx.CallAfter(gauge.Show)
-        wx.CallAfter(self.main_frame.custom_status_bar.Layout)
-        wx.CallAfter(self.main_frame.UpdateStatusBar, "Saving Rule...")
-        wx.CallAfter(self.main_frame.EnableCancelButton, True)
-        thread = threading.Thread(target=self._SaveRuleDataWorker, args=(payload, gauge, op_event))
-        thread.start()
-    def _SaveRuleDataWorker(self, payload, gauge, op_event):
-        success = False
-        error_msg = ""
+            if self.perf: self.perf.count("sleep_seconds", time.perf_counter() - start)
+    async def _request(self, method, endpoint, **kwargs):
+        attempt = 0
+        while True:
+            try: return await self._send(method, endpoint, **kwargs)
+            except ConnectionError as e:
+                # Only a 429 is known not to have been processed; anything else is retried for reads only
+                retryable = self.error_status(e) == 429 or (method.upper() == "GET" and self.is_transient(e))
+                if not retryable or attempt >= ASYNC_API_MAX_RETRIES: raise
+            attempt += 1
+            if self.perf: self.perf.count("retries")
+            await self.pause(ASYNC_API_RETRY_BACKOFF_SECONDS * (2 ** (attempt - 1)))
+    async def _send(self, method, endpoint, **kwargs):
+        timeout = kwargs.pop('timeout', 45)
+        extra_headers = kwargs.pop('headers', None)
+        # httpx takes a pre-encoded body as content=; data= stays in kwargs for the byte counters
+        send_kwargs = {("content" if key == "data" else key): value for key, value in kwargs.items()}
+        perf, start, response = self.perf, time.perf_counter(), None
         try:
-            self.main_frame._check_cancel_request(op_event)
-            response = self.api_client.patch_rule(self.rule_id, **payload)
-            self.main_frame._check_cancel_request(op_event)
-            if response and response.get("success"):
-                success = True
-            else:
-                error_msg = f"API call failed: {response}"
-        except OperationCancelledError:
-             wx.CallAfter(self.main_frame.LogMessage, "Rule saving cancelled.", "orange")
-             success = False
-        except Exception as e:
-            error_msg = f"An error occurred while saving:\n{e}"
-            traceback.print_exc()
+            try: response = await self.client.request(method, f"{self.base_url}{endpoint}", headers=extra_headers, timeout=timeout, **send_kwargs)
+            except httpx.TimeoutException as e: raise ConnectionError(f"API timed out ({method} {endpoint}) - Status: N/A - Error: {e}. Timeout: {timeout}s.") from e
+            except httpx.HTTPError as e: raise ConnectionError(f"API request failed ({method} {endpoint}) - Status: N/A - Error: {e}.") from e
+            if response.status_code == 429: raise ConnectionError(f"API rate limit hit ({method} {endpoint}) - Status: 429 - Body: {response.text}")
+            if response.status_code >= 400:
+                try: error_body = response.json()
+                except ValueError: error_body = response.text
+                raise ConnectionError(f"API request failed ({method} {endpoint}) - Status: {response.status_code} - Response: {error_body}")
+            try: return self._parse_response(method, endpoint, response)
+            except json.JSONDecodeError as e: raise ConnectionError(f"API returned invalid JSON ({method} {endpoint}) - Status: {response.status_code} - Error: {e}. Text: {response.text[:200]}") from e
         finally:
-            wx.CallAfter(gauge.Hide)
-            wx.CallAfter(self.main_frame.custom_status_bar.Layout)
-            wx.CallAfter(gauge.SetValue, 0)
-            wx.CallAfter(self.main_frame.EnableCancelButton, False)
-            wx.CallAfter(self.main_frame.UpdateStatusBar, "Ready")
-            wx.CallAfter(self.save_btn.Enable)
-            if 'busy_cursor' in locals(): del busy_cursor
-            if success:
-                wx.CallAfter(self.EndModal, wx.ID_OK)
-            elif not op_event.is_set():
-                wx.CallAfter(wx.MessageBox, f"Failed to save rule:\n{error_msg}", "Error", wx.OK | wx.ICON_ERROR, self)
-class MainFrame(wx.Frame):
-    def __init__(self, parent, account_id, api_token):
-        super().__init__(parent, title=f"{APP_NAME} v{APP_VERSION}", size=(940, 550))
-        self.account_id, self.api_token = account_id, api_token
-        self.api_client = None
-        try: self.api_client = CloudflareAPI(self.api_token, self.account_id)
-        except Exception as e: wx.MessageBox(f"Failed to initialize Cloudflare API client:\n{e}", "Initialization Error", wx.OK | wx.ICON_ERROR, self); self.Close(); return
-        icon = self._load_app_icon(); self.SetIcon(icon) if icon else None
-        self.adblock_filepath, self.adblock_url = None, None
-        self.txt_list_prefix, self.txt_rule_name = None, None
-        self.list_ctrl_lists, self.list_ctrl_rules = None, None
-        self.log_ctrl = None
-        self.log_menu_item = None
-        self.status_bar_menu_item = None
-        self.notebook = None
-        self.splitter = None
-        self.main_panel, self.bottom_panel = None, None
-        self.lbl_source_display = None
-        self.custom_status_bar = None
-        self.status_text = None
-        self.progress_gauge = None
-        self.log_visible = False
-        self.status_bar_visible = True
-        self.operation_cancelled = threading.Event()
-        self.list_item_data_lists, self.list_item_data_rules = {}, {}
-        self.toolbar_apply_item = None
-        self.InitUI()
-        self.InitMenu()
-        self._update_log_visibility()
-        self._update_status_bar_visibility()
-        self._update_management_button_states()
-        self.Center(); self.Show()
-        wx.CallAfter(self.OnRefresh)
-    def _load_app_icon(self):
-        try:
-            response = requests.get(APP_ICON_URL, timeout=10)
-            response.raise_for_status()
-            image_data = io.BytesIO(response.content)
-            image = wx.Image(image_data)
-            if image.IsOk():
-                bitmap = image.ConvertToBitmap(); icon = wx.Icon(); icon.CopyFromBitmap(bitmap); return icon
-            else: print("Error: Failed to load app icon data into wx.Image."); return None
-        except requests.exceptions.RequestException as e: print(f"Error fetching app icon: {e}"); return None
-        except Exception as e: print(f"Error processing app icon: {e}"); return None
-    def InitToolBar(self):
-        toolbar = self.CreateToolBar(wx.TB_HORIZONTAL | wx.TB_FLAT | wx.TB_TEXT)
-        tsize = (24, 24)
-        toolbar.SetToolBitmapSize(tsize)
-        load_file_bmp = wx.ArtProvider.GetBitmap(wx.ART_FILE_OPEN, wx.ART_TOOLBAR, tsize)
-        load_url_bmp = wx.ArtProvider.GetBitmap(wx.ART_NEW_DIR, wx.ART_TOOLBAR, tsize)
-        refresh_bmp = wx.ArtProvider.GetBitmap(wx.ART_REDO, wx.ART_TOOLBAR, tsize)
-        apply_bmp = wx.ArtProvider.GetBitmap(wx.ART_TICK_MARK, wx.ART_TOOLBAR, tsize)
-        edit_bmp = wx.ArtProvider.GetBitmap(wx.ART_EDIT, wx.ART_TOOLBAR, tsize)
-        update_bmp = wx.ArtProvider.GetBitmap(wx.ART_EXECUTABLE_FILE, wx.ART_TOOLBAR, tsize)
-        delete_lists_bmp = wx.ArtProvider.GetBitmap(wx.ART_DELETE, wx.ART_TOOLBAR, tsize)
-        cancel_bmp = wx.ArtProvider.GetBitmap(wx.ART_CROSS_MARK, wx.ART_TOOLBAR, tsize)
-        toolbar.AddTool(ID_TOOLBAR_LOAD_FILE, "Load File", load_file_bmp, "Load adblock list from a local file")
-        toolbar.AddTool(ID_TOOLBAR_LOAD_URL, "Load URL", load_url_bmp, "Load adblock list from a URL")
-        toolbar.AddSeparator()
-        toolbar.AddTool(ID_TOOLBAR_REFRESH, "Refresh", refresh_bmp, "Refresh Gateway Lists and Rules")
-        toolbar.AddStretchableSpace()
-        toolbar.AddTool(ID_TOOLBAR_APPLY, "Apply Config", apply_bmp, "Apply the loaded adblock configuration")
-        toolbar.AddTool(ID_TOOLBAR_EDIT, "Edit Item", edit_bmp, "Edit Selected List or Rule")
-        toolbar.AddTool(ID_TOOLBAR_UPDATE, "Update Rule", update_bmp, "Update Selected Rule from Source URL")
-        toolbar.AddTool(ID_TOOLBAR_DELETE_RULE_LISTS, "Delete Rule", delete_lists_bmp, "Delete Selected Rule(s) and Associated Lists")
-        toolbar.AddSeparator()
-        toolbar.AddTool(ID_TOOLBAR_CANCEL, "Cancel", cancel_bmp, "Cancel the current background operation")
-        toolbar.EnableTool(ID_TOOLBAR_APPLY, False)
-        toolbar.EnableTool(ID_TOOLBAR_EDIT, False)
-        toolbar.EnableTool(ID_TOOLBAR_UPDATE, False)
-        toolbar.EnableTool(ID_TOOLBAR_DELETE_RULE_LISTS, False)
-        toolbar.EnableTool(ID_TOOLBAR_CANCEL, False)
-        toolbar.Realize()
-        self.Bind(wx.EVT_TOOL, self.OnLoadFromFile, id=ID_TOOLBAR_LOAD_FILE)
-        self.Bind(wx.EVT_TOOL, self.OnLoadFromURL, id=ID_TOOLBAR_LOAD_URL)
-        self.Bind(wx.EVT_TOOL, self.OnRefresh, id=ID_TOOLBAR_REFRESH)
-        self.Bind(wx.EVT_TOOL, self.OnApplyAdblock, id=ID_TOOLBAR_APPLY)
-        self.Bind(wx.EVT_TOOL, self.OnEditItem, id=ID_TOOLBAR_EDIT)
-        self.Bind(wx.EVT_TOOL, self.OnUpdateSelectedRule, id=ID_TOOLBAR_UPDATE)
-        self.Bind(wx.EVT_TOOL, self.OnDeleteRuleAndLists, id=ID_TOOLBAR_DELETE_RULE_LISTS)
-        self.Bind(wx.EVT_TOOL, self.OnCancelOperation, id=ID_TOOLBAR_CANCEL)
-    def InitMenu(self):
-        menu_bar = wx.MenuBar()
-        file_menu = wx.Menu()
-        file_menu.Append(ID_LOAD_FILE, "&Load from File...\tCtrl+O", "Load adblock list from a local file")
-        file_menu.Append(ID_LOAD_URL, "Load from &URL...\tCtrl+U", "Load adblock list from a URL")
-        file_menu.Append(ID_REFRESH, "&Refresh Lists/Rules\tF5", "Refresh the lists and rules from Cloudflare")
-        file_menu.AppendSeparator()
-        file_menu.Append(wx.ID_EXIT, "&Exit\tCtrl+Q", "Exit the application")
-        menu_bar.Append(file_menu, "&File")
-        edit_menu = wx.Menu()
-        edit_menu.Append(ID_TOOLBAR_EDIT, "&Edit Selected Item\tCtrl+E", "Edit the selected list or rule")
-        menu_bar.Append(edit_menu, "&Edit")
-        actions_menu = wx.Menu()
-        actions_menu.Append(ID_APPLY, "&Apply Adblock Configuration\tCtrl+A", "Apply the loaded adblock list and create lists/rule")
-        actions_menu.Append(ID_UPDATE_RULE, "Update Selected &Rule from Source\tCtrl+R", "Update the selected rule and its lists from its source URL")
-        actions_menu.AppendSeparator()
-        actions_menu.Append(ID_DELETE_RULE_LISTS, "Delete R&ule\tCtrl+D", "Delete selected rule(s) and their associated lists")
-        actions_menu.AppendSeparator()
-        actions_menu.Append(ID_CANCEL_OPERATION, "&Cancel Current Operation\tEsc", "Cancel the ongoing background task")
-        menu_bar.Append(actions_menu, "&Actions")
-        view_menu = wx.Menu()
-        self.log_menu_item = view_menu.AppendCheckItem(ID_TOGGLE_LOG, "Show Status &Log\tCtrl+L", "Show/Hide Status Log")
-        self.log_menu_item.Check(self.log_visible)
-        menu_bar.Append(view_menu, "&View")
-        help_menu = wx.Menu()
-        help_menu.Append(wx.ID_ABOUT, "&About\tF1", f"About {APP_NAME}")
-        menu_bar.Append(help_menu, "&Help")
-        self.SetMenuBar(menu_bar)
-        self.Bind(wx.EVT_MENU, self.OnLoadFromFile, id=ID_LOAD_FILE)
-        self.Bind(wx.EVT_MENU, self.OnLoadFromURL, id=ID_LOAD_URL)
-        self.Bind(wx.EVT_MENU, self.OnRefresh, id=ID_REFRESH)
-        self.Bind(wx.EVT_MENU, self.OnExit, id=wx.ID_EXIT)
-        self.Bind(wx.EVT_MENU, self.OnEditItem, id=ID_TOOLBAR_EDIT)
-        self.Bind(wx.EVT_MENU, self.OnApplyAdblock, id=ID_APPLY)
-        self.Bind(wx.EVT_MENU, self.OnUpdateSelectedRule, id=ID_UPDATE_RULE)
-        self.Bind(wx.EVT_MENU, self.OnDeleteRuleAndLists, id=ID_DELETE_RULE_LISTS)
-        self.Bind(wx.EVT_MENU, self.OnCancelOperation, id=ID_CANCEL_OPERATION)
-        self.Bind(wx.EVT_MENU, self.OnToggleLog, id=ID_TOGGLE_LOG)
-        self.Bind(wx.EVT_MENU, self.OnAbout, id=wx.ID_ABOUT)
-        menu_bar.Enable(ID_CANCEL_OPERATION, False)
-    def InitUI(self):
-        self.InitToolBar()
-        base_panel = wx.Panel(self)
-        outer_sizer = wx.BoxSizer(wx.VERTICAL)
-        self.splitter = wx.SplitterWindow(base_panel, style=wx.SP_LIVE_UPDATE | wx.SP_BORDER | wx.SP_3DSASH)
-        self.splitter.SetSashGravity(0.8)
-        self.splitter.SetMinimumPaneSize(150)
-        self.main_panel = self._CreateMainPanel(self.splitter)
-        self.bottom_panel = self._CreateBottomPanel(self.splitter)
-        self.splitter.SplitHorizontally(self.main_panel, self.bottom_panel)
-        outer_sizer.Add(self.splitter, 1, wx.EXPAND | wx.ALL, 0)
-        self.custom_status_bar = wx.Panel(base_panel, style=wx.BORDER_SUNKEN)
-        status_sizer = wx.BoxSizer(wx.HORIZONTAL)
-        self.status_text = wx.StaticText(self.custom_status_bar, label="Ready", style=wx.ST_ELLIPSIZE_END)
-        self.progress_gauge = wx.Gauge(self.custom_status_bar, range=100, size=(150, 15), style=wx.GA_HORIZONTAL | wx.GA_SMOOTH)
-        self.progress_gauge.Hide()
-        status_sizer.Add(self.status_text, 1, wx.ALIGN_CENTER_VERTICAL | wx.LEFT | wx.RIGHT, 5)
-        status_sizer.Add(self.progress_gauge, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
-        self.custom_status_bar.SetSizer(status_sizer)
-        outer_sizer.Add(self.custom_status_bar, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 2)
-        base_panel.SetSizer(outer_sizer)
-        self.Layout()
-        self.LogMessage(f"Application UI Initialized ({APP_NAME} v{APP_VERSION}).")
-    def _CreateMainPanel(self, parent):
-        panel = wx.Panel(parent, style=wx.BORDER_NONE)
-        sizer = wx.BoxSizer(wx.VERTICAL)
-        config_sizer = wx.BoxSizer(wx.HORIZONTAL)
-        self.lbl_source_display = wx.StaticText(panel, label="Source: None", style=wx.ST_ELLIPSIZE_END)
-        lbl_list_prefix = wx.StaticText(panel, label="List Prefix:")
-        self.txt_list_prefix = wx.TextCtrl(panel, value="", size=(180,-1))
-        lbl_rule_name = wx.StaticText(panel, label="Rule Name:")
-        self.txt_rule_name = wx.TextCtrl(panel, value="", size=(180,-1))
-        self.txt_list_prefix.Bind(wx.EVT_TEXT, self.OnNamingOptionsChanged)
-        self.txt_rule_name.Bind(wx.EVT_TEXT, self.OnNamingOptionsChanged)
-        config_sizer.Add(self.lbl_source_display, 1, wx.LEFT | wx.RIGHT | wx.EXPAND, 10)
-        config_sizer.Add(lbl_list_prefix, 0, wx.ALIGN_CENTER_VERTICAL | wx.LEFT, 5)
-        config_sizer.Add(self.txt_list_prefix, 0, wx.ALIGN_CENTER_VERTICAL | wx.LEFT | wx.RIGHT, 5)
-        config_sizer.Add(lbl_rule_name, 0, wx.ALIGN_CENTER_VERTICAL | wx.LEFT, 5)
-        config_sizer.Add(self.txt_rule_name, 0, wx.ALIGN_CENTER_VERTICAL | wx.LEFT | wx.RIGHT, 10)
-        sizer.Add(config_sizer, 0, wx.EXPAND | wx.TOP | wx.BOTTOM, 10)
-        self.notebook = wx.Notebook(panel, style=wx.BK_DEFAULT)
-        rule_panel = self._CreateRulesPanel(self.notebook)
-        list_panel = self._CreateListsPanel(self.notebook)
-        self.notebook.AddPage(rule_panel, " Gateway Rules ")
-        self.notebook.AddPage(list_panel, " Gateway Lists ")
-        sizer.Add(self.notebook, 1, wx.EXPAND | wx.ALL, 5)
-        panel.SetSizer(sizer)
-        return panel
-    def _CreateListsPanel(self, parent_notebook):
-        panel = wx.Panel(parent_notebook)
-        sizer = wx.BoxSizer(wx.VERTICAL)
-        list_style = wx.LC_REPORT | wx.LC_VRULES | wx.BORDER_SUNKEN | wx.LC_SORT_ASCENDING | wx.LC_SINGLE_SEL
-        self.list_ctrl_lists = SortableListCtrl(panel, style=list_style)
-        self.list_ctrl_lists.InsertColumn(0, "Name", width=350)
-        self.list_ctrl_lists.InsertColumn(1, "ID", width=300)
-        self.list_ctrl_lists.InsertColumn(2, "Item Count", width=120, format=wx.LIST_FORMAT_RIGHT)
-        self.list_ctrl_lists.Bind(wx.EVT_LIST_ITEM_SELECTED, self.OnListItemSelected)
-        self.list_ctrl_lists.Bind(wx.EVT_LIST_ITEM_DESELECTED, self.OnListItemDeselected)
-        self.list_ctrl_lists.Bind(wx.EVT_LIST_KEY_DOWN, self.OnListKeyDown)
-        self.list_ctrl_lists.InitializeColumnSorter(3)
-        sizer.Add(self.list_ctrl_lists, 1, wx.EXPAND | wx.ALL, 0)
-        panel.SetSizer(sizer)
-        return panel
-    def _CreateRulesPanel(self, parent_notebook):
-        panel = wx.Panel(parent_notebook)
-        sizer = wx.BoxSizer(wx.VERTICAL)
-        list_style = wx.LC_REPORT | wx.LC_VRULES | wx.BORDER_SUNKEN | wx.LC_SORT_ASCENDING | wx.LC_SINGLE_SEL
-        self.list_ctrl_rules = SortableListCtrl(panel, style=list_style)
-        self.list_ctrl_rules.InsertColumn(0, "Name", width=300)
-        self.list_ctrl_rules.InsertColumn(1, "ID", width=250)
-        self.list_ctrl_rules.InsertColumn(2, "Enabled", width=80, format=wx.LIST_FORMAT_CENTER)
-        self.list_ctrl_rules.InsertColumn(3, "Source Type", width=100, format=wx.LIST_FORMAT_CENTER)
-        self.list_ctrl_rules.InsertColumn(4, "Update Status", width=120, format=wx.LIST_FORMAT_CENTER)
-        self.list_ctrl_rules.Bind(wx.EVT_LIST_ITEM_SELECTED, self.OnListItemSelected)
-        self.list_ctrl_rules.Bind(wx.EVT_LIST_ITEM_DESELECTED, self.OnListItemDeselected)
-        self.list_ctrl_rules.Bind(wx.EVT_LIST_KEY_DOWN, self.OnListKeyDown)
-        self.list_ctrl_rules.InitializeColumnSorter(5)
-        sizer.Add(self.list_ctrl_rules, 1, wx.EXPAND | wx.ALL, 0)
-        panel.SetSizer(sizer)
-        return panel
-    def _CreateBottomPanel(self, parent):
-        panel = wx.Panel(parent, style=wx.BORDER_SUNKEN)
-        sizer = wx.BoxSizer(wx.VERTICAL)
-        log_label = wx.StaticText(panel, label=" Status Log:")
-        sizer.Add(log_label, 0, wx.LEFT | wx.TOP, 5)
-        self.log_ctrl = wx.TextCtrl(panel, style=wx.TE_MULTILINE | wx.TE_READONLY | wx.TE_RICH2 | wx.TE_DONTWRAP | wx.BORDER_NONE)
-        self.log_ctrl.SetMinSize(wx.Size(-1, 100))
-        sizer.Add(self.log_ctrl, 1, wx.EXPAND | wx.ALL, 5)
-        panel.SetSizer(sizer)
-        return panel
-    def OnExit(self, event):
-        self.operation_cancelled.set()
-        self.Close()
-    def OnAbout(self, event):
-        try:
-            # Create a custom about dialog instead of using wx.adv.AboutBox
-            about_dlg = wx.Dialog(self, title=f"About {APP_NAME}", size=(395, 370))
-            panel = wx.Panel(about_dlg)
-            sizer = wx.BoxSizer(wx.VERTICAL)
-            
-            # Logo
-            try:
-                response = requests.get("https://raw.githubusercontent.com/john-holt4/Gateway-Gaurdian/main/logo/logo.png", timeout=10)
-                response.raise_for_status()
-                image_data = io.BytesIO(response.content)
-                img = wx.Image(image_data)
-                if img.IsOk():
-                    # Keep original aspect ratio
-                    original_width = img.GetWidth()
-                    original_height = img.GetHeight()
-                    target_height = 64
-                    target_width = int(original_width * (target_height / original_height))
-                    bitmap = img.Scale(target_width, target_height, wx.IMAGE_QUALITY_HIGH).ConvertToBitmap()
-                    logo = wx.StaticBitmap(panel, -1, bitmap)
-                    sizer.Add(logo, 0, wx.ALIGN_CENTER | wx.ALL, 10)
-                else:
-                    print("Error: Failed to load logo image.")
-            except Exception as img_err:
-                print(f"Error displaying logo: {img_err}")
-            
-            # App info
-            app_name = wx.StaticText(panel, -1, f"{APP_NAME} v{APP_VERSION}")
-            font = app_name.GetFont()
-            font.SetPointSize(font.GetPointSize() + 2)
-            font.SetWeight(wx.FONTWEIGHT_BOLD)
-            app_name.SetFont(font)
-            sizer.Add(app_name, 0, wx.ALIGN_CENTER | wx.ALL, 5)
-            
-            desc = wx.StaticText(panel, -1, f"Manage Cloudflare Zero Trust Gateway lists and rules for adblocking.")
-            sizer.Add(desc, 0, wx.ALIGN_CENTER | wx.ALL, 5)
-            
-            not_affiliated = wx.StaticText(panel, -1, f"({APP_NAME} is not affiliated with Cloudflare, Inc.)")
-            font = not_affiliated.GetFont()
-            font.SetPointSize(font.GetPointSize() - 1)
-            font.SetStyle(wx.FONTSTYLE_ITALIC)
-            not_affiliated.SetFont(font)
-            sizer.Add(not_affiliated, 0, wx.ALIGN_CENTER | wx.ALL, 5)
-            
-            copyright_text = wx.StaticText(panel, -1, f"{datetime.date.today().year}")
-            sizer.Add(copyright_text, 0, wx.ALIGN_CENTER | wx.TOP | wx.BOTTOM, 10)
-            
-            # GitHub link
-            github_link = wx.adv.HyperlinkCtrl(panel, -1, "Visit on GitHub", "https://github.com/john-holt4/Gateway-Gaurdian")
-            sizer.Add(github_link, 0, wx.ALIGN_CENTER | wx.BOTTOM, 15)
-            
-            # Add a donate button
-            donate_btn = wx.Button(panel, -1, "☕ Buy me a coffee")
-            donate_btn.Bind(wx.EVT_BUTTON, self.OnDonateButton)
-            sizer.Add(donate_btn, 0, wx.ALIGN_CENTER | wx.ALL, 10)
-            
-            # Add a close handler
-            about_dlg.Bind(wx.EVT_CLOSE, lambda e: about_dlg.EndModal(wx.ID_OK))
-            
-            panel.SetSizer(sizer)
-            about_dlg.Layout()
-            about_dlg.Center()
-            about_dlg.ShowModal()
-            about_dlg.Destroy()
-        except Exception as e:
-            wx.MessageBox(f"Error displaying About dialog: {e}", "Error", wx.OK | wx.ICON_ERROR)
-            
-    def OnDonateButton(self, event):
-        # Launch PayPal donate URL in default browser
-        paypal_url = "https://www.paypal.com/donate/?business=243S6YP5USR38&no_recurring=0&item_name=Support+the+development+of+Gateway+Gaurdian&currency_code=USD"
-        import webbrowser
-        try:
-            webbrowser.open(paypal_url)
-        except Exception as e:
-            wx.MessageBox(f"Error opening donation page: {e}", "Error", wx.OK | wx.ICON_ERROR)
-    def OnToggleLog(self, event):
-        self.log_visible = event.IsChecked()
-        self._update_log_visibility()
-    def OnToggleStatusBar(self, event):
-        self.status_bar_visible = event.IsChecked()
-        self._update_status_bar_visibility()
-    def _update_log_visibility(self):
-        if not all(hasattr(self, attr) and getattr(self, attr) for attr in ['splitter', 'bottom_panel', 'main_panel']):
-            print("Warning: Splitter/panels not ready during log visibility update.")
-            return
-        if self.log_visible:
-            self.bottom_panel.Show()
-            if not self.splitter.IsSplit():
-                try:
-                    h = self.splitter.GetClientSize().height
-                    s = self.splitter.GetSashSize()
-                    m = self.splitter.GetMinimumPaneSize()
-                    p = int(h * self.splitter.GetSashGravity())
-                    p = max(m, p)
-                    p = min(h - m - s, p)
-                    if p >= m and h > (2 * m + s):
-                        self.splitter.SplitHorizontally(self.main_panel, self.bottom_panel, p)
-                    else:
-                        self.splitter.SplitHorizontally(self.main_panel, self.bottom_panel)
-                except Exception as e:
-                    print(f"Error re-splitting window: {e}")
-                    traceback.print_exc()
-                    if not self.splitter.IsSplit():
-                        try: self.splitter.SplitHorizontally(self.main_panel, self.bottom_panel)
-                        except Exception as split_err: print(f"Error during fallback split: {split_err}")
-        else:
-            if self.splitter.IsSplit(): self.splitter.Unsplit(self.bottom_panel)
-            self.bottom_panel.Hide()
-        self.Layout()
-        if hasattr(self, 'log_menu_item') and self.log_menu_item:
-            self.log_menu_item.Check(self.log_visible)
-    def _update_status_bar_visibility(self):
-        if self.custom_status_bar:
-            self.custom_status_bar.Show(True)  # Always show status bar
-            self.Layout()
-    def _calculate_content_hash(self, content):
-        """Calculate a hash of content for update tracking based on size"""
-        if not content:
-            return None
-        # Use content length as a simple hash
-        content_size = len(content)
-        content_lines = len(content.splitlines())
-        hash_value = f"{content_size}"  # Simple size-based hash
-        self.LogMessage(f"Content size: {content_size} bytes, {content_lines} lines", "grey")
-        return hash_value
-    
-    def _parse_metadata(self, description):
-        """Extract source URL and list prefix from rule description"""
-        source_url, list_prefix = None, None
-        
-        # Use the improved extraction method
-        metadata = self._extract_rule_metadata(description)
-        if metadata:
-            source_url = metadata.get("URL")
-            list_prefix = metadata.get("PREFIX")
-            
-        return source_url, list_prefix
-        
-    def _extract_rule_metadata(self, description):
-        """Extract metadata from rule description using a simpler approach"""
-        self.LogMessage(f"Extracting metadata from: {description[:50]}{'...' if len(description) > 50 else ''}", "grey")
-        
-        metadata = {}
-        
-        try:
-            # Find all metadata within the markers
-            if METADATA_MARKER_PREFIX in description and METADATA_MARKER_SUFFIX in description:
-                start_idx = description.find(METADATA_MARKER_PREFIX) + len(METADATA_MARKER_PREFIX)
-                end_idx = description.find(METADATA_MARKER_SUFFIX, start_idx)
-                if start_idx > 0 and end_idx > start_idx:
-                    metadata_content = description[start_idx:end_idx]
-                    self.LogMessage(f"Raw metadata: {metadata_content}", "grey")
-                    
-                    # Extract URL (handles URL with path)
-                    url_parts = re.split(r':(?=PREFIX=|HASH=)', metadata_content)
-                    if len(url_parts) > 0 and url_parts[0].startswith("URL="):
-                        url = url_parts[0][4:]  # Remove "URL="
-                        metadata["URL"] = url
-                        self.LogMessage(f"Found URL: {url}", "grey")
-                    
-                    # Extract PREFIX
-                    prefix_match = re.search(r'PREFIX=([^:]+)(?::|$)', metadata_content)
-                    if prefix_match:
-                        prefix = prefix_match.group(1)
-                        metadata["PREFIX"] = prefix
-                        self.LogMessage(f"Found PREFIX: {prefix}", "grey")
-                    
-                    # Always take the last HASH value
-                    # First try numeric hashes
-                    hash_parts = re.findall(r'HASH=(\d+)', metadata_content)
-                    if hash_parts:
-                        # Use only the last hash value
-                        hash_value = hash_parts[-1]
-                        metadata["HASH"] = hash_value
-                        self.LogMessage(f"Found last hash: {hash_value}", "grey")
-                    else:
-                        # Fallback to last hash of any type
-                        hash_matches = re.findall(r'HASH=([^:]+?)(?::|HASH=|$|\])', metadata_content)
-                        if hash_matches:
-                            hash_value = hash_matches[-1]
-                            metadata["HASH"] = hash_value
-                            self.LogMessage(f"Found last non-numeric hash: {hash_value}", "grey")
-        except Exception as e:
-            self.LogMessage(f"Error extracting metadata: {e}", "red")
-            
-        self.LogMessage(f"Extracted metadata: {metadata}", "grey")
-        return metadata
+            if perf: self._record_request(perf, method, endpoint, start, response, kwargs)
+    async def get_lists(self, name_prefix="", timeout=GET_ALL_LISTS_TIMEOUT_SECONDS):
+        try: return self._lists_result(await self._request("GET", "/lists", timeout=timeout), name_prefix)
+        except ConnectionError as e: raise ConnectionError(f"Error getting lists: {e}") from e
+    async def iter_lists(self, name_prefix="", per_page=LIST_PAGE_SIZE, timeout=GET_ALL_LISTS_TIMEOUT_SECONDS):
+        page, total_pages = 1, 1
+        while page <= total_pages:
+            response = await self._request("GET", "/lists", params={"page": page, "per_page": per_page}, timeout=timeout)
+            if not response or not response.get("success"): raise ConnectionError(f"API call to get lists (page {page}) failed. Response: {response}")
+            for lst in response.get("result") or []:
+                if not name_prefix or lst.get("name", "").startswith(name_prefix): yield lst
+            total_pages = (response.get("result_info") or {}).get("total_pages", 1) or 1; page += 1
+    async def get_list_details(self, list_id, timeout=30):
+        if not list_id: raise ValueError("List ID cannot be empty.")
+        return await self._request("GET", f"/lists/{list_id}", timeout=timeout)
+    async def get_list_items(self, list_id, timeout=60):
+        if not list_id: raise ValueError("List ID cannot be empty.")
+        return await self._request("GET", f"/lists/{list_id}/items", timeout=timeout)
+    async def _send_list_body(self, method, endpoint, body, timeout):
+        if self.gzip_bodies_accepted is False or len(body) < LIST_BODY_GZIP_MIN_BYTES: return await self._request(method, endpoint, data=body, timeout=timeout)
+        try: response = await self._request(method, endpoint, data=gzip.compress(body, LIST_BODY_GZIP_LEVEL), headers={"Content-Encoding": "gzip"}, timeout=timeout)
+        except ConnectionError as e:
+            if self.gzip_bodies_accepted or not ("Status: 400" in str(e) or "Status: 415" in str(e)): raise
+            if self.perf: self.perf.count("retries")
+            response = await self._request(method, endpoint, data=body, timeout=timeout)
+            if self.gzip_bodies_accepted is None:
+                self.gzip_bodies_accepted = False
+                if self.perf: self.perf.count("gzip_bodies_rejected")
+            return response
+        self.gzip_bodies_accepted = True
+        return response
+    async def create_list(self, name, domains, timeout=LIST_CREATE_TIMEOUT_SECONDS, digest=True):
+        return await self._send_list_body("POST", "/lists", self._create_list_body(name, domains, digest), timeout)
+    async def update_list(self, list_id, name, description, items, timeout=LIST_CREATE_TIMEOUT_SECONDS):
+        return await self._send_list_body("PUT", f"/lists/{list_id}", self._update_list_body(list_id, name, description, items), timeout)
+    async def patch_list_items(self, list_id, append=None, remove=None, timeout=LIST_CREATE_TIMEOUT_SECONDS):
+        return await self._request("PATCH", f"/lists/{list_id}", json=self._list_items_patch(list_id, append, remove), timeout=timeout)
+    async def patch_list(self, list_id, name=None, description=None, timeout=30):
+        return await self._request("PATCH", f"/lists/{list_id}", json=self._list_patch(list_id, name, description), timeout=timeout)
+    async def delete_list(self, list_id):
+        if not list_id: raise ValueError("List ID cannot be empty.")
+        return await self._request("DELETE", f"/lists/{list_id}")
+    async def get_rules(self, rule_name="", timeout=60):
+        try: return self._rules_result(await self._request("GET", "/rules", timeout=timeout), rule_name)
+        except ConnectionError as e: raise ConnectionError(f"Error getting rules: {e}") from e
+    async def get_rule_details(self, rule_id, timeout=30):
+        if not rule_id: raise ValueError("Rule ID cannot be empty.")
+        try: return await self._request("GET", f"/rules/{rule_id}", timeout=timeout)
+        except ConnectionError as e: raise ConnectionError(f"Error getting details for rule {rule_id}: {e}") from e
+    async def create_rule(self, name, list_ids, id_map, description=MANAGED_DESCRIPTION, action="block", enabled=True, filters=None, source_url=None, list_prefix=None, content_hash=None, layout=None):
+        payload = self._rule_payload(name, list_ids, id_map, description, action, enabled, filters, source_url, list_prefix, content_hash, layout)
+        try: return await self._request("POST", "/rules", json=payload)
+        except ConnectionError as e: raise ConnectionError(f"Error creating rule '{name}': {e}") from e
+    async def patch_rule(self, rule_id, name=None, description=None, enabled=None, traffic=None, timeout=30):
+        return await self._request("PATCH", f"/rules/{rule_id}", json=self._rule_patch(rule_id, name, description, enabled, traffic), timeout=timeout)
+    async def delete_rule(self, rule_id):
+        if not rule_id: raise ValueError("Rule ID cannot be empty.")
+        return await self._request("DELETE", f"/rules/{rule_id}")
+def parse_blocklist_lines(lines, progress=None):
+    """Extract domains from blocklist lines (hosts, dnsmasq, wildcard, RPZ, AdBlock or plain domain formats).
 
-    def _check_update_status(self, rule_description, source_url):
-        """Check if a rule needs updating based on content size"""
-        if not source_url:
-            return "No source URL"
-            
-        # Extract metadata directly 
-        metadata = self._extract_rule_metadata(rule_description)
-        
-        # Debug logging to understand what's happening
-        self.LogMessage(f"Checking updates for URL: {source_url}", "grey")
-        
-        # Get the stored hash directly from the metadata
-        stored_hash = metadata.get("HASH")
-        
-        # More debug logging
-        self.LogMessage(f"Stored hash from metadata: {stored_hash} (type: {type(stored_hash).__name__})", "grey")
-        
-        if not stored_hash:
-            return "No hash data"
-            
-        try:
-            self.LogMessage(f"Fetching content from {source_url}...", "grey")
-            response = requests.get(source_url, timeout=30)
-            if response.status_code != 200:
-                return "Check failed"
-                
-            current_content = response.text
-            # For simplicity, just count the lines in the content and check its size
-            content_lines = len(current_content.splitlines())
-            content_size = len(current_content)
-            
-            self.LogMessage(f"Content length: {content_size} bytes, {content_lines} lines", "grey")
-            
-            # Calculate current hash (which is just the content size)
-            current_hash = self._calculate_content_hash(current_content)
-            
-            # Convert both to strings for comparison
-            if not isinstance(stored_hash, str):
-                stored_hash = str(stored_hash)
-            if not isinstance(current_hash, str):
-                current_hash = str(current_hash)
-                
-            # Better logging to understand what's being compared
-            self.LogMessage(f"Comparing stored hash '{stored_hash}' (type: {type(stored_hash).__name__}) with current hash '{current_hash}' (type: {type(current_hash).__name__})", "grey")
-            
-            # Compare hashes
-            if stored_hash == current_hash:
-                self.LogMessage(f"Hashes match: {stored_hash} == {current_hash}", "green")
-                return "Up to date"
-            else:
-                self.LogMessage(f"Hashes don't match: {stored_hash} != {current_hash}", "orange") 
-                return "Update available"
-        except Exception as e:
-            self.LogMessage(f"Update check failed: {e}", "red")
-            return "Check failed"
+    progress(line_number) is called every 1000 lines. Returns (DomainSet, processed lines, total lines)."""
+    domains = set()
+    # Basic domain structure validation
+    domain_pattern = re.compile(r"^(?:[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?\.)+[a-zA-Z]{2,}$")
     
-    def sanitize_filename(self, filename):
-        if not filename: return "default_name"
-        base = os.path.splitext(os.path.basename(filename))[0]
-        sanitized = re.sub(r'[\s\-.]+', '_', base)
-        valid_chars = string.ascii_letters + string.digits + "_"
-        sanitized = ''.join(c for c in sanitized if c in valid_chars)
-        sanitized = sanitized.strip('_')[:50]
-        return sanitized if sanitized else "default_name"
-    def _sanitize_url_for_name(self, url):
-        if not url: return "default_name"
-        try:
-            parsed = urlparse(url)
-            base = parsed.netloc.split(':')[0]
-            sanitized = re.sub(r'[\-.]+', '_', base)
-            valid_chars = string.ascii_letters + string.digits + "_"
-            sanitized = ''.join(c for c in sanitized if c in valid_chars)
-            sanitized = sanitized.strip('_')[:50]
-            return sanitized if sanitized else "default_name_from_url"
-        except Exception as e:
-            print(f"Error parsing URL for sanitization: {e}")
-            return "url_parse_error"
-    def OnLoadFromFile(self, event):
-        style = wx.FD_OPEN | wx.FD_FILE_MUST_EXIST
-        wildcard = "Text files (*.txt)|*.txt|All files (*.*)|*.*"
-        with wx.FileDialog(self, "Open Adblock List File", wildcard=wildcard, style=style) as fileDialog:
-            if fileDialog.ShowModal() == wx.ID_CANCEL: return
-            self.adblock_filepath, self.adblock_url = fileDialog.GetPath(), None
-            display_name = os.path.basename(self.adblock_filepath)
-            self.lbl_source_display.SetLabel(f"Source: File - {display_name}")
-            self.LogMessage(f"Selected adblock list file: {self.adblock_filepath}")
-            self.UpdateStatusBar(f"Loaded file: {display_name}")
-            sanitized_name = self.sanitize_filename(display_name)
-            suggested_prefix, suggested_rule = f"{sanitized_name}_list_", f"{sanitized_name}_rule"
-            self.txt_list_prefix.SetValue(suggested_prefix)
-            self.txt_rule_name.SetValue(suggested_rule)
-            self.LogMessage(f"Auto-populated naming options: Prefix='{suggested_prefix}', Rule='{suggested_rule}'")
-            self._update_apply_button_state()
-            self.Layout()
-            self.main_panel.Layout()
-    def OnLoadFromURL(self, event):
-        dlg = wx.TextEntryDialog(self, "Enter the URL for the adblock list:", "Load from URL")
-        if dlg.ShowModal() == wx.ID_OK:
-            url = dlg.GetValue().strip()
-            if url:
-                self.adblock_url, self.adblock_filepath = url, None
-                self.lbl_source_display.SetLabel(f"Source: URL - {url}")
-                self.LogMessage(f"Selected adblock list URL: {url}")
-                self.UpdateStatusBar(f"Loaded URL source")
-                sanitized_name = ""
-                try:
-                    parsed_url = urlparse(url)
-                    url_filename = os.path.basename(parsed_url.path)
-                    if url_filename:
-                        sanitized_name = self.sanitize_filename(url_filename)
-                        self.LogMessage(f"Using filename '{url_filename}' from URL for auto-naming.")
-                    else:
-                        self.LogMessage("No filename found in URL path, using domain for auto-naming.", "grey")
-                        sanitized_name = self._sanitize_url_for_name(url)
-                except Exception as e:
-                    self.LogMessage(f"Error parsing URL filename, falling back to domain: {e}", "orange")
-                    sanitized_name = self._sanitize_url_for_name(url)
-                suggested_prefix, suggested_rule = f"{sanitized_name}_list_", f"{sanitized_name}_rule"
-                self.txt_list_prefix.SetValue(suggested_prefix)
-                self.txt_rule_name.SetValue(suggested_rule)
-                self.LogMessage(f"Auto-populated naming options: Prefix='{suggested_prefix}', Rule='{suggested_rule}'")
-                self._update_apply_button_state()
-                self.Layout()
-                self.main_panel.Layout()
-            else:
-                self.ShowInfo("No URL entered.")
-                self.UpdateStatusBar("URL load cancelled.")
-        dlg.Destroy()
-    def OnNamingOptionsChanged(self, event):
-        self._update_apply_button_state()
-        event.Skip()
-    def _update_apply_button_state(self):
-        toolbar = self.GetToolBar()
-        if not toolbar: return
-        has_source = bool(self.adblock_filepath or self.adblock_url)
-        has_prefix = bool(self.txt_list_prefix.GetValue().strip())
-        has_rule_name = bool(self.txt_rule_name.GetValue().strip())
-        enable_apply = has_source and has_prefix and has_rule_name
-        toolbar.EnableTool(ID_TOOLBAR_APPLY, enable_apply)
-        mb = self.GetMenuBar()
-        if mb: mb.Enable(ID_APPLY, enable_apply)
-    def OnListItemSelected(self, event):
-        self._update_management_button_states()
-        event.Skip()
-    def OnListItemDeselected(self, event):
-        wx.CallAfter(self._update_management_button_states)
-        event.Skip()
-        
-    def OnListKeyDown(self, event):
-        """Handle key events on list controls"""
-        key_code = event.GetKeyCode()
-        
-        # Block Ctrl+A in the list control to prevent "select all" behavior
-        if key_code == ord('A') and (wx.GetKeyState(wx.WXK_CONTROL) or event.ControlDown()):
-            # Don't call event.Skip() - this blocks the event from propagating
-            # This allows the menu accelerator to handle Ctrl+A instead
-            return
-        
-        # Let other key events continue
-        event.Skip()
-    def OnEditItem(self, event):
-        active_list_ctrl, active_data_map = self._get_active_list_ctrl()
-        if not active_list_ctrl or active_list_ctrl.GetSelectedItemCount() != 1:
-            self.UpdateStatusBar("Select a single item to edit.")
-            return
-        index = active_list_ctrl.GetFirstSelected()
-        if index == -1: return
-        item_data_key = active_list_ctrl.GetItemData(index)
-        item_data = active_data_map.get(item_data_key)
-        if not item_data:
-            self.ShowError("Could not retrieve data for the selected item.")
-            return
-        item_type = None
-        if isinstance(item_data, tuple):
-            item_type = item_data[0]
-        elif isinstance(item_data, dict):
-            item_type = item_data.get('type')
-        if item_type == 'list':
-            list_id = item_data[1] if isinstance(item_data, tuple) else item_data.get('id')
-            list_name = active_list_ctrl.GetItemText(index)
-            self.LogMessage(f"Opening edit dialog for list: {list_name} ({list_id})")
-            self.UpdateStatusBar(f"Editing list: {list_name}")
-            dlg = ListEditDialog(self, self.api_client, list_id, list_name)
-            result = dlg.ShowModal()
-            if result == wx.ID_OK:
-                self.LogMessage(f"List '{list_name}' updated successfully.")
-                self.UpdateStatusBar(f"List updated.")
-                self.OnRefresh()
-            else:
-                self.LogMessage(f"Editing cancelled for list: {list_name}")
-                self.UpdateStatusBar("List edit cancelled.")
-            dlg.Destroy()
-        elif item_type == 'rule':
-            rule_id = item_data.get('id')
-            rule_name = item_data.get('name')
-            rule_enabled = item_data.get('enabled')
-            full_desc = ""
-            try:
-                details_resp = self.api_client.get_rule_details(rule_id)
-                if details_resp and details_resp.get("success"):
-                    full_desc = details_resp.get("result", {}).get("description", "")
-                else:
-                    self.LogMessage(f"Warning: Could not fetch full description for rule {rule_name}", "orange")
-            except Exception as e:
-                 self.LogMessage(f"Warning: Error fetching full description for rule {rule_name}: {e}", "orange")
-            self.LogMessage(f"Opening edit dialog for rule: {rule_name} ({rule_id})")
-            self.UpdateStatusBar(f"Editing rule: {rule_name}")
-            dlg = RuleEditDialog(self, self.api_client, rule_id, rule_name, rule_enabled, full_desc)
-            result = dlg.ShowModal()
-            if result == wx.ID_OK:
-                self.LogMessage(f"Rule '{rule_name}' updated successfully.")
-                self.UpdateStatusBar(f"Rule updated.")
-                self.OnRefresh()
-            else:
-                self.LogMessage(f"Editing cancelled for rule: {rule_name}")
-                self.UpdateStatusBar("Rule edit cancelled.")
-            dlg.Destroy()
-        else:
-            self.ShowError(f"Cannot edit item of unknown type: {item_type}")
-    def _update_management_button_states(self):
-        selected_rule_count = 0
-        selected_list_count = 0
-        can_update_rule = False
-        active_list_ctrl, _ = self._get_active_list_ctrl()
-        toolbar = self.GetToolBar()
-        mb = self.GetMenuBar()
-        if not toolbar or not mb: return
-        if self.list_ctrl_rules:
-            selected_rule_count = self.list_ctrl_rules.GetSelectedItemCount()
-            if selected_rule_count == 1:
-                idx = self.list_ctrl_rules.GetFirstSelected()
-                if idx != -1:
-                    rule_data_key = self.list_ctrl_rules.GetItemData(idx)
-                    rule_data = self.list_item_data_rules.get(rule_data_key)
-                    if isinstance(rule_data, dict) and rule_data.get("source_url"):
-                        can_update_rule = True
-        if self.list_ctrl_lists:
-            selected_list_count = self.list_ctrl_lists.GetSelectedItemCount()
-        enable_edit = (selected_rule_count == 1 and active_list_ctrl == self.list_ctrl_rules) or \
-                      (selected_list_count == 1 and active_list_ctrl == self.list_ctrl_lists)
-        enable_delete_rule_lists = (selected_rule_count >= 1 and active_list_ctrl == self.list_ctrl_rules)
-        enable_update_from_source = (selected_rule_count == 1 and can_update_rule and active_list_ctrl == self.list_ctrl_rules)
-        toolbar.EnableTool(ID_TOOLBAR_EDIT, enable_edit)
-        toolbar.EnableTool(ID_TOOLBAR_UPDATE, enable_update_from_source)
-        toolbar.EnableTool(ID_TOOLBAR_DELETE_RULE_LISTS, enable_delete_rule_lists)
-        mb.Enable(ID_TOOLBAR_EDIT, enable_edit)
-        mb.Enable(ID_UPDATE_RULE, enable_update_from_source)
-        mb.Enable(ID_DELETE_RULE_LISTS, enable_delete_rule_lists)
-    def OnApplyAdblock(self, event):
-        if not self._validate_naming_options(): return
-        if not self.adblock_filepath and not self.adblock_url:
-            self.ShowError("No adblock list source (file or URL) has been loaded.")
-            self.UpdateStatusBar("Apply failed: No source loaded.")
-            return
-        list_prefix = self.txt_list_prefix.GetValue().strip()
-        rule_name = self.txt_rule_name.GetValue().strip()
-        cursor = wx.BusyCursor()
-        self.UpdateStatusBar("Checking for existing items...")
-        try:
-            self.LogMessage(f"Checking for existing items with prefix '{list_prefix}' or rule name '{rule_name}'...")
-            existing_lists = self.api_client.get_lists(name_prefix=list_prefix, timeout=30)
-            existing_rules = self.api_client.get_rules(rule_name=rule_name, timeout=30)
-            if existing_lists or existing_rules:
-                error_detail = []
-                if existing_lists: error_detail.append(f"{len(existing_lists)} list(s) starting with '{list_prefix}'")
-                if existing_rules: error_detail.append(f"a rule named '{rule_name}'")
-                err_msg = f"Cannot proceed: Pre-existing items found ({' and '.join(error_detail)}).\nPlease use different names or delete existing items."
-                self.ShowError(err_msg)
-                self.UpdateStatusBar("Apply failed: Item name conflict.")
-                if 'cursor' in locals() and cursor: del cursor
-                return
-            self.LogMessage("Pre-check passed. No conflicts found.")
-            self.UpdateStatusBar("Pre-check passed.")
-        except ConnectionError as e:
-            self.ShowError(f"Failed during pre-check for existing items: {e}")
-            self.UpdateStatusBar("Apply failed: API connection error during pre-check.")
-            if 'cursor' in locals() and cursor: del cursor
-            return
-        except Exception as e:
-            self.ShowError(f"An unexpected error occurred during pre-check: {e}")
-            self.UpdateStatusBar("Apply failed: Unexpected error during pre-check.")
-            traceback.print_exc()
-            if 'cursor' in locals() and cursor: del cursor
-            return
-        content, source_description = None, ""
-        try:
-            source_is_url = bool(self.adblock_url)
-            if self.adblock_url:
-                url = self.adblock_url
-                self.LogMessage(f"Fetching adblock list from URL: {url}...")
-                self.UpdateStatusBar("Fetching content from URL...")
-                try:
-                    headers = {'User-Agent': 'Mozilla/5.0'}
-                    response = requests.get(url, timeout=30, headers=headers, allow_redirects=True)
-                    response.raise_for_status()
-                    try: content = response.content.decode('utf-8')
-                    except UnicodeDecodeError:
-                        if HAS_CHARDET:
-                            detected = chardet.detect(response.content)
-                            encoding = detected.get('encoding', 'latin-1') if detected else 'latin-1'
-                            self.LogMessage(f"Detected encoding (URL): {encoding}", "grey")
-                            content = response.content.decode(encoding, errors='ignore')
-                        else:
-                            self.LogMessage("UTF-8 decode failed (URL), fallback to latin-1.", "orange")
-                            if not HAS_CHARDET: self.LogMessage("Install 'chardet' package for better encoding detection.", "orange")
-                            content = response.content.decode('latin-1', errors='ignore')
-                    source_description = f"URL: {url}"; self.LogMessage("Successfully fetched content from URL.")
-                    self.UpdateStatusBar("Content fetched from URL.")
-                except requests.exceptions.Timeout: self.ShowError("Timeout occurred while fetching the adblock list from the URL."); self.UpdateStatusBar("Apply failed: URL fetch timeout."); return
-                except requests.exceptions.RequestException as e: self.ShowError(f"Failed to fetch adblock list from URL: {e}"); self.UpdateStatusBar("Apply failed: URL fetch error."); return
-                except Exception as e: self.ShowError(f"An unexpected error occurred while fetching from URL: {e}"); self.UpdateStatusBar("Apply failed: URL fetch processing error."); traceback.print_exc(); return
-            elif self.adblock_filepath and os.path.exists(self.adblock_filepath):
-                fpath = self.adblock_filepath
-                self.LogMessage(f"Reading adblock list from file: {fpath}...")
-                self.UpdateStatusBar("Reading content from file...")
-                try:
-                    content = self._read_file_with_encoding_detection(fpath)
-                    if content is None: raise IOError("Failed to read file content.")
-                    source_description = f"File: {os.path.basename(fpath)}"; self.LogMessage("Successfully read content from file.")
-                    self.UpdateStatusBar("Content read from file.")
-                except Exception as e: self.ShowError(f"Failed to read adblock list file: {e}"); self.UpdateStatusBar("Apply failed: File read error."); traceback.print_exc(); return
-            else: self.ShowError("Internal error: No valid source after pre-check."); self.UpdateStatusBar("Apply failed: Internal source error."); return
-        finally:
-            if 'cursor' in locals() and cursor: del cursor
-        if content is None: self.ShowError("Could not retrieve adblock list content."); self.UpdateStatusBar("Apply failed: No content retrieved."); return
-        self.LogMessage(f"Processing content from: {source_description}..."); self.UpdateStatusBar("Processing content...")
-        self._set_apply_enabled(False)
-        try:
-            wx.YieldIfNeeded(); domains = self._process_adblock_content(content)
-            if not domains: self.ShowError("No valid domains were extracted from the source. Please check the list format."); self.UpdateStatusBar("Apply failed: No valid domains found."); self._set_apply_enabled(True); return
-            if len(domains) > TOTAL_DOMAIN_LIMIT: self.ShowError(f"The number of extracted domains ({len(domains):,}) exceeds the Cloudflare account limit of {TOTAL_DOMAIN_LIMIT:,} across all lists."); self.UpdateStatusBar("Apply failed: Domain limit exceeded."); self._set_apply_enabled(True); return
-            num_lists_needed = (len(domains) + MAX_DOMAINS_PER_LIST - 1) // MAX_DOMAINS_PER_LIST
-            try:
-                self.LogMessage("Checking current account list count...")
-                self.UpdateStatusBar("Checking account limits...")
-                existing_lists_total = self.api_client.get_lists(timeout=30)
-                current_list_count = len(existing_lists_total)
-                self.LogMessage(f" -> Account currently has {current_list_count} lists.")
-                if num_lists_needed + current_list_count > MAX_LISTS: self.ShowError(f"Error: Creating {num_lists_needed} new list(s) would exceed the account limit of {MAX_LISTS} lists (currently have {current_list_count}).\nPlease delete some existing lists."); self.UpdateStatusBar("Apply failed: Account list limit exceeded."); self._set_apply_enabled(True); return
-                self.UpdateStatusBar("Account limits OK.")
-            except Exception as e: self.ShowError(f"Error checking current list count: {e}"); self.UpdateStatusBar("Apply failed: Error checking limits."); self._set_apply_enabled(True); return
-            self.LogMessage(f"Extracted {len(domains):,} valid domains. This will require creating {num_lists_needed} list(s). Account limit check passed.")
-            max_progress = num_lists_needed + 1; self.operation_cancelled.clear()
-            wx.CallAfter(self.progress_gauge.SetRange, max_progress)
-            wx.CallAfter(self.progress_gauge.SetValue, 0)
-            wx.CallAfter(self.progress_gauge.Show)
-            wx.CallAfter(self.custom_status_bar.Layout)
-            wx.CallAfter(self.UpdateStatusBar, "Applying Configuration...")
-            wx.CallAfter(self.EnableCancelButton, True)
-            source_url_for_worker = self.adblock_url if source_is_url else None
-            # Pass the original content for hash calculation
-            thread = threading.Thread(target=self._load_and_create_worker, args=(self.progress_gauge, self.operation_cancelled, domains, list_prefix, rule_name, source_url_for_worker, content))
-            thread.start()
-        except Exception as e:
-            self.ShowError(f"Error during adblock preprocessing: {e}")
-            self.UpdateStatusBar("Apply failed: Preprocessing error.")
-            self.LogMessage(f"Preprocessing Traceback:\n{traceback.format_exc()}", "red")
-            self._set_apply_enabled(True)
-    def _set_apply_enabled(self, enabled):
-        toolbar = self.GetToolBar()
-        if toolbar: toolbar.EnableTool(ID_TOOLBAR_APPLY, enabled)
-        mb = self.GetMenuBar()
-        if mb: mb.Enable(ID_APPLY, enabled)
-    def EnableCancelButton(self, enable):
-        toolbar = self.GetToolBar()
-        if toolbar: toolbar.EnableTool(ID_TOOLBAR_CANCEL, enable)
-        mb = self.GetMenuBar()
-        if mb: mb.Enable(ID_CANCEL_OPERATION, enable)
-    def _read_file_with_encoding_detection(self, filepath):
-        self.LogMessage(f"Reading file: {filepath}", "grey")
-        try:
-            if HAS_CHARDET:
-                with open(filepath, 'rb') as f_raw: raw_data = f_raw.read()
-                if not raw_data: self.LogMessage("File appears to be empty.", "orange"); return ""
-                detection = chardet.detect(raw_data); encoding, confidence = detection['encoding'], detection['confidence']
-                if encoding and confidence > 0.7:
-                    self.LogMessage(f" -> Detected encoding: {encoding} (Confidence: {confidence:.2f})", "grey")
-                    try: return raw_data.decode(encoding, errors='ignore')
-                    except Exception as decode_err: self.LogMessage(f" -> Decode with detected encoding failed: {decode_err}. Falling back.", "orange")
-                else: self.LogMessage(f" -> Low confidence detection ({encoding} @ {confidence:.2f}). Falling back.", "grey")
-            else:
-                 self.LogMessage(" -> 'chardet' module not found. Trying UTF-8 then Latin-1.", "grey")
-            common_encodings = ['utf-8', 'latin-1']
-            for enc in common_encodings:
-                try:
-                    with open(filepath, 'r', encoding=enc) as f: content = f.read()
-                    self.LogMessage(f" -> Successfully read file using encoding: {enc}", "grey"); return content
-                except UnicodeDecodeError: self.LogMessage(f" -> Failed to read file with encoding: {enc}", "grey"); continue
-                except Exception as e: self.LogMessage(f" -> Error reading file with encoding {enc}: {e}", "red"); raise e
-            self.LogMessage("Could not read file with common encodings.", "red"); return None
-        except FileNotFoundError: self.LogMessage(f"Error: File not found at path: {filepath}", "red"); raise
-        except Exception as e: self.LogMessage(f"An unexpected error occurred while reading file {filepath}: {e}", "red"); raise
-    def OnRefresh(self, event=None):
-        if not self.api_client: self.ShowError("API client is not initialized. Cannot refresh."); return
-        self.LogMessage("Refreshing Gateway Lists and Rules...")
-        self.UpdateStatusBar("Refreshing...")
-        if self.list_ctrl_lists: self.list_ctrl_lists.DeleteAllItems()
-        if self.list_ctrl_rules: self.list_ctrl_rules.DeleteAllItems()
-        self.list_item_data_lists, self.list_item_data_rules = {}, {}
-        self.operation_cancelled.clear()
-        wx.CallAfter(self.progress_gauge.SetRange, 2)
-        wx.CallAfter(self.progress_gauge.SetValue, 0)
-        wx.CallAfter(self.progress_gauge.Show)
-        wx.CallAfter(self.custom_status_bar.Layout)
-        wx.CallAfter(self.UpdateStatusBar, "Refreshing Items...")
-        wx.CallAfter(self.EnableCancelButton, True)
-        thread = threading.Thread(target=self._refresh_worker, args=(self.progress_gauge, self.operation_cancelled)); thread.start()
-    def _get_active_list_ctrl(self):
-        if not self.notebook: return None, None
-        selection = self.notebook.GetSelection()
-        if selection == 0: return self.list_ctrl_rules, self.list_item_data_rules
-        elif selection == 1: return self.list_ctrl_lists, self.list_item_data_lists
-        else: return None, None
-    def OnListKeyDown(self, event):
-        keycode = event.GetKeyCode()
-        # ListEvent doesn't have ControlDown(), so we need to use GetControl()
-        ctrl_key = wx.GetKeyState(wx.WXK_CONTROL)
-        if ctrl_key and keycode == ord('A'):
-            # Use Ctrl+A for Apply Adblock Configuration instead of Select All
-            self.OnApplyAdblock(event)
-        elif keycode == wx.WXK_ESCAPE:
-             self.OnCancelOperation(event)
-        else:
-            event.Skip()
-    def OnSelectAll(self, event):
-        active_list_ctrl, _ = self._get_active_list_ctrl()
-        if not active_list_ctrl: return
-        count = active_list_ctrl.GetItemCount()
-        if count == 0: self.LogMessage("Cannot select all: List is empty.", "grey"); return
-        for i in range(count): active_list_ctrl.Select(i)
-        self.LogMessage(f"Selected all {count} items.")
-        self.UpdateStatusBar(f"Selected {count} items.")
-        self._update_management_button_states()
-    def OnDeselectAll(self, event):
-        active_list_ctrl, _ = self._get_active_list_ctrl()
-        if not active_list_ctrl: return
-        count = active_list_ctrl.GetItemCount()
-        if count == 0: self.LogMessage("Cannot deselect all: List is empty.", "grey"); return
-        selected_idx = active_list_ctrl.GetFirstSelected()
-        num_deselected = 0
-        while selected_idx != -1:
-            active_list_ctrl.Select(selected_idx, False)
-            num_deselected += 1
-            selected_idx = active_list_ctrl.GetNextSelected(selected_idx)
-        self.LogMessage("Deselected all items.")
-        self.UpdateStatusBar(f"Deselected {num_deselected} items.")
-        self._update_management_button_states()
-    def OnCancelOperation(self, event):
-        self.operation_cancelled.set()
-        self.LogMessage("Cancel requested by user.", "orange")
-        self.UpdateStatusBar("Cancel requested...")
-        self.EnableCancelButton(False)
-    def OnDeleteRuleAndLists(self, event):
-        if not self.api_client: self.ShowError("API client not initialized."); return
-        selected_indices = []
-        if not self.list_ctrl_rules: return
-        idx = self.list_ctrl_rules.GetFirstSelected()
-        while idx != -1: selected_indices.append(idx); idx = self.list_ctrl_rules.GetNextSelected(idx)
-        if not selected_indices: self.ShowError("Please select at least one rule to delete."); self.UpdateStatusBar("Select rule(s) to delete."); return
-        selected_rule_ids, selected_rule_names = [], []
-        for selected_idx in selected_indices:
-            rule_data_key = self.list_ctrl_rules.GetItemData(selected_idx); rule_data = self.list_item_data_rules.get(rule_data_key)
-            if isinstance(rule_data, dict) and rule_data.get('type') == 'rule':
-                rule_id = rule_data.get('id'); rule_name = rule_data.get('name', self.list_ctrl_rules.GetItemText(selected_idx))
-                if rule_id: selected_rule_ids.append(rule_id); selected_rule_names.append(rule_name)
-                else: self.LogMessage(f"Warning: Missing ID for rule data at index {selected_idx}, key {rule_data_key}", "orange")
-            else: self.ShowError(f"Could not retrieve valid rule data for selected rule at index {selected_idx}, key {rule_data_key}."); return
-        if not selected_rule_ids: self.ShowError("Failed to identify IDs for selected rules."); return
-        num_rules_to_delete = len(selected_rule_ids); self.LogMessage(f"Preparing deletion for {num_rules_to_delete} rule(s): {', '.join(selected_rule_names)}")
-        self.UpdateStatusBar("Fetching rule details...")
-        wx.BeginBusyCursor(); all_associated_list_uuids = set(); all_associated_list_names_map = {}; fetch_errors = []
-        try:
-            self.LogMessage(" -> Fetching rule details to identify associated lists...")
-            uuid_to_name_map = {}
-            try:
-                all_lists_for_naming = self.api_client.get_lists()
-                uuid_to_name_map = {lst.get('id'): lst.get('name', 'Unnamed List') for lst in all_lists_for_naming if lst.get('id')}
-            except Exception as name_err: self.LogMessage(f" -> Warning: Could not fetch all lists for naming: {name_err}", "orange")
-            for rule_id, rule_name in zip(selected_rule_ids, selected_rule_names):
-                try:
-                    self.LogMessage(f"   -> Fetching details for rule '{rule_name}' ({rule_id})...", "grey")
-                    rule_details_resp = self.api_client.get_rule_details(rule_id)
-                    if not rule_details_resp or not rule_details_resp.get("success"): raise ConnectionError(f"Failed to fetch details for rule '{rule_name}': {rule_details_resp}")
-                    rule_obj = rule_details_resp.get("result")
-                    if not rule_obj: raise ValueError(f"Rule details missing for '{rule_name}'.")
-                    traffic_expr = rule_obj.get("traffic", "")
-                    if not traffic_expr: self.LogMessage(f"   -> Rule '{rule_name}' has no traffic expression.", "grey"); continue
-                    extracted_uuids = set(re.findall(r'\$([a-fA-F0-9]{8}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{12})', traffic_expr))
-                    if not extracted_uuids:
-                        extracted_vars = set(re.findall(r'\$([a-zA-Z0-9_]+)', traffic_expr))
-                        msg = f"   -> Could not parse list variables from expression for rule '{rule_name}'."
-                        if extracted_vars: msg = f"   -> Rule '{rule_name}' uses non-UUID variables: {', '.join(extracted_vars)}. Cannot reliably determine associated lists."
-                        self.LogMessage(msg, "orange"); continue
-                    self.LogMessage(f"   -> Found {len(extracted_uuids)} potential list UUID(s) for rule '{rule_name}'.", "grey")
-                    all_associated_list_uuids.update(extracted_uuids)
-                    for uuid in extracted_uuids:
-                        if uuid not in all_associated_list_names_map: all_associated_list_names_map[uuid] = uuid_to_name_map.get(uuid, f"Unknown List ({uuid[:8]}...)")
-                except Exception as e: fetch_errors.append(f"Rule '{rule_name}': {e}"); self.LogMessage(f"   -> Error fetching/parsing details for rule '{rule_name}': {e}", "red")
-            if fetch_errors: error_summary = "Errors occurred while fetching rule details:\n- " + "\n- ".join(fetch_errors); wx.MessageBox(error_summary, "Rule Detail Fetch Errors", wx.OK | wx.ICON_WARNING, self)
-        except Exception as e: self.ShowError(f"Error preparing deletion: {e}"); traceback.print_exc(); self.LogMessage(f"Error preparing deletion: {e}", "red"); self.UpdateStatusBar("Error preparing deletion.");
-        finally: wx.EndBusyCursor()
-        num_assoc_lists = len(all_associated_list_uuids); confirm_message = f"Delete {num_rules_to_delete} selected rule(s)?\n"
-        confirm_message += "\n".join([f"- {name}" for name in selected_rule_names]) if num_rules_to_delete <= 10 else "(Too many rule names to display)"
-        if num_assoc_lists > 0:
-            confirm_message += f"\n\nALSO delete {num_assoc_lists} uniquely associated list(s):\n"
-            display_list_names = [all_associated_list_names_map.get(uuid, f"ID: {uuid}") for uuid in sorted(list(all_associated_list_uuids))]
-            confirm_message += "\n".join([f"- {name}" for name in display_list_names]) if num_assoc_lists <= 10 else f"(Too many list names to display)"
-        else: confirm_message += "\n\nNo associated lists identified (or errors occurred during detection)."
-        confirm_message += "\n\nProceed with deletion?"
-        dialog_result = wx.MessageBox(confirm_message, "Confirm Delete Rule(s) and Associated Lists", wx.YES_NO | wx.ICON_WARNING | wx.NO_DEFAULT, self)
-        if dialog_result == wx.NO: self.LogMessage("Deletion cancelled by user."); self.UpdateStatusBar("Deletion cancelled."); return
-        self.LogMessage(f"Starting deletion worker for {num_rules_to_delete} rule(s) and {num_assoc_lists} associated list(s)...")
-        self.UpdateStatusBar(f"Deleting {num_rules_to_delete} rule(s) and {num_assoc_lists} list(s)...")
-        self.operation_cancelled.clear(); max_progress = num_rules_to_delete + num_assoc_lists
-        wx.CallAfter(self.progress_gauge.SetRange, max(1, max_progress))
-        wx.CallAfter(self.progress_gauge.SetValue, 0)
-        wx.CallAfter(self.progress_gauge.Show)
-        wx.CallAfter(self.custom_status_bar.Layout)
-        wx.CallAfter(self.UpdateStatusBar, f"Deleting Rule(s) and Lists...")
-        wx.CallAfter(self.EnableCancelButton, True)
-        thread = threading.Thread(target=self._delete_rule_and_lists_worker, args=(selected_rule_ids, selected_rule_names, list(all_associated_list_uuids), self.progress_gauge, self.operation_cancelled)); thread.start()
-    def OnUpdateSelectedRule(self, event):
-        if not self.list_ctrl_rules or self.list_ctrl_rules.GetSelectedItemCount() != 1: self.ShowError("Please select exactly one rule to update."); self.UpdateStatusBar("Select one rule to update."); return
-        selected_idx = self.list_ctrl_rules.GetFirstSelected()
-        if selected_idx == -1: return
-        rule_data_key = self.list_ctrl_rules.GetItemData(selected_idx); rule_data = self.list_item_data_rules.get(rule_data_key)
-        if not isinstance(rule_data, dict) or not rule_data.get("source_url") or not rule_data.get("list_prefix"): self.ShowError("The selected rule does not appear to be managed by this script or lacks source URL/prefix metadata."); self.UpdateStatusBar("Cannot update: Rule missing metadata."); return
-        rule_id = rule_data.get("id"); rule_name = rule_data.get("name"); source_url = rule_data.get("source_url"); list_prefix = rule_data.get("list_prefix")
-        if not all([rule_id, rule_name, source_url, list_prefix]): self.ShowError("Could not retrieve necessary information (ID, Name, URL, Prefix) for the selected rule."); self.UpdateStatusBar("Cannot update: Incomplete rule info."); return
-        msg = f"This will update the rule '{rule_name}' and its associated lists by:\n\n1. Fetching the latest list from:\n   {source_url}\n2. Deleting the existing rule and its current lists.\n3. Creating new lists (named '{list_prefix}...') and a new rule ('{rule_name}').\n\nProceed with update?"
-        dialog_result = wx.MessageBox(msg, "Confirm Rule Update from URL", wx.YES_NO | wx.ICON_QUESTION | wx.NO_DEFAULT, self)
-        if dialog_result == wx.NO: self.LogMessage("Rule update cancelled by user."); self.UpdateStatusBar("Rule update cancelled."); return
-        self.LogMessage(f"Starting update process for rule '{rule_name}' from {source_url}...")
-        self.UpdateStatusBar(f"Updating rule '{rule_name}'...")
-        self.operation_cancelled.clear()
-        wx.CallAfter(self.progress_gauge.Pulse)
-        wx.CallAfter(self.progress_gauge.Show)
-        wx.CallAfter(self.custom_status_bar.Layout)
-        wx.CallAfter(self.UpdateStatusBar, f"Updating Rule '{rule_name}'...")
-        wx.CallAfter(self.EnableCancelButton, True)
-        thread = threading.Thread(target=self._update_rule_worker, args=(rule_id, rule_name, source_url, list_prefix, self.progress_gauge, self.operation_cancelled)); thread.start()
-    def _update_rules_status(self, op_event=None):
-        """Update status of all rules in the list control - called after refresh"""
-        if not self.list_ctrl_rules or not self.api_client:
-            return
-        
-        wx.CallAfter(self.LogMessage, "Checking rules for updates...", "grey")
-        wx.CallAfter(self.UpdateStatusBar, "Checking rules for updates...")
-        
-        # Process in a separate thread to avoid freezing UI
-        thread = threading.Thread(target=self._update_rules_status_worker, args=(op_event,))
-        thread.daemon = True
-        thread.start()
+    # --- Patterns for different list formats ---
+    # /etc/hosts or IP-based blocking
+    ip_hosts_pattern = re.compile(r"^(?:0\.0\.0\.0|127\.0\.0\.1)\s+(.*)") 
+    # Dnsmasq format (e.g., local=/example.com/)
+    dnsmasq_pattern = re.compile(r"^local=/(.+?)/") 
+    # Simple wildcard format (e.g., *.example.com) - Note: Cloudflare Gateway doesn't directly support wildcards in lists, but we extract the base domain.
+    wildcard_pattern = re.compile(r"^\*\.(.+)$") 
+    # RPZ format (e.g., example.com CNAME .)
+    rpz_pattern = re.compile(r"^(?:\*\.)?([a-zA-Z0-9.-]+)\s+CNAME\s+\.$") 
     
-    def _update_rules_status_worker(self, op_event=None):
-        """Worker thread for updating rule status"""
-        try:
-            if op_event:
-                self._check_cancel_request(op_event)
-                
-            # Get all rules from the list control
-            count = self.list_ctrl_rules.GetItemCount()
-            wx.CallAfter(self.LogMessage, f"Checking update status for {count} rules...", "grey")
-            
-            for i in range(count):
-                if op_event:
-                    self._check_cancel_request(op_event)
-                    
-                # Get rule data
-                rule_data_key = self.list_ctrl_rules.GetItemData(i)
-                rule_data = self.list_item_data_rules.get(rule_data_key)
-                
-                if not rule_data:
-                    continue
-                    
-                # Get rule name and ID for logging
-                rule_name = rule_data.get("name", f"Rule {i+1}")
-                rule_id = rule_data.get("id", "")
-                    
-                # Find and extract source URL
-                description = ""
-                source_url = ""
-                
-                try:
-                    # Get detailed rule information
-                    rule_details = self.api_client.get_rule_details(rule_id)
-                    if rule_details and rule_details.get("success"):
-                        rule_result = rule_details.get("result", {})
-                        if rule_result:
-                            description = rule_result.get("description", "")
-                            source_url, list_prefix = self._parse_metadata(description)
-                            
-                            # Store source URL in rule data if found
-                            if source_url:
-                                rule_data["source_url"] = source_url
-                                rule_data["list_prefix"] = list_prefix
-                            
-                    # Check update status if we have a source URL
-                    if source_url:
-                        wx.CallAfter(self.LogMessage, f"Checking updates for rule '{rule_name}'...", "grey")
-                        update_status = self._check_update_status(description, source_url)
-                        
-                        # Update the list control with status
-                        wx.CallAfter(self.list_ctrl_rules.SetItem, i, 4, update_status)
-                        
-                        # Update data map
-                        rule_data["update_status"] = update_status
-                        self.list_item_data_rules[rule_data_key] = rule_data
-                    else:
-                        # No source URL found
-                        wx.CallAfter(self.list_ctrl_rules.SetItem, i, 4, "No source URL")
-                        rule_data["update_status"] = "No source URL"
-                        self.list_item_data_rules[rule_data_key] = rule_data
-                        
-                except Exception as e:
-                    wx.CallAfter(self.LogMessage, f"Error checking rule '{rule_name}': {e}", "red")
-                    wx.CallAfter(self.list_ctrl_rules.SetItem, i, 4, "Check failed")
-                    rule_data["update_status"] = "Check failed"
-                    self.list_item_data_rules[rule_data_key] = rule_data
-                    
-            # Update the item data map for sorting
-            wx.CallAfter(lambda: self.list_ctrl_rules.SetItemDataMap(self.list_item_data_rules))
-            wx.CallAfter(self.LogMessage, "Update check complete.", "green")
-            wx.CallAfter(self.UpdateStatusBar, "Ready")
-            
-        except OperationCancelledError:
-            wx.CallAfter(self.LogMessage, "Update check cancelled.", "orange")
-            wx.CallAfter(self.UpdateStatusBar, "Ready")
-        except Exception as e:
-            wx.CallAfter(self.LogMessage, f"Error during update check: {e}", "red")
-            wx.CallAfter(self.UpdateStatusBar, "Update check failed")
-        
-    def _update_progress_task(self, gauge, progress, message):
-        def task():
-            if gauge and gauge.IsShown():
-                try:
-                    gauge.SetValue(progress)
-                    self.UpdateStatusBar(message)
-                except Exception as e: print(f"Error updating gauge/statusbar: {e}")
-        wx.CallAfter(task)
-    def _pulse_progress_task(self, gauge, message):
-        def task():
-            if gauge and gauge.IsShown():
-                try:
-                    gauge.Pulse()
-                    self.UpdateStatusBar(message)
-                except Exception as e: print(f"Error pulsing gauge/statusbar: {e}")
-        wx.CallAfter(task)
-    def _check_cancel_request(self, cancelled_event):
-        time.sleep(0.01)
-        if cancelled_event.is_set(): raise OperationCancelledError("Operation cancelled by user.")
-    def _load_and_create_worker(self, gauge, op_event, domains, prefix, rule_name, source_url=None, original_content=None):
-        created_list_ids, created_rule_id, success = [], None, False; id_map_for_rule_expr = {}
-        try:
-            if not self.api_client: raise RuntimeError("API client is not available in worker thread.")
-            num_lists_to_create = (len(domains) + MAX_DOMAINS_PER_LIST - 1) // MAX_DOMAINS_PER_LIST; current_progress = 0
-            def log_and_progress(prog, msg, color=None): wx.CallAfter(lambda: (self.LogMessage(msg, color), self._update_progress_task(gauge, prog, msg)))
-            domain_chunks = [domains[i:i + MAX_DOMAINS_PER_LIST] for i in range(0, len(domains), MAX_DOMAINS_PER_LIST)]
-            wx.CallAfter(self.LogMessage, f"Creating {num_lists_to_create} list(s)...")
-            num_digits = len(str(num_lists_to_create)) if num_lists_to_create > 0 else 1
-            for i, chunk in enumerate(domain_chunks):
-                list_num_str = str(i + 1).zfill(num_digits); list_name = f"{prefix}{list_num_str}"; current_progress += 1
-                msg = f"Creating list '{list_name}' ({i + 1}/{num_lists_to_create})..."; log_and_progress(current_progress, msg); self._check_cancel_request(op_event)
-                try:
-                    response = self.api_client.create_list(list_name, chunk, timeout=LIST_CREATE_TIMEOUT_SECONDS)
-                    if not response or not response.get("success"): errors = response.get("errors", [{"message": "Unknown API error"}]) if response else [{"message": "No response from API"}]; raise ValueError(f"API call failed to create list '{list_name}'. Error: {errors[0].get('message', 'N/A')}")
-                    result = response.get("result"); list_id = result.get("id") if result else None
-                    if not list_id: raise ValueError(f"API response missing ID for created list '{list_name}'.")
-                    created_list_ids.append(list_id); id_map_for_rule_expr[list_id] = list_id
-                    wx.CallAfter(self.LogMessage, f"Successfully created list '{list_name}' (ID: {list_id})")
-                    if LIST_CREATE_DELAY_SECONDS > 0: time.sleep(LIST_CREATE_DELAY_SECONDS); self._check_cancel_request(op_event)
-                except Exception as e: raise RuntimeError(f"Error creating list #{i+1} ('{list_name}'): {e}") from e
-            if len(created_list_ids) != num_lists_to_create: raise RuntimeError(f"List creation count mismatch. Expected {num_lists_to_create}, created {len(created_list_ids)}.")
-            current_progress += 1; msg = f"Creating rule '{rule_name}'..."; log_and_progress(current_progress, msg); self._check_cancel_request(op_event)
-            if not created_list_ids: raise ValueError("Cannot create rule: No list IDs were generated.")
-            try:
-                # Calculate content hash for the original content
-                content_hash = self._calculate_content_hash(original_content) if original_content else str(len("\n".join(domains)))
-                self.LogMessage(f"Creating rule with hash: {content_hash}", "grey")
-                rule_response = self.api_client.create_rule(rule_name, created_list_ids, id_map_for_rule_expr, enabled=True, source_url=source_url, list_prefix=prefix, content_hash=content_hash)
-                if not rule_response or not rule_response.get("success"): errors = rule_response.get("errors", [{"message": "Unknown API error"}]) if rule_response else [{"message": "No response from API"}]; raise ConnectionError(f"API call failed to create rule '{rule_name}'. Error: {errors[0].get('message', 'N/A')}")
-                result = rule_response.get("result"); created_rule_id = result.get("id") if result else None
-                if not created_rule_id: raise ConnectionError("API response missing ID for created rule.")
-                wx.CallAfter(self.LogMessage, f"Successfully created rule '{rule_name}' (ID: {created_rule_id})", "green"); success = True
-            except Exception as e: raise RuntimeError(f"Error creating rule '{rule_name}': {e}") from e
-            if success: wx.CallAfter(self.LogMessage, "Adblock configuration applied successfully!", "green"); wx.CallAfter(self.UpdateStatusBar, "Configuration applied successfully."); wx.CallAfter(self.OnRefresh)
-        except OperationCancelledError as e:
-            wx.CallAfter(self.LogMessage, f"Operation cancelled by user: {e}", "orange"); wx.CallAfter(self.UpdateStatusBar, "Apply cancelled.")
-            if created_list_ids: wx.CallAfter(self.LogMessage, "Attempting to clean up partially created lists..."); cleanup_thread = threading.Thread(target=self._cleanup_items, args=(created_list_ids, [])); cleanup_thread.start()
-            wx.CallAfter(self.OnRefresh)
-        except Exception as e:
-            wx.CallAfter(self.ShowError, f"Error during adblock application: {e}"); wx.CallAfter(self.LogMessage, f"PROCESS FAILED: {e}", "red"); wx.CallAfter(self.UpdateStatusBar, "Apply failed.")
-            if not isinstance(e, RuntimeError) or "Pre-existing" not in str(e): wx.CallAfter(self.LogMessage, f"Traceback:\n{traceback.format_exc()}", "red")
-            if created_list_ids or created_rule_id:
-                wx.CallAfter(self.LogMessage, "Attempting to clean up partially created items...")
-                rule_ids_to_cleanup = [created_rule_id] if created_rule_id else []; cleanup_thread = threading.Thread(target=self._cleanup_items, args=(created_list_ids, rule_ids_to_cleanup)); cleanup_thread.start()
-            wx.CallAfter(self.OnRefresh)
-        finally:
-            wx.CallAfter(self._set_apply_enabled, True); wx.CallAfter(wx.EndBusyCursor)
-            wx.CallAfter(self.lbl_source_display.SetLabel, "Source: None")
-            wx.CallAfter(self.txt_list_prefix.SetValue, ""); wx.CallAfter(self.txt_rule_name.SetValue, "")
-            self.adblock_filepath, self.adblock_url = None, None
-            wx.CallAfter(gauge.Hide)
-            wx.CallAfter(self.custom_status_bar.Layout)
-            wx.CallAfter(gauge.SetValue, 0)
-            wx.CallAfter(self.EnableCancelButton, False)
-            wx.CallAfter(self.UpdateStatusBar, "Ready")
-    def _refresh_worker(self, gauge, op_event):
-        fetched_lists, fetched_rules = [], []
-        try:
-            if not self.api_client: raise ConnectionError("API Client not initialized.")
-            def log_and_progress(prog, msg, color=None): wx.CallAfter(lambda: (self.LogMessage(msg, color), self._update_progress_task(gauge, prog, msg)))
-            msg = "Fetching Gateway Lists..."; log_and_progress(1, msg, "grey"); self._check_cancel_request(op_event)
-            try: fetched_lists = self.api_client.get_lists(); wx.CallAfter(self.LogMessage, f"Found {len(fetched_lists)} lists.", "grey")
-            except Exception as e: wx.CallAfter(self.LogMessage, f"Error fetching lists: {e}", "orange")
-            msg = "Fetching Gateway Rules..."; log_and_progress(2, msg, "grey"); self._check_cancel_request(op_event)
-            try: fetched_rules = self.api_client.get_rules(); wx.CallAfter(self.LogMessage, f"Found {len(fetched_rules)} rules.", "grey")
-            except Exception as e: wx.CallAfter(self.LogMessage, f"Error fetching rules: {e}", "orange")
+    # --- Adblock Plus style patterns ---
+    # ORIGINAL: Might not handle options ($third-party) correctly
+    # adblock_patterns = [
+    #     re.compile(r"^\|\|([a-zA-Z0-9.-]+)[\^|/$]?(?:$|\s|,)"), 
+    #     re.compile(r"^([a-zA-Z0-9.-]+)$") # Plain domain list
+    # ]
+    
+    # UPDATED: Specifically targets the ||domain.com^ format and captures the domain
+    adblock_patterns = [
+        # Handles ||domain.com^... format, capturing only the domain
+        re.compile(r"^\|\|([a-zA-Z0-9.-]+)\^"), 
+         # Handles lines with just the domain name
+        re.compile(r"^([a-zA-Z0-9.-]+)$")
+    ]
 
-            # Populate the lists, then immediately check for updates
-            wx.CallAfter(self._populate_list_ctrl, fetched_lists, fetched_rules)
-            wx.CallAfter(self._update_rules_status, op_event)
-            wx.CallAfter(self.LogMessage, "Refresh complete - checking for updates.") 
-            wx.CallAfter(self.UpdateStatusBar, "Refresh complete.")
-        except OperationCancelledError as e: wx.CallAfter(self.LogMessage, f"Refresh operation cancelled: {e}", "orange"); wx.CallAfter(self.UpdateStatusBar, "Refresh cancelled.")
-        except ConnectionError as e: wx.CallAfter(self.ShowError, f"Refresh Error: Could not connect to Cloudflare API.\n{e}"); wx.CallAfter(self.UpdateStatusBar, "Refresh failed: Connection error.")
-        except Exception as e: wx.CallAfter(self.ShowError, f"An unexpected error occurred during refresh: {e}"); wx.CallAfter(self.LogMessage, f"Refresh Traceback:\n{traceback.format_exc()}", "red"); wx.CallAfter(self.UpdateStatusBar, "Refresh failed: Unexpected error.")
-        finally:
-            wx.CallAfter(gauge.Hide)
-            wx.CallAfter(self.custom_status_bar.Layout)
-            wx.CallAfter(gauge.SetValue, 0)
-            wx.CallAfter(self.EnableCancelButton, False)
-            wx.CallAfter(self.UpdateStatusBar, "Ready")
-    def _delete_items_worker(self, items_to_delete, gauge, op_event):
-        deleted_count, failed_items, total_items = 0, [], len(items_to_delete)
-        try:
-            if not self.api_client: raise RuntimeError("API client is not available in worker thread.")
-            def log_and_progress(prog, msg, color=None): wx.CallAfter(lambda: (self.LogMessage(msg, color), self._update_progress_task(gauge, prog, msg)))
-            for i, item in enumerate(items_to_delete):
-                item_type = item.get("type", "unknown"); item_id = item.get("id"); item_name = item.get("name", f"Unnamed {item_type}")
-                current_progress = i + 1; self._check_cancel_request(op_event)
-                if not item_id: msg = f"Skipping item '{item_name}' - No ID found."; wx.CallAfter(lambda m=msg: self.LogMessage(m, "orange")); failed_items.append(f"{item_name} (Missing ID)"); continue
-                msg = f"Deleting {item_type} '{item_name}' ({current_progress}/{total_items})..."; log_and_progress(current_progress, msg)
-                try:
-                    if item_type.lower() == "list": self.api_client.delete_list(item_id)
-                    elif item_type.lower() == "rule": self.api_client.delete_rule(item_id)
-                    else: raise ValueError(f"Unknown item type encountered: '{item_type}'")
-                    deleted_count += 1; wx.CallAfter(self.LogMessage, f"Successfully deleted '{item_name}'.")
-                    if DELETE_DELAY_SECONDS > 0: time.sleep(DELETE_DELAY_SECONDS); self._check_cancel_request(op_event)
-                except Exception as e: fail_msg = f"FAILED to delete {item_type} '{item_name}': {e}"; wx.CallAfter(self.LogMessage, fail_msg, "orange"); failed_items.append(f"'{item_name}' ({item_type})")
-            final_color = "green" if not failed_items else "orange"
-            final_msg = f"Deletion process finished. Successfully deleted {deleted_count}/{total_items} item(s)."
-            status_msg = f"Deleted {deleted_count}/{total_items} items."
-            if failed_items: final_msg += f" Failed to delete {len(failed_items)} item(s)."; status_msg += f" ({len(failed_items)} failed)"
-            wx.CallAfter(self.LogMessage, final_msg, final_color); wx.CallAfter(self.UpdateStatusBar, status_msg)
-            if failed_items: error_summary = f"Failed to delete the following items:\n - " + "\n - ".join(failed_items); wx.CallAfter(self.ShowError, error_summary)
-            wx.CallAfter(self.OnRefresh)
-        except OperationCancelledError as e: wx.CallAfter(self.LogMessage, f"Deletion operation cancelled: {e}", "orange"); wx.CallAfter(self.UpdateStatusBar, "Deletion cancelled."); wx.CallAfter(self.OnRefresh)
-        except Exception as e: error_msg = f"An unexpected error occurred during item deletion: {e}"; wx.CallAfter(self.ShowError, error_msg); wx.CallAfter(self.LogMessage, f"Deletion Process FAILED: {e}\n{traceback.format_exc()}", "red"); wx.CallAfter(self.UpdateStatusBar, "Deletion failed: Unexpected error."); wx.CallAfter(self.OnRefresh)
-        finally:
-            wx.CallAfter(gauge.Hide)
-            wx.CallAfter(self.custom_status_bar.Layout)
-            wx.CallAfter(gauge.SetValue, 0)
-            wx.CallAfter(self.EnableCancelButton, False)
-            wx.CallAfter(self.UpdateStatusBar, "Ready")
-    def _delete_rule_and_lists_worker(self, rule_ids, rule_names, list_uuids, gauge, op_event):
-        deleted_rules_count, deleted_lists_count, failed_rules, failed_lists = 0, 0, [], []
-        total_rules, total_lists, current_progress = len(rule_ids), len(list_uuids), 0
-        total_ops = total_rules + total_lists
-        try:
-            if not self.api_client: raise RuntimeError("API client is not available in worker thread.")
-            def log_and_progress(prog, msg, color=None): wx.CallAfter(lambda: (self.LogMessage(msg, color), self._update_progress_task(gauge, prog, msg)))
-            if total_rules > 0:
-                wx.CallAfter(self.LogMessage, f"Deleting {total_rules} rule(s)...")
-                for i, (rule_id, rule_name) in enumerate(zip(rule_ids, rule_names)):
-                    current_progress += 1; msg = f"Deleting rule '{rule_name}' ({i + 1}/{total_rules})..."; log_and_progress(current_progress, msg); self._check_cancel_request(op_event)
-                    try: self.api_client.delete_rule(rule_id); deleted_rules_count += 1; wx.CallAfter(self.LogMessage, f"Successfully deleted rule '{rule_name}'."); time.sleep(DELETE_DELAY_SECONDS if DELETE_DELAY_SECONDS > 0 else 0); self._check_cancel_request(op_event)
-                    except Exception as e: fail_msg = f"FAILED to delete rule '{rule_name}': {e}"; wx.CallAfter(self.LogMessage, fail_msg, "red"); failed_rules.append(rule_name)
-            if total_lists > 0:
-                wx.CallAfter(self.LogMessage, f"Deleting {total_lists} associated list(s)...")
-                for i, list_uuid in enumerate(list_uuids):
-                    current_progress += 1; display_uuid = f"{list_uuid[:8]}..." if len(list_uuid) > 8 else list_uuid; msg = f"Deleting associated list {i + 1}/{total_lists} (ID: {display_uuid})..."; log_and_progress(current_progress, msg); self._check_cancel_request(op_event)
-                    try: self.api_client.delete_list(list_uuid); deleted_lists_count += 1; time.sleep(DELETE_DELAY_SECONDS if DELETE_DELAY_SECONDS > 0 else 0); self._check_cancel_request(op_event)
-                    except Exception as e: fail_msg = f"FAILED to delete associated list ID {list_uuid}: {e}"; wx.CallAfter(self.LogMessage, fail_msg, "orange"); failed_lists.append(list_uuid)
-            final_color = "green" if not failed_rules and not failed_lists else "orange"
-            final_message = f"Deletion process finished. Rules: {deleted_rules_count}/{total_rules} deleted"; final_message += f" ({len(failed_rules)} failed)." if failed_rules else "."
-            final_message += f" Lists: {deleted_lists_count}/{total_lists} deleted"; final_message += f" ({len(failed_lists)} failed)." if failed_lists else "."
-            status_msg = f"Deleted {deleted_rules_count} rule(s), {deleted_lists_count} list(s)."
-            if failed_rules or failed_lists: status_msg += f" ({len(failed_rules) + len(failed_lists)} failed)"
-            wx.CallAfter(self.LogMessage, final_message, final_color); wx.CallAfter(self.UpdateStatusBar, status_msg)
-            if failed_rules or failed_lists:
-                error_summary = f"Deletion completed with errors:\n";
-                if failed_rules: error_summary += f"- Failed Rules:\n   - " + "\n   - ".join(failed_rules) + "\n"
-                if failed_lists: error_summary += f"- Failed Lists (UUIDs):\n   - " + "\n   - ".join(failed_lists)
-                wx.CallAfter(self.ShowError, error_summary)
-            wx.CallAfter(self.OnRefresh)
-        except OperationCancelledError as e: wx.CallAfter(self.LogMessage, f"Deletion operation cancelled: {e}", "orange"); wx.CallAfter(self.UpdateStatusBar, "Deletion cancelled."); wx.CallAfter(self.OnRefresh)
-        except Exception as e: error_msg = f"An unexpected error occurred during rule/list deletion: {e}"; wx.CallAfter(self.ShowError, error_msg); wx.CallAfter(self.LogMessage, f"Deletion Process FAILED: {e}\n{traceback.format_exc()}", "red"); wx.CallAfter(self.UpdateStatusBar, "Deletion failed: Unexpected error."); wx.CallAfter(self.OnRefresh)
-        finally:
-            wx.CallAfter(gauge.Hide)
-            wx.CallAfter(self.custom_status_bar.Layout)
-            wx.CallAfter(gauge.SetValue, 0)
-            wx.CallAfter(self.EnableCancelButton, False)
-            wx.CallAfter(self.UpdateStatusBar, "Ready")
-    def _update_rule_worker(self, old_rule_id, rule_name, source_url, list_prefix, gauge, op_event):
-        newly_created_list_ids, newly_created_rule_id, success = [], None, False; progress_step = 0
-        def update_gauge(message): nonlocal progress_step; progress_step += 1; wx.CallAfter(self._pulse_progress_task, gauge, message)
-        try:
-            if not self.api_client: raise RuntimeError("API client not available.")
-            update_gauge("Fetching updated list from URL..."); wx.CallAfter(self.LogMessage, f"Fetching updated content from {source_url}...")
-            new_content = None
-            try:
-                headers = {'User-Agent': 'Mozilla/5.0'}; response = requests.get(source_url, timeout=60, headers=headers, allow_redirects=True); response.raise_for_status()
-                try: new_content = response.content.decode('utf-8')
-                except UnicodeDecodeError:
-                    if HAS_CHARDET: detected = chardet.detect(response.content); encoding = detected.get('encoding', 'latin-1') if detected else 'latin-1'; wx.CallAfter(self.LogMessage, f"Detected encoding: {encoding}", "grey"); new_content = response.content.decode(encoding, errors='ignore')
-                    else: wx.CallAfter(self.LogMessage,"UTF-8 decode failed, fallback to latin-1.", "orange"); new_content = response.content.decode('latin-1', errors='ignore')
-                wx.CallAfter(self.LogMessage, "Successfully fetched updated content.")
-            except Exception as e: raise RuntimeError(f"Failed to fetch updated content from URL: {e}") from e
-            if new_content is None: raise RuntimeError("Failed to decode content from URL.")
-            update_gauge("Processing updated domain list..."); wx.CallAfter(self.LogMessage, "Processing updated domain list...")
-            new_domains = self._process_adblock_content(new_content)
-            if not new_domains: raise RuntimeError("No valid domains found in the updated list content.")
-            wx.CallAfter(self.LogMessage, f"Found {len(new_domains):,} valid domains in updated list."); num_new_lists_needed = (len(new_domains) + MAX_DOMAINS_PER_LIST - 1) // MAX_DOMAINS_PER_LIST
-            update_gauge("Fetching details of existing rule..."); wx.CallAfter(self.LogMessage, f"Fetching details for old rule ID: {old_rule_id}...")
-            old_list_uuids = set()
-            try:
-                rule_details_resp = self.api_client.get_rule_details(old_rule_id)
-                if not rule_details_resp or not rule_details_resp.get("success"): raise ConnectionError(f"Failed to fetch details for rule '{rule_name}': {rule_details_resp}")
-                rule_obj = rule_details_resp.get("result")
-                if not rule_obj: raise ValueError(f"Rule details missing for '{rule_name}'.")
-                traffic_expr = rule_obj.get("traffic", "")
-                if traffic_expr:
-                    extracted = set(re.findall(r'\$([a-fA-F0-9]{8}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{12})', traffic_expr))
-                    if extracted: old_list_uuids = extracted; wx.CallAfter(self.LogMessage, f"Found {len(old_list_uuids)} associated list UUID(s) in old rule.")
-                    else: wx.CallAfter(self.LogMessage, "Could not parse list UUIDs from old rule traffic expression.", "orange")
-                else: wx.CallAfter(self.LogMessage, "Old rule has no traffic expression.", "orange")
-            except Exception as e: raise RuntimeError(f"Error getting details or parsing old rule '{rule_name}': {e}") from e
-            update_gauge("Deleting existing rule..."); wx.CallAfter(self.LogMessage, f"Deleting old rule '{rule_name}' ({old_rule_id})...")
-            try: self.api_client.delete_rule(old_rule_id); wx.CallAfter(self.LogMessage, "Successfully deleted old rule.")
-            except Exception as e: raise RuntimeError(f"Failed to delete old rule '{rule_name}': {e}") from e
-            if old_list_uuids:
-                wx.CallAfter(self.LogMessage, f"Deleting {len(old_list_uuids)} old associated list(s)...")
-                for i, list_uuid in enumerate(old_list_uuids):
-                    update_gauge(f"Deleting old list {i+1}/{len(old_list_uuids)}...")
-                    try:
-                        self.api_client.delete_list(list_uuid); wx.CallAfter(self.LogMessage, f"Deleted old list {list_uuid[:8]}...")
-                        if DELETE_DELAY_SECONDS > 0: time.sleep(DELETE_DELAY_SECONDS); self._check_cancel_request(op_event)
-                    except Exception as e: wx.CallAfter(self.LogMessage, f"WARNING: Failed to delete old list {list_uuid}: {e}. Continuing update...", "orange")
-            else: wx.CallAfter(self.LogMessage, "No old lists found to delete.", "grey")
-            wx.CallAfter(self.LogMessage, f"Creating {num_new_lists_needed} new list(s)...")
-            new_domain_chunks = [new_domains[i:i + MAX_DOMAINS_PER_LIST] for i in range(0, len(new_domains), MAX_DOMAINS_PER_LIST)]
-            num_digits = len(str(num_new_lists_needed)) if num_new_lists_needed > 0 else 1; new_id_map = {}
-            for i, chunk in enumerate(new_domain_chunks):
-                list_num_str = str(i + 1).zfill(num_digits); new_list_name = f"{list_prefix}{list_num_str}"
-                update_gauge(f"Creating new list {i+1}/{num_new_lists_needed}..."); wx.CallAfter(self.LogMessage, f"Creating new list '{new_list_name}'...")
-                try:
-                    response = self.api_client.create_list(new_list_name, chunk, timeout=LIST_CREATE_TIMEOUT_SECONDS)
-                    if not response or not response.get("success"): raise ValueError(f"API call failed: {response.get('errors', 'Unknown error')}")
-                    result = response.get("result"); list_id = result.get("id") if result else None;
-                    if not list_id: raise ValueError("API response missing ID.")
-                    newly_created_list_ids.append(list_id); new_id_map[list_id] = list_id
-                    wx.CallAfter(self.LogMessage, f"Created new list '{new_list_name}' (ID: {list_id})")
-                    if LIST_CREATE_DELAY_SECONDS > 0: time.sleep(LIST_CREATE_DELAY_SECONDS); self._check_cancel_request(op_event)
-                except Exception as e: raise RuntimeError(f"Error creating new list '{new_list_name}': {e}") from e
-            if len(newly_created_list_ids) != num_new_lists_needed: raise RuntimeError("New list creation count mismatch.")
-            update_gauge("Creating new rule..."); wx.CallAfter(self.LogMessage, f"Creating new rule '{rule_name}'...")
-            if not newly_created_list_ids: raise ValueError("Cannot create rule: No new list IDs were generated.")
-            try:
-                # Calculate content hash from the updated content
-                content_hash = self._calculate_content_hash(new_content)
-                wx.CallAfter(self.LogMessage, f"Calculated content hash for update: {content_hash}", "grey")
-                
-                rule_response = self.api_client.create_rule(rule_name, newly_created_list_ids, new_id_map, 
-                                                          enabled=True, source_url=source_url, 
-                                                          list_prefix=list_prefix, content_hash=content_hash)
-                
-                if not rule_response or not rule_response.get("success"): raise ConnectionError(f"API call failed: {rule_response.get('errors', 'Unknown error')}")
-                result = rule_response.get("result"); newly_created_rule_id = result.get("id") if result else None
-                if not newly_created_rule_id: raise ConnectionError("API response missing ID for new rule.")
-                wx.CallAfter(self.LogMessage, f"Successfully created new rule '{rule_name}' (ID: {newly_created_rule_id}) with hash: {content_hash}", "green"); success = True
-            except Exception as e: raise RuntimeError(f"Error creating new rule '{rule_name}': {e}") from e
-            if success: wx.CallAfter(self.LogMessage, f"Rule '{rule_name}' updated successfully!", "green"); wx.CallAfter(self.UpdateStatusBar, f"Rule '{rule_name}' updated.")
-        except OperationCancelledError as e:
-            wx.CallAfter(self.LogMessage, f"Rule update cancelled: {e}", "orange"); wx.CallAfter(self.UpdateStatusBar, "Rule update cancelled.")
-            if newly_created_list_ids or newly_created_rule_id:
-                wx.CallAfter(self.LogMessage, "Attempting cleanup of partially created items during update...")
-                rule_ids_to_cleanup = [newly_created_rule_id] if newly_created_rule_id else []; cleanup_thread = threading.Thread(target=self._cleanup_items, args=(newly_created_list_ids, rule_ids_to_cleanup)); cleanup_thread.start()
-        except Exception as e:
-            wx.CallAfter(self.ShowError, f"Error during rule update: {e}"); wx.CallAfter(self.LogMessage, f"UPDATE FAILED for rule '{rule_name}': {e}", "red"); wx.CallAfter(self.LogMessage, f"Traceback:\n{traceback.format_exc()}", "red"); wx.CallAfter(self.UpdateStatusBar, "Rule update failed.")
-            if newly_created_list_ids or newly_created_rule_id:
-                wx.CallAfter(self.LogMessage, "Attempting cleanup of partially created items during update...")
-                rule_ids_to_cleanup = [newly_created_rule_id] if newly_created_rule_id else []; cleanup_thread = threading.Thread(target=self._cleanup_items, args=(newly_created_list_ids, rule_ids_to_cleanup)); cleanup_thread.start()
-        finally:
-            wx.CallAfter(self.OnRefresh)
-            wx.CallAfter(gauge.Hide)
-            wx.CallAfter(self.custom_status_bar.Layout)
-            wx.CallAfter(gauge.SetValue, 0)
-            wx.CallAfter(self.EnableCancelButton, False)
-            wx.CallAfter(self.UpdateStatusBar, "Ready")
-    def _delete_all_worker(self, lists_to_delete, rules_to_delete, gauge, op_event):
-        deleted_rules, deleted_lists, failed_rules, failed_lists = 0, 0, [], []
-        current_progress, total_items = 0, len(lists_to_delete) + len(rules_to_delete)
-        try:
-            if not self.api_client: raise RuntimeError("API client unavailable.")
-            def log_and_progress(prog, msg, color=None): wx.CallAfter(lambda: (self.LogMessage(msg, color), self._update_progress_task(gauge, prog, msg)))
-            current_progress += 1; start_msg = f"Starting 'Delete All (Legacy)' for {total_items} item(s)..."; log_and_progress(current_progress, start_msg); self._check_cancel_request(op_event)
-            num_rules = len(rules_to_delete)
-            if num_rules > 0:
-                wx.CallAfter(self.LogMessage, f"Deleting {num_rules} rule(s)...")
-                for i, rule in enumerate(rules_to_delete):
-                    rule_id, rule_name = rule.get("id"), rule.get("name", "Unknown Rule"); current_progress += 1
-                    msg = f"Deleting rule '{rule_name}' ({i+1}/{num_rules})..."; log_and_progress(current_progress, msg); self._check_cancel_request(op_event)
-                    if rule_id:
-                        try: self.api_client.delete_rule(rule_id); deleted_rules += 1; wx.CallAfter(self.LogMessage, f"Deleted rule '{rule_name}'."); time.sleep(DELETE_DELAY_SECONDS if DELETE_DELAY_SECONDS > 0 else 0); self._check_cancel_request(op_event)
-                        except Exception as e: fail_msg = f"FAILED delete rule '{rule_name}': {e}"; wx.CallAfter(self.LogMessage, fail_msg, "orange"); failed_rules.append(f"'{rule_name}'")
-                    else: skip_msg = f"SKIPPED rule '{rule_name}' (No ID)."; wx.CallAfter(self.LogMessage, skip_msg, "orange"); failed_rules.append(f"'{rule_name}' (No ID)")
-            num_lists = len(lists_to_delete)
-            if num_lists > 0:
-                wx.CallAfter(self.LogMessage, f"Deleting {num_lists} list(s)...")
-                for i, lst in enumerate(lists_to_delete):
-                    list_id, list_name = lst.get("id"), lst.get("name", "Unknown List"); current_progress += 1
-                    msg = f"Deleting list '{list_name}' ({i+1}/{num_lists})..."; log_and_progress(current_progress, msg); self._check_cancel_request(op_event)
-                    if list_id:
-                        try: self.api_client.delete_list(list_id); deleted_lists += 1; wx.CallAfter(self.LogMessage, f"Deleted list '{list_name}'."); time.sleep(DELETE_DELAY_SECONDS if DELETE_DELAY_SECONDS > 0 else 0); self._check_cancel_request(op_event)
-                        except Exception as e: fail_msg = f"FAILED delete list '{list_name}': {e}"; wx.CallAfter(self.LogMessage, fail_msg, "orange"); failed_lists.append(f"'{list_name}'")
-                    else: skip_msg = f"SKIPPED list '{list_name}' (No ID)."; wx.CallAfter(self.LogMessage, skip_msg, "orange"); failed_lists.append(f"'{list_name}' (No ID)")
-            total_deleted, total_failed = deleted_lists + deleted_rules, len(failed_lists) + len(failed_rules)
-            final_color = "green" if total_failed == 0 else "orange"
-            completion_msg = f"'Delete All (Legacy)' finished. Deleted: {total_deleted}. Failed: {total_failed}."; wx.CallAfter(self.LogMessage, completion_msg, final_color); wx.CallAfter(self.UpdateStatusBar, f"Delete All finished: {total_deleted} deleted, {total_failed} failed.")
-            if total_failed > 0:
-                errors = []
-                if failed_rules: errors.append(f"Failed Rules:\n   - " + "\n   - ".join(failed_rules))
-                if failed_lists: errors.append(f"Failed Lists:\n   - " + "\n   - ".join(failed_lists))
-                wx.CallAfter(self.ShowError, f"Failed to delete {total_failed} items:\n\n" + "\n".join(errors))
-            wx.CallAfter(self.OnRefresh)
-        except OperationCancelledError as e: wx.CallAfter(self.LogMessage, f"'Delete All (Legacy)' operation cancelled: {e}", "orange"); wx.CallAfter(self.UpdateStatusBar, "Delete All cancelled."); wx.CallAfter(self.OnRefresh)
-        except Exception as e: error_msg = f"Unexpected error during 'Delete All (Legacy)': {e}"; wx.CallAfter(self.ShowError, error_msg); wx.CallAfter(self.LogMessage, f"'Delete All (Legacy)' FAILED: {e}\n{traceback.format_exc()}", "red"); wx.CallAfter(self.UpdateStatusBar, "Delete All failed: Unexpected error."); wx.CallAfter(self.OnRefresh)
-        finally:
-            wx.CallAfter(gauge.Hide)
-            wx.CallAfter(self.custom_status_bar.Layout)
-            wx.CallAfter(gauge.SetValue, 0)
-            wx.CallAfter(self.EnableCancelButton, False)
-            wx.CallAfter(self.UpdateStatusBar, "Ready")
-    def _process_adblock_content(self, content):
-        domains = set()
-        # Basic domain structure validation
-        domain_pattern = re.compile(r"^(?:[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?\.)+[a-zA-Z]{2,}$")
-        
-        # --- Patterns for different list formats ---
-        # /etc/hosts or IP-based blocking
-        ip_hosts_pattern = re.compile(r"^(?:0\.0\.0\.0|127\.0\.0\.1)\s+(.*)") 
-        # Dnsmasq format (e.g., local=/example.com/)
-        dnsmasq_pattern = re.compile(r"^local=/(.+?)/") 
-        # Simple wildcard format (e.g., *.example.com) - Note: Cloudflare Gateway doesn't directly support wildcards in lists, but we extract the base domain.
-        wildcard_pattern = re.compile(r"^\*\.(.+)$") 
-        # RPZ format (e.g., example.com CNAME .)
-        rpz_pattern = re.compile(r"^(?:\*\.)?([a-zA-Z0-9.-]+)\s+CNAME\s+\.$") 
-        
-        # --- Adblock Plus style patterns ---
-        # ORIGINAL: Might not handle options ($third-party) correctly
-        # adblock_patterns = [
-        #     re.compile(r"^\|\|([a-zA-Z0-9.-]+)[\^|/$]?(?:$|\s|,)"), 
-        #     re.compile(r"^([a-zA-Z0-9.-]+)$") # Plain domain list
-        # ]
-        
-        # UPDATED: Specifically targets the ||domain.com^ format and captures the domain
-        adblock_patterns = [
-            # Handles ||domain.com^... format, capturing only the domain
-            re.compile(r"^\|\|([a-zA-Z0-9.-]+)\^"), 
-             # Handles lines with just the domain name
-            re.compile(r"^([a-zA-Z0-9.-]+)$")
-        ]
+    processed_lines, line_count = 0, 0
 
-        lines = content.splitlines()
-        processed_lines = 0
-        total_lines = len(lines)
+    for line_num, line in enumerate(lines):
+        line_count += 1
+        # Report progress periodically for very large lists
+        if progress and line_num % 1000 == 0 and line_num: progress(line_num)
 
-        # Log progress for large lists
-        if total_lines > 100:
-            wx.CallAfter(self.LogMessage, f"Processing {total_lines:,} lines...")
-            wx.CallAfter(self.UpdateStatusBar, f"Processing {total_lines:,} lines...")
+        line = line.strip()
+        # Skip comments, empty lines, exceptions (@@), and common invalid lines
+        if not line or line.startswith(('#', '!', '[', '/', ';')) or 'localhost' in line or line.startswith('@@'):
+            continue
 
-        for line_num, line in enumerate(lines):
-            # Provide progress update periodically for very large lists
-            if total_lines > 5000 and line_num % 1000 == 0:
-                 wx.YieldIfNeeded() # Allow UI updates
-                 wx.CallAfter(self.UpdateStatusBar, f"Processing line {line_num:,}/{total_lines:,}...")
+        potential_domain = None
+        matched = False
 
-            line = line.strip()
-            # Skip comments, empty lines, exceptions (@@), and common invalid lines
-            if not line or line.startswith(('#', '!', '[', '/', ';')) or 'localhost' in line or line.startswith('@@'):
-                continue
+        # --- Check patterns in order ---
 
-            potential_domain = None
-            matched = False
+        # 1. IP/Hosts format
+        ip_match = ip_hosts_pattern.match(line)
+        if ip_match:
+            # Extract potential domains, ignore comments after #
+            potential_domains_str = ip_match.group(1).split('#')[0].strip() 
+            potential_domains = potential_domains_str.split()
+            for p_dom in potential_domains:
+                p_dom = p_dom.strip('.').lower()
+                # Validate it looks like a domain and not an IP
+                if p_dom and not re.match(r"^\d{1,3}(\.\d{1,3}){3}$", p_dom) and domain_pattern.match(p_dom):
+                    domains.add(p_dom)
+            matched = True 
+            continue # Skip other patterns if matched here
 
-            # --- Check patterns in order ---
+        # 2. Dnsmasq format
+        if not matched:
+            dnsmasq_match = dnsmasq_pattern.match(line)
+            if dnsmasq_match:
+                potential_domain = dnsmasq_match.group(1)
+                matched = True
+        
+        # 3. Wildcard format (extract base domain)
+        if not matched:
+            wildcard_match = wildcard_pattern.match(line)
+            if wildcard_match:
+                # Cloudflare lists don't use wildcards, so we add the base domain
+                potential_domain = wildcard_match.group(1) 
+                matched = True
 
-            # 1. IP/Hosts format
-            ip_match = ip_hosts_pattern.match(line)
-            if ip_match:
-                # Extract potential domains, ignore comments after #
-                potential_domains_str = ip_match.group(1).split('#')[0].strip() 
-                potential_domains = potential_domains_str.split()
-                for p_dom in potential_domains:
-                    p_dom = p_dom.strip('.').lower()
-                    # Validate it looks like a domain and not an IP
-                    if p_dom and not re.match(r"^\d{1,3}(\.\d{1,3}){3}$", p_dom) and domain_pattern.match(p_dom):
-                        domains.add(p_dom)
-                matched = True 
-                continue # Skip other patterns if matched here
+        # 4. RPZ format
+        if not matched:
+            # NOTE: The previous fix for rpz_match was applied here
+            rpz_match = rpz_pattern.match(line) 
+            if rpz_match:
+                potential_domain = rpz_match.group(1)
+                matched = True
 
-            # 2. Dnsmasq format
-            if not matched:
-                dnsmasq_match = dnsmasq_pattern.match(line)
-                if dnsmasq_match:
-                    potential_domain = dnsmasq_match.group(1)
-                    matched = True
-            
-            # 3. Wildcard format (extract base domain)
-            if not matched:
-                wildcard_match = wildcard_pattern.match(line)
-                if wildcard_match:
-                    # Cloudflare lists don't use wildcards, so we add the base domain
-                    potential_domain = wildcard_match.group(1) 
+        # 5. Adblock Plus formats (using the UPDATED patterns)
+        if not matched:
+            for pattern in adblock_patterns:
+                match = pattern.match(line)
+                if match:
+                    # Extract domain from group 1, clean it up
+                    potential_domain = match.group(1).lower().strip('.')
+                    # Handle potential inline comments (though less common in this format)
+                    potential_domain = potential_domain.split('#')[0].strip().split(';')[0].strip() 
                     matched = True
+                    break # Stop checking adblock patterns once one matches
 
-            # 4. RPZ format
-            if not matched:
-                # NOTE: The previous fix for rpz_match was applied here
-                rpz_match = rpz_pattern.match(line) 
-                if rpz_match:
-                    potential_domain = rpz_match.group(1)
-                    matched = True
+        # --- Add valid extracted domain ---
+        if potential_domain:
+            potential_domain = potential_domain.lower().strip('.')
+            # Final validation: ensure it looks like a domain and not an IP address
+            if potential_domain and not re.match(r"^\d{1,3}(\.\d{1,3}){3}$", potential_domain) and domain_pattern.match(potential_domain):
+                domains.add(potential_domain)
+        
+        processed_lines += 1
+    return DomainSet.from_iterable(domains), processed_lines, line_count
+def build_list_reference_graph(rules):
+    """Map each list UUID to the rules whose traffic expression references it"""
+    graph = {}
+    for rule in rules:
+        for list_id in set(LIST_UUID_PATTERN.findall(rule.get("traffic", "") or "")): graph.setdefault(list_id, []).append(rule)
+    return graph
+def find_orphaned_lists(lists, rules, protected_ids=()):
+    """Managed lists that no rule references; lists recorded by a pending journal are never reported"""
+    references = build_list_reference_graph(rules); protected_ids = set(protected_ids)
+    return [lst for lst in lists if lst.get("id") and lst.get("id") not in references and lst.get("id") not in protected_ids
+            and (lst.get("description") or "").startswith(MANAGED_DESCRIPTION)]
+BulkDeleteItem = namedtuple("BulkDeleteItem", ["kind", "item_id", "name"])
+class BulkDeleteSummary:
+    def __init__(self, total):
+        self.total, self.deleted, self.failed, self.already_gone = total, [], [], []
+        self.cancelled, self.elapsed = False, 0.0
+    @property
+    def not_attempted(self): return self.total - len(self.deleted) - len(self.failed)
+    def describe(self):
+        msg = f"Deleted {len(self.deleted)}/{self.total} item(s) in {self.elapsed:.1f}s"
+        if self.already_gone: msg += f" ({len(self.already_gone)} already gone)"
+        if self.failed: msg += f"; {len(self.failed)} failed"
+        if self.cancelled: msg += f"; cancelled with {self.not_attempted} not attempted"
+        return msg + "."
+class BulkDeleter:
+    """Deletes rules and lists with bounded concurrency, a shared request rate limit and per-item retry.
 
-            # 5. Adblock Plus formats (using the UPDATED patterns)
-            if not matched:
-                for pattern in adblock_patterns:
-                    match = pattern.match(line)
-                    if match:
-                        # Extract domain from group 1, clean it up
-                        potential_domain = match.group(1).lower().strip('.')
-                        # Handle potential inline comments (though less common in this format)
-                        potential_domain = potential_domain.split('#')[0].strip().split(';')[0].strip() 
-                        matched = True
-                        break # Stop checking adblock patterns once one matches
+    Rules are deleted before lists, since a list cannot be removed while a rule still references it.
+    429, 5xx and connection errors are retried with exponential backoff; a 404 counts as deleted."""
+    def __init__(self, api_client, max_workers=BULK_DELETE_WORKERS, rate_per_second=BULK_DELETE_RATE_PER_SECOND, max_retries=BULK_DELETE_MAX_RETRIES, cancel_event=None, on_result=None):
+        self.api_client, self.max_workers, self.max_retries = api_client, max(1, max_workers), max_retries
+        self.cancel_event = cancel_event if cancel_event is not None else threading.Event()
+        self.on_result = on_result
+        self._interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next_slot, self._lock = 0.0, threading.Lock()
+    def _wait_for_slot(self):
+        with self._lock:
+            now = time.monotonic(); slot = max(now, self._next_slot); self._next_slot = slot + self._interval
+        if slot > now: self.api_client.pause(slot - now, self.cancel_event)
+    @classmethod
+    def _classify_error(cls, error):
+        if CloudflareAPIBase.error_status(error) == 404: return "gone"
+        return "retry" if CloudflareAPIBase.is_transient(error) else "failed"
+    def _delete_one(self, item, perf):
+        delete = self.api_client.delete_rule if item.kind == "rule" else self.api_client.delete_list
+        self.api_client.bind_cancel_token(self.cancel_event); self.api_client.bind_perf(perf)
+        attempt = 0
+        while True:
+            self._wait_for_slot()
+            if self.cancel_event.is_set(): return "cancelled", None
+            try: delete(item.item_id); return "deleted", None
+            except OperationCancelledError: return "cancelled", None
+            except Exception as e:
+                outcome = self._classify_error(e)
+                if outcome != "retry" or attempt >= self.max_retries: return outcome, e
+                attempt += 1
+                if self.api_client.perf: self.api_client.perf.count("retries")
+                if self.api_client.pause(BULK_DELETE_RETRY_BACKOFF_SECONDS * (2 ** (attempt - 1)), self.cancel_event): return "cancelled", None
+    def run(self, items):
+        items = list(items); summary = BulkDeleteSummary(len(items)); start = time.monotonic()
+        # The pool threads time their deletes on the recorder of the thread running the delete
+        perf = self.api_client.perf
+        for item in items:
+            if item.kind not in ("rule", "list"): summary.failed.append((item, ValueError(f"Unknown item type encountered: '{item.kind}'")))
+        for kind in ("rule", "list"):
+            phase = [item for item in items if item.kind == kind]
+            if not phase or self.cancel_event.is_set(): continue
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(phase))) as pool:
+                futures = {pool.submit(self._delete_one, item, perf): item for item in phase}
+                for future in as_completed(futures):
+                    item = futures[future]; outcome, error = future.result()
+                    if outcome == "cancelled": continue
+                    if outcome == "failed": summary.failed.append((item, error))
+                    else:
+                        summary.deleted.append(item)
+                        if outcome == "gone": summary.already_gone.append(item)
+                    if self.on_result: self.on_result(item, error if outcome == "failed" else None, len(summary.deleted) + len(summary.failed), summary.total)
+        summary.cancelled, summary.elapsed = self.cancel_event.is_set(), time.monotonic() - start
+        return summary
+RuleMetadata = namedtuple("RuleMetadata", ["url", "prefix", "content_hash", "version", "base_description", "mode"], defaults=(None,))
+class RuleMetadataCodec:
+    """Encodes and decodes the source metadata block stored in rule descriptions.
 
-            # --- Add valid extracted domain ---
-            if potential_domain:
-                potential_domain = potential_domain.lower().strip('.')
-                # Final validation: ensure it looks like a domain and not an IP address
-                if potential_domain and not re.match(r"^\d{1,3}(\.\d{1,3}){3}$", potential_domain) and domain_pattern.match(potential_domain):
-                    domains.add(potential_domain)
-            
-            processed_lines += 1
+    V1 is the readable '[CF_ADBLOCK_MGR_V1:URL=...:PREFIX=...:HASH=...]' form. V2 is a compact form
+    (zlib with a preset dictionary, then base85) used only when V1 would not fit in the description."""
+    # Preset dictionary for V2; changing it requires a new metadata version
+    V2_ZDICT = b"https://raw.githubusercontent.com/refs/heads/main/master/gitlab.com/github.com/hosts.txtdomainsadblockblocklistfilterlist_"
+    V2_FIELD_SEPARATOR = "\n"
+    @staticmethod
+    def _escape_v2_field(field): return field.replace("\\", "\\\\").replace("\n", "\\n")
+    @staticmethod
+    def _unescape_v2_field(field): return METADATA_V2_ESCAPE_PATTERN.sub(lambda m: "\n" if m.group(1) == "n" else m.group(1), field)
+    @staticmethod
+    @functools.lru_cache(maxsize=METADATA_CACHE_SIZE)
+    def decode(description):
+        if not description: return RuleMetadata(None, None, None, None, description or "")
+        # The block is appended last, so the last match is current even if the text before it quotes another
+        match = None
+        for match in METADATA_BLOCK_PATTERN.finditer(description): pass
+        if not match: return RuleMetadata(None, None, None, None, description)
+        version, content = int(match.group(1)), match.group(2)
+        base_description = description[:match.start()].rstrip()
+        url, prefix, content_hash, mode = None, None, None, None
+        if version == 1:
+            url_part = METADATA_V1_URL_SPLIT_PATTERN.split(content, 1)[0]
+            if url_part.startswith(METADATA_URL_KEY): url = url_part[len(METADATA_URL_KEY):] or None
+            prefix_match = METADATA_V1_PREFIX_PATTERN.search(content)
+            if prefix_match: prefix = prefix_match.group(1)
+            # Older releases could append several HASH= values; the last one is current
+            hash_values = METADATA_V1_HASH_PATTERN.findall(content)
+            if hash_values: content_hash = hash_values[-1]
+            mode_match = METADATA_V1_MODE_PATTERN.search(content)
+            if mode_match: mode = mode_match.group(1)
+        elif version == 2:
+            try:
+                decompressor = zlib.decompressobj(zdict=RuleMetadataCodec.V2_ZDICT)
+                fields = (decompressor.decompress(base64.b85decode(content)) + decompressor.flush()).decode('utf-8').split(RuleMetadataCodec.V2_FIELD_SEPARATOR)
+                url, prefix, content_hash, mode = [(RuleMetadataCodec._unescape_v2_field(field) if field else None) for field in (fields + [None, None, None, None])[:4]]
+            except (ValueError, zlib.error, UnicodeDecodeError): return RuleMetadata(None, None, None, version, base_description)
+        return RuleMetadata(url, prefix, content_hash, version, base_description, mode)
+    @staticmethod
+    def encode_v1(url, prefix, content_hash=None, mode=None):
+        parts = [f"{METADATA_URL_KEY}{url or ''}", f"{METADATA_PREFIX_KEY}{prefix}"]
+        if content_hash: parts.append(f"{METADATA_HASH_KEY}{content_hash}")
+        if mode: parts.append(f"{METADATA_MODE_KEY}{mode}")
+        return f"{METADATA_MARKER_PREFIX}{':'.join(parts)}{METADATA_MARKER_SUFFIX}"
+    @classmethod
+    def encode_v2(cls, url, prefix, content_hash=None, mode=None):
+        compressor = zlib.compressobj(9, zdict=cls.V2_ZDICT)
+        fields = [url or "", prefix or "", str(content_hash or "")] + ([mode] if mode else [])
+        raw = cls.V2_FIELD_SEPARATOR.join(cls._escape_v2_field(field) for field in fields).encode('utf-8')
+        packed = base64.b85encode(compressor.compress(raw) + compressor.flush()).decode('ascii')
+        return f"{METADATA_V2_MARKER_PREFIX}{packed}{METADATA_MARKER_SUFFIX}"
+    @classmethod
+    def encode(cls, url, prefix, content_hash=None, max_len=RULE_DESCRIPTION_MAX_LEN, mode=None):
+        """Return the readable V1 block if it fits in max_len and round-trips unambiguously, otherwise the shorter valid block"""
+        content_hash = str(content_hash) if content_hash else None
+        v1_marker = cls.encode_v1(url, prefix, content_hash, mode)
+        decoded = cls.decode(v1_marker)
+        v1_valid = (decoded.url, decoded.prefix, decoded.content_hash, decoded.mode) == (url or None, prefix, content_hash, mode or None)
+        if v1_valid and len(v1_marker) <= max_len: return v1_marker
+        v2_marker = cls.encode_v2(url, prefix, content_hash, mode)
+        return v1_marker if v1_valid and len(v1_marker) <= len(v2_marker) else v2_marker
+    @classmethod
+    def compose_description(cls, base_description, url, prefix, content_hash=None, max_len=RULE_DESCRIPTION_MAX_LEN, mode=None):
+        """Append the metadata block; rules without a source URL only get one when their list layout must be recorded.
+        Metadata blocks already in base_description are dropped so they cannot be mistaken for the rule's own."""
+        base_description = base_description or ""
+        while METADATA_BLOCK_PATTERN.search(base_description): base_description = METADATA_BLOCK_PATTERN.sub("", base_description)
+        base_description = base_description.strip()
+        if not prefix or not (url or mode): return base_description[:max_len]
+        marker = cls.encode(url, prefix, content_hash, max_len - len(base_description) - 1 if base_description else max_len, mode)
+        if len(marker) > max_len: return base_description[:max_len]
+        if not base_description: return marker
+        allowed_base_len = max_len - len(marker) - 1
+        return (base_description[:allowed_base_len].rstrip() + " " + marker) if allowed_base_len > 0 else marker
+class DomainIndex:
+    """Local domain -> list/rule lookup built from a bulk sync of every list's items.
 
+    Exact and suffix lookups are dictionary probes; substring lookups scan one newline-joined
+    blob of all domains, so every query type stays in the millisecond range at 300k domains."""
+    FILE_VERSION = 1
+    def __init__(self, account_id=""):
+        self.account_id = account_id
+        self.lists = {}
+        self.domain_lists = {}
+        self.synced_at = None
+        self._blob, self._blob_offsets, self._blob_domains = "", [], []
+    @staticmethod
+    def index_path(account_id): return app_data_path(f"domain_index_{account_id}.json")
+    def add_list(self, list_id, name, domains, rule_names=()):
+        self.lists[list_id] = {"name": name, "rules": list(rule_names), "domains": list(domains)}
+        for domain in domains: self.domain_lists.setdefault(domain, []).append(list_id)
+    def finalize(self):
+        self._blob_domains = sorted(self.domain_lists)
+        self._blob_offsets, offset = [], 0
+        for domain in self._blob_domains: self._blob_offsets.append(offset); offset += len(domain) + 1
+        self._blob = "\n".join(self._blob_domains)
+    @property
+    def domain_count(self): return len(self.domain_lists)
+    def _rows_for(self, domain):
+        rows = []
+        for list_id in self.domain_lists.get(domain, ()):
+            info = self.lists.get(list_id, {})
+            rows.append((domain, list_id, info.get("name", ""), info.get("rules", [])))
+        return rows
+    def find_exact(self, domain):
+        return self._rows_for(domain.strip().lower().strip('.'))
+    def find_covering(self, domain):
+        """Return entries that match the domain itself or any of its parent domains"""
+        labels = domain.strip().lower().strip('.').split('.')
+        rows = []
+        for i in range(len(labels)): rows.extend(self._rows_for('.'.join(labels[i:])))
+        return rows
+    def find_substring(self, text, limit=DOMAIN_INDEX_MAX_RESULTS):
+        text = text.strip().lower()
+        if not text or '\n' in text: return []
+        rows, pos, last_idx = [], self._blob.find(text), -1
+        while pos != -1 and len(rows) < limit:
+            idx = bisect.bisect_right(self._blob_offsets, pos) - 1
+            if idx != last_idx:
+                rows.extend(self._rows_for(self._blob_domains[idx])); last_idx = idx
+            # Jump to the next domain so one domain with repeated matches is reported once
+            pos = self._blob.find(text, self._blob_offsets[idx] + len(self._blob_domains[idx]) + 1)
+        return rows[:limit]
+    def search(self, query, mode="suffix"):
+        if mode == "exact": return self.find_exact(query)
+        if mode == "substring": return self.find_substring(query)
+        return self.find_covering(query)
+    def save(self):
+        data = {"version": self.FILE_VERSION, "account_id": self.account_id, "synced_at": self.synced_at, "lists": self.lists}
+        path = self.index_path(self.account_id); tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f: json.dump(data, f)
+        os.replace(tmp_path, path)
+    @classmethod
+    def load(cls, account_id):
+        path = cls.index_path(account_id)
+        if not os.path.exists(path): return None
+        with open(path, 'r', encoding='utf-8') as f: data = json.load(f)
+        if data.get("version") != cls.FILE_VERSION: return None
+        index = cls(account_id); index.synced_at = data.get("synced_at")
+        for list_id, info in (data.get("lists") or {}).items(): index.add_list(list_id, info.get("name", ""), info.get("domains", []), info.get("rules", []))
+        index.finalize()
+        return index
+    @classmethod
+    def sync(cls, api_client, op_event=None, progress_callback=None):
+        """Fetch all lists, rules and list items and build a fresh index"""
+        def check_cancel():
+            if op_event is not None and op_event.is_set(): raise OperationCancelledError("Operation cancelled by user.")
+        api_client.invalidate_cache()
+        lists = api_client.get_lists(); check_cancel()
+        rules = api_client.get_rules(); check_cancel()
+        list_rules = {list_id: [rule.get("name", "") for rule in referencing_rules] for list_id, referencing_rules in build_list_reference_graph(rules).items()}
+        index = cls(api_client.account_id)
+        valid_lists = [lst for lst in lists if lst.get("id") and lst.get("type", "DOMAIN") == "DOMAIN"]
+        def add_items(done, lst, response):
+            if not response or not response.get("success"): raise ConnectionError(f"Failed to fetch items for list '{lst.get('name')}': {response}")
+            index.add_list(lst["id"], lst.get("name", ""), [item.get("value").lower() for item in (response.get("result") or []) if item.get("value")], list_rules.get(lst["id"], []))
+            if progress_callback: progress_callback(done, len(valid_lists), lst.get("name", ""))
+        cls.fetch_items(api_client, valid_lists, check_cancel, add_items)
+        index.synced_at = datetime.datetime.now().isoformat(timespec='seconds')
+        index.finalize()
+        return index
+    @classmethod
+    def fetch_items(cls, api_client, lists, check_cancel, add_items):
+        """Fetch the items of many lists concurrently, calling add_items(done, lst, response) as each arrives"""
+        if HAS_HTTPX: asyncio.run(cls._fetch_items_async(api_client, lists, check_cancel, add_items))
+        else: cls._fetch_items_threaded(api_client, lists, check_cancel, add_items)
+    @staticmethod
+    async def _fetch_items_async(api_client, lists, check_cancel, add_items):
+        """Fetch every list's items concurrently on one AsyncCloudflareAPI (one HTTP/2 connection when h2 is installed)"""
+        async with AsyncCloudflareAPI(api_client.api_token, api_client.account_id) as async_client:
+            async_client.perf = api_client.perf
+            slots = asyncio.Semaphore(ASYNC_API_MAX_CONCURRENCY)
+            async def fetch(lst):
+                async with slots:
+                    check_cancel()
+                    return lst, await async_client.get_list_items(lst["id"])
+            async def watch_cancel():
+                # Cancel lands between awaits: stop every fetch, including requests still waiting for a response
+                while True:
+                    try: check_cancel()
+                    except OperationCancelledError:
+                        for task in tasks: task.cancel()
+                        return
+                    await asyncio.sleep(ASYNC_CANCEL_POLL_SECONDS)
+            tasks = [asyncio.ensure_future(fetch(lst)) for lst in lists]
+            watcher = asyncio.ensure_future(watch_cancel())
+            try:
+                for done, next_done in enumerate(asyncio.as_completed(tasks), start=1):
+                    try: lst, response = await next_done
+                    except asyncio.CancelledError: check_cancel(); raise
+                    check_cancel()
+                    add_items(done, lst, response)
+            finally:
+                for task in tasks + [watcher]: task.cancel()
+                await asyncio.gather(*tasks, watcher, return_exceptions=True)
+    @staticmethod
+    def _fetch_items_threaded(api_client, lists, check_cancel, add_items):
+        perf = api_client.perf
+        def fetch_items(lst):
+            check_cancel(); api_client.bind_perf(perf)
+            return lst, api_client.get_list_items(lst["id"])
+        with ThreadPoolExecutor(max_workers=DOMAIN_INDEX_SYNC_WORKERS) as executor:
+            futures = [executor.submit(fetch_items, lst) for lst in lists]
+            try:
+                for done, future in enumerate(as_completed(futures), start=1): add_items(done, *future.result())
+            except BaseException:
+                for future in futures: future.cancel()
+                raise
+class AccountSnapshot:
+    """Last known lists, rules and update statuses of one account, kept on disk so the main window can show
+    them at launch (marked stale) while the refresh and the update checks run in the background."""
+    FILE_VERSION = 1
+    def __init__(self, account_id=""):
+        self.account_id = account_id
+        self.lists, self.rules = [], []
+        self.update_statuses = {}
+        self.saved_at = None
+    @staticmethod
+    def snapshot_path(account_id): return app_data_path(f"account_snapshot_{account_id}.json")
+    def set_lists(self, lists):
+        self.lists = [{"id": lst.get("id"), "name": lst.get("name"), "count": lst.get("count", 0)} for lst in lists if lst.get("id")]
+    def set_rules(self, rules):
+        self.rules = [{"id": rule.get("id"), "name": rule.get("name"), "enabled": rule.get("enabled", False), "description": rule.get("description", "")} for rule in rules if rule.get("id")]
+    def set_update_status(self, rule_id, status, description):
+        """Remember a rule's last update check; it is only reused while the rule's description (source metadata) is unchanged"""
+        self.update_statuses[rule_id] = {"status": status, "description": description}
+    def update_status(self, rule_id, description):
+        entry = self.update_statuses.get(rule_id)
+        return entry["status"] if entry and entry.get("description") == description else None
+    def save(self):
+        rule_ids = {rule["id"] for rule in self.rules}
+        self.update_statuses = {rule_id: entry for rule_id, entry in self.update_statuses.items() if rule_id in rule_ids}
+        self.saved_at = datetime.datetime.now().isoformat(timespec='seconds')
+        data = {"version": self.FILE_VERSION, "account_id": self.account_id, "saved_at": self.saved_at, "lists": self.lists, "rules": self.rules, "update_statuses": self.update_statuses}
+        path = self.snapshot_path(self.account_id); tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f: json.dump(data, f)
+        os.replace(tmp_path, path)
+    @classmethod
+    def load(cls, account_id):
+        path = cls.snapshot_path(account_id)
+        if not os.path.exists(path): return None
+        with open(path, 'r', encoding='utf-8') as f: data = json.load(f)
+        if data.get("version") != cls.FILE_VERSION or data.get("account_id") != account_id: return None
+        snapshot = cls(account_id); snapshot.saved_at = data.get("saved_at")
+        snapshot.lists, snapshot.rules = data.get("lists") or [], data.get("rules") or []
+        snapshot.update_statuses = data.get("update_statuses") or {}
+        return snapshot
+class ListLedger:
+    """What Gateway Guardian last wrote to each list of one account: item count, content digest and the list's
+    updated_at, plus a gzip copy of the items. verify_lists compares list metadata against it, so only lists
+    changed elsewhere (e.g. in the Cloudflare dashboard) have to be downloaded, and can be put back from it."""
+    FILE_VERSION = 1
+    LEDGER_DIR_NAME = "list_ledger"
+    _lock = threading.Lock()
+    def __init__(self, account_id=""):
+        self.account_id = account_id
+        self.lists = {}
+    @classmethod
+    def ledger_dir(cls, account_id):
+        path = os.path.join(APP_DATA_DIR, cls.LEDGER_DIR_NAME, account_id)
+        os.makedirs(path, exist_ok=True)
+        return path
+    @classmethod
+    def ledger_path(cls, account_id): return os.path.join(cls.ledger_dir(account_id), "ledger.json")
+    def items_path(self, list_id): return os.path.join(self.ledger_dir(self.account_id), f"{list_id}.gz")
+    def load_items(self, list_id):
+        with gzip.open(self.items_path(list_id), 'rb') as f: return DomainSet(f.read())
+    @staticmethod
+    def unchanged(entry, lst):
+        """True when a list on Cloudflare still has the count and updated_at recorded for it"""
+        return bool(entry and lst and entry.get("updated_at")) and entry.get("count") == lst.get("count") and entry["updated_at"] == lst.get("updated_at")
+    @staticmethod
+    def stamp(response):
+        """The updated_at Cloudflare returned for a list write, if any"""
+        return ((response or {}).get("result") or {}).get("updated_at") if isinstance(response, dict) else None
+    def save(self):
+        data = {"version": self.FILE_VERSION, "account_id": self.account_id, "lists": self.lists}
+        path = self.ledger_path(self.account_id); tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f: json.dump(data, f)
+        os.replace(tmp_path, path)
+    @classmethod
+    def load(cls, account_id):
+        ledger, path = cls(account_id), cls.ledger_path(account_id)
+        if not os.path.exists(path): return ledger
+        with open(path, 'r', encoding='utf-8') as f: data = json.load(f)
+        if data.get("version") == cls.FILE_VERSION and data.get("account_id") == account_id: ledger.lists = data.get("lists") or {}
+        return ledger
+    @classmethod
+    def record(cls, account_id, list_id, name, items, updated_at=None):
+        """Remember items as the expected content of a list that was just written"""
+        domains = DomainSet.from_iterable(items); ledger = cls(account_id)
+        items_path = ledger.items_path(list_id); tmp_path = f"{items_path}.{uuid.uuid4().hex}.tmp"
+        with gzip.open(tmp_path, 'wb') as f: f.write(domains.segment())
+        os.replace(tmp_path, items_path)
+        with cls._lock:
+            ledger = cls.load(account_id)
+            ledger.lists[list_id] = {"name": name, "count": len(domains), "digest": domains.digest(), "updated_at": updated_at, "recorded_at": datetime.datetime.now().isoformat(timespec='seconds')}
+            ledger.save()
+    @classmethod
+    def touch(cls, account_id, list_id, name=None, updated_at=None):
+        """Follow a change that left a recorded list's items alone (rename, description)"""
+        with cls._lock:
+            ledger = cls.load(account_id); entry = ledger.lists.get(list_id)
+            if not entry: return
+            if name is not None: entry["name"] = name
+            entry["updated_at"] = updated_at
+            ledger.save()
+    @classmethod
+    def forget(cls, account_id, list_ids):
+        with cls._lock:
+            ledger = cls.load(account_id)
+            for list_id in list_ids:
+                ledger.lists.pop(list_id, None)
+                try: os.remove(ledger.items_path(list_id))
+                except OSError: pass
+            ledger.save()
+class DriftReport:
+    """Outcome of AccountOperator.verify_lists and repair_drift.
+
+    Each drifted entry is a dict with the list's id, name, rules, reasons, expected and actual counts, and the
+    domains found on Cloudflare but not recorded ("unexpected") and recorded but not found ("missing")."""
+    def __init__(self):
+        self.checked, self.fetched = 0, 0
+        self.drifted, self.untracked, self.gone = [], [], []
+        self.repaired, self.failed = [], []
+    def describe(self):
+        msg = f"Checked {self.checked} recorded list(s) and downloaded {self.fetched}: {len(self.drifted)} changed outside {APP_NAME}"
+        if self.untracked: msg += f"; {len(self.untracked)} managed list(s) not recorded yet"
+        if self.repaired or self.failed: msg += f"; repaired {len(self.repaired)}" + (f", {len(self.failed)} failed" if self.failed else "")
+        return msg + "."
+    @staticmethod
+    def describe_entry(entry, sample=5):
+        parts = [f"List '{entry['name']}'" + (f" ({', '.join(entry['rules'])})" if entry["rules"] else "") + f": {'; '.join(entry['reasons'])}"]
+        for key, label in (("unexpected", "not written by us"), ("missing", "missing")):
+            domains = entry.get(key) or []
+            if domains: parts.append(f"{len(domains)} {label}: {', '.join(domains[:sample])}{', ...' if len(domains) > sample else ''}")
+        return ". ".join(parts)
+    def as_dict(self):
+        return {"checked": self.checked, "fetched": self.fetched, "drifted": self.drifted, "untracked": self.untracked, "gone": self.gone,
+                "repaired": [entry["id"] for entry in self.repaired], "failed": [{"id": entry["id"], "error": str(error)} for entry, error in self.failed]}
+class RuleHistory:
+    """Versions of the domain set applied to one rule, kept in history/<account>/<rule hash>.jsonl.gz.
+
+    Each version is appended as its own gzip member holding one JSON line: the full set every
+    HISTORY_KEYFRAME_INTERVAL versions (or when the change is bigger than the set), otherwise only the
+    domains added and removed since the previous version. Reading a version replays deltas from the
+    nearest full copy, so diffs, rollbacks and "since when is this blocked" need no API calls."""
+    HISTORY_DIR_NAME = "history"
+    _lock = threading.Lock()
+    def __init__(self, account_id, rule_name=None, path=None):
+        self.account_id, self.rule_name = account_id, rule_name
+        self.path = path or self.history_path(account_id, rule_name)
+        self.records = []
+    @classmethod
+    def history_dir(cls, account_id):
+        path = os.path.join(APP_DATA_DIR, cls.HISTORY_DIR_NAME, account_id)
+        os.makedirs(path, exist_ok=True)
+        return path
+    @classmethod
+    def history_path(cls, account_id, rule_name):
+        return os.path.join(cls.history_dir(account_id), f"{hashlib.sha256((rule_name or '').encode('utf-8')).hexdigest()[:16]}.jsonl.gz")
+    @classmethod
+    def load(cls, account_id, rule_name=None, path=None):
+        history = cls(account_id, rule_name, path)
+        if not os.path.exists(history.path): return history
+        try:
+            with gzip.open(history.path, 'rt', encoding='utf-8') as f:
+                for line in f: history.records.append(json.loads(line))
+        # A crash mid-append leaves a truncated last version; the versions before it are intact
+        except (EOFError, gzip.BadGzipFile, json.JSONDecodeError): pass
+        if history.records: history.rule_name = history.records[-1].get("rule_name", rule_name)
+        return history
+    @classmethod
+    def all(cls, account_id):
+        """The histories of every rule of the account, by rule name"""
+        directory = cls.history_dir(account_id)
+        histories = (cls.load(account_id, path=os.path.join(directory, name)) for name in sorted(os.listdir(directory)) if name.endswith(".jsonl.gz"))
+        return {history.rule_name: history for history in histories if history.records}
+    @property
+    def latest(self): return self.records[-1] if self.records else None
+    def get(self, version):
+        for record in self.records:
+            if record["version"] == version: return record
+        raise KeyError(f"Rule '{self.rule_name}' has no version {version} in its history.")
+    def _domain_set(self, index):
+        start = max(i for i in range(index + 1) if "domains" in self.records[i])
+        domains = set(self.records[start]["domains"].split("\n")) if self.records[start]["domains"] else set()
+        for record in self.records[start + 1:index + 1]: domains.difference_update(record["removed"]); domains.update(record["added"])
+        return domains
+    def domains_at(self, version):
+        """The domain set applied as version, replayed from the nearest full copy at or before it"""
+        return DomainSet.from_iterable(self._domain_set(self.records.index(self.get(version))))
+    def diff(self, old_version, new_version):
+        """(added, removed) domains going from old_version to new_version"""
+        old_index, new_index = self.records.index(self.get(old_version)), self.records.index(self.get(new_version))
+        if new_index == old_index + 1 and "added" in self.records[new_index]: return sorted(self.records[new_index]["added"]), sorted(self.records[new_index]["removed"])
+        old, new = self._domain_set(old_index), self._domain_set(new_index)
+        return sorted(new - old), sorted(old - new)
+    def changes(self, version):
+        """(added, removed) by version relative to the one before it; a first version adds everything"""
+        index = self.records.index(self.get(version))
+        if index == 0: return sorted(self._domain_set(0)), []
+        return self.diff(self.records[index - 1]["version"], version)
+    def diff_from_latest(self, domains):
+        """(added, removed) if domains were applied now, computed without downloading the rule's lists"""
+        if not self.records: return list(domains), []
+        current, new = self._domain_set(len(self.records) - 1), set(domains)
+        return sorted(new - current), sorted(current - new)
+    def domain_events(self, domain):
+        """(version record, "added" or "removed") for every version in which domain entered or left the set"""
+        domain, events, present = domain.strip().lower().strip('.'), [], False
+        for record in self.records:
+            if "domains" in record: now = f"\n{domain}\n" in f"\n{record['domains']}\n"
+            else: now = domain in record["added"] or (present and domain not in record["removed"])
+            if now != present: events.append((record, "added" if now else "removed")); present = now
+        return events
+    def record(self, domains, **meta):
+        """Append domains as the next version unless it matches the latest; returns the new version number or None"""
+        domains, latest = DomainSet.from_iterable(domains), self.latest
+        entry = {"rule_name": self.rule_name, **meta, "count": len(domains), "digest": domains.digest()}
+        if latest and all(latest.get(key) == value for key, value in entry.items()): return None
+        entry = {"version": latest["version"] + 1 if latest else 1, "time": datetime.datetime.now().isoformat(timespec='seconds'), **entry}
+        same_as = next((record["version"] for record in reversed(self.records) if record["digest"] == entry["digest"]), None)
+        if same_as is not None and same_as != latest["version"]: entry["same_as"] = same_as
+        since_keyframe = next((i for i, record in enumerate(reversed(self.records)) if "domains" in record), None)
+        added = removed = None
+        if since_keyframe is not None and since_keyframe + 1 < HISTORY_KEYFRAME_INTERVAL:
+            added, removed = self.diff_from_latest(domains)
+            if len(added) + len(removed) >= len(domains): added = removed = None
+        if added is None: entry["domains"] = bytes(domains.segment()).decode("ascii")
+        else: entry["added"], entry["removed"] = added, removed
+        with self._lock:
+            if len(self.records) >= HISTORY_MAX_VERSIONS: self._compact(HISTORY_MAX_VERSIONS - 1)
+            with gzip.open(self.path, 'ab') as f: f.write((json.dumps(entry) + "\n").encode("utf-8"))
+        self.records.append(entry)
+        return entry["version"]
+    def _compact(self, keep):
+        """Drop all but the last keep versions, turning the oldest kept one into a full copy"""
+        records = self.records[-keep:]
+        if "domains" not in records[0]:
+            first = {key: value for key, value in records[0].items() if key not in ("added", "removed")}
+            first["domains"] = "\n".join(sorted(self._domain_set(len(self.records) - keep))); records[0] = first
+        tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with gzip.open(tmp_path, 'wb') as f:
+            for record in records: f.write((json.dumps(record) + "\n").encode("utf-8"))
+        os.replace(tmp_path, self.path)
+        self.records = records
+    @staticmethod
+    def describe_version(record):
+        note = record.get("kind", "")
+        if record.get("same_as"): note += f", same domains as v{record['same_as']}"
+        return f"v{record['version']}  {record.get('time', '?')}  {record.get('count', 0):,} domains  ({note})"
+class OperationJournal:
+    """Write-ahead journal for multi-step apply/update operations.
 
-        # Log results
-        if not domains:
-            wx.CallAfter(self.LogMessage, "Warning: No valid domains were extracted from the provided content.", "orange")
-            wx.CallAfter(self.UpdateStatusBar, "Warning: No valid domains extracted.")
+    Every step is appended (and fsynced) as one JSON line before and after it runs, next to a gzip
+    copy of the planned domain set, so an interrupted run can be resumed from the last completed
+    chunk instead of being redone or rolled back."""
+    JOURNAL_DIR_NAME = "journal"
+    def __init__(self, path):
+        self.path = path
+        self.op_id = os.path.splitext(os.path.basename(path))[0]
+        self.plan, self.created_lists, self.started_chunks = {}, {}, set()
+        self.rule_id, self.completed_steps, self.deleted_old_lists = None, set(), set()
+        # Existing lists shared by this operation (content digest match); a rollback must never delete them
+        self.reused_lists = set()
+        self.status, self.resumed = "open", False
+        self._lock = threading.Lock()
+    @classmethod
+    def journal_dir(cls):
+        path = os.path.join(APP_DATA_DIR, cls.JOURNAL_DIR_NAME)
+        os.makedirs(path, exist_ok=True)
+        return path
+    @property
+    def domains_path(self): return os.path.splitext(self.path)[0] + ".domains.gz"
+    @property
+    def kind(self): return self.plan.get("kind", "")
+    @property
+    def description(self):
+        done = len(self.created_lists)
+        return f"{self.kind.title()} of rule '{self.plan.get('rule_name', '?')}' (prefix '{self.plan.get('prefix', '?')}') started {self.plan.get('time', '?')}: {done}/{self.plan.get('num_chunks', '?')} list(s) created"
+    @classmethod
+    def create(cls, account_id, kind, plan, domains):
+        op_id = f"{kind}_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        journal = cls(os.path.join(cls.journal_dir(), f"{op_id}.jsonl"))
+        with gzip.open(journal.domains_path, 'wb') as f: f.write(DomainSet.from_iterable(domains).segment())
+        journal.record("plan", **{"account_id": account_id, "kind": kind, "num_chunks": (len(domains) + MAX_DOMAINS_PER_LIST - 1) // MAX_DOMAINS_PER_LIST, **plan})
+        return journal
+    def record(self, event, **data):
+        entry = {"event": event, "time": datetime.datetime.now().isoformat(timespec='seconds'), **data}
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + "\n"); f.flush(); os.fsync(f.fileno())
+            self._apply(entry)
+    def _apply(self, entry):
+        event = entry.get("event")
+        if event == "plan": self.plan = entry
+        elif event == "list_begin": self.started_chunks.add(entry["chunk"])
+        elif event == "list_created":
+            self.created_lists[entry["chunk"]] = entry["list_id"]
+            if entry.get("reused"): self.reused_lists.add(entry["list_id"])
+        elif event == "list_dropped": self.created_lists.pop(entry["chunk"], None)
+        elif event == "rule_created": self.rule_id = entry["rule_id"]
+        elif event == "old_list_deleted": self.deleted_old_lists.add(entry["list_id"])
+        elif event in ("commit", "abort"): self.status = event
+        else: self.completed_steps.add(event)
+    @classmethod
+    def load(cls, path):
+        journal = cls(path); journal.resumed = True
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                # A crash mid-write can leave a truncated last line; everything before it is still valid
+                try: journal._apply(json.loads(line))
+                except json.JSONDecodeError: break
+        return journal
+    @classmethod
+    def pending(cls, account_id):
+        journals = []
+        for name in sorted(os.listdir(cls.journal_dir())):
+            if not name.endswith(".jsonl"): continue
+            try: journal = cls.load(os.path.join(cls.journal_dir(), name))
+            except (OSError, KeyError) as e: print(f"Error reading journal {name}: {e}"); continue
+            if journal.status == "open" and journal.plan.get("account_id") == account_id and os.path.exists(journal.domains_path): journals.append(journal)
+        return journals
+    @classmethod
+    def protected_list_ids(cls, account_id, exclude_op_id=None):
+        """IDs of lists an open operation created or still has to delete; garbage collection must leave them alone"""
+        protected = set()
+        for journal in cls.pending(account_id):
+            if journal.op_id != exclude_op_id: protected.update(journal.created_lists.values()); protected.update(journal.plan.get("old_list_ids", []))
+        return protected
+    def load_domains(self):
+        with gzip.open(self.domains_path, 'rb') as f: return DomainSet(f.read())
+    @property
+    def has_changes(self):
+        """True once the operation has created or deleted anything on Cloudflare"""
+        return bool(set(self.created_lists.values()) - self.reused_lists or self.rule_id or self.deleted_old_lists or {"old_rule_deleted", "list_patched"} & self.completed_steps)
+    @property
+    def own_lists(self):
+        """IDs of the lists this operation created itself (not shared ones)"""
+        return [list_id for list_id in self.created_lists.values() if list_id not in self.reused_lists]
+    def finish(self, status="commit"):
+        self.record(status)
+        for path in (self.path, self.domains_path):
+            try: os.remove(path)
+            except OSError as e: print(f"Error removing journal file {path}: {e}")
+class AccountOperator:
+    """The list and rule steps of an apply or update against one account, without any UI.
+
+    Messages go to log(message, colour); cancel_event stops the work between steps and aborts in-flight requests.
+    The main window drives it for its own account, and fan-out runs one per account, each with its own client."""
+    def __init__(self, api_client, account_id, log, cancel_event):
+        self.api_client, self.account_id, self.log, self.cancel_event = api_client, account_id, log, cancel_event
+    def check_cancel(self):
+        self.api_client.bind_cancel_token(self.cancel_event)
+        if self.cancel_event.is_set(): raise OperationCancelledError("Operation cancelled by user.")
+    def phase(self, name):
+        """Time a step on the client's attached recorder; a no-op outside an instrumented operation"""
+        return self.api_client.perf.span(name) if self.api_client.perf else contextlib.nullcontext({})
+    def start_apply(self, domains, prefix, rule_name, source_url=None, content_hash=None, layout=None):
+        content_hash = content_hash or str(domains.text_length())
+        plan = {"prefix": prefix, "rule_name": rule_name, "source_url": source_url, "content_hash": content_hash, "layout": layout or ("buckets" if LIST_LAYOUT_BUCKETS else "sorted")}
+        if plan["layout"] == "buckets": plan["num_buckets"] = plan["num_chunks"] = DomainBuckets.bucket_count(len(domains))
+        return OperationJournal.create(self.account_id, "apply", plan, domains)
+    @staticmethod
+    def lists_needed(num_domains, layout):
+        if layout == "buckets": return DomainBuckets.bucket_count(num_domains)
+        return (num_domains + MAX_DOMAINS_PER_LIST - 1) // MAX_DOMAINS_PER_LIST
+    @staticmethod
+    def layout_chunks(domains, plan):
+        """The domains split into the plan's lists: consecutive ranges of the sorted set, or hash buckets"""
+        if plan.get("layout") == "buckets": return DomainBuckets.assign(domains, plan.get("num_buckets") or DomainBuckets.bucket_count(len(domains)))
+        return list(domains.chunks(MAX_DOMAINS_PER_LIST))
+    def apply(self, journal, domains, progress):
+        """Create the journal's lists and rule, continuing where an interrupted run stopped; returns the rule ID"""
+        prefix, rule_name, source_url, content_hash = (journal.plan.get(key) for key in ("prefix", "rule_name", "source_url", "content_hash"))
+        with self.phase("chunk"): domain_chunks = self.layout_chunks(domains, journal.plan)
+        if journal.resumed:
+            with self.phase("reconcile journal"): self.reconcile_journal_lists(journal, domain_chunks, prefix)
+        self.log(f"Creating {len(domain_chunks) - len(journal.created_lists)} list(s)...")
+        with self.phase("create lists"): list_ids = self.create_journal_lists(journal, domain_chunks, prefix, progress)
+        progress(f"Creating rule '{rule_name}'..."); self.check_cancel()
+        if not list_ids: raise ValueError("Cannot create rule: No list IDs were generated.")
+        try:
+            self.log(f"Creating rule with hash: {content_hash}", "grey")
+            with self.phase("create rule"): rule_id = self.create_journal_rule(journal, rule_name, list_ids, source_url, prefix, content_hash)
+        except Exception as e: raise RuntimeError(f"Error creating rule '{rule_name}': {e}") from e
+        self.log(f"Successfully created rule '{rule_name}' (ID: {rule_id})", "green")
+        return rule_id
+    def start_update(self, rule, domains, source_url, list_prefix, content_hash, layout=None):
+        """Journal the update of an existing rule object (as returned by get_rules/get_rule_details) to domains.
+
+        The rule keeps the list layout recorded in its metadata unless another layout is given, which converts it."""
+        rule_name, traffic_expr = rule.get("name", ""), rule.get("traffic", "")
+        slot_list_ids = list(dict.fromkeys(LIST_UUID_PATTERN.findall(traffic_expr))) if traffic_expr else []
+        if slot_list_ids: self.log(f"Found {len(slot_list_ids)} associated list UUID(s) in old rule.")
+        elif traffic_expr: self.log("Could not parse list UUIDs from old rule traffic expression.", "orange")
+        else: self.log("Old rule has no traffic expression.", "orange")
+        current_layout = RuleMetadataCodec.decode(rule.get("description", "")).mode or "sorted"
+        plan = {"prefix": list_prefix, "rule_name": rule_name, "source_url": source_url, "content_hash": content_hash, "old_rule_id": rule.get("id"), "old_list_ids": sorted(slot_list_ids), "old_description": rule.get("description", ""), "staging_prefix": f"{UPDATE_STAGING_PREFIX}{list_prefix}", "layout": layout or current_layout}
+        if plan["layout"] == "buckets":
+            plan["num_buckets"] = plan["num_chunks"] = DomainBuckets.bucket_count(len(domains), len(slot_list_ids) if current_layout == "buckets" else 0)
+        history = self.rule_history(rule_name)
+        unchanged = False
+        if history is not None and history.latest:
+            added, removed = history.diff_from_latest(domains)
+            self.log(f"Compared offline with version {history.latest['version']} ({history.latest.get('time', '?')}): +{len(added):,} / -{len(removed):,} domain(s).", "grey")
+            unchanged = not added and not removed and plan["layout"] == current_layout and sorted(history.latest.get("list_ids") or []) == sorted(slot_list_ids) and self.lists_match_ledger(slot_list_ids)
+        if unchanged:
+            plan["mode"] = "metadata"
+            self.log("The domains are the same as the last applied version and its lists are unchanged; only the rule's source metadata is updated.", "grey")
+        elif plan["layout"] == "buckets" and current_layout == "buckets" and slot_list_ids:
+            new_lists = plan["num_buckets"] - len(slot_list_ids); current_list_count = len(self.api_client.get_lists())
+            if new_lists and current_list_count + new_lists > MAX_LISTS: raise RuntimeError(f"Adding {new_lists} bucket list(s) would exceed the limit of {MAX_LISTS} lists (account has {current_list_count}).")
+            plan.update(mode="delta", slot_list_ids=slot_list_ids)
+            self.log(f"Bucket layout: only lists whose buckets changed are patched{f'; {new_lists} bucket(s) will be added' if new_lists else ''}.", "grey")
         else:
-             final_count = len(domains)
-             wx.CallAfter(self.LogMessage, f"Successfully extracted {final_count:,} unique domains from {processed_lines:,} processed lines (out of {total_lines:,} total).")
-             wx.CallAfter(self.UpdateStatusBar, f"Processed {final_count:,} domains.")
-             
-        return sorted(list(domains))
-    def _cleanup_items(self, list_ids_to_delete, rule_ids_to_delete):
-        if not list_ids_to_delete and not rule_ids_to_delete: wx.CallAfter(self.LogMessage, "Cleanup: No items specified for cleanup.", "grey"); return
-        temp_api_client = None
-        try: temp_api_client = CloudflareAPI(self.api_token, self.account_id)
-        except Exception as api_err: wx.CallAfter(self.LogMessage, f"Cleanup Error: Failed to initialize API client for cleanup: {api_err}", "red"); return
-        num_rules, num_lists = len(rule_ids_to_delete), len(list_ids_to_delete)
-        wx.CallAfter(self.LogMessage, f"Cleanup: Attempting to delete {num_rules} rule(s) and {num_lists} list(s)...", "grey")
-        wx.CallAfter(self.UpdateStatusBar, f"Cleaning up {num_rules + num_lists} items...")
-        deleted_rules, deleted_lists = 0, 0
-        for rule_id in rule_ids_to_delete:
-            if not rule_id: continue
-            try: wx.CallAfter(self.LogMessage, f"Cleanup: Deleting rule {rule_id}...", "grey"); temp_api_client.delete_rule(rule_id); deleted_rules += 1; wx.CallAfter(self.LogMessage, f"Cleanup: Successfully deleted rule {rule_id}.", "grey"); time.sleep(DELETE_DELAY_SECONDS if DELETE_DELAY_SECONDS > 0 else 0)
-            except Exception as ex: wx.CallAfter(self.LogMessage, f"Cleanup WARNING: Failed to delete rule {rule_id}: {ex}", "orange")
-        for list_id in list_ids_to_delete:
-            if not list_id: continue
-            try: wx.CallAfter(self.LogMessage, f"Cleanup: Deleting list {list_id}...", "grey"); temp_api_client.delete_list(list_id); deleted_lists += 1; wx.CallAfter(self.LogMessage, f"Cleanup: Successfully deleted list {list_id}.", "grey"); time.sleep(DELETE_DELAY_SECONDS if DELETE_DELAY_SECONDS > 0 else 0)
-            except Exception as ex: wx.CallAfter(self.LogMessage, f"Cleanup WARNING: Failed to delete list {list_id}: {ex}", "orange")
-        wx.CallAfter(self.LogMessage, f"Cleanup finished. Deleted {deleted_rules}/{num_rules} rules, {deleted_lists}/{num_lists} lists.", "grey")
-        wx.CallAfter(self.UpdateStatusBar, f"Cleanup finished.")
-    def _parse_metadata(self, description):
-        url, prefix = None, None
-        if description and METADATA_MARKER_PREFIX in description and METADATA_MARKER_SUFFIX in description:
-            start_marker_idx = description.find(METADATA_MARKER_PREFIX); end_marker_idx = description.find(METADATA_MARKER_SUFFIX, start_marker_idx)
-            if start_marker_idx != -1 and end_marker_idx != -1:
-                content_start = start_marker_idx + len(METADATA_MARKER_PREFIX); metadata_content = description[content_start:end_marker_idx]
-                url_key_idx = metadata_content.find(METADATA_URL_KEY); prefix_key_idx = metadata_content.find(METADATA_PREFIX_KEY)
-                if url_key_idx != -1:
-                    url_start_val_idx = url_key_idx + len(METADATA_URL_KEY); url_end_val_idx = prefix_key_idx if prefix_key_idx != -1 and prefix_key_idx > url_key_idx else len(metadata_content)
-                    url = metadata_content[url_start_val_idx:url_end_val_idx].strip().rstrip(':')
-                if prefix_key_idx != -1:
-                    prefix_start_val_idx = prefix_key_idx + len(METADATA_PREFIX_KEY); prefix_end_val_idx = url_key_idx if url_key_idx != -1 and url_key_idx > prefix_key_idx else len(metadata_content)
-                    prefix = metadata_content[prefix_start_val_idx:prefix_end_val_idx].strip().rstrip(':')
-        return url, prefix
-    def _populate_list_ctrl(self, fetched_lists, fetched_rules):
-        if not self.list_ctrl_lists or not self.list_ctrl_rules: print("Error: List controls not available during UI population."); self.LogMessage("Internal Error: UI List controls not ready.", "red"); return
+            if plan["layout"] != current_layout: self.log(f"Converting rule '{rule_name}' from the {current_layout} to the {plan['layout']} list layout.")
+            plan["mode"] = self.choose_update_mode(plan.get("num_buckets") or (len(domains) + MAX_DOMAINS_PER_LIST - 1) // MAX_DOMAINS_PER_LIST)
+        return OperationJournal.create(self.account_id, "update", plan, domains)
+    def update(self, journal, domains, update_gauge, list_progress):
+        """Run a journaled update (bucket delta, blue/green swap or in-place replace, as planned)"""
+        plan = journal.plan
+        if plan.get("mode") == "metadata": return self.metadata_update(journal, update_gauge)
+        if plan.get("mode") == "delta": return self.delta_update(journal, domains, update_gauge, list_progress)
+        with self.phase("chunk"): new_domain_chunks = self.layout_chunks(domains, plan)
+        args = (journal, plan.get("old_rule_id"), plan.get("rule_name"), plan.get("source_url"), plan.get("prefix"), plan.get("content_hash"), set(plan.get("old_list_ids", [])), new_domain_chunks, update_gauge, list_progress)
+        if plan.get("mode") == "swap": self.swap_update(*args)
+        else: self.replace_update(*args)
+    def metadata_update(self, journal, update_gauge):
+        """The source changed but its domains did not: refresh the content hash in the rule description and leave the lists alone"""
+        plan = journal.plan
+        if "rule_swapped" in journal.completed_steps: return
+        update_gauge("Updating rule metadata..."); self.check_cancel()
+        base_description = RuleMetadataCodec.decode(plan.get("old_description", "")).base_description or MANAGED_DESCRIPTION
+        description = RuleMetadataCodec.compose_description(base_description, plan.get("source_url"), plan.get("prefix"), plan.get("content_hash"), mode="buckets" if plan.get("layout") == "buckets" else None)
         try:
-            self.list_ctrl_lists.Freeze(); self.list_ctrl_lists.DeleteAllItems(); self.list_item_data_lists = {}; list_idx_counter = 0
-            valid_lists = fetched_lists if isinstance(fetched_lists, list) else []
-            list_data_to_display = [{"id": l.get("id"), "name": l.get("name"), "count": l.get("count", 0)} for l in valid_lists if l.get("id") and l.get("name") is not None]
-            list_data_to_display.sort(key=lambda x: x.get('name', '').lower())
-            for list_data in list_data_to_display:
-                list_id = list_data["id"]; list_name = list_data["name"]; item_count = list_data.get("count", 0)
-                idx = self.list_ctrl_lists.InsertItem(list_idx_counter, list_name); self.list_ctrl_lists.SetItem(idx, 1, list_id); self.list_ctrl_lists.SetItem(idx, 2, f"{item_count:,}")
-                item_tuple = ("list", list_id); self.list_ctrl_lists.SetItemData(idx, list_idx_counter); self.list_item_data_lists[list_idx_counter] = item_tuple; list_idx_counter += 1
-            self.list_ctrl_lists.SetItemDataMap(self.list_item_data_lists)
-        except Exception as e: print(f"Error populating lists tab: {e}"); traceback.print_exc(); self.LogMessage(f"Error updating lists tab display: {e}", "red")
-        finally:
-            if self.list_ctrl_lists: self.list_ctrl_lists.Thaw()
+            with self.phase("update rule"): self.api_client.patch_rule(plan.get("old_rule_id"), description=description)
+        except Exception as e: raise RuntimeError(f"Failed to update rule '{plan.get('rule_name')}': {e}") from e
+        journal.record("rule_swapped")
+        self.log(f"Rule '{plan.get('rule_name')}' already blocks these domains; updated its hash to {plan.get('content_hash')}.", "green")
+    def delta_update(self, journal, domains, update_gauge, list_progress):
+        """Bucket-layout update: patch only the lists whose bucket contents changed, and add buckets the set outgrew.
+
+        Each list's diff is computed from its current items, so re-running after an interruption is safe. Items of lists
+        whose count and updated_at still match the ledger come from the ledger instead of being downloaded."""
+        plan = journal.plan; prefix, slot_list_ids, num_buckets = plan.get("prefix"), plan["slot_list_ids"], plan["num_buckets"]
+        with self.phase("assign buckets"): buckets = DomainBuckets.assign(domains, num_buckets)
+        existing = {lst.get("id"): lst for lst in self.api_client.get_lists()}
+        missing = [list_id for list_id in slot_list_ids if list_id not in existing]
+        if missing: raise RuntimeError(f"{len(missing)} list(s) of rule '{plan.get('rule_name')}' no longer exist; update it with the sorted layout to rebuild it.")
+        current_items = self.recorded_items(slot_list_ids, existing)
+        to_fetch = [existing[list_id] for list_id in slot_list_ids if list_id not in current_items]
+        if current_items: self.log(f"{len(current_items)} of {len(slot_list_ids)} list(s) are unchanged since they were last written; their items are read from the local record.", "grey")
+        def add_items(done, lst, response):
+            if not response or not response.get("success"): raise ConnectionError(f"Failed to fetch items for list '{lst.get('name')}': {response}")
+            current_items[lst["id"]] = {item.get("value") for item in (response.get("result") or []) if item.get("value")}
+            update_gauge(f"Reading current lists ({done}/{len(to_fetch)})...")
+        if to_fetch:
+            with self.phase("fetch list items"): DomainIndex.fetch_items(self.api_client, to_fetch, self.check_cancel, add_items)
+        changed, added, removed = 0, 0, 0
+        with self.phase("patch lists"):
+            for slot, list_id in enumerate(slot_list_ids):
+                wanted, current = set(buckets[slot]), current_items[list_id]
+                append, remove = sorted(wanted - current), sorted(current - wanted)
+                if not append and not remove: continue
+                list_progress(f"Patching list '{existing[list_id].get('name', list_id)}' (+{len(append)} / -{len(remove)})..."); self.check_cancel()
+                try: response = self.api_client.patch_list_items(list_id, append=append, remove=remove)
+                except OperationCancelledError: raise
+                except Exception as e: raise RuntimeError(f"Error patching list '{existing[list_id].get('name', list_id)}': {e}") from e
+                journal.record("list_patched", chunk=slot, list_id=list_id, appended=len(append), removed=len(remove))
+                self.remember_list(list_id, existing[list_id].get("name", list_id), buckets[slot], ListLedger.stamp(response))
+                changed += 1; added += len(append); removed += len(remove)
+        new_buckets = list(range(len(slot_list_ids), num_buckets))
+        if new_buckets:
+            if journal.resumed: self.reconcile_journal_lists(journal, buckets, prefix, excluded_list_ids=slot_list_ids)
+            with self.phase("create lists"):
+                for slot in new_buckets:
+                    if slot in journal.created_lists: continue
+                    list_name = self.chunk_list_name(prefix, slot, num_buckets)
+                    list_progress(f"Creating bucket list '{list_name}'..."); self.check_cancel()
+                    journal.record("list_begin", chunk=slot, name=list_name)
+                    try: response = self.api_client.create_list(list_name, buckets[slot], timeout=LIST_CREATE_TIMEOUT_SECONDS, digest=False)
+                    except OperationCancelledError: raise
+                    except Exception as e: raise RuntimeError(f"Error creating bucket list '{list_name}': {e}") from e
+                    list_id = ((response or {}).get("result") or {}).get("id")
+                    if not list_id: raise RuntimeError(f"API response missing ID for created list '{list_name}'.")
+                    journal.record("list_created", chunk=slot, name=list_name, list_id=list_id)
+                    self.remember_list(list_id, list_name, buckets[slot], ListLedger.stamp(response))
+        if "rule_swapped" not in journal.completed_steps:
+            update_gauge("Updating rule..."); self.check_cancel()
+            base_description = RuleMetadataCodec.decode(plan.get("old_description", "")).base_description or MANAGED_DESCRIPTION
+            description = RuleMetadataCodec.compose_description(base_description, plan.get("source_url"), prefix, plan.get("content_hash"), mode="buckets")
+            traffic = self.api_client.traffic_expression(slot_list_ids + [journal.created_lists[slot] for slot in new_buckets]) if new_buckets else None
+            try:
+                with self.phase("update rule"): self.api_client.patch_rule(plan.get("old_rule_id"), description=description, traffic=traffic)
+            except Exception as e: raise RuntimeError(f"Failed to update rule '{plan.get('rule_name')}': {e}") from e
+            journal.record("rule_swapped")
+        self.log(f"Bucket update: patched {changed} of {len(slot_list_ids)} list(s) (+{added:,} / -{removed:,} domains){f', added {len(new_buckets)} bucket list(s)' if new_buckets else ''}.", "green")
+    def sync_rule(self, domains, prefix, rule_name, source_url=None, content_hash=None, progress=None, layout=None, convert_layout=False):
+        """Make the account's rule named rule_name block exactly domains: update it if it exists, otherwise apply it.
+
+        layout ("sorted" or "buckets") is used for a new rule; with convert_layout an existing rule is converted to it."""
+        progress = progress or (lambda message: self.log(message))
+        self.check_cancel()
+        if not domains: raise ValueError("No domains to apply.")
+        if len(domains) > TOTAL_DOMAIN_LIMIT: raise ValueError(f"{len(domains):,} domains exceed the account limit of {TOTAL_DOMAIN_LIMIT:,}.")
+        content_hash, journal = content_hash or str(domains.text_length()), None
+        existing = self.api_client.get_rules(rule_name=rule_name)
         try:
-            self.list_ctrl_rules.Freeze(); self.list_ctrl_rules.DeleteAllItems(); self.list_item_data_rules = {}; rule_idx_counter = 0
-            valid_rules = fetched_rules if isinstance(fetched_rules, list) else []
-            rule_data_to_display = [{"id": r.get("id"), "name": r.get("name"), "enabled": r.get("enabled", False), "description": r.get("description","")} for r in valid_rules if r.get("id") and r.get("name") is not None]
-            rule_data_to_display.sort(key=lambda x: x.get('name', '').lower())
-            for rule_data in rule_data_to_display:
-                rule_id = rule_data["id"]; rule_name = rule_data["name"]; enabled_status = "Yes" if rule_data.get("enabled", False) else "No"; description = rule_data.get("description", "")
-                source_url, list_prefix = self._parse_metadata(description); source_display = "URL" if source_url else "Manual"
-                idx = self.list_ctrl_rules.InsertItem(rule_idx_counter, rule_name); self.list_ctrl_rules.SetItem(idx, 1, rule_id); self.list_ctrl_rules.SetItem(idx, 2, enabled_status); self.list_ctrl_rules.SetItem(idx, 3, source_display)
-                item_dict = {"type": "rule", "id": rule_id, "name": rule_name, "enabled": rule_data.get("enabled", False), "source_url": source_url, "list_prefix": list_prefix}
-                self.list_ctrl_rules.SetItemData(idx, rule_idx_counter); self.list_item_data_rules[rule_idx_counter] = item_dict; rule_idx_counter += 1
-            self.list_ctrl_rules.SetItemDataMap(self.list_item_data_rules)
-        except Exception as e: print(f"Error populating rules tab: {e}"); traceback.print_exc(); self.LogMessage(f"Error updating rules tab display: {e}", "red")
-        finally:
-            if self.list_ctrl_rules: self.list_ctrl_rules.Thaw()
-            self._update_management_button_states()
-    def _validate_naming_options(self):
-        if not all(hasattr(self, ctrl) and getattr(self, ctrl) for ctrl in ['txt_list_prefix', 'txt_rule_name']): print("Error: Naming UI elements not initialized during validation."); self.ShowError("Internal UI Error: Naming fields are not ready."); return False
-        prefix = self.txt_list_prefix.GetValue().strip(); rule_name = self.txt_rule_name.GetValue().strip()
-        if not prefix: self.ShowError("Please enter a 'List Name Prefix' before applying."); self.txt_list_prefix.SetFocus(); return False
-        if not rule_name: self.ShowError("Please enter a 'Rule Name' before applying."); self.txt_rule_name.SetFocus(); return False
-        return True
-    def LogMessage(self, message, color=None):
-        if not hasattr(self, 'log_ctrl') or not self.log_ctrl: print(f"LOG (UI Not Ready): {message}"); return
-        wx.CallAfter(self._do_log, message, color)
-    def _do_log(self, message, color):
-        if not self.log_ctrl: return
+            if existing:
+                journal = self.start_update(existing[0], domains, source_url, prefix, content_hash, layout if convert_layout else None)
+                self.update(journal, domains, progress, progress); outcome = "updated"
+            else:
+                if self.api_client.get_lists(name_prefix=prefix): raise RuntimeError(f"Pre-existing lists start with '{prefix}' but no rule is named '{rule_name}'.")
+                num_lists, current_count = self.lists_needed(len(domains), layout or ("buckets" if LIST_LAYOUT_BUCKETS else "sorted")), len(self.api_client.get_lists())
+                if num_lists + current_count > MAX_LISTS: raise RuntimeError(f"Creating {num_lists} list(s) would exceed the limit of {MAX_LISTS} lists (account has {current_count}).")
+                journal = self.start_apply(domains, prefix, rule_name, source_url, content_hash, layout)
+                self.apply(journal, domains, progress); outcome = "applied"
+        except BaseException:
+            # Left open only when there is something to resume or roll back (Actions > Resume Interrupted Operation)
+            if journal is not None and not journal.has_changes: journal.finish("abort")
+            raise
+        self.commit(journal, domains)
+        return outcome
+    def chunk_list_name(self, prefix, chunk_index, num_chunks):
+        num_digits = len(str(num_chunks)) if num_chunks > 0 else 1
+        return f"{prefix}{str(chunk_index + 1).zfill(num_digits)}"
+    def reconcile_journal_lists(self, journal, domain_chunks, prefix, excluded_list_ids=()):
+        """Before resuming, drop journaled lists that no longer exist and adopt lists whose creation succeeded but was never journaled"""
+        all_lists = {lst.get("id"): lst for lst in self.api_client.get_lists() if lst.get("id")}
+        existing_lists = {list_id: lst for list_id, lst in all_lists.items() if lst.get("name", "").startswith(prefix)}
+        for chunk_index, list_id in list(journal.created_lists.items()):
+            # Shared lists carry another rule's prefix, so existence is checked against every list
+            if list_id not in all_lists:
+                journal.record("list_dropped", chunk=chunk_index, list_id=list_id)
+                self.log(f"Journaled list {list_id} no longer exists; chunk {chunk_index + 1} will be recreated.", "orange")
+        known_ids = set(journal.created_lists.values()) | set(excluded_list_ids)
+        lists_by_name = {lst.get("name"): lst for lst in existing_lists.values() if lst.get("id") not in known_ids}
+        for chunk_index in sorted(journal.started_chunks - set(journal.created_lists)):
+            list_name = self.chunk_list_name(prefix, chunk_index, len(domain_chunks))
+            lst = lists_by_name.get(list_name)
+            if lst and lst.get("count") == len(domain_chunks[chunk_index]):
+                journal.record("list_created", chunk=chunk_index, name=list_name, list_id=lst["id"], adopted=True)
+                self.remember_list(lst["id"], list_name, domain_chunks[chunk_index], lst.get("updated_at"))
+                self.log(f"Adopted list '{list_name}' ({lst['id']}) created before the interruption.", "grey")
+    def reusable_lists(self, journal):
+        """Managed lists by content digest that a new chunk may share, leaving out lists other open operations may still roll back"""
+        protected_ids = OperationJournal.protected_list_ids(self.account_id, exclude_op_id=journal.op_id)
+        return {digest: lst for lst in self.api_client.get_lists() if lst.get("id") not in protected_ids and (digest := ListDigest.read(lst.get("description")))}
+    def create_journal_lists(self, journal, domain_chunks, prefix, progress):
+        """Create every chunk list not yet recorded in the journal and return all list IDs in chunk order.
+
+        A sorted-layout chunk identical to an existing managed list (same digest and size) shares that list instead."""
+        num_chunks, shareable = len(domain_chunks), journal.plan.get("layout") != "buckets"
+        candidates = self.reusable_lists(journal) if shareable and LIST_REUSE else {}
+        ledger = self.load_ledger() if candidates else None
+        for i, chunk in enumerate(domain_chunks):
+            list_name = self.chunk_list_name(prefix, i, num_chunks)
+            if i in journal.created_lists:
+                progress(f"Reusing list '{list_name}' ({i + 1}/{num_chunks}) from the interrupted run..."); continue
+            shared = candidates.get(chunk.digest()) if candidates else None
+            if shared and shared.get("count") == len(chunk) and not self.list_holds(shared, chunk.digest(), ledger):
+                self.log(f"List '{shared.get('name')}' no longer holds the items its digest claims (changed outside the app); not sharing it.", "orange")
+                candidates.pop(chunk.digest()); shared = None
+            if shared and shared.get("count") == len(chunk):
+                journal.record("list_created", chunk=i, name=shared.get("name"), list_id=shared["id"], reused=True)
+                self.remember_list(shared["id"], shared.get("name"), chunk, shared.get("updated_at"))
+                if self.api_client.perf: self.api_client.perf.count("lists_reused")
+                progress(f"Sharing identical list '{shared.get('name')}' for chunk {i + 1}/{num_chunks}..."); continue
+            progress(f"Creating list '{list_name}' ({i + 1}/{num_chunks})..."); self.check_cancel()
+            try:
+                journal.record("list_begin", chunk=i, name=list_name)
+                response = self.api_client.create_list(list_name, chunk, timeout=LIST_CREATE_TIMEOUT_SECONDS, digest=shareable)
+                if not response or not response.get("success"): errors = response.get("errors", [{"message": "Unknown API error"}]) if response else [{"message": "No response from API"}]; raise ValueError(f"API call failed to create list '{list_name}'. Error: {errors[0].get('message', 'N/A')}")
+                result = response.get("result"); list_id = result.get("id") if result else None
+                if not list_id: raise ValueError(f"API response missing ID for created list '{list_name}'.")
+                journal.record("list_created", chunk=i, name=list_name, list_id=list_id)
+                self.remember_list(list_id, list_name, chunk, ListLedger.stamp(response))
+                self.log(f"Successfully created list '{list_name}' (ID: {list_id})")
+                if LIST_CREATE_DELAY_SECONDS > 0: self.api_client.pause(LIST_CREATE_DELAY_SECONDS, self.cancel_event); self.check_cancel()
+            except OperationCancelledError: raise
+            except Exception as e: raise RuntimeError(f"Error creating list #{i+1} ('{list_name}'): {e}") from e
+        list_ids = [journal.created_lists.get(i) for i in range(num_chunks)]
+        if not all(list_ids): raise RuntimeError(f"List creation count mismatch. Expected {num_chunks}, created {len(journal.created_lists)}.")
+        return list_ids
+    def create_journal_rule(self, journal, rule_name, list_ids, source_url, prefix, content_hash):
+        if journal.rule_id: return journal.rule_id
+        if journal.resumed and "rule_begin" in journal.completed_steps:
+            for rule in self.api_client.get_rules(rule_name=rule_name):
+                if set(LIST_UUID_PATTERN.findall(rule.get("traffic", "") or "")) == set(list_ids):
+                    journal.record("rule_created", rule_id=rule.get("id"), adopted=True)
+                    self.log(f"Adopted rule '{rule_name}' ({rule.get('id')}) created before the interruption.", "grey")
+                    return journal.rule_id
+        journal.record("rule_begin")
+        rule_response = self.api_client.create_rule(rule_name, list_ids, {list_id: list_id for list_id in list_ids}, enabled=True, source_url=source_url, list_prefix=prefix, content_hash=content_hash, layout=journal.plan.get("layout"))
+        if not rule_response or not rule_response.get("success"): errors = rule_response.get("errors", [{"message": "Unknown API error"}]) if rule_response else [{"message": "No response from API"}]; raise ConnectionError(f"API call failed to create rule '{rule_name}'. Error: {errors[0].get('message', 'N/A')}")
+        result = rule_response.get("result"); created_rule_id = result.get("id") if result else None
+        if not created_rule_id: raise ConnectionError("API response missing ID for created rule.")
+        journal.record("rule_created", rule_id=created_rule_id)
+        return created_rule_id
+    def choose_update_mode(self, num_new_lists):
+        """Use a blue/green swap when the account has room for both list sets at once, otherwise replace in place"""
+        if not UPDATE_SWAP_MODE: return "replace"
+        current_list_count = len(self.api_client.get_lists())
+        if current_list_count + num_new_lists <= MAX_LISTS:
+            self.log(f"Using blue/green update: {num_new_lists} new list(s) will be staged while the current rule keeps enforcing ({current_list_count}/{MAX_LISTS} lists in use).", "grey"); return "swap"
+        self.log(f"Not enough list headroom for a blue/green update ({current_list_count} + {num_new_lists} > {MAX_LISTS}); replacing the rule in place. Blocking pauses until the new lists exist.", "orange")
+        return "replace"
+    def delete_old_update_lists(self, journal, old_list_uuids, update_gauge):
+        remaining_old_lists = old_list_uuids - journal.deleted_old_lists - set(journal.created_lists.values())
+        # Lists another rule still uses (shared by content digest) stay
+        in_use = {list_id: rules for list_id, rules in build_list_reference_graph(self.api_client.get_rules()).items() if list_id in remaining_old_lists}
+        for list_id, rules in in_use.items(): self.log(f"Keeping old list {list_id[:8]}...: still used by {', '.join(rule.get('name', '?') for rule in rules)}.", "grey")
+        remaining_old_lists = sorted(remaining_old_lists - set(in_use))
+        if not remaining_old_lists: self.log("No old lists found to delete.", "grey"); return
+        self.log(f"Deleting {len(remaining_old_lists)} old associated list(s)...")
+        def on_result(item, error, done, total):
+            update_gauge(f"Deleting old lists ({done}/{total})...")
+            if error: self.log(f"WARNING: Failed to delete old list {item.item_id}: {error}. Continuing update...", "orange")
+            else: journal.record("old_list_deleted", list_id=item.item_id); self.log(f"Deleted old list {item.item_id[:8]}...")
+        summary = BulkDeleter(self.api_client, cancel_event=self.cancel_event, on_result=on_result).run(BulkDeleteItem("list", list_uuid, list_uuid) for list_uuid in remaining_old_lists)
+        if summary.cancelled: raise OperationCancelledError(summary.describe())
+        self.log(f"Old list cleanup: {summary.describe()}", "grey")
+    def replace_update(self, journal, old_rule_id, rule_name, source_url, list_prefix, content_hash, old_list_uuids, new_domain_chunks, update_gauge, list_progress):
+        """Delete the old rule and lists, then create new ones; blocking pauses until the new rule exists"""
+        if "old_rule_deleted" not in journal.completed_steps:
+            update_gauge("Deleting existing rule..."); self.log(f"Deleting old rule '{rule_name}' ({old_rule_id})...")
+            try:
+                with self.phase("delete old rule"): self.api_client.delete_rule(old_rule_id)
+                self.log("Successfully deleted old rule.")
+            except Exception as e:
+                if not (journal.resumed and "Status: 404" in str(e)): raise RuntimeError(f"Failed to delete old rule '{rule_name}': {e}") from e
+            journal.record("old_rule_deleted")
+        keep_ids = set()
+        if LIST_REUSE and journal.plan.get("layout") != "buckets":
+            new_digests, ledger = {chunk.digest() for chunk in new_domain_chunks}, self.load_ledger()
+            keep_ids = {lst["id"] for lst in self.api_client.get_lists() if lst.get("id") in old_list_uuids and (digest := ListDigest.read(lst.get("description"))) in new_digests
+                        and self.list_holds(lst, digest, ledger)}
+            if keep_ids: self.log(f"Keeping {len(keep_ids)} old list(s) whose content is unchanged.", "grey")
+        with self.phase("delete old lists"): self.delete_old_update_lists(journal, old_list_uuids - keep_ids, update_gauge)
+        if journal.resumed: self.reconcile_journal_lists(journal, new_domain_chunks, list_prefix, excluded_list_ids=old_list_uuids)
+        self.log(f"Creating {len(new_domain_chunks) - len(journal.created_lists)} new list(s)...")
+        with self.phase("create lists"): newly_created_list_ids = self.create_journal_lists(journal, new_domain_chunks, list_prefix, list_progress)
+        self.name_kept_lists(journal, newly_created_list_ids, list_prefix, old_list_uuids)
+        update_gauge("Creating new rule..."); self.log(f"Creating new rule '{rule_name}'...")
+        if not newly_created_list_ids: raise ValueError("Cannot create rule: No new list IDs were generated.")
         try:
-            timestamp = time.strftime("%Y-%m-%d %H:%M:%S"); log_entry = f"[{timestamp}] {message}\n"
-            insertion_point = self.log_ctrl.GetLastPosition(); self.log_ctrl.AppendText(log_entry); end_point = self.log_ctrl.GetLastPosition()
-            if color:
-                color_map = {"red": wx.RED, "green": wx.Colour(0, 128, 0), "blue": wx.BLUE, "orange": wx.Colour(255, 165, 0), "grey": wx.Colour(128, 128, 128), "gray": wx.Colour(128, 128, 128)}
-                text_color = color_map.get(str(color).lower())
-                if text_color: style = wx.TextAttr(text_color); self.log_ctrl.SetStyle(insertion_point, end_point, style)
-            self.log_ctrl.ShowPosition(end_point)
-        except Exception as e: print(f"Error writing to log control: {e}\nOriginal Message: {message}"); traceback.print_exc()
-    def UpdateStatusBar(self, text):
-        if self.status_text:
-             wx.CallAfter(self.status_text.SetLabel, text)
-    def ShowError(self, message):
-        def show_and_log(): wx.MessageBox(message, "Error", wx.OK | wx.ICON_ERROR, self); self.LogMessage(f"ERROR: {message}", "red")
-        if wx.IsMainThread(): show_and_log()
-        else: wx.CallAfter(show_and_log)
-    def ShowInfo(self, message):
-        def show_and_log(): wx.MessageBox(message, "Information", wx.OK | wx.ICON_INFORMATION, self); self.LogMessage(f"INFO: {message}", "grey")
-        if wx.IsMainThread(): show_and_log()
-        else: wx.CallAfter(show_and_log)
-if __name__ == '__main__':
-    app = wx.App(redirect=False)
-    app.SetAppName(APP_NAME)
-    app.SetAppDisplayName(APP_NAME)
-    login_dialog = LoginDialog(None)
-    result = login_dialog.ShowModal()
-    account_id, api_token = login_dialog.account_id, login_dialog.api_token
-    login_dialog.Destroy()
-    if result == wx.ID_OK: frame = MainFrame(None, account_id=account_id, api_token=api_token); app.MainLoop()
-    else: print("Login cancelled or failed. Exiting application.")
+            with self.phase("create rule"): newly_created_rule_id = self.create_journal_rule(journal, rule_name, newly_created_list_ids, source_url, list_prefix, content_hash)
+            self.log(f"Successfully created new rule '{rule_name}' (ID: {newly_created_rule_id}) with hash: {content_hash}", "green")
+        except Exception as e: raise RuntimeError(f"Error creating new rule '{rule_name}': {e}") from e
+    def swap_update(self, journal, old_rule_id, rule_name, source_url, list_prefix, content_hash, old_list_uuids, new_domain_chunks, update_gauge, list_progress):
+        """Blue/green update: stage the new lists, repoint the existing rule in one PATCH, then delete the old lists"""
+        staging_prefix = journal.plan.get("staging_prefix") or f"{UPDATE_STAGING_PREFIX}{list_prefix}"
+        if journal.resumed: self.reconcile_journal_lists(journal, new_domain_chunks, staging_prefix, excluded_list_ids=old_list_uuids)
+        self.log(f"Staging {len(new_domain_chunks) - len(journal.created_lists)} new list(s) under '{staging_prefix}'...")
+        with self.phase("stage lists"): new_list_ids = self.create_journal_lists(journal, new_domain_chunks, staging_prefix, list_progress)
+        if not new_list_ids: raise ValueError("Cannot swap rule: No new list IDs were generated.")
+        if "rule_swapped" not in journal.completed_steps:
+            update_gauge("Switching rule to the new lists..."); self.check_cancel()
+            base_description = RuleMetadataCodec.decode(journal.plan.get("old_description", "")).base_description or MANAGED_DESCRIPTION
+            description = RuleMetadataCodec.compose_description(base_description, source_url, list_prefix, content_hash, mode="buckets" if journal.plan.get("layout") == "buckets" else None)
+            try:
+                with self.phase("switch rule"): self.api_client.patch_rule(old_rule_id, description=description, traffic=self.api_client.traffic_expression(new_list_ids))
+            except Exception as e: raise RuntimeError(f"Failed to switch rule '{rule_name}' to the new lists: {e}") from e
+            journal.record("rule_swapped")
+            self.log(f"Rule '{rule_name}' now uses {len(new_list_ids)} new list(s) (hash: {content_hash}).", "green")
+        with self.phase("delete old lists"): self.delete_old_update_lists(journal, old_list_uuids, update_gauge)
+        if "lists_renamed" not in journal.completed_steps:
+            update_gauge("Renaming staged lists...")
+            with self.phase("rename lists"): self.name_kept_lists(journal, new_list_ids, list_prefix, old_list_uuids)
+            journal.record("lists_renamed")
+    def name_kept_lists(self, journal, list_ids, list_prefix, old_list_uuids):
+        """Give the rule's lists their chunk names; lists shared from other rules keep theirs"""
+        names = {lst.get("id"): lst.get("name") for lst in self.api_client.get_lists()}
+        for i, list_id in enumerate(list_ids):
+            list_name = self.chunk_list_name(list_prefix, i, len(list_ids))
+            if names.get(list_id) == list_name or (list_id in journal.reused_lists and list_id not in old_list_uuids): continue
+            try: response = self.api_client.patch_list(list_id, name=list_name)
+            except Exception as e: self.log(f"WARNING: Failed to rename list {list_id} to '{list_name}': {e}", "orange"); continue
+            try: ListLedger.touch(self.account_id, list_id, list_name, ListLedger.stamp(response))
+            except OSError as e: self.log(f"Could not record the rename of list '{list_name}' for drift checks: {e}", "orange")
+    def commit(self, journal, domains):
+        """Close a finished journal and add the applied domains to the rule's history; returns the new version, if any"""
+        journal.finish()
+        plan = journal.plan
+        if plan.get("mode") == "metadata": list_ids = plan.get("old_list_ids", [])
+        elif plan.get("mode") == "delta": list_ids = plan["slot_list_ids"] + [journal.created_lists[slot] for slot in sorted(journal.created_lists)]
+        else: list_ids = [journal.created_lists[chunk] for chunk in sorted(journal.created_lists)]
+        history = self.rule_history(plan.get("rule_name"))
+        if history is None: return None
+        try: version = history.record(domains, kind=journal.kind, source_url=plan.get("source_url"), prefix=plan.get("prefix"), content_hash=plan.get("content_hash"), layout=plan.get("layout"), list_ids=list_ids)
+        except OSError as e: self.log(f"Could not save the history of rule '{plan.get('rule_name')}': {e}", "orange"); return None
+        if version: self.log(f"Saved as version {version} in the history of rule '{plan.get('rule_name')}'.", "grey")
+        return version
+    def rule_history(self, rule_name):
+        try: return RuleHistory.load(self.account_id, rule_name)
+        except (OSError, ValueError) as e: self.log(f"Could not read the history of rule '{rule_name}': {e}", "orange"); return None
+    def rollback_rule(self, rule_name, version, progress=None):
+        """Apply an earlier version from the rule's history (recreating the rule if it was deleted); it becomes the newest version"""
+        history = self.rule_history(rule_name)
+        if history is None or not history.records: raise ValueError(f"No history recorded for rule '{rule_name}'.")
+        record = history.get(version); domains = history.domains_at(version)
+        self.log(f"Rolling rule '{rule_name}' back to version {version} ({record.get('time', '?')}, {len(domains):,} domains)...")
+        return self.sync_rule(domains, record.get("prefix"), rule_name, record.get("source_url"), record.get("content_hash"), progress, layout=record.get("layout"))
+    def load_ledger(self):
+        try: return ListLedger.load(self.account_id)
+        except (OSError, ValueError) as e: self.log(f"Could not read the list ledger: {e}", "orange"); return None
+    def list_holds(self, lst, digest, ledger=None):
+        """True when a list provably still holds the items with this digest: the ledger recorded them and the list
+        has not changed since (count and updated_at), or else its items are downloaded and match"""
+        entry = ledger.lists.get(lst.get("id")) if ledger else None
+        if ListLedger.unchanged(entry, lst) and entry.get("digest") == digest: return True
+        try: response = self.api_client.get_list_items(lst["id"])
+        except ConnectionError as e: self.log(f"Could not check the items of list '{lst.get('name')}': {e}", "orange"); return False
+        if self.api_client.perf: self.api_client.perf.count("reuse_checks_fetched")
+        values = [item.get("value") for item in ((response or {}).get("result") or []) if item.get("value")]
+        return bool(response and response.get("success")) and ListDigest.of(values) == digest
+    def recorded_items(self, list_ids, lists):
+        """Items from the ledger for lists whose count and updated_at on Cloudflare still match what was last written"""
+        ledger = self.load_ledger()
+        if ledger is None: return {}
+        items = {}
+        for list_id in list_ids:
+            if not ListLedger.unchanged(ledger.lists.get(list_id), lists.get(list_id)): continue
+            try: items[list_id] = set(ledger.load_items(list_id))
+            except OSError: continue
+        return items
+    def lists_match_ledger(self, list_ids):
+        """True when every list still has the count and updated_at recorded when it was last written"""
+        lists = {lst.get("id"): lst for lst in self.api_client.get_lists()}
+        try: ledger = ListLedger.load(self.account_id)
+        except (OSError, ValueError): return False
+        return bool(list_ids) and all(ListLedger.unchanged(ledger.lists.get(list_id), lists.get(list_id)) for list_id in list_ids)
+    def remember_list(self, list_id, name, items, updated_at=None):
+        """Record what was just written to a list as the state verify_lists checks it against"""
+        try: ListLedger.record(self.account_id, list_id, name, items, updated_at)
+        except OSError as e: self.log(f"Could not record list '{name}' for drift checks: {e}", "orange")
+    def verify_lists(self, deep=False, progress=None):
+        """Compare every recorded list with its count, description digest and updated_at on Cloudflare, download only
+        the lists that disagree (every recorded list with deep) and return a DriftReport of those whose items changed"""
+        progress = progress or (lambda message: None)
+        ledger, report = ListLedger.load(self.account_id), DriftReport()
+        self.api_client.invalidate_cache()
+        with self.phase("list metadata"): lists, rules = {lst.get("id"): lst for lst in self.api_client.get_lists() if lst.get("id")}, self.api_client.get_rules()
+        self.check_cancel()
+        references, busy_ids = build_list_reference_graph(rules), OperationJournal.protected_list_ids(self.account_id)
+        suspects = {}
+        for list_id, expected in ledger.lists.items():
+            lst = lists.get(list_id)
+            if lst is None: report.gone.append(list_id); continue
+            if list_id in busy_ids: continue
+            report.checked += 1; reasons = []
+            if lst.get("count", 0) != expected.get("count"): reasons.append(f"{lst.get('count', 0):,} items instead of {expected.get('count', 0):,}")
+            digest = ListDigest.read(lst.get("description"))
+            if digest and digest != expected.get("digest"): reasons.append("description digest does not match")
+            if expected.get("updated_at") and lst.get("updated_at") and lst["updated_at"] != expected["updated_at"]: reasons.append(f"modified {lst['updated_at']}")
+            if reasons or deep: suspects[list_id] = reasons
+        report.untracked = sorted(lst.get("name", list_id) for list_id, lst in lists.items() if list_id not in ledger.lists and list_id not in busy_ids
+                                  and (lst.get("description") or "").startswith(MANAGED_DESCRIPTION))
+        self.log(f"{report.checked} recorded list(s) checked from list metadata; {len(suspects)} need their items compared.", "grey")
+        def add_items(done, lst, response):
+            if not response or not response.get("success"): raise ConnectionError(f"Failed to fetch items for list '{lst.get('name')}': {response}")
+            report.fetched += 1; progress(f"Comparing list items ({done}/{len(suspects)})...")
+            list_id, expected, values = lst["id"], ledger.lists[lst["id"]], [item.get("value") for item in (response.get("result") or []) if item.get("value")]
+            reasons = suspects[list_id]
+            if ListDigest.of(values) == expected.get("digest"):
+                # Same items: a rename or a description edit. Following the new updated_at keeps the next check metadata-only
+                if "description digest does not match" not in reasons:
+                    try: ListLedger.touch(self.account_id, list_id, lst.get("name"), lst.get("updated_at"))
+                    except OSError as e: self.log(f"Could not update the drift record of list '{lst.get('name')}': {e}", "orange")
+                    return
+                unexpected = missing = []
+            else:
+                try: recorded = set(ledger.load_items(list_id)); current = set(values); unexpected, missing = sorted(current - recorded), sorted(recorded - current)
+                except OSError: unexpected = missing = None; reasons = reasons + ["recorded items unavailable"]
+                if len(values) == expected.get("count"): reasons = reasons + ["items differ"]
+            report.drifted.append({"id": list_id, "name": lst.get("name", list_id), "rules": [rule.get("name", rule.get("id")) for rule in references.get(list_id, [])], "reasons": reasons,
+                                   "expected_count": expected.get("count", 0), "count": len(values), "description": lst.get("description", ""), "unexpected": unexpected, "missing": missing})
+        if suspects:
+            with self.phase("fetch list items"): DomainIndex.fetch_items(self.api_client, [lists[list_id] for list_id in suspects], self.check_cancel, add_items)
+        if report.gone:
+            try: ListLedger.forget(self.account_id, report.gone)
+            except OSError as e: self.log(f"Could not prune deleted lists from the drift records: {e}", "orange")
+        report.drifted.sort(key=lambda entry: entry["name"])
+        return report
+    def repair_drift(self, report, list_ids=None, progress=None):
+        """Put drifted lists (all of them, or only list_ids) back to their recorded items and digest"""
+        progress = progress or (lambda message: None)
+        ledger = ListLedger.load(self.account_id)
+        entries = [entry for entry in report.drifted if list_ids is None or entry["id"] in list_ids]
+        for done, entry in enumerate(entries, start=1):
+            self.check_cancel(); progress(f"Repairing list '{entry['name']}' ({done}/{len(entries)})...")
+            try:
+                if entry["unexpected"] is None: raise ValueError("its recorded items are unavailable")
+                response = None
+                if entry["unexpected"] or entry["missing"]:
+                    with self.phase("repair lists"): response = self.api_client.patch_list_items(entry["id"], append=entry["missing"], remove=entry["unexpected"])
+                recorded = ledger.load_items(entry["id"])
+                digest = ListDigest.read(entry["description"])
+                if digest and digest != recorded.digest():
+                    with self.phase("repair lists"): response = self.api_client.patch_list(entry["id"], description=ListDigest.describe(entry["description"], recorded))
+                ListLedger.record(self.account_id, entry["id"], entry["name"], recorded, ListLedger.stamp(response))
+                report.repaired.append(entry)
+                self.log(f"Repaired list '{entry['name']}': {len(entry['missing']):,} domain(s) restored, {len(entry['unexpected']):,} removed.", "green")
+            except OperationCancelledError: raise
+            except Exception as e: report.failed.append((entry, e)); self.log(f"Could not repair list '{entry['name']}': {e}", "red")
+        return report
+class AccountProfiles:
+    """Named Cloudflare accounts for fan-out, kept in profiles.json.
+
+    Only profile names and account IDs are written to that file. API tokens go to the OS keyring when the
+    keyring package is installed, and are otherwise kept for the current session only."""
+    FILE_VERSION = 1
+    KEYRING_SERVICE = APP_NAME
+    _session_tokens = {}
+    def __init__(self, profiles=None): self.profiles = dict(profiles or {})
+    @staticmethod
+    def profiles_path(): return app_data_path("profiles.json")
+    @classmethod
+    def load(cls):
+        path = cls.profiles_path()
+        if not os.path.exists(path): return cls()
+        with open(path, 'r', encoding='utf-8') as f: data = json.load(f)
+        return cls(data.get("profiles") if data.get("version") == cls.FILE_VERSION else None)
+    def save(self):
+        path = self.profiles_path(); tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f: json.dump({"version": self.FILE_VERSION, "profiles": self.profiles}, f, indent=2)
+        os.replace(tmp_path, path)
+    def names(self): return sorted(self.profiles)
+    def account_id(self, name): return self.profiles[name]["account_id"]
+    def add(self, name, account_id, api_token=None):
+        """Add or replace a profile; returns False if its token could only be kept for this session"""
+        self.profiles[name] = {"account_id": account_id.strip()}
+        return self.set_token(name, api_token) if api_token else True
+    def remove(self, name):
+        self.profiles.pop(name, None); self._session_tokens.pop(name, None)
+        if HAS_KEYRING:
+            try: keyring.delete_password(self.KEYRING_SERVICE, name)
+            except Exception: pass
+    def set_token(self, name, api_token):
+        self._session_tokens[name] = api_token.strip()
+        if not HAS_KEYRING: return False
+        try: keyring.set_password(self.KEYRING_SERVICE, name, api_token.strip()); return True
+        except Exception as e: print(f"Could not store the token of profile '{name}' in the keyring: {e}"); return False
+    def token(self, name):
+        if name in self._session_tokens: return self._session_tokens[name]
+        if not HAS_KEYRING: return None
+        try: return keyring.get_password(self.KEYRING_SERVICE, name)
+        except Exception as e: print(f"Could not read the token of profile '{name}' from the keyring: {e}"); return None
+    def client(self, name):
+        api_token = self.token(name)
+        if not api_token: raise ValueError(f"No API token stored for profile '{name}'.")
+        return CloudflareAPI(api_token, self.account_id(name))
+def fan_out_sync(clients, domains, prefix, rule_name, source_url=None, content_hash=None, log=print, cancel_event=None, perf=None, layout=None, convert_layout=False):
+    """Apply or update the same rule, from one parsed domain set, on several accounts at once.
 
+    clients maps a label (profile name) to that account's CloudflareAPI. Every account runs on its own thread
+    with its own client, so list-creation pacing, retries and 429 backoff only slow the account that hit them.
+    Returns {label: "applied" | "updated" | the exception that stopped it}."""
+    cancel_event = cancel_event or CancelToken()
+    def run(label, client):
+        client.bind_perf(perf)
+        operator = AccountOperator(client, client.account_id, lambda message, color=None: log(f"[{label}] {message}", color), cancel_event)
+        try:
+            with operator.phase(f"account {label}"): return operator.sync_rule(domains, prefix, rule_name, source_url, content_hash, layout=layout, convert_layout=convert_layout)
+        except Exception as e: operator.log(f"Failed: {e}", "red"); return e
+        finally: client.bind_perf(None)
+    results = {}
+    if not clients: return results
+    with ThreadPoolExecutor(max_workers=min(FAN_OUT_MAX_ACCOUNTS, len(clients)), thread_name_prefix="fan-out") as pool:
+        futures = {pool.submit(run, label, client): label for label, client in clients.items()}
+        for future in as_completed(futures): results[futures[future]] = future.result()
+    return results
+def open_blocklist_source(source, cache=None):
+    """Line source for a URL or a local file path"""
+    if urlparse(source).scheme in ("http", "https"): return fetch_blocklist_url(source, timeout=30, cache=cache)
+    return open_blocklist_file(source)
+def _cli_api_client(args):
+    account_id = args.account_id or os.environ.get(ENV_ACCOUNT_ID, "")
+    api_token = args.api_token or os.environ.get(ENV_API_TOKEN, "")
+    if not account_id or not api_token: raise SystemExit(f"Error: Account ID and API token are required (use --account-id/--api-token or {ENV_ACCOUNT_ID}/{ENV_API_TOKEN}).")
+    api_client = CloudflareAPI(api_token, account_id)
+    api_client.bind_perf(args.perf)
+    return api_client
+def _cli_orphans(args):
+    api_client = _cli_api_client(args)
+    orphans = find_orphaned_lists(api_client.get_lists(), api_client.get_rules(), OperationJournal.protected_list_ids(api_client.account_id))
+    for lst in sorted(orphans, key=lambda l: l.get("name", "")): print(f"{lst.get('name', '')}\t{lst['id']}\t{lst.get('count', 0)}")
+    print(f"{len(orphans)} orphaned managed list(s).", file=sys.stderr)
+    if not args.delete or not orphans: return 0
+    summary = BulkDeleter(api_client, on_result=lambda item, error, done, total: print(f"  [{done}/{total}] {'FAILED ' + str(error) if error else 'deleted'}: {item.name}", file=sys.stderr)).run(BulkDeleteItem("list", lst["id"], lst.get("name", lst["id"])) for lst in orphans)
+    print(summary.describe(), file=sys.stderr)
+    return 1 if summary.failed else 0
+def _cli_verify(args):
+    api_client = _cli_api_client(args)
+    operator = AccountOperator(api_client, api_client.account_id, lambda message, color=None: print(message, file=sys.stderr), CancelToken())
+    report = operator.verify_lists(deep=args.deep)
+    for entry in report.drifted: print(DriftReport.describe_entry(entry), file=sys.stderr)
+    if report.untracked: print(f"Not recorded yet: {', '.join(report.untracked)}", file=sys.stderr)
+    if args.repair is not None and report.drifted:
+        names = set(args.repair)
+        unknown = names - {entry["name"] for entry in report.drifted}
+        if unknown: print(f"Not drifted (left alone): {', '.join(sorted(unknown))}", file=sys.stderr)
+        operator.repair_drift(report, {entry["id"] for entry in report.drifted if entry["name"] in names} if names else None)
+    print(report.describe(), file=sys.stderr)
+    if args.json: print(json.dumps(report.as_dict(), indent=2))
+    unresolved = len(report.drifted) - len(report.repaired)
+    return 1 if unresolved else 0
+def _cli_history(args):
+    account_id = args.account_id or os.environ.get(ENV_ACCOUNT_ID, "")
+    if not account_id: raise SystemExit(f"Error: an account ID is required (use --account-id or {ENV_ACCOUNT_ID}).")
+    histories = RuleHistory.all(account_id)
+    if args.domain:
+        labels, found = args.domain.strip().lower().strip('.').split('.'), 0
+        for rule_name, history in sorted(histories.items()):
+            for i in range(max(1, len(labels) - 1)):
+                for record, change in history.domain_events('.'.join(labels[i:])):
+                    print(f"{rule_name}\t{'.'.join(labels[i:])}\t{change}\tv{record['version']}\t{record.get('time', '?')}"); found += 1
+        print(f"{found} change(s) found in {len(histories)} rule history(ies).", file=sys.stderr)
+        return 0 if found else 1
+    if not args.rule:
+        for rule_name, history in sorted(histories.items()): print(f"{rule_name}\t{len(history.records)} version(s)\t{RuleHistory.describe_version(history.latest)}")
+        return 0
+    if args.rule not in histories: print(f"No history recorded for rule '{args.rule}'.", file=sys.stderr); return 1
+    history = histories[args.rule]
+    if args.diff and len(args.diff) > 2: raise SystemExit("Error: --diff takes one or two versions.")
+    try:
+        if args.rollback is not None:
+            api_client = _cli_api_client(args)
+            operator = AccountOperator(api_client, account_id, lambda message, color=None: print(message, file=sys.stderr), CancelToken())
+            print(f"Rule '{args.rule}' {operator.rollback_rule(args.rule, args.rollback)} to version {args.rollback}.", file=sys.stderr); return 0
+        if args.export is not None:
+            for domain in history.domains_at(args.export): print(domain)
+            return 0
+        if args.diff:
+            added, removed = history.diff(*args.diff) if len(args.diff) == 2 else history.changes(args.diff[0])
+            for domain in added: print(f"+{domain}")
+            for domain in removed: print(f"-{domain}")
+            print(f"{len(added):,} added, {len(removed):,} removed.", file=sys.stderr); return 0
+    except KeyError as e: print(f"Error: {e.args[0]}", file=sys.stderr); return 1
+    for record in history.records: print(RuleHistory.describe_version(record) + (f"  +{len(record['added']):,} / -{len(record['removed']):,}" if "added" in record else ""))
+    return 0
+def _cli_find_domain(args):
+    account_id = args.account_id or os.environ.get(ENV_ACCOUNT_ID, "")
+    index = None if args.sync or not account_id else DomainIndex.load(account_id)
+    if index is None:
+        api_client = _cli_api_client(args)
+        print("Syncing domain index (downloading all list items)...", file=sys.stderr)
+        index = DomainIndex.sync(api_client, progress_callback=lambda done, total, name: print(f"  [{done}/{total}] {name}", file=sys.stderr))
+        index.save()
+    print(f"Index: {index.domain_count:,} domains across {len(index.lists):,} lists (synced {index.synced_at}).", file=sys.stderr)
+    start = time.perf_counter()
+    rows = index.search(args.query, args.mode)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    for domain, list_id, list_name, rule_names in rows: print(f"{domain}\t{list_name}\t{list_id}\t{', '.join(rule_names) if rule_names else '-'}")
+    print(f"{len(rows):,} match(es) in {elapsed_ms:.1f} ms", file=sys.stderr)
+    return 0 if rows else 1
+def _cli_profiles(args):
+    profiles = AccountProfiles.load()
+    if args.action == "list":
+        for name in profiles.names(): print(f"{name}\t{profiles.account_id(name)}\t{'token stored' if profiles.token(name) else 'no token'}")
+        print(f"{len(profiles.profiles)} profile(s).{'' if HAS_KEYRING else ' Install the keyring package to store API tokens.'}", file=sys.stderr)
+        return 0
+    if not args.name: raise SystemExit(f"Error: profiles {args.action} needs a profile name.")
+    if args.action == "remove":
+        if args.name not in profiles.profiles: print(f"No profile named '{args.name}'.", file=sys.stderr); return 1
+        profiles.remove(args.name); profiles.save(); print(f"Removed profile '{args.name}'.", file=sys.stderr); return 0
+    account_id = args.profile_account_id or args.account_id or os.environ.get(ENV_ACCOUNT_ID, "")
+    if not account_id: raise SystemExit("Error: profiles add needs an account ID.")
+    api_token = args.api_token or os.environ.get(ENV_API_TOKEN, "") or (getpass.getpass(f"API token for '{args.name}': ") if sys.stdin.isatty() else "")
+    stored = profiles.add(args.name, account_id, api_token or None); profiles.save()
+    if api_token and not stored: print("Warning: the API token could not be stored (install the keyring package); fan-out will ask for it.", file=sys.stderr)
+    print(f"Saved profile '{args.name}' ({account_id}).", file=sys.stderr)
+    return 0
+def _cli_fan_out(args):
+    profiles = AccountProfiles.load()
+    names = [name.strip() for name in args.profiles.split(",") if name.strip()] if args.profiles else profiles.names()
+    unknown = [name for name in names if name not in profiles.profiles]
+    if unknown: raise SystemExit(f"Error: unknown profile(s): {', '.join(unknown)}.")
+    if not names: raise SystemExit("Error: no profiles configured (see: profiles add).")
+    clients = {}
+    for name in names:
+        if not profiles.token(name) and sys.stdin.isatty(): profiles.set_token(name, getpass.getpass(f"API token for '{name}': "))
+        try: clients[name] = profiles.client(name)
+        except ValueError as e: raise SystemExit(f"Error: {e}")
+    print(f"Reading {args.source}...", file=sys.stderr)
+    line_source = open_blocklist_source(args.source, SourceCache() if SOURCE_CACHE_ENABLED else None)
+    with (args.perf.span("parse") if args.perf else contextlib.nullcontext({})): domains, _, _ = parse_blocklist_lines(line_source)
+    source_url = args.source if urlparse(args.source).scheme in ("http", "https") else None
+    content_hash = str(line_source.text_length) if line_source.text_length else None
+    print(f"Parsed {len(domains):,} domains from {line_source.line_count:,} lines once; syncing rule '{args.rule_name}' to {len(clients)} account(s)...", file=sys.stderr)
+    results = fan_out_sync(clients, domains, args.prefix, args.rule_name, source_url, content_hash, log=lambda message, color=None: print(message, file=sys.stderr), perf=args.perf, layout=args.layout, convert_layout=bool(args.layout))
+    for name in names: print(f"{name}\t{profiles.account_id(name)}\t{results[name] if isinstance(results[name], str) else 'failed: ' + str(results[name])}")
+    return 1 if any(isinstance(result, Exception) for result in results.values()) else 0
+def run_cli(argv):
+    parser = argparse.ArgumentParser(prog="gateway_guardian.py", description=f"{APP_NAME} command line tools. Run without arguments to start the GUI.")
+    parser.add_argument("--account-id", default="", help=f"Cloudflare account ID (default: ${ENV_ACCOUNT_ID})")
+    parser.add_argument("--api-token", default="", help=f"Cloudflare API token (default: ${ENV_API_TOKEN})")
+    parser.add_argument("--timings", action="store_true", help="Print a per-endpoint timing table on stderr when done")
+    parser.add_argument("--trace", metavar="FILE", help="Write a Chrome trace-event JSON of the run's API calls to FILE")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    find_parser = subparsers.add_parser("find-domain", help="Find which lists and rules contain a domain")
+    find_parser.add_argument("query", help="Domain or text to search for")
+    find_parser.add_argument("--mode", choices=["suffix", "exact", "substring"], default="suffix", help="suffix: entries covering the domain or a parent (default); exact: the domain itself; substring: any domain containing the text")
+    find_parser.add_argument("--sync", action="store_true", help="Re-download all list items before searching")
+    find_parser.set_defaults(handler=_cli_find_domain)
+    orphans_parser = subparsers.add_parser("orphans", help="Report (or delete) managed lists that no rule uses")
+    orphans_parser.add_argument("--delete", action="store_true", help="Delete the orphaned lists instead of only reporting them")
+    orphans_parser.set_defaults(handler=_cli_orphans)
+    verify_parser = subparsers.add_parser("verify", help="Find managed lists changed outside Gateway Guardian (downloads only lists whose metadata disagrees)")
+    verify_parser.add_argument("--deep", action="store_true", help="Download and compare every recorded list, not only suspicious ones")
+    verify_parser.add_argument("--repair", nargs="*", metavar="LIST", help="Restore drifted lists to what was last written (all, or only the named lists)")
+    verify_parser.add_argument("--json", action="store_true", help="Print the report as JSON on stdout")
+    verify_parser.set_defaults(handler=_cli_verify)
+    history_parser = subparsers.add_parser("history", help="Show the domain sets applied to rules over time (works offline), compare or roll back versions")
+    history_parser.add_argument("rule", nargs="?", help="Rule name (default: list rules with a history)")
+    history_parser.add_argument("--diff", nargs="+", type=int, metavar="VERSION", help="Domains changed by one version, or between two versions")
+    history_parser.add_argument("--export", type=int, metavar="VERSION", help="Print the domains of a version")
+    history_parser.add_argument("--domain", help="When a domain (or a parent domain) started or stopped being blocked, across all rules")
+    history_parser.add_argument("--rollback", type=int, metavar="VERSION", help="Apply a version to the rule again (needs API credentials)")
+    history_parser.set_defaults(handler=_cli_history)
+    profiles_parser = subparsers.add_parser("profiles", help="Manage the named accounts used by fan-out")
+    profiles_parser.add_argument("action", choices=["list", "add", "remove"])
+    profiles_parser.add_argument("name", nargs="?", help="Profile name")
+    profiles_parser.add_argument("profile_account_id", nargs="?", metavar="account_id", help="Account ID for add (default: --account-id)")
+    profiles_parser.set_defaults(handler=_cli_profiles)
+    fan_out_parser = subparsers.add_parser("fan-out", help="Apply or update one source as the same rule on several accounts at once")
+    fan_out_parser.add_argument("source", help="Blocklist URL or file")
+    fan_out_parser.add_argument("--prefix", required=True, help="List name prefix")
+    fan_out_parser.add_argument("--rule-name", required=True, help="Rule name; an existing rule with this name is updated")
+    fan_out_parser.add_argument("--profiles", help="Comma-separated profile names (default: all)")
+    fan_out_parser.add_argument("--layout", choices=["sorted", "buckets"], help="List layout for new rules; converts existing rules laid out differently (default: keep, sorted for new rules)")
+    fan_out_parser.set_defaults(handler=_cli_fan_out)
+    args = parser.parse_args(argv)
+    args.perf = PerfRecorder(args.command) if args.timings or args.trace else None
+    try: return args.handler(args)
+    except ConnectionError as e: print(f"Error: {e}", file=sys.stderr); return 2
+    finally:
+        if args.perf:
+            args.perf.finish()
+            if args.timings: print(args.perf.summary(), file=sys.stderr)
+            if args.trace: print(f"Trace written to {args.perf.export(args.trace)}", file=sys.stderr)
+if __name__ == '__main__':
+    if len(sys.argv) > 1: sys.exit(run_cli(sys.argv[1:]))
+    # wxPython is only needed from here on; the GUI module imports this one by name, so register it rather than load it twice
+    sys.modules.setdefault("gateway_guardian", sys.modules[__name__])
+    from gateway_guardian_gui import main
+    main()
@@ -0,0 +1,2385 @@
+import wx
+import wx.adv
+import wx.html
+import wx.lib.mixins.listctrl as listmix
+import bisect
+import contextlib
+import datetime
+import io
+import os
+import re
+import string
+import threading
+import time
+import traceback
+import uuid
+import requests
+from urllib.parse import urlparse
+from gateway_guardian import (APP_LAUNCH_TIME, APP_NAME, APP_VERSION, MAX_DOMAINS_PER_LIST, MAX_LISTS, TOTAL_DOMAIN_LIMIT,
+                              SOURCE_CACHE_ENABLED, COMPRESSED_SUFFIXES, SOURCE_READ_ERRORS, LIST_LAYOUT_BUCKETS, ORPHAN_GC_AUTO_DELETE,
+                              PERF_TRACE_EXPORT, LIST_UUID_PATTERN, APP_DATA_DIR, DOMAIN_INDEX_MAX_RESULTS, APP_ICON_URL, LOGIN_ICON_URL,
+                              ASSET_DIR, OperationCancelledError, CancelToken, app_data_path, ListDigest, open_blocklist_file, SourceCache,
+                              fetch_blocklist_url, PerfRecorder, CloudflareAPI, parse_blocklist_lines, build_list_reference_graph,
+                              find_orphaned_lists, BulkDeleteItem, BulkDeleter, RuleMetadataCodec, DomainIndex, AccountSnapshot,
+                              ListLedger, DriftReport, RuleHistory, OperationJournal, AccountOperator, AccountProfiles, fan_out_sync,
+                              open_blocklist_source, HAS_CHARDET)
+ID_TOOLBAR_LOAD_FILE = wx.NewIdRef()
+ID_TOOLBAR_LOAD_URL = wx.NewIdRef()
+ID_TOOLBAR_REFRESH = wx.NewIdRef()
+ID_TOOLBAR_APPLY = wx.NewIdRef()
+ID_TOOLBAR_EDIT = wx.NewIdRef()
+ID_TOOLBAR_UPDATE = wx.NewIdRef()
+ID_TOOLBAR_DELETE_RULE_LISTS = wx.NewIdRef()
+ID_TOOLBAR_CANCEL = wx.NewIdRef()
+ID_TOGGLE_LOG = wx.NewIdRef()
+ID_TOGGLE_STATUS_BAR = wx.NewIdRef()
+ID_LOAD_FILE = wx.NewIdRef()
+ID_LOAD_URL = wx.NewIdRef()
+ID_REFRESH = wx.NewIdRef()
+ID_APPLY = wx.NewIdRef()
+ID_UPDATE_RULE = wx.NewIdRef()
+ID_DELETE_RULE_LISTS = wx.NewIdRef()
+ID_CANCEL_OPERATION = wx.NewIdRef()
+ID_FIND_DOMAIN = wx.NewIdRef()
+ID_RESUME_OPERATION = wx.NewIdRef()
+ID_CLEAN_ORPHANS = wx.NewIdRef()
+ID_AUTO_CLEAN_ORPHANS = wx.NewIdRef()
+ID_TOGGLE_PERF_TRACE = wx.NewIdRef()
+ID_SAVE_PROFILE = wx.NewIdRef()
+ID_FAN_OUT = wx.NewIdRef()
+ID_BUCKET_LAYOUT = wx.NewIdRef()
+ID_VERIFY_LISTS = wx.NewIdRef()
+ID_RULE_HISTORY = wx.NewIdRef()
+class AppAssets:
+    """Logos and icons, read from the bundled logo/ folder or from a copy cached in the app data folder.
+
+    The UI thread never waits on the network: an asset missing locally is downloaded once on a background
+    thread, cached, and handed to a callback on the UI thread, so the window can paint without it."""
+    URLS = {"logo.png": APP_ICON_URL, "logo-full.png": LOGIN_ICON_URL}
+    sources = {}
+    @classmethod
+    def local_bytes(cls, name):
+        for origin, path in (("bundled", os.path.join(ASSET_DIR, name)), ("cached", os.path.join(APP_DATA_DIR, "assets", name))):
+            try:
+                with open(path, 'rb') as f: data = f.read()
+            except OSError: continue
+            cls.sources[name] = origin; return data
+        return None
+    @classmethod
+    def _fetch(cls, name, callback):
+        try:
+            response = requests.get(cls.URLS[name], timeout=10); response.raise_for_status()
+            path = app_data_path("assets", name); tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, 'wb') as f: f.write(response.content)
+            os.replace(tmp_path, path)
+            cls.sources[name] = "downloaded"
+            wx.CallAfter(callback, response.content)
+        except Exception as e: print(f"Error fetching {name}: {e}")
+    @classmethod
+    def load(cls, name, callback):
+        """Return the asset's bytes if they are on disk; otherwise return None and pass them to callback once downloaded"""
+        data = cls.local_bytes(name)
+        if data is None: threading.Thread(target=cls._fetch, args=(name, callback), daemon=True).start()
+        return data
+    @staticmethod
+    def bitmap(data, target_h=None):
+        """Decode image bytes into a bitmap, scaled to target_h pixels high (keeping the aspect ratio) when given"""
+        try: image = wx.Image(io.BytesIO(data))
+        except Exception as e: print(f"Error decoding image: {e}"); return None
+        if not image.IsOk(): print("Error: Failed to load image data into wx.Image."); return None
+        if target_h and image.GetHeight() != target_h: image.Rescale(max(1, int(image.GetWidth() * target_h / image.GetHeight())), target_h, wx.IMAGE_QUALITY_HIGH)
+        return image.ConvertToBitmap()
+    @classmethod
+    def icon(cls, data):
+        bitmap = cls.bitmap(data)
+        if not bitmap: return None
+        icon = wx.Icon(); icon.CopyFromBitmap(bitmap); return icon
+    @classmethod
+    def report_first_paint(cls, window, label, log=print):
+        """Log once how long after launch window was first painted, and where the icons shown so far came from"""
+        def on_paint(event):
+            event.Skip(); window.Unbind(wx.EVT_PAINT, handler=on_paint)
+            origins = ", ".join(f"{name} {origin}" for name, origin in sorted(cls.sources.items())) or "none loaded yet"
+            log(f"{label} first painted {(time.perf_counter() - APP_LAUNCH_TIME) * 1000:.0f} ms after launch (icons: {origins}).")
+        window.Bind(wx.EVT_PAINT, on_paint)
+class LoginDialog(wx.Dialog):
+    def __init__(self, parent):
+        super().__init__(parent, title="Cloudflare Zero Trust Login", style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
+        self.account_id, self.api_token = "", ""
+        panel = wx.Panel(self)
+        main_sizer = wx.BoxSizer(wx.VERTICAL)
+        # Icons come from logo/ (or the app data cache); a missing one is fetched in the background and filled in later
+        self.panel = panel
+        login_data = AppAssets.load("logo-full.png", self._set_login_bitmap)
+        self.login_icon_ctrl = wx.StaticBitmap(panel, wx.ID_ANY, wx.NullBitmap)
+        main_sizer.Add(self.login_icon_ctrl, 0, wx.ALIGN_CENTER | wx.TOP | wx.LEFT | wx.RIGHT, 15)
+        if login_data: self._set_login_bitmap(login_data, fit=False)
+        app_icon_data = AppAssets.load("logo.png", self._set_dialog_icon)
+        if app_icon_data: self._set_dialog_icon(app_icon_data)
+        AppAssets.report_first_paint(panel, "Login window")
+        grid_sizer = wx.FlexGridSizer(rows=2, cols=2, vgap=10, hgap=10)
+        grid_sizer.AddGrowableCol(1, 1)
+        lbl_account_id = wx.StaticText(panel, label="Account ID:")
+        self.txt_account_id = wx.TextCtrl(panel)
+        lbl_api_token = wx.StaticText(panel, label="API Token:")
+        self.txt_api_token = wx.TextCtrl(panel, style=wx.TE_PASSWORD)
+        grid_sizer.Add(lbl_account_id, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALIGN_RIGHT)
+        grid_sizer.Add(self.txt_account_id, 1, wx.EXPAND)
+        grid_sizer.Add(lbl_api_token, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALIGN_RIGHT)
+        grid_sizer.Add(self.txt_api_token, 1, wx.EXPAND)
+        main_sizer.Add(grid_sizer, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.TOP, 20)
+        main_sizer.Add(wx.StaticLine(panel), 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.TOP, 15)
+        main_sizer.AddSpacer(5)
+        btn_sizer = wx.StdDialogButtonSizer()
+        login_btn = wx.Button(panel, wx.ID_OK, "Login")
+        login_btn.SetDefault()
+        btn_sizer.AddButton(login_btn)
+        cancel_btn = wx.Button(panel, wx.ID_CANCEL)
+        btn_sizer.AddButton(cancel_btn)
+        btn_sizer.Realize()
+        main_sizer.Add(btn_sizer, 0, wx.ALIGN_CENTER | wx.TOP | wx.BOTTOM, 10)
+        panel.SetSizer(main_sizer)
+        self.Fit()
+        self.SetMinSize(wx.Size(400, 280))
+        self.CenterOnScreen()
+        self.Bind(wx.EVT_BUTTON, self.OnLogin, id=wx.ID_OK)
+    def _set_login_bitmap(self, data, fit=True):
+        if not self: return  # closed before a background download finished
+        bitmap = AppAssets.bitmap(data, 64)
+        if not bitmap: return
+        self.login_icon_ctrl.SetBitmap(bitmap)
+        if fit: self.panel.Layout(); self.Fit()
+    def _set_dialog_icon(self, data):
+        if not self: return
+        icon = AppAssets.icon(data)
+        if icon: self.SetIcon(icon)
+    def OnLogin(self, event):
+        acc_id, token = self.txt_account_id.GetValue().strip(), self.txt_api_token.GetValue().strip()
+        if not acc_id or not token:
+            wx.MessageBox("Please enter both Account ID and API Token.", "Input Required", wx.OK | wx.ICON_WARNING, self)
+            return
+        cursor = wx.BusyCursor()
+        try:
+            temp_api = CloudflareAPI(token, acc_id)
+            test_response = temp_api._request("GET", "/lists", params={"per_page": 1}, timeout=15)
+            if test_response and test_response.get("success"):
+                self.account_id, self.api_token = acc_id, token
+                self.EndModal(wx.ID_OK)
+            else:
+                wx.MessageBox("Login Failed: Invalid API response or credentials.", "Login Failed", wx.OK | wx.ICON_ERROR, self)
+        except ConnectionError as e:
+            err_msg = f"Login Failed: Connection error.\nCould not reach Cloudflare API.\nError: {e}"
+            title = "Connection Error"
+            if "Status: 401" in str(e) or "Status: 403" in str(e):
+                err_msg, title = "Login Failed: Invalid Credentials.\nPlease check your Account ID and API Token.", "Authentication Error"
+            elif "timed out" in str(e):
+                err_msg, title = f"Login Failed: Connection timed out.\nPlease check your network connection.\nError: {e}", "Timeout Error"
+            wx.MessageBox(err_msg, title, wx.OK | wx.ICON_ERROR, self)
+        except Exception as e:
+            wx.MessageBox(f"An unexpected error occurred during login:\n{e}", "Login Error", wx.OK | wx.ICON_ERROR, self)
+            traceback.print_exc()
+        finally:
+            if 'cursor' in locals() and cursor: del cursor
+class SortableListCtrl(wx.ListCtrl, listmix.ListCtrlAutoWidthMixin, listmix.ColumnSorterMixin):
+    def __init__(self, parent, id=wx.ID_ANY, *args, **kw):
+        wx.ListCtrl.__init__(self, parent, id, *args, **kw)
+        listmix.ListCtrlAutoWidthMixin.__init__(self)
+        self.itemDataMap = {}
+    def InitializeColumnSorter(self, numColumns):
+        try: listmix.ColumnSorterMixin.__init__(self, numColumns)
+        except Exception as e: print(f"Error initializing column sorter: {e}"); traceback.print_exc()
+    def GetListCtrl(self): return self
+    def SetItemDataMap(self, itemDataMap): self.itemDataMap = itemDataMap
+    def GetItemDataMap(self): return self.itemDataMap
+    def GetSortImages(self): return (-1, -1)
+class DomainVirtualListCtrl(wx.ListCtrl, listmix.ListCtrlAutoWidthMixin):
+    """Virtual list control that renders domains straight from a Python list, so thousands of rows cost nothing to display"""
+    def __init__(self, parent, id=wx.ID_ANY, *args, **kw):
+        wx.ListCtrl.__init__(self, parent, id, *args, **kw)
+        listmix.ListCtrlAutoWidthMixin.__init__(self)
+        self.InsertColumn(0, "Domain", width=500)
+        self.domains, self.added_domains = [], set()
+        self.attr_added = wx.ItemAttr(); self.attr_added.SetTextColour(wx.Colour(0, 128, 0))
+    def SetDomains(self, domains, added_domains=None):
+        self.domains = domains
+        self.added_domains = added_domains if added_domains is not None else set()
+        self.SetItemCount(len(domains))
+        self.Refresh()
+    def GetSelectedDomains(self):
+        selected, idx = [], self.GetFirstSelected()
+        while idx != -1:
+            if idx < len(self.domains): selected.append(self.domains[idx])
+            idx = self.GetNextSelected(idx)
+        return selected
+    def OnGetItemText(self, item, col): return self.domains[item] if item < len(self.domains) else ""
+    def OnGetItemAttr(self, item):
+        if item < len(self.domains) and self.domains[item] in self.added_domains: return self.attr_added
+        return None
+class ListEditDialog(wx.Dialog):
+    def __init__(self, parent, api_client, list_id, list_name):
+        super().__init__(parent, title=f"Edit List: {list_name}", size=(600, 500), style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
+        self.main_frame = parent
+        self.api_client = api_client
+        self.list_id = list_id
+        self.original_name = list_name
+        self.original_description = ""
+        self.original_domains = []
+        # Pending edits are tracked as a delta against the loaded list so a save only sends what changed
+        self.added_domains, self.removed_domains = set(), set()
+        self.current_domains = []
+        self.filter_text = ""
+        panel = wx.Panel(self)
+        main_sizer = wx.BoxSizer(wx.VERTICAL)
+        info_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        lbl_id = wx.StaticText(panel, label="ID:")
+        txt_id = wx.TextCtrl(panel, value=self.list_id, style=wx.TE_READONLY)
+        txt_id.SetForegroundColour(wx.SystemSettings.GetColour(wx.SYS_COLOUR_GRAYTEXT))
+        lbl_name = wx.StaticText(panel, label="Name:")
+        self.txt_name = wx.TextCtrl(panel, value=self.original_name)
+        info_sizer.Add(lbl_id, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        info_sizer.Add(txt_id, 1, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        info_sizer.Add(lbl_name, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        info_sizer.Add(self.txt_name, 2, wx.EXPAND)
+        main_sizer.Add(info_sizer, 0, wx.EXPAND | wx.ALL, 10)
+        search_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.search_ctrl = wx.SearchCtrl(panel, style=wx.TE_PROCESS_ENTER)
+        self.search_ctrl.ShowCancelButton(True)
+        self.search_ctrl.SetDescriptiveText("Filter domains")
+        self.lbl_count = wx.StaticText(panel, label="Loading...")
+        search_sizer.Add(self.search_ctrl, 1, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        search_sizer.Add(self.lbl_count, 0, wx.ALIGN_CENTER_VERTICAL)
+        main_sizer.Add(search_sizer, 0, wx.EXPAND | wx.LEFT | wx.RIGHT, 10)
+        self.list_domains = DomainVirtualListCtrl(panel, style=wx.LC_REPORT | wx.LC_VIRTUAL | wx.LC_VRULES | wx.BORDER_SUNKEN)
+        main_sizer.Add(self.list_domains, 1, wx.EXPAND | wx.ALL, 10)
+        edit_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.add_btn = wx.Button(panel, wx.ID_ADD, "Add Domains...")
+        self.remove_btn = wx.Button(panel, wx.ID_REMOVE, "Remove Selected")
+        self.lbl_changes = wx.StaticText(panel, label="")
+        edit_sizer.Add(self.add_btn, 0, wx.RIGHT, 5)
+        edit_sizer.Add(self.remove_btn, 0, wx.RIGHT, 10)
+        edit_sizer.Add(self.lbl_changes, 0, wx.ALIGN_CENTER_VERTICAL)
+        main_sizer.Add(edit_sizer, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 10)
+        btn_sizer = wx.StdDialogButtonSizer()
+        self.save_btn = wx.Button(panel, wx.ID_SAVE)
+        self.save_btn.SetDefault()
+        btn_sizer.AddButton(self.save_btn)
+        cancel_btn = wx.Button(panel, wx.ID_CANCEL)
+        btn_sizer.AddButton(cancel_btn)
+        btn_sizer.Realize()
+        main_sizer.Add(btn_sizer, 0, wx.ALIGN_CENTER | wx.BOTTOM, 10)
+        panel.SetSizer(main_sizer)
+        self.Bind(wx.EVT_BUTTON, self.OnSave, id=wx.ID_SAVE)
+        self.Bind(wx.EVT_BUTTON, self.OnAddDomains, id=wx.ID_ADD)
+        self.Bind(wx.EVT_BUTTON, self.OnRemoveSelected, id=wx.ID_REMOVE)
+        self.search_ctrl.Bind(wx.EVT_TEXT, self.OnFilterChanged)
+        self.search_ctrl.Bind(wx.EVT_SEARCHCTRL_CANCEL_BTN, self.OnFilterCleared)
+        self.Bind(wx.EVT_INIT_DIALOG, self.OnInit)
+        self.CenterOnParent()
+    def OnInit(self, event):
+        self.save_btn.Disable()
+        self.add_btn.Disable()
+        self.remove_btn.Disable()
+        wx.CallAfter(self.LoadListData)
+        event.Skip()
+    def LoadListData(self):
+        busy_cursor = wx.BusyCursor()
+        gauge = self.main_frame.progress_gauge
+        op_event = self.main_frame.operation_cancelled
+        wx.CallAfter(gauge.SetRange, 2)
+        wx.CallAfter(gauge.SetValue, 0)
+        wx.CallAfter(gauge.Show)
+        wx.CallAfter(self.main_frame.custom_status_bar.Layout)
+        wx.CallAfter(self.main_frame.UpdateStatusBar, "Loading List Data...")
+        wx.CallAfter(self.main_frame.EnableCancelButton, True)
+        thread = threading.Thread(target=self._LoadListDataWorker, args=(gauge, op_event))
+        thread.start()
+    def _LoadListDataWorker(self, gauge, op_event):
+        details_ok, items_ok = False, False
+        error_msg = ""
+        list_details, list_items_resp = None, None
+        try:
+            wx.CallAfter(gauge.SetValue, 0); wx.CallAfter(self.main_frame.UpdateStatusBar, "Fetching list details...")
+            self.main_frame._check_cancel_request(op_event)
+            list_details_resp = self.api_client.get_list_details(self.list_id)
+            if not list_details_resp or not list_details_resp.get("success"):
+                error_msg = f"Failed to fetch list details: {list_details_resp}"
+            else:
+                list_details = list_details_resp.get("result")
+                if list_details:
+                    self.original_description = list_details.get("description", "")
+                    details_ok = True
+                else: error_msg = "Failed to parse list details from API response."
+            if details_ok:
+                wx.CallAfter(gauge.SetValue, 1); wx.CallAfter(self.main_frame.UpdateStatusBar, "Fetching list items...")
+                self.main_frame._check_cancel_request(op_event)
+                list_items_resp = self.api_client.get_list_items(self.list_id)
+                if not list_items_resp or not list_items_resp.get("success"):
+                    error_msg = f"Failed to fetch list items: {list_items_resp}"
+                else:
+                    items_data = list_items_resp.get("result", [])
+                    self.original_domains = sorted(set(item.get("value") for item in items_data if item.get("value")))
+                    items_ok = True
+                    wx.CallAfter(gauge.SetValue, 2)
+        except OperationCancelledError:
+             wx.CallAfter(self.main_frame.LogMessage, "List data loading cancelled.", "orange")
+             wx.CallAfter(self.EndModal, wx.ID_CANCEL)
+             return
+        except Exception as e:
+            error_msg = f"An error occurred while loading list data:\n{e}"
+            traceback.print_exc()
+        finally:
+            wx.CallAfter(gauge.Hide)
+            wx.CallAfter(self.main_frame.custom_status_bar.Layout)
+            wx.CallAfter(gauge.SetValue, 0)
+            wx.CallAfter(self.main_frame.EnableCancelButton, False)
+            wx.CallAfter(self.main_frame.UpdateStatusBar, "Ready")
+            if details_ok and items_ok:
+                wx.CallAfter(self._OnDomainsLoaded)
+            elif not op_event.is_set():
+                wx.CallAfter(wx.MessageBox, f"Error loading list data:\n{error_msg}", "Error", wx.OK | wx.ICON_ERROR, self)
+                wx.CallAfter(self.EndModal, wx.ID_CANCEL)
+            if 'busy_cursor' in locals(): del busy_cursor
+    def _OnDomainsLoaded(self):
+        self.current_domains = list(self.original_domains)
+        self._RefreshDomainView()
+        self.save_btn.Enable()
+        self.add_btn.Enable()
+        self.remove_btn.Enable()
+    def _RefreshDomainView(self):
+        if self.filter_text:
+            visible = [d for d in self.current_domains if self.filter_text in d]
+            self.lbl_count.SetLabel(f"{len(visible):,} of {len(self.current_domains):,} domains")
+        else:
+            visible = self.current_domains
+            self.lbl_count.SetLabel(f"{len(self.current_domains):,} domains")
+        self.list_domains.SetDomains(visible, self.added_domains)
+        changes = []
+        if self.added_domains: changes.append(f"+{len(self.added_domains):,} added")
+        if self.removed_domains: changes.append(f"-{len(self.removed_domains):,} removed")
+        self.lbl_changes.SetLabel(", ".join(changes) if changes else "No pending changes")
+        self.lbl_count.GetParent().Layout()
+    def OnFilterChanged(self, event):
+        self.filter_text = self.search_ctrl.GetValue().strip().lower()
+        self._RefreshDomainView()
+    def OnFilterCleared(self, event):
+        self.search_ctrl.SetValue("")
+    def OnAddDomains(self, event):
+        dlg = wx.TextEntryDialog(self, "Enter domains to add (one per line):", "Add Domains", style=wx.TE_MULTILINE | wx.OK | wx.CANCEL)
+        try:
+            if dlg.ShowModal() != wx.ID_OK: return
+            new_domains = set(line.strip().lower() for line in dlg.GetValue().splitlines() if line.strip())
+        finally: dlg.Destroy()
+        current_set = set(self.current_domains)
+        for domain in new_domains - current_set:
+            if domain in self.removed_domains: self.removed_domains.discard(domain)
+            else: self.added_domains.add(domain)
+            bisect.insort(self.current_domains, domain)
+        self._RefreshDomainView()
+    def OnRemoveSelected(self, event):
+        selected = self.list_domains.GetSelectedDomains()
+        if not selected: return
+        for domain in selected:
+            if domain in self.added_domains: self.added_domains.discard(domain)
+            else: self.removed_domains.add(domain)
+        selected_set = set(selected)
+        self.current_domains = [d for d in self.current_domains if d not in selected_set]
+        self.list_domains.SetItemState(-1, 0, wx.LIST_STATE_SELECTED)
+        self._RefreshDomainView()
+    def OnSave(self, event):
+        new_name = self.txt_name.GetValue().strip()
+        if not new_name:
+            wx.MessageBox("List name cannot be empty.", "Validation Error", wx.OK | wx.ICON_WARNING, self)
+            self.txt_name.SetFocus()
+            return
+        if len(self.current_domains) > MAX_DOMAINS_PER_LIST:
+            wx.MessageBox(f"Error: Number of domains ({len(self.current_domains)}) exceeds the maximum limit of {MAX_DOMAINS_PER_LIST} per list.", "Limit Exceeded", wx.OK | wx.ICON_ERROR, self)
+            return
+        name_changed = (new_name != self.original_name)
+        domains_to_append, domains_to_remove = sorted(self.added_domains), sorted(self.removed_domains)
+        domains_changed = bool(domains_to_append or domains_to_remove)
+        if not name_changed and not domains_changed:
+            self.EndModal(wx.ID_CANCEL)
+            return
+        busy_cursor = wx.BusyCursor()
+        self.save_btn.Disable()
+        gauge = self.main_frame.progress_gauge
+        op_event = self.main_frame.operation_cancelled
+        wx.CallAfter(gauge.SetRange, int(domains_changed) + int(name_changed))
+        wx.CallAfter(gauge.SetValue, 0)
+        wx.CallAfter(gauge.Show)
+        wx.CallAfter(self.main_frame.custom_status_bar.Layout)
+        wx.CallAfter(self.main_frame.UpdateStatusBar, "Saving List...")
+        wx.CallAfter(self.main_frame.EnableCancelButton, True)
+        thread = threading.Thread(target=self._SaveListDataWorker, args=(new_name, domains_to_append, domains_to_remove, name_changed, gauge, op_event))
+        thread.start()
+    def _SaveListDataWorker(self, new_name, domains_to_append, domains_to_remove, name_changed, gauge, op_event):
+        success = False
+        error_msg = ""
+        try:
+            self.main_frame._check_cancel_request(op_event)
+            response, progress = {"success": True}, 0
+            if domains_to_append or domains_to_remove:
+                wx.CallAfter(self.main_frame.UpdateStatusBar, f"Updating list items (+{len(domains_to_append)}/-{len(domains_to_remove)})...")
+                response = self.api_client.patch_list_items(self.list_id, append=domains_to_append, remove=domains_to_remove)
+                progress += 1; wx.CallAfter(gauge.SetValue, progress)
+                self.main_frame._check_cancel_request(op_event)
+            # A shareable list's digest must keep matching its items
+            new_description = ListDigest.describe(self.original_description, self.current_domains) if (domains_to_append or domains_to_remove) and ListDigest.read(self.original_description) else None
+            if (name_changed or new_description) and response and response.get("success"):
+                wx.CallAfter(self.main_frame.UpdateStatusBar, f"Renaming list to '{new_name}' (PATCH)..." if name_changed else "Updating list digest (PATCH)...")
+                response = self.api_client.patch_list(self.list_id, name=new_name if name_changed else None, description=new_description)
+                progress += 1; wx.CallAfter(gauge.SetValue, progress)
+                self.main_frame._check_cancel_request(op_event)
+            if response and response.get("success"):
+                success = True
+                wx.CallAfter(self.main_frame.LogMessage, f"List '{new_name}' saved: {len(domains_to_append)} domain(s) added, {len(domains_to_remove)} removed.")
+                # Edits made here are intended, so Verify Lists checks against them from now on
+                try: ListLedger.record(self.api_client.account_id, self.list_id, new_name, self.current_domains, ListLedger.stamp(response))
+                except (OSError, ValueError) as e: wx.CallAfter(self.main_frame.LogMessage, f"Could not record list '{new_name}' for drift checks: {e}", "orange")
+            else:
+                error_msg = f"API call failed: {response}"
+        except OperationCancelledError:
+             wx.CallAfter(self.main_frame.LogMessage, "List saving cancelled.", "orange")
+             success = False
+        except Exception as e:
+            error_msg = f"An error occurred while saving:\n{e}"
+            traceback.print_exc()
+        finally:
+            wx.CallAfter(gauge.Hide)
+            wx.CallAfter(self.main_frame.custom_status_bar.Layout)
+            wx.CallAfter(gauge.SetValue, 0)
+            wx.CallAfter(self.main_frame.EnableCancelButton, False)
+            wx.CallAfter(self.main_frame.UpdateStatusBar, "Ready")
+            wx.CallAfter(self.save_btn.Enable)
+            if 'busy_cursor' in locals(): del busy_cursor
+            if success:
+                wx.CallAfter(self.EndModal, wx.ID_OK)
+            elif not op_event.is_set():
+                wx.CallAfter(wx.MessageBox, f"Failed to save list:\n{error_msg}", "Error", wx.OK | wx.ICON_ERROR, self)
+class RuleEditDialog(wx.Dialog):
+    def __init__(self, parent, api_client, rule_id, rule_name, rule_enabled, rule_description):
+        super().__init__(parent, title=f"Edit Rule: {rule_name}", size=(500, 400), style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
+        self.main_frame = parent
+        self.api_client = api_client
+        self.rule_id = rule_id
+        self.original_name = rule_name
+        self.original_enabled = rule_enabled
+        self.original_description = rule_description
+        panel = wx.Panel(self)
+        main_sizer = wx.BoxSizer(wx.VERTICAL)
+        grid_sizer = wx.FlexGridSizer(rows=4, cols=2, vgap=10, hgap=10)
+        grid_sizer.AddGrowableCol(1, 1)
+        grid_sizer.AddGrowableRow(3, 1)
+        lbl_id = wx.StaticText(panel, label="ID:")
+        txt_id = wx.TextCtrl(panel, value=self.rule_id, style=wx.TE_READONLY)
+        txt_id.SetForegroundColour(wx.SystemSettings.GetColour(wx.SYS_COLOUR_GRAYTEXT))
+        lbl_name = wx.StaticText(panel, label="Name:")
+        self.txt_name = wx.TextCtrl(panel, value=self.original_name)
+        lbl_enabled = wx.StaticText(panel, label="Enabled:")
+        self.chk_enabled = wx.CheckBox(panel)
+        self.chk_enabled.SetValue(self.original_enabled)
+        lbl_desc = wx.StaticText(panel, label="Description:")
+        self.txt_desc = wx.TextCtrl(panel, value=self.original_description, style=wx.TE_MULTILINE)
+        grid_sizer.Add(lbl_id, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALIGN_RIGHT)
+        grid_sizer.Add(txt_id, 1, wx.EXPAND)
+        grid_sizer.Add(lbl_name, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALIGN_RIGHT)
+        grid_sizer.Add(self.txt_name, 1, wx.EXPAND)
+        enabled_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        enabled_sizer.Add(self.chk_enabled, 0, wx.ALIGN_CENTER_VERTICAL)
+        grid_sizer.Add(lbl_enabled, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALIGN_RIGHT)
+        grid_sizer.Add(enabled_sizer, 0)
+        grid_sizer.Add(lbl_desc, 0, wx.ALIGN_TOP | wx.ALIGN_RIGHT | wx.TOP, 5)
+        grid_sizer.Add(self.txt_desc, 1, wx.EXPAND | wx.ALL, 0)
+        main_sizer.Add(grid_sizer, 1, wx.EXPAND | wx.ALL, 10)
+        btn_sizer = wx.StdDialogButtonSizer()
+        self.save_btn = wx.Button(panel, wx.ID_SAVE)
+        self.save_btn.SetDefault()
+        btn_sizer.AddButton(self.save_btn)
+        cancel_btn = wx.Button(panel, wx.ID_CANCEL)
+        btn_sizer.AddButton(cancel_btn)
+        btn_sizer.Realize()
+        main_sizer.Add(btn_sizer, 0, wx.ALIGN_CENTER | wx.BOTTOM, 10)
+        panel.SetSizer(main_sizer)
+        self.Bind(wx.EVT_BUTTON, self.OnSave, id=wx.ID_SAVE)
+        self.CenterOnParent()
+    def OnSave(self, event):
+        new_name = self.txt_name.GetValue().strip()
+        new_enabled = self.chk_enabled.GetValue()
+        new_description = self.txt_desc.GetValue()
+        if not new_name:
+            wx.MessageBox("Rule name cannot be empty.", "Validation Error", wx.OK | wx.ICON_WARNING, self)
+            self.txt_name.SetFocus()
+            return
+        name_changed = (new_name != self.original_name)
+        enabled_changed = (new_enabled != self.original_enabled)
+        desc_changed = (new_description != self.original_description)
+        if not name_changed and not enabled_changed and not desc_changed:
+            self.EndModal(wx.ID_CANCEL)
+            return
+        payload = {}
+        if name_changed: payload["name"] = new_name
+        if enabled_changed: payload["enabled"] = new_enabled
+        if desc_changed: payload["description"] = new_description
+        busy_cursor = wx.BusyCursor()
+        self.save_btn.Disable()
+        gauge = self.main_frame.progress_gauge
+        op_event = self.main_frame.operation_cancelled
+        wx.CallAfter(gauge.Pulse)
+        wx.CallAfter(gauge.Show)
+        wx.CallAfter(self.main_frame.custom_status_bar.Layout)
+        wx.CallAfter(self.main_frame.UpdateStatusBar, "Saving Rule...")
+        wx.CallAfter(self.main_frame.EnableCancelButton, True)
+        thread = threading.Thread(target=self._SaveRuleDataWorker, args=(payload, gauge, op_event))
+        thread.start()
+    def _SaveRuleDataWorker(self, payload, gauge, op_event):
+        success = False
+        error_msg = ""
+        try:
+            self.main_frame._check_cancel_request(op_event)
+            response = self.api_client.patch_rule(self.rule_id, **payload)
+            self.main_frame._check_cancel_request(op_event)
+            if response and response.get("success"):
+                success = True
+            else:
+                error_msg = f"API call failed: {response}"
+        except OperationCancelledError:
+             wx.CallAfter(self.main_frame.LogMessage, "Rule saving cancelled.", "orange")
+             success = False
+        except Exception as e:
+            error_msg = f"An error occurred while saving:\n{e}"
+            traceback.print_exc()
+        finally:
+            wx.CallAfter(gauge.Hide)
+            wx.CallAfter(self.main_frame.custom_status_bar.Layout)
+            wx.CallAfter(gauge.SetValue, 0)
+            wx.CallAfter(self.main_frame.EnableCancelButton, False)
+            wx.CallAfter(self.main_frame.UpdateStatusBar, "Ready")
+            wx.CallAfter(self.save_btn.Enable)
+            if 'busy_cursor' in locals(): del busy_cursor
+            if success:
+                wx.CallAfter(self.EndModal, wx.ID_OK)
+            elif not op_event.is_set():
+                wx.CallAfter(wx.MessageBox, f"Failed to save rule:\n{error_msg}", "Error", wx.OK | wx.ICON_ERROR, self)
+class DomainSearchDialog(wx.Dialog):
+    SEARCH_MODES = [("Covers (domain or parent)", "suffix"), ("Exact match", "exact"), ("Contains text", "substring")]
+    def __init__(self, parent, api_client):
+        super().__init__(parent, title="Find Domain", size=(760, 480), style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
+        self.main_frame = parent
+        self.api_client = api_client
+        self.index = None
+        panel = wx.Panel(self)
+        main_sizer = wx.BoxSizer(wx.VERTICAL)
+        query_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.search_ctrl = wx.SearchCtrl(panel, style=wx.TE_PROCESS_ENTER)
+        self.search_ctrl.SetDescriptiveText("Domain, e.g. ads.example.com")
+        self.choice_mode = wx.Choice(panel, choices=[label for label, _ in self.SEARCH_MODES])
+        self.choice_mode.SetSelection(0)
+        self.sync_btn = wx.Button(panel, label="Sync Index")
+        query_sizer.Add(self.search_ctrl, 1, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        query_sizer.Add(self.choice_mode, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        query_sizer.Add(self.sync_btn, 0, wx.ALIGN_CENTER_VERTICAL)
+        main_sizer.Add(query_sizer, 0, wx.EXPAND | wx.ALL, 10)
+        self.lbl_index = wx.StaticText(panel, label="Index: not loaded", style=wx.ST_ELLIPSIZE_END)
+        main_sizer.Add(self.lbl_index, 0, wx.EXPAND | wx.LEFT | wx.RIGHT, 10)
+        self.list_results = wx.ListCtrl(panel, style=wx.LC_REPORT | wx.LC_VRULES | wx.BORDER_SUNKEN)
+        self.list_results.InsertColumn(0, "Domain", width=250)
+        self.list_results.InsertColumn(1, "List", width=220)
+        self.list_results.InsertColumn(2, "Rule(s)", width=240)
+        main_sizer.Add(self.list_results, 1, wx.EXPAND | wx.ALL, 10)
+        self.lbl_results = wx.StaticText(panel, label="")
+        main_sizer.Add(self.lbl_results, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 10)
+        btn_sizer = wx.StdDialogButtonSizer()
+        close_btn = wx.Button(panel, wx.ID_CANCEL, "Close")
+        btn_sizer.AddButton(close_btn)
+        btn_sizer.Realize()
+        main_sizer.Add(btn_sizer, 0, wx.ALIGN_CENTER | wx.BOTTOM, 10)
+        panel.SetSizer(main_sizer)
+        self.search_ctrl.Bind(wx.EVT_TEXT, self.OnSearch)
+        self.search_ctrl.Bind(wx.EVT_TEXT_ENTER, self.OnSearch)
+        self.choice_mode.Bind(wx.EVT_CHOICE, self.OnSearch)
+        self.sync_btn.Bind(wx.EVT_BUTTON, self.OnSync)
+        self.CenterOnParent()
+        self._LoadSavedIndex()
+    def _LoadSavedIndex(self):
+        try: self.index = DomainIndex.load(self.api_client.account_id)
+        except Exception as e: self.main_frame.LogMessage(f"Could not load saved domain index: {e}", "orange"); self.index = None
+        self._UpdateIndexLabel()
+        if self.index is None: self.lbl_index.SetLabel("Index: not synced yet. Click 'Sync Index' to download all list items.")
+    def _UpdateIndexLabel(self):
+        if self.index: self.lbl_index.SetLabel(f"Index: {self.index.domain_count:,} domains across {len(self.index.lists):,} lists (synced {self.index.synced_at}).")
+    def OnSearch(self, event):
+        query = self.search_ctrl.GetValue().strip()
+        self.list_results.DeleteAllItems()
+        if not query or not self.index: self.lbl_results.SetLabel(""); return
+        mode = self.SEARCH_MODES[self.choice_mode.GetSelection()][1]
+        start = time.perf_counter()
+        rows = self.index.search(query, mode)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.list_results.Freeze()
+        try:
+            for row_num, (domain, list_id, list_name, rule_names) in enumerate(rows[:DOMAIN_INDEX_MAX_RESULTS]):
+                idx = self.list_results.InsertItem(row_num, domain)
+                self.list_results.SetItem(idx, 1, list_name or list_id)
+                self.list_results.SetItem(idx, 2, ", ".join(rule_names) if rule_names else "(not used by any rule)")
+        finally: self.list_results.Thaw()
+        self.lbl_results.SetLabel(f"{len(rows):,} match(es) in {elapsed_ms:.1f} ms")
+    def OnSync(self, event):
+        self.sync_btn.Disable()
+        gauge = self.main_frame.progress_gauge
+        op_event = self.main_frame.operation_cancelled
+        op_event.clear()
+        wx.CallAfter(gauge.SetRange, 1)
+        wx.CallAfter(gauge.SetValue, 0)
+        wx.CallAfter(gauge.Show)
+        wx.CallAfter(self.main_frame.custom_status_bar.Layout)
+        wx.CallAfter(self.main_frame.UpdateStatusBar, "Syncing domain index...")
+        wx.CallAfter(self.main_frame.EnableCancelButton, True)
+        thread = threading.Thread(target=self._SyncWorker, args=(gauge, op_event))
+        thread.start()
+    def _SyncWorker(self, gauge, op_event):
+        new_index, error_msg = None, ""
+        def progress(done, total, list_name):
+            def task():
+                if gauge: gauge.SetRange(max(1, total)); gauge.SetValue(done)
+                self.main_frame.UpdateStatusBar(f"Indexing list {done}/{total}: {list_name}")
+            wx.CallAfter(task)
+        try:
+            new_index = DomainIndex.sync(self.api_client, op_event, progress)
+            new_index.save()
+            wx.CallAfter(self.main_frame.LogMessage, f"Domain index synced: {new_index.domain_count:,} domains across {len(new_index.lists):,} lists.", "green")
+        except OperationCancelledError:
+            wx.CallAfter(self.main_frame.LogMessage, "Domain index sync cancelled.", "orange")
+        except Exception as e:
+            error_msg = f"Failed to sync domain index:\n{e}"
+            traceback.print_exc()
+        finally:
+            wx.CallAfter(gauge.Hide)
+            wx.CallAfter(self.main_frame.custom_status_bar.Layout)
+            wx.CallAfter(gauge.SetValue, 0)
+            wx.CallAfter(self.main_frame.EnableCancelButton, False)
+            wx.CallAfter(self.main_frame.UpdateStatusBar, "Ready")
+            wx.CallAfter(self._OnSyncFinished, new_index, error_msg)
+    def _OnSyncFinished(self, new_index, error_msg):
+        self.sync_btn.Enable()
+        if new_index: self.index = new_index; self._UpdateIndexLabel(); self.OnSearch(None)
+        elif error_msg: wx.MessageBox(error_msg, "Error", wx.OK | wx.ICON_ERROR, self)
+class RuleHistoryDialog(wx.Dialog):
+    """Versions of one rule's domain set: select a version to see what it changed (or two to compare them),
+    look up since when a domain is blocked, or pick a version to roll back to (rollback_version after ID_OK)"""
+    def __init__(self, parent, history):
+        super().__init__(parent, title=f"History of '{history.rule_name}'", size=(760, 600), style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
+        self.history, self.rollback_version = history, None
+        self.records = list(reversed(history.records))
+        panel = wx.Panel(self)
+        main_sizer = wx.BoxSizer(wx.VERTICAL)
+        self.list_versions = wx.ListCtrl(panel, style=wx.LC_REPORT | wx.LC_VRULES | wx.BORDER_SUNKEN)
+        for col, (label, width) in enumerate((("Version", 70), ("Applied", 160), ("Domains", 90), ("Added", 80), ("Removed", 80), ("Source", 250))): self.list_versions.InsertColumn(col, label, width=width)
+        for row, record in enumerate(self.records):
+            idx = self.list_versions.InsertItem(row, f"v{record['version']}")
+            added, removed = (len(record["added"]), len(record["removed"])) if "added" in record else ("", "")
+            note = record.get("source_url") or "(file)"
+            if record.get("same_as"): note = f"same as v{record['same_as']} - {note}"
+            for col, value in enumerate((record.get("time", "").replace("T", " "), f"{record.get('count', 0):,}", f"{added:,}" if added != "" else "-", f"{removed:,}" if removed != "" else "-", note), start=1): self.list_versions.SetItem(idx, col, value)
+        main_sizer.Add(self.list_versions, 1, wx.EXPAND | wx.ALL, 10)
+        self.lbl_changes = wx.StaticText(panel, label="Select a version to see its changes, or two versions to compare them.")
+        main_sizer.Add(self.lbl_changes, 0, wx.EXPAND | wx.LEFT | wx.RIGHT, 10)
+        self.list_changes = DomainVirtualListCtrl(panel, style=wx.LC_REPORT | wx.LC_VIRTUAL | wx.LC_VRULES | wx.BORDER_SUNKEN)
+        main_sizer.Add(self.list_changes, 1, wx.EXPAND | wx.ALL, 10)
+        find_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.search_ctrl = wx.SearchCtrl(panel, style=wx.TE_PROCESS_ENTER)
+        self.search_ctrl.SetDescriptiveText("Since when is this domain blocked? e.g. ads.example.com")
+        self.lbl_since = wx.StaticText(panel, label="", style=wx.ST_ELLIPSIZE_END)
+        find_sizer.Add(self.search_ctrl, 1, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        find_sizer.Add(self.lbl_since, 1, wx.ALIGN_CENTER_VERTICAL)
+        main_sizer.Add(find_sizer, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 10)
+        btn_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.rollback_btn = wx.Button(panel, label="&Roll Back to Selected Version...")
+        self.rollback_btn.Disable()
+        close_btn = wx.Button(panel, wx.ID_CANCEL, "Close")
+        btn_sizer.Add(self.rollback_btn, 0, wx.RIGHT, 10)
+        btn_sizer.Add(close_btn, 0)
+        main_sizer.Add(btn_sizer, 0, wx.ALIGN_CENTER | wx.BOTTOM, 10)
+        panel.SetSizer(main_sizer)
+        self.list_versions.Bind(wx.EVT_LIST_ITEM_SELECTED, self.OnSelectionChanged)
+        self.list_versions.Bind(wx.EVT_LIST_ITEM_DESELECTED, self.OnSelectionChanged)
+        self.search_ctrl.Bind(wx.EVT_TEXT_ENTER, self.OnFindDomain)
+        self.search_ctrl.Bind(wx.EVT_SEARCHCTRL_SEARCH_BTN, self.OnFindDomain)
+        self.rollback_btn.Bind(wx.EVT_BUTTON, self.OnRollback)
+        self.CenterOnParent()
+    def _selected_records(self):
+        selected, idx = [], self.list_versions.GetFirstSelected()
+        while idx != -1: selected.append(self.records[idx]); idx = self.list_versions.GetNextSelected(idx)
+        return sorted(selected, key=lambda record: record["version"])
+    def OnSelectionChanged(self, event):
+        selected = self._selected_records()
+        self.rollback_btn.Enable(len(selected) == 1 and selected[0] is not self.history.latest)
+        if len(selected) == 1: (added, removed), label = self.history.changes(selected[0]["version"]), f"Changes made by v{selected[0]['version']}"
+        elif len(selected) == 2: (added, removed), label = self.history.diff(selected[0]["version"], selected[1]["version"]), f"Changes from v{selected[0]['version']} to v{selected[1]['version']}"
+        else: self.list_changes.SetDomains([]); self.lbl_changes.SetLabel("Select a version to see its changes, or two versions to compare them."); return
+        rows = [f"+ {domain}" for domain in added] + [f"- {domain}" for domain in removed]
+        self.list_changes.SetDomains(rows, set(rows[:len(added)]))
+        self.lbl_changes.SetLabel(f"{label}: {len(added):,} added (green), {len(removed):,} removed.")
+    def OnFindDomain(self, event):
+        query = self.search_ctrl.GetValue().strip().lower().strip('.')
+        if not query: self.lbl_since.SetLabel(""); return
+        labels, found = query.split('.'), []
+        # A list entry also blocks its subdomains, so parents of the query count too
+        for i in range(max(1, len(labels) - 1)):
+            events = self.history.domain_events('.'.join(labels[i:]))
+            if events: found.append(('.'.join(labels[i:]), events))
+        if not found: self.lbl_since.SetLabel(f"'{query}' was never blocked by this rule."); return
+        parts = []
+        for entry, events in found:
+            record, change = events[-1]
+            parts.append(f"'{entry}' blocked since v{record['version']} ({record.get('time', '?').replace('T', ' ')})" if change == "added" else f"'{entry}' unblocked in v{record['version']} ({record.get('time', '?').replace('T', ' ')})")
+        self.lbl_since.SetLabel("; ".join(parts))
+    def OnRollback(self, event):
+        selected = self._selected_records()
+        if len(selected) != 1: return
+        record = selected[0]
+        msg = (f"Apply version {record['version']} ({record.get('count', 0):,} domains, {record.get('time', '?').replace('T', ' ')}) to rule '{self.history.rule_name}'?\n\n"
+               "The rule's lists are updated to exactly that domain set; it is saved as a new version, so this can be undone the same way.")
+        if wx.MessageBox(msg, "Roll Back Rule", wx.YES_NO | wx.ICON_QUESTION | wx.NO_DEFAULT, self) != wx.YES: return
+        self.rollback_version = record["version"]
+        self.EndModal(wx.ID_OK)
+class MainFrame(wx.Frame):
+    def __init__(self, parent, account_id, api_token):
+        super().__init__(parent, title=f"{APP_NAME} v{APP_VERSION}", size=(940, 550))
+        self.account_id, self.api_token = account_id, api_token
+        self.api_client = None
+        try: self.api_client = CloudflareAPI(self.api_token, self.account_id)
+        except Exception as e: wx.MessageBox(f"Failed to initialize Cloudflare API client:\n{e}", "Initialization Error", wx.OK | wx.ICON_ERROR, self); self.Close(); return
+        self.api_client.on_abandoned_settled = lambda: wx.CallAfter(self._on_abandoned_requests_settled)
+        icon_data = AppAssets.load("logo.png", self._set_app_icon)
+        if icon_data: self._set_app_icon(icon_data)
+        self.adblock_filepath, self.adblock_url = None, None
+        self.txt_list_prefix, self.txt_rule_name = None, None
+        self.list_ctrl_lists, self.list_ctrl_rules = None, None
+        self.log_ctrl = None
+        self.log_menu_item = None
+        self.status_bar_menu_item = None
+        self.notebook = None
+        self.splitter = None
+        self.main_panel, self.bottom_panel = None, None
+        self.lbl_source_display = None
+        self.custom_status_bar = None
+        self.status_text = None
+        self.progress_gauge = None
+        self.log_visible = False
+        self.status_bar_visible = True
+        self.operation_cancelled = CancelToken()
+        self.auto_clean_orphans, self._orphan_gc_attempted = ORPHAN_GC_AUTO_DELETE, set()
+        self.bucket_layout = LIST_LAYOUT_BUCKETS
+        self.source_cache = SourceCache() if SOURCE_CACHE_ENABLED else None
+        self.perf_trace_export = PERF_TRACE_EXPORT
+        self.list_item_data_lists, self.list_item_data_rules = {}, {}
+        self.snapshot, self._snapshot_lock = AccountSnapshot(self.account_id), threading.Lock()
+        self.toolbar_apply_item = None
+        self.InitUI()
+        self.InitMenu()
+        self._update_log_visibility()
+        self._update_status_bar_visibility()
+        self._update_management_button_states()
+        AppAssets.report_first_paint(self.main_panel, "Main window", lambda msg: self.LogMessage(msg, "grey"))
+        self._show_cached_snapshot()
+        self.Center(); self.Show()
+        wx.CallAfter(self.OnRefresh)
+        wx.CallAfter(self._check_pending_journals)
+    def _set_app_icon(self, data):
+        if not self: return
+        icon = AppAssets.icon(data)
+        if icon: self.SetIcon(icon)
+    def _show_cached_snapshot(self):
+        """Fill the tables from the last saved snapshot of this account, greyed out until the first refresh replaces them"""
+        try: snapshot = AccountSnapshot.load(self.account_id)
+        except (OSError, ValueError) as e: self.LogMessage(f"Could not read the cached account snapshot: {e}", "orange"); return
+        if not snapshot: return
+        self.snapshot = snapshot
+        self._populate_list_ctrl(snapshot.lists, snapshot.rules)
+        self._mark_tables_stale()
+        self.LogMessage(f"Showing {len(snapshot.rules)} rules and {len(snapshot.lists)} lists cached at {snapshot.saved_at} while refreshing.", "grey")
+    def _mark_tables_stale(self):
+        """Grey out the current rows; they keep working for selection until a refresh repopulates the tables"""
+        stale_colour = wx.Colour(128, 128, 128)
+        for ctrl in (self.list_ctrl_lists, self.list_ctrl_rules):
+            if not ctrl: continue
+            for i in range(ctrl.GetItemCount()): ctrl.SetItemTextColour(i, stale_colour)
+        if self.snapshot.saved_at: self.UpdateStatusBar(f"Showing cached data from {self.snapshot.saved_at}")
+    def _save_snapshot(self):
+        with self._snapshot_lock:
+            try: self.snapshot.save()
+            except OSError as e: wx.CallAfter(self.LogMessage, f"Could not save the account snapshot: {e}", "orange")
+    def InitToolBar(self):
+        toolbar = self.CreateToolBar(wx.TB_HORIZONTAL | wx.TB_FLAT | wx.TB_TEXT)
+        tsize = (24, 24)
+        toolbar.SetToolBitmapSize(tsize)
+        load_file_bmp = wx.ArtProvider.GetBitmap(wx.ART_FILE_OPEN, wx.ART_TOOLBAR, tsize)
+        load_url_bmp = wx.ArtProvider.GetBitmap(wx.ART_NEW_DIR, wx.ART_TOOLBAR, tsize)
+        refresh_bmp = wx.ArtProvider.GetBitmap(wx.ART_REDO, wx.ART_TOOLBAR, tsize)
+        apply_bmp = wx.ArtProvider.GetBitmap(wx.ART_TICK_MARK, wx.ART_TOOLBAR, tsize)
+        edit_bmp = wx.ArtProvider.GetBitmap(wx.ART_EDIT, wx.ART_TOOLBAR, tsize)
+        update_bmp = wx.ArtProvider.GetBitmap(wx.ART_EXECUTABLE_FILE, wx.ART_TOOLBAR, tsize)
+        delete_lists_bmp = wx.ArtProvider.GetBitmap(wx.ART_DELETE, wx.ART_TOOLBAR, tsize)
+        cancel_bmp = wx.ArtProvider.GetBitmap(wx.ART_CROSS_MARK, wx.ART_TOOLBAR, tsize)
+        toolbar.AddTool(ID_TOOLBAR_LOAD_FILE, "Load File", load_file_bmp, "Load adblock list from a local file")
+        toolbar.AddTool(ID_TOOLBAR_LOAD_URL, "Load URL", load_url_bmp, "Load adblock list from a URL")
+        toolbar.AddSeparator()
+        toolbar.AddTool(ID_TOOLBAR_REFRESH, "Refresh", refresh_bmp, "Refresh Gateway Lists and Rules")
+        toolbar.AddStretchableSpace()
+        toolbar.AddTool(ID_TOOLBAR_APPLY, "Apply Config", apply_bmp, "Apply the loaded adblock configuration")
+        toolbar.AddTool(ID_TOOLBAR_EDIT, "Edit Item", edit_bmp, "Edit Selected List or Rule")
+        toolbar.AddTool(ID_TOOLBAR_UPDATE, "Update Rule", update_bmp, "Update Selected Rule from Source URL")
+        toolbar.AddTool(ID_TOOLBAR_DELETE_RULE_LISTS, "Delete Rule", delete_lists_bmp, "Delete Selected Rule(s) and Associated Lists")
+        toolbar.AddSeparator()
+        toolbar.AddTool(ID_TOOLBAR_CANCEL, "Cancel", cancel_bmp, "Cancel the current background operation")
+        toolbar.EnableTool(ID_TOOLBAR_APPLY, False)
+        toolbar.EnableTool(ID_TOOLBAR_EDIT, False)
+        toolbar.EnableTool(ID_TOOLBAR_UPDATE, False)
+        toolbar.EnableTool(ID_TOOLBAR_DELETE_RULE_LISTS, False)
+        toolbar.EnableTool(ID_TOOLBAR_CANCEL, False)
+        toolbar.Realize()
+        self.Bind(wx.EVT_TOOL, self.OnLoadFromFile, id=ID_TOOLBAR_LOAD_FILE)
+        self.Bind(wx.EVT_TOOL, self.OnLoadFromURL, id=ID_TOOLBAR_LOAD_URL)
+        self.Bind(wx.EVT_TOOL, self.OnRefresh, id=ID_TOOLBAR_REFRESH)
+        self.Bind(wx.EVT_TOOL, self.OnApplyAdblock, id=ID_TOOLBAR_APPLY)
+        self.Bind(wx.EVT_TOOL, self.OnEditItem, id=ID_TOOLBAR_EDIT)
+        self.Bind(wx.EVT_TOOL, self.OnUpdateSelectedRule, id=ID_TOOLBAR_UPDATE)
+        self.Bind(wx.EVT_TOOL, self.OnDeleteRuleAndLists, id=ID_TOOLBAR_DELETE_RULE_LISTS)
+        self.Bind(wx.EVT_TOOL, self.OnCancelOperation, id=ID_TOOLBAR_CANCEL)
+    def InitMenu(self):
+        menu_bar = wx.MenuBar()
+        file_menu = wx.Menu()
+        file_menu.Append(ID_LOAD_FILE, "&Load from File...\tCtrl+O", "Load adblock list from a local file")
+        file_menu.Append(ID_LOAD_URL, "Load from &URL...\tCtrl+U", "Load adblock list from a URL")
+        file_menu.Append(ID_REFRESH, "&Refresh Lists/Rules\tF5", "Refresh the lists and rules from Cloudflare")
+        file_menu.AppendSeparator()
+        file_menu.Append(wx.ID_EXIT, "&Exit\tCtrl+Q", "Exit the application")
+        menu_bar.Append(file_menu, "&File")
+        edit_menu = wx.Menu()
+        edit_menu.Append(ID_TOOLBAR_EDIT, "&Edit Selected Item\tCtrl+E", "Edit the selected list or rule")
+        edit_menu.AppendSeparator()
+        edit_menu.Append(ID_FIND_DOMAIN, "&Find Domain...\tCtrl+F", "Find which lists and rules block a domain")
+        menu_bar.Append(edit_menu, "&Edit")
+        actions_menu = wx.Menu()
+        actions_menu.Append(ID_APPLY, "&Apply Adblock Configuration\tCtrl+A", "Apply the loaded adblock list and create lists/rule")
+        actions_menu.Append(ID_UPDATE_RULE, "Update Selected &Rule from Source\tCtrl+R", "Update the selected rule and its lists from its source URL")
+        actions_menu.AppendSeparator()
+        actions_menu.Append(ID_DELETE_RULE_LISTS, "Delete R&ule\tCtrl+D", "Delete selected rule(s) and their associated lists")
+        actions_menu.AppendSeparator()
+        actions_menu.Append(ID_RESUME_OPERATION, "Re&sume Interrupted Operation...", "Resume an apply or update that was interrupted")
+        actions_menu.Append(ID_CLEAN_ORPHANS, "Clean Up &Orphaned Lists...", "Find and delete managed lists that no rule uses")
+        actions_menu.Append(ID_RULE_HISTORY, "Rule &History...", "Browse the domain sets applied to a rule over time, compare versions and roll back")
+        actions_menu.Append(ID_VERIFY_LISTS, "&Verify Lists...", "Find managed lists whose domains were changed outside the app and optionally restore them")
+        actions_menu.AppendSeparator()
+        actions_menu.Append(ID_SAVE_PROFILE, "Save Account as &Profile...", "Remember this account for applying lists to several accounts")
+        actions_menu.Append(ID_FAN_OUT, "Apply to Pro&files...", "Apply or update the loaded source as the same rule on several saved accounts at once")
+        self.auto_clean_orphans_item = actions_menu.AppendCheckItem(ID_AUTO_CLEAN_ORPHANS, "Delete Orphaned Lists After &Refresh", "Automatically delete managed lists that no rule uses after each refresh")
+        self.auto_clean_orphans_item.Check(self.auto_clean_orphans)
+        self.bucket_layout_item = actions_menu.AppendCheckItem(ID_BUCKET_LAYOUT, "Stable &Bucket Layout for New Rules", "Place domains in lists by hash, so later updates only rewrite the lists whose domains changed")
+        self.bucket_layout_item.Check(self.bucket_layout)
+        actions_menu.AppendSeparator()
+        actions_menu.Append(ID_CANCEL_OPERATION, "&Cancel Current Operation\tEsc", "Cancel the ongoing background task")
+        menu_bar.Append(actions_menu, "&Actions")
+        view_menu = wx.Menu()
+        self.log_menu_item = view_menu.AppendCheckItem(ID_TOGGLE_LOG, "Show Status &Log\tCtrl+L", "Show/Hide Status Log")
+        self.log_menu_item.Check(self.log_visible)
+        self.perf_trace_item = view_menu.AppendCheckItem(ID_TOGGLE_PERF_TRACE, "Save Performance &Traces", "Write each operation's timings as a trace file to the app data folder")
+        self.perf_trace_item.Check(self.perf_trace_export)
+        menu_bar.Append(view_menu, "&View")
+        help_menu = wx.Menu()
+        help_menu.Append(wx.ID_ABOUT, "&About\tF1", f"About {APP_NAME}")
+        menu_bar.Append(help_menu, "&Help")
+        self.SetMenuBar(menu_bar)
+        self.Bind(wx.EVT_MENU, self.OnLoadFromFile, id=ID_LOAD_FILE)
+        self.Bind(wx.EVT_MENU, self.OnLoadFromURL, id=ID_LOAD_URL)
+        self.Bind(wx.EVT_MENU, self.OnRefresh, id=ID_REFRESH)
+        self.Bind(wx.EVT_MENU, self.OnExit, id=wx.ID_EXIT)
+        self.Bind(wx.EVT_MENU, self.OnEditItem, id=ID_TOOLBAR_EDIT)
+        self.Bind(wx.EVT_MENU, self.OnFindDomain, id=ID_FIND_DOMAIN)
+        self.Bind(wx.EVT_MENU, self.OnApplyAdblock, id=ID_APPLY)
+        self.Bind(wx.EVT_MENU, self.OnUpdateSelectedRule, id=ID_UPDATE_RULE)
+        self.Bind(wx.EVT_MENU, self.OnDeleteRuleAndLists, id=ID_DELETE_RULE_LISTS)
+        self.Bind(wx.EVT_MENU, self.OnCancelOperation, id=ID_CANCEL_OPERATION)
+        self.Bind(wx.EVT_MENU, self.OnResumeOperation, id=ID_RESUME_OPERATION)
+        self.Bind(wx.EVT_MENU, self.OnCleanOrphans, id=ID_CLEAN_ORPHANS)
+        self.Bind(wx.EVT_MENU, self.OnVerifyLists, id=ID_VERIFY_LISTS)
+        self.Bind(wx.EVT_MENU, self.OnRuleHistory, id=ID_RULE_HISTORY)
+        self.Bind(wx.EVT_MENU, self.OnSaveProfile, id=ID_SAVE_PROFILE)
+        self.Bind(wx.EVT_MENU, self.OnFanOut, id=ID_FAN_OUT)
+        self.Bind(wx.EVT_MENU, self.OnToggleAutoCleanOrphans, id=ID_AUTO_CLEAN_ORPHANS)
+        self.Bind(wx.EVT_MENU, self.OnToggleBucketLayout, id=ID_BUCKET_LAYOUT)
+        self.Bind(wx.EVT_MENU, self.OnToggleLog, id=ID_TOGGLE_LOG)
+        self.Bind(wx.EVT_MENU, self.OnTogglePerfTrace, id=ID_TOGGLE_PERF_TRACE)
+        self.Bind(wx.EVT_MENU, self.OnAbout, id=wx.ID_ABOUT)
+        menu_bar.Enable(ID_CANCEL_OPERATION, False)
+    def InitUI(self):
+        self.InitToolBar()
+        base_panel = wx.Panel(self)
+        outer_sizer = wx.BoxSizer(wx.VERTICAL)
+        self.splitter = wx.SplitterWindow(base_panel, style=wx.SP_LIVE_UPDATE | wx.SP_BORDER | wx.SP_3DSASH)
+        self.splitter.SetSashGravity(0.8)
+        self.splitter.SetMinimumPaneSize(150)
+        self.main_panel = self._CreateMainPanel(self.splitter)
+        self.bottom_panel = self._CreateBottomPanel(self.splitter)
+        self.splitter.SplitHorizontally(self.main_panel, self.bottom_panel)
+        outer_sizer.Add(self.splitter, 1, wx.EXPAND | wx.ALL, 0)
+        self.custom_status_bar = wx.Panel(base_panel, style=wx.BORDER_SUNKEN)
+        status_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.status_text = wx.StaticText(self.custom_status_bar, label="Ready", style=wx.ST_ELLIPSIZE_END)
+        self.progress_gauge = wx.Gauge(self.custom_status_bar, range=100, size=(150, 15), style=wx.GA_HORIZONTAL | wx.GA_SMOOTH)
+        self.progress_gauge.Hide()
+        status_sizer.Add(self.status_text, 1, wx.ALIGN_CENTER_VERTICAL | wx.LEFT | wx.RIGHT, 5)
+        status_sizer.Add(self.progress_gauge, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        self.custom_status_bar.SetSizer(status_sizer)
+        outer_sizer.Add(self.custom_status_bar, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 2)
+        base_panel.SetSizer(outer_sizer)
+        self.Layout()
+        self.LogMessage(f"Application UI Initialized ({APP_NAME} v{APP_VERSION}).")
+    def _CreateMainPanel(self, parent):
+        panel = wx.Panel(parent, style=wx.BORDER_NONE)
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        config_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.lbl_source_display = wx.StaticText(panel, label="Source: None", style=wx.ST_ELLIPSIZE_END)
+        lbl_list_prefix = wx.StaticText(panel, label="List Prefix:")
+        self.txt_list_prefix = wx.TextCtrl(panel, value="", size=(180,-1))
+        lbl_rule_name = wx.StaticText(panel, label="Rule Name:")
+        self.txt_rule_name = wx.TextCtrl(panel, value="", size=(180,-1))
+        self.txt_list_prefix.Bind(wx.EVT_TEXT, self.OnNamingOptionsChanged)
+        self.txt_rule_name.Bind(wx.EVT_TEXT, self.OnNamingOptionsChanged)
+        config_sizer.Add(self.lbl_source_display, 1, wx.LEFT | wx.RIGHT | wx.EXPAND, 10)
+        config_sizer.Add(lbl_list_prefix, 0, wx.ALIGN_CENTER_VERTICAL | wx.LEFT, 5)
+        config_sizer.Add(self.txt_list_prefix, 0, wx.ALIGN_CENTER_VERTICAL | wx.LEFT | wx.RIGHT, 5)
+        config_sizer.Add(lbl_rule_name, 0, wx.ALIGN_CENTER_VERTICAL | wx.LEFT, 5)
+        config_sizer.Add(self.txt_rule_name, 0, wx.ALIGN_CENTER_VERTICAL | wx.LEFT | wx.RIGHT, 10)
+        sizer.Add(config_sizer, 0, wx.EXPAND | wx.TOP | wx.BOTTOM, 10)
+        self.notebook = wx.Notebook(panel, style=wx.BK_DEFAULT)
+        rule_panel = self._CreateRulesPanel(self.notebook)
+        list_panel = self._CreateListsPanel(self.notebook)
+        self.notebook.AddPage(rule_panel, " Gateway Rules ")
+        self.notebook.AddPage(list_panel, " Gateway Lists ")
+        sizer.Add(self.notebook, 1, wx.EXPAND | wx.ALL, 5)
+        panel.SetSizer(sizer)
+        return panel
+    def _CreateListsPanel(self, parent_notebook):
+        panel = wx.Panel(parent_notebook)
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        list_style = wx.LC_REPORT | wx.LC_VRULES | wx.BORDER_SUNKEN | wx.LC_SORT_ASCENDING | wx.LC_SINGLE_SEL
+        self.list_ctrl_lists = SortableListCtrl(panel, style=list_style)
+        self.list_ctrl_lists.InsertColumn(0, "Name", width=350)
+        self.list_ctrl_lists.InsertColumn(1, "ID", width=300)
+        self.list_ctrl_lists.InsertColumn(2, "Item Count", width=120, format=wx.LIST_FORMAT_RIGHT)
+        self.list_ctrl_lists.Bind(wx.EVT_LIST_ITEM_SELECTED, self.OnListItemSelected)
+        self.list_ctrl_lists.Bind(wx.EVT_LIST_ITEM_DESELECTED, self.OnListItemDeselected)
+        self.list_ctrl_lists.Bind(wx.EVT_LIST_KEY_DOWN, self.OnListKeyDown)
+        self.list_ctrl_lists.InitializeColumnSorter(3)
+        sizer.Add(self.list_ctrl_lists, 1, wx.EXPAND | wx.ALL, 0)
+        panel.SetSizer(sizer)
+        return panel
+    def _CreateRulesPanel(self, parent_notebook):
+        panel = wx.Panel(parent_notebook)
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        list_style = wx.LC_REPORT | wx.LC_VRULES | wx.BORDER_SUNKEN | wx.LC_SORT_ASCENDING | wx.LC_SINGLE_SEL
+        self.list_ctrl_rules = SortableListCtrl(panel, style=list_style)
+        self.list_ctrl_rules.InsertColumn(0, "Name", width=300)
+        self.list_ctrl_rules.InsertColumn(1, "ID", width=250)
+        self.list_ctrl_rules.InsertColumn(2, "Enabled", width=80, format=wx.LIST_FORMAT_CENTER)
+        self.list_ctrl_rules.InsertColumn(3, "Source Type", width=100, format=wx.LIST_FORMAT_CENTER)
+        self.list_ctrl_rules.InsertColumn(4, "Update Status", width=120, format=wx.LIST_FORMAT_CENTER)
+        self.list_ctrl_rules.Bind(wx.EVT_LIST_ITEM_SELECTED, self.OnListItemSelected)
+        self.list_ctrl_rules.Bind(wx.EVT_LIST_ITEM_DESELECTED, self.OnListItemDeselected)
+        self.list_ctrl_rules.Bind(wx.EVT_LIST_KEY_DOWN, self.OnListKeyDown)
+        self.list_ctrl_rules.InitializeColumnSorter(5)
+        sizer.Add(self.list_ctrl_rules, 1, wx.EXPAND | wx.ALL, 0)
+        panel.SetSizer(sizer)
+        return panel
+    def _CreateBottomPanel(self, parent):
+        panel = wx.Panel(parent, style=wx.BORDER_SUNKEN)
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        log_label = wx.StaticText(panel, label=" Status Log:")
+        sizer.Add(log_label, 0, wx.LEFT | wx.TOP, 5)
+        self.log_ctrl = wx.TextCtrl(panel, style=wx.TE_MULTILINE | wx.TE_READONLY | wx.TE_RICH2 | wx.TE_DONTWRAP | wx.BORDER_NONE)
+        self.log_ctrl.SetMinSize(wx.Size(-1, 100))
+        sizer.Add(self.log_ctrl, 1, wx.EXPAND | wx.ALL, 5)
+        panel.SetSizer(sizer)
+        return panel
+    def OnExit(self, event):
+        self.operation_cancelled.set()
+        self.Close()
+    def OnAbout(self, event):
+        try:
+            # Create a custom about dialog instead of using wx.adv.AboutBox
+            about_dlg = wx.Dialog(self, title=f"About {APP_NAME}", size=(395, 370))
+            panel = wx.Panel(about_dlg)
+            sizer = wx.BoxSizer(wx.VERTICAL)
+            
+            # Logo (bundled or cached; if neither exists yet the dialog opens without it and it is downloaded for next time)
+            logo_data = AppAssets.load("logo.png", lambda data: None)
+            bitmap = AppAssets.bitmap(logo_data, 64) if logo_data else None
+            if bitmap:
+                logo = wx.StaticBitmap(panel, -1, bitmap)
+                sizer.Add(logo, 0, wx.ALIGN_CENTER | wx.ALL, 10)
+            
+            # App info
+            app_name = wx.StaticText(panel, -1, f"{APP_NAME} v{APP_VERSION}")
+            font = app_name.GetFont()
+            font.SetPointSize(font.GetPointSize() + 2)
+            font.SetWeight(wx.FONTWEIGHT_BOLD)
+            app_name.SetFont(font)
+            sizer.Add(app_name, 0, wx.ALIGN_CENTER | wx.ALL, 5)
+            
+            desc = wx.StaticText(panel, -1, f"Manage Cloudflare Zero Trust Gateway lists and rules for adblocking.")
+            sizer.Add(desc, 0, wx.ALIGN_CENTER | wx.ALL, 5)
+            
+            not_affiliated = wx.StaticText(panel, -1, f"({APP_NAME} is not affiliated with Cloudflare, Inc.)")
+            font = not_affiliated.GetFont()
+            font.SetPointSize(font.GetPointSize() - 1)
+            font.SetStyle(wx.FONTSTYLE_ITALIC)
+            not_affiliated.SetFont(font)
+            sizer.Add(not_affiliated, 0, wx.ALIGN_CENTER | wx.ALL, 5)
+            
+            copyright_text = wx.StaticText(panel, -1, f"{datetime.date.today().year}")
+            sizer.Add(copyright_text, 0, wx.ALIGN_CENTER | wx.TOP | wx.BOTTOM, 10)
+            
+            # GitHub link
+            github_link = wx.adv.HyperlinkCtrl(panel, -1, "Visit on GitHub", "https://github.com/john-holt4/Gateway-Gaurdian")
+            sizer.Add(github_link, 0, wx.ALIGN_CENTER | wx.BOTTOM, 15)
+            
+            # Add a donate button
+            donate_btn = wx.Button(panel, -1, "☕ Buy me a coffee")
+            donate_btn.Bind(wx.EVT_BUTTON, self.OnDonateButton)
+            sizer.Add(donate_btn, 0, wx.ALIGN_CENTER | wx.ALL, 10)
+            
+            # Add a close handler
+            about_dlg.Bind(wx.EVT_CLOSE, lambda e: about_dlg.EndModal(wx.ID_OK))
+            
+            panel.SetSizer(sizer)
+            about_dlg.Layout()
+            about_dlg.Center()
+            about_dlg.ShowModal()
+            about_dlg.Destroy()
+        except Exception as e:
+            wx.MessageBox(f"Error displaying About dialog: {e}", "Error", wx.OK | wx.ICON_ERROR)
+            
+    def OnDonateButton(self, event):
+        # Launch PayPal donate URL in default browser
+        paypal_url = "https://www.paypal.com/donate/?business=243S6YP5USR38&no_recurring=0&item_name=Support+the+development+of+Gateway+Gaurdian&currency_code=USD"
+        import webbrowser
+        try:
+            webbrowser.open(paypal_url)
+        except Exception as e:
+            wx.MessageBox(f"Error opening donation page: {e}", "Error", wx.OK | wx.ICON_ERROR)
+    def OnToggleLog(self, event):
+        self.log_visible = event.IsChecked()
+        self._update_log_visibility()
+    def OnTogglePerfTrace(self, event):
+        self.perf_trace_export = event.IsChecked()
+        self.LogMessage(f"Performance traces {'will be saved to ' + os.path.join(APP_DATA_DIR, 'traces') if self.perf_trace_export else 'disabled'}.")
+    def OnToggleStatusBar(self, event):
+        self.status_bar_visible = event.IsChecked()
+        self._update_status_bar_visibility()
+    def _update_log_visibility(self):
+        if not all(hasattr(self, attr) and getattr(self, attr) for attr in ['splitter', 'bottom_panel', 'main_panel']):
+            print("Warning: Splitter/panels not ready during log visibility update.")
+            return
+        if self.log_visible:
+            self.bottom_panel.Show()
+            if not self.splitter.IsSplit():
+                try:
+                    h = self.splitter.GetClientSize().height
+                    s = self.splitter.GetSashSize()
+                    m = self.splitter.GetMinimumPaneSize()
+                    p = int(h * self.splitter.GetSashGravity())
+                    p = max(m, p)
+                    p = min(h - m - s, p)
+                    if p >= m and h > (2 * m + s):
+                        self.splitter.SplitHorizontally(self.main_panel, self.bottom_panel, p)
+                    else:
+                        self.splitter.SplitHorizontally(self.main_panel, self.bottom_panel)
+                except Exception as e:
+                    print(f"Error re-splitting window: {e}")
+                    traceback.print_exc()
+                    if not self.splitter.IsSplit():
+                        try: self.splitter.SplitHorizontally(self.main_panel, self.bottom_panel)
+                        except Exception as split_err: print(f"Error during fallback split: {split_err}")
+        else:
+            if self.splitter.IsSplit(): self.splitter.Unsplit(self.bottom_panel)
+            self.bottom_panel.Hide()
+        self.Layout()
+        if hasattr(self, 'log_menu_item') and self.log_menu_item:
+            self.log_menu_item.Check(self.log_visible)
+    def _update_status_bar_visibility(self):
+        if self.custom_status_bar:
+            self.custom_status_bar.Show(True)  # Always show status bar
+            self.Layout()
+    def _source_cache_note(self, line_source):
+        """(message, colour) describing where a URL source came from, or None when it was not cached"""
+        status, age = line_source.cache_status, line_source.cache_age or 0
+        age_text = f"{age / 3600:.1f} h" if age >= 3600 else f"{age / 60:.0f} min"
+        if status == "fresh": return f"Using cached copy of the source ({age_text} old).", "grey"
+        if status == "revalidated": return "Source unchanged upstream (304 Not Modified); using cached copy.", "grey"
+        if status == "stale": return f"Source unreachable upstream; using cached copy from {age_text} ago.", "orange"
+        if status == "miss": return f"Downloaded source saved to the local cache ({line_source.size:,} bytes).", "grey"
+        return None
+    def _content_size_hash(self, content_size, content_lines):
+        if not content_size: return None
+        hash_value = f"{content_size}"  # Simple size-based hash
+        self.LogMessage(f"Content size: {content_size} bytes, {content_lines} lines", "grey")
+        return hash_value
+    
+    def _check_update_status(self, rule_description, source_url):
+        """Check if a rule needs updating based on content size"""
+        if not source_url:
+            return "No source URL"
+            
+        self.LogMessage(f"Checking updates for URL: {source_url}", "grey")
+        stored_hash = RuleMetadataCodec.decode(rule_description).content_hash
+        
+        if not stored_hash:
+            return "No hash data"
+            
+        try:
+            self.LogMessage(f"Fetching content from {source_url}...", "grey")
+            # Read the source the same way the update itself does (decompressing if needed), so the sizes being compared agree
+            try: line_source = fetch_blocklist_url(source_url, timeout=30, cache=self.source_cache)
+            except requests.exceptions.HTTPError: return "Check failed"
+            note = self._source_cache_note(line_source)
+            if note: self.LogMessage(*note)
+            # A stale copy says nothing about the upstream's current content
+            if line_source.cache_status == "stale": return "Check failed"
+            
+            # Calculate current hash (which is just the content size)
+            current_hash = self._content_size_hash(*line_source.measure())
+            
+            # Convert both to strings for comparison
+            if not isinstance(stored_hash, str):
+                stored_hash = str(stored_hash)
+            if not isinstance(current_hash, str):
+                current_hash = str(current_hash)
+                
+            # Better logging to understand what's being compared
+            self.LogMessage(f"Comparing stored hash '{stored_hash}' (type: {type(stored_hash).__name__}) with current hash '{current_hash}' (type: {type(current_hash).__name__})", "grey")
+            
+            # Compare hashes
+            if stored_hash == current_hash:
+                self.LogMessage(f"Hashes match: {stored_hash} == {current_hash}", "green")
+                return "Up to date"
+            else:
+                self.LogMessage(f"Hashes don't match: {stored_hash} != {current_hash}", "orange") 
+                return "Update available"
+        except Exception as e:
+            self.LogMessage(f"Update check failed: {e}", "red")
+            return "Check failed"
+    
+    def sanitize_filename(self, filename):
+        if not filename: return "default_name"
+        base = os.path.basename(filename)
+        if base.lower().endswith(COMPRESSED_SUFFIXES): base = os.path.splitext(base)[0]
+        base = os.path.splitext(base)[0]
+        sanitized = re.sub(r'[\s\-.]+', '_', base)
+        valid_chars = string.ascii_letters + string.digits + "_"
+        sanitized = ''.join(c for c in sanitized if c in valid_chars)
+        sanitized = sanitized.strip('_')[:50]
+        return sanitized if sanitized else "default_name"
+    def _sanitize_url_for_name(self, url):
+        if not url: return "default_name"
+        try:
+            parsed = urlparse(url)
+            base = parsed.netloc.split(':')[0]
+            sanitized = re.sub(r'[\-.]+', '_', base)
+            valid_chars = string.ascii_letters + string.digits + "_"
+            sanitized = ''.join(c for c in sanitized if c in valid_chars)
+            sanitized = sanitized.strip('_')[:50]
+            return sanitized if sanitized else "default_name_from_url"
+        except Exception as e:
+            print(f"Error parsing URL for sanitization: {e}")
+            return "url_parse_error"
+    def OnLoadFromFile(self, event):
+        style = wx.FD_OPEN | wx.FD_FILE_MUST_EXIST
+        wildcard = "Blocklists (*.txt;*.gz;*.xz;*.bz2;*.zip)|*.txt;*.gz;*.xz;*.bz2;*.zip|Text files (*.txt)|*.txt|All files (*.*)|*.*"
+        with wx.FileDialog(self, "Open Adblock List File", wildcard=wildcard, style=style) as fileDialog:
+            if fileDialog.ShowModal() == wx.ID_CANCEL: return
+            self.adblock_filepath, self.adblock_url = fileDialog.GetPath(), None
+            display_name = os.path.basename(self.adblock_filepath)
+            self.lbl_source_display.SetLabel(f"Source: File - {display_name}")
+            self.LogMessage(f"Selected adblock list file: {self.adblock_filepath}")
+            self.UpdateStatusBar(f"Loaded file: {display_name}")
+            sanitized_name = self.sanitize_filename(display_name)
+            suggested_prefix, suggested_rule = f"{sanitized_name}_list_", f"{sanitized_name}_rule"
+            self.txt_list_prefix.SetValue(suggested_prefix)
+            self.txt_rule_name.SetValue(suggested_rule)
+            self.LogMessage(f"Auto-populated naming options: Prefix='{suggested_prefix}', Rule='{suggested_rule}'")
+            self._update_apply_button_state()
+            self.Layout()
+            self.main_panel.Layout()
+    def OnLoadFromURL(self, event):
+        dlg = wx.TextEntryDialog(self, "Enter the URL for the adblock list:", "Load from URL")
+        if dlg.ShowModal() == wx.ID_OK:
+            url = dlg.GetValue().strip()
+            if url:
+                self.adblock_url, self.adblock_filepath = url, None
+                self.lbl_source_display.SetLabel(f"Source: URL - {url}")
+                self.LogMessage(f"Selected adblock list URL: {url}")
+                self.UpdateStatusBar(f"Loaded URL source")
+                sanitized_name = ""
+                try:
+                    parsed_url = urlparse(url)
+                    url_filename = os.path.basename(parsed_url.path)
+                    if url_filename:
+                        sanitized_name = self.sanitize_filename(url_filename)
+                        self.LogMessage(f"Using filename '{url_filename}' from URL for auto-naming.")
+                    else:
+                        self.LogMessage("No filename found in URL path, using domain for auto-naming.", "grey")
+                        sanitized_name = self._sanitize_url_for_name(url)
+                except Exception as e:
+                    self.LogMessage(f"Error parsing URL filename, falling back to domain: {e}", "orange")
+                    sanitized_name = self._sanitize_url_for_name(url)
+                suggested_prefix, suggested_rule = f"{sanitized_name}_list_", f"{sanitized_name}_rule"
+                self.txt_list_prefix.SetValue(suggested_prefix)
+                self.txt_rule_name.SetValue(suggested_rule)
+                self.LogMessage(f"Auto-populated naming options: Prefix='{suggested_prefix}', Rule='{suggested_rule}'")
+                self._update_apply_button_state()
+                self.Layout()
+                self.main_panel.Layout()
+            else:
+                self.ShowInfo("No URL entered.")
+                self.UpdateStatusBar("URL load cancelled.")
+        dlg.Destroy()
+    def OnNamingOptionsChanged(self, event):
+        self._update_apply_button_state()
+        event.Skip()
+    def _update_apply_button_state(self):
+        toolbar = self.GetToolBar()
+        if not toolbar: return
+        has_source = bool(self.adblock_filepath or self.adblock_url)
+        has_prefix = bool(self.txt_list_prefix.GetValue().strip())
+        has_rule_name = bool(self.txt_rule_name.GetValue().strip())
+        enable_apply = has_source and has_prefix and has_rule_name
+        toolbar.EnableTool(ID_TOOLBAR_APPLY, enable_apply)
+        mb = self.GetMenuBar()
+        if mb: mb.Enable(ID_APPLY, enable_apply)
+    def OnListItemSelected(self, event):
+        self._update_management_button_states()
+        event.Skip()
+    def OnListItemDeselected(self, event):
+        wx.CallAfter(self._update_management_button_states)
+        event.Skip()
+        
+    def OnListKeyDown(self, event):
+        """Handle key events on list controls"""
+        key_code = event.GetKeyCode()
+        
+        # Block Ctrl+A in the list control to prevent "select all" behavior
+        if key_code == ord('A') and (wx.GetKeyState(wx.WXK_CONTROL) or event.ControlDown()):
+            # Don't call event.Skip() - this blocks the event from propagating
+            # This allows the menu accelerator to handle Ctrl+A instead
+            return
+        
+        # Let other key events continue
+        event.Skip()
+    def OnEditItem(self, event):
+        active_list_ctrl, active_data_map = self._get_active_list_ctrl()
+        if not active_list_ctrl or active_list_ctrl.GetSelectedItemCount() != 1:
+            self.UpdateStatusBar("Select a single item to edit.")
+            return
+        index = active_list_ctrl.GetFirstSelected()
+        if index == -1: return
+        item_data_key = active_list_ctrl.GetItemData(index)
+        item_data = active_data_map.get(item_data_key)
+        if not item_data:
+            self.ShowError("Could not retrieve data for the selected item.")
+            return
+        item_type = None
+        if isinstance(item_data, tuple):
+            item_type = item_data[0]
+        elif isinstance(item_data, dict):
+            item_type = item_data.get('type')
+        if item_type == 'list':
+            list_id = item_data[1] if isinstance(item_data, tuple) else item_data.get('id')
+            list_name = active_list_ctrl.GetItemText(index)
+            self.LogMessage(f"Opening edit dialog for list: {list_name} ({list_id})")
+            self.UpdateStatusBar(f"Editing list: {list_name}")
+            try: sharing_rules = [rule.get("name", rule.get("id")) for rule in build_list_reference_graph(self.api_client.get_rules()).get(list_id, [])]
+            except Exception as e: sharing_rules = []; self.LogMessage(f"Could not check which rules use list '{list_name}': {e}", "orange")
+            if len(sharing_rules) > 1 and wx.MessageBox(f"List '{list_name}' is shared by {len(sharing_rules)} rules:\n\n" + "\n".join(f"- {name}" for name in sharing_rules) + "\n\nChanges will apply to all of them. Edit it anyway?", "Shared List", wx.YES_NO | wx.ICON_WARNING | wx.NO_DEFAULT, self) != wx.YES:
+                self.UpdateStatusBar("List edit cancelled."); return
+            dlg = ListEditDialog(self, self.api_client, list_id, list_name)
+            result = dlg.ShowModal()
+            if result == wx.ID_OK:
+                self.LogMessage(f"List '{list_name}' updated successfully.")
+                self.UpdateStatusBar(f"List updated.")
+                self.OnRefresh()
+            else:
+                self.LogMessage(f"Editing cancelled for list: {list_name}")
+                self.UpdateStatusBar("List edit cancelled.")
+            dlg.Destroy()
+        elif item_type == 'rule':
+            rule_id = item_data.get('id')
+            rule_name = item_data.get('name')
+            rule_enabled = item_data.get('enabled')
+            full_desc = ""
+            try:
+                details_resp = self.api_client.get_rule_details(rule_id)
+                if details_resp and details_resp.get("success"):
+                    full_desc = details_resp.get("result", {}).get("description", "")
+                else:
+                    self.LogMessage(f"Warning: Could not fetch full description for rule {rule_name}", "orange")
+            except Exception as e:
+                 self.LogMessage(f"Warning: Error fetching full description for rule {rule_name}: {e}", "orange")
+            self.LogMessage(f"Opening edit dialog for rule: {rule_name} ({rule_id})")
+            self.UpdateStatusBar(f"Editing rule: {rule_name}")
+            dlg = RuleEditDialog(self, self.api_client, rule_id, rule_name, rule_enabled, full_desc)
+            result = dlg.ShowModal()
+            if result == wx.ID_OK:
+                self.LogMessage(f"Rule '{rule_name}' updated successfully.")
+                self.UpdateStatusBar(f"Rule updated.")
+                self.OnRefresh()
+            else:
+                self.LogMessage(f"Editing cancelled for rule: {rule_name}")
+                self.UpdateStatusBar("Rule edit cancelled.")
+            dlg.Destroy()
+        else:
+            self.ShowError(f"Cannot edit item of unknown type: {item_type}")
+    def OnFindDomain(self, event):
+        if not self.api_client: self.ShowError("API client not initialized."); return
+        dlg = DomainSearchDialog(self, self.api_client)
+        dlg.ShowModal()
+        dlg.Destroy()
+    def _update_management_button_states(self):
+        selected_rule_count = 0
+        selected_list_count = 0
+        can_update_rule = False
+        active_list_ctrl, _ = self._get_active_list_ctrl()
+        toolbar = self.GetToolBar()
+        mb = self.GetMenuBar()
+        if not toolbar or not mb: return
+        if self.list_ctrl_rules:
+            selected_rule_count = self.list_ctrl_rules.GetSelectedItemCount()
+            if selected_rule_count == 1:
+                idx = self.list_ctrl_rules.GetFirstSelected()
+                if idx != -1:
+                    rule_data_key = self.list_ctrl_rules.GetItemData(idx)
+                    rule_data = self.list_item_data_rules.get(rule_data_key)
+                    if isinstance(rule_data, dict) and rule_data.get("source_url"):
+                        can_update_rule = True
+        if self.list_ctrl_lists:
+            selected_list_count = self.list_ctrl_lists.GetSelectedItemCount()
+        enable_edit = (selected_rule_count == 1 and active_list_ctrl == self.list_ctrl_rules) or \
+                      (selected_list_count == 1 and active_list_ctrl == self.list_ctrl_lists)
+        enable_delete_rule_lists = (selected_rule_count >= 1 and active_list_ctrl == self.list_ctrl_rules)
+        enable_update_from_source = (selected_rule_count == 1 and can_update_rule and active_list_ctrl == self.list_ctrl_rules)
+        toolbar.EnableTool(ID_TOOLBAR_EDIT, enable_edit)
+        toolbar.EnableTool(ID_TOOLBAR_UPDATE, enable_update_from_source)
+        toolbar.EnableTool(ID_TOOLBAR_DELETE_RULE_LISTS, enable_delete_rule_lists)
+        mb.Enable(ID_TOOLBAR_EDIT, enable_edit)
+        mb.Enable(ID_UPDATE_RULE, enable_update_from_source)
+        mb.Enable(ID_DELETE_RULE_LISTS, enable_delete_rule_lists)
+    def OnApplyAdblock(self, event):
+        if not self._validate_naming_options(): return
+        if not self.adblock_filepath and not self.adblock_url:
+            self.ShowError("No adblock list source (file or URL) has been loaded.")
+            self.UpdateStatusBar("Apply failed: No source loaded.")
+            return
+        list_prefix = self.txt_list_prefix.GetValue().strip()
+        rule_name = self.txt_rule_name.GetValue().strip()
+        cursor = wx.BusyCursor()
+        self.UpdateStatusBar("Checking for existing items...")
+        try:
+            self.LogMessage(f"Checking for existing items with prefix '{list_prefix}' or rule name '{rule_name}'...")
+            existing_lists = self.api_client.get_lists(name_prefix=list_prefix, timeout=30)
+            existing_rules = self.api_client.get_rules(rule_name=rule_name, timeout=30)
+            if existing_lists or existing_rules:
+                error_detail = []
+                if existing_lists: error_detail.append(f"{len(existing_lists)} list(s) starting with '{list_prefix}'")
+                if existing_rules: error_detail.append(f"a rule named '{rule_name}'")
+                err_msg = f"Cannot proceed: Pre-existing items found ({' and '.join(error_detail)}).\nPlease use different names or delete existing items."
+                self.ShowError(err_msg)
+                self.UpdateStatusBar("Apply failed: Item name conflict.")
+                if 'cursor' in locals() and cursor: del cursor
+                return
+            self.LogMessage("Pre-check passed. No conflicts found.")
+            self.UpdateStatusBar("Pre-check passed.")
+        except ConnectionError as e:
+            self.ShowError(f"Failed during pre-check for existing items: {e}")
+            self.UpdateStatusBar("Apply failed: API connection error during pre-check.")
+            if 'cursor' in locals() and cursor: del cursor
+            return
+        except Exception as e:
+            self.ShowError(f"An unexpected error occurred during pre-check: {e}")
+            self.UpdateStatusBar("Apply failed: Unexpected error during pre-check.")
+            traceback.print_exc()
+            if 'cursor' in locals() and cursor: del cursor
+            return
+        line_source, source_description, perf = None, "", PerfRecorder("apply")
+        try:
+            source_is_url = bool(self.adblock_url)
+            if self.adblock_url:
+                url = self.adblock_url
+                self.LogMessage(f"Fetching adblock list from URL: {url}...")
+                self.UpdateStatusBar("Fetching content from URL...")
+                try:
+                    # Compressed bodies are decompressed and parsed while they download
+                    with perf.span("fetch source"): line_source = fetch_blocklist_url(url, timeout=30, cache=self.source_cache)
+                    note = self._source_cache_note(line_source)
+                    if note: self.LogMessage(*note)
+                    source_description = f"URL: {url}" + (f" ({line_source.compression}, {line_source.size:,} bytes)" if line_source.compression else "")
+                    self.LogMessage("Successfully fetched content from URL." if not line_source.compression else f"Streaming {line_source.compression}-compressed content from URL.")
+                    self.UpdateStatusBar("Content fetched from URL.")
+                except requests.exceptions.Timeout: self.ShowError("Timeout occurred while fetching the adblock list from the URL."); self.UpdateStatusBar("Apply failed: URL fetch timeout."); return
+                except requests.exceptions.RequestException as e: self.ShowError(f"Failed to fetch adblock list from URL: {e}"); self.UpdateStatusBar("Apply failed: URL fetch error."); return
+                except Exception as e: self.ShowError(f"An unexpected error occurred while fetching from URL: {e}"); self.UpdateStatusBar("Apply failed: URL fetch processing error."); traceback.print_exc(); return
+            elif self.adblock_filepath and os.path.exists(self.adblock_filepath):
+                fpath = self.adblock_filepath
+                self.LogMessage(f"Reading adblock list from file: {fpath}...")
+                self.UpdateStatusBar("Reading content from file...")
+                try:
+                    # Plain files are memory-mapped and compressed ones streamed through a decompressor, parsed line by line either way
+                    with perf.span("open source"): line_source = open_blocklist_file(fpath)
+                    source_description = f"File: {os.path.basename(fpath)} ({line_source.size:,} bytes{', ' + line_source.compression if line_source.compression else ''})"
+                    if not line_source.size: self.LogMessage("File appears to be empty.", "orange")
+                except Exception as e: self.ShowError(f"Failed to read adblock list file: {e}"); self.UpdateStatusBar("Apply failed: File read error."); traceback.print_exc(); return
+            else: self.ShowError("Internal error: No valid source after pre-check."); self.UpdateStatusBar("Apply failed: Internal source error."); return
+        finally:
+            if 'cursor' in locals() and cursor: del cursor
+        if line_source is None: self.ShowError("Could not retrieve adblock list content."); self.UpdateStatusBar("Apply failed: No content retrieved."); return
+        self.LogMessage(f"Processing content from: {source_description}..."); self.UpdateStatusBar("Processing content...")
+        self._set_apply_enabled(False)
+        try:
+            wx.YieldIfNeeded()
+            with perf.span("parse") as info: domains = self._process_adblock_lines(line_source); info.update(lines=line_source.line_count, domains=len(domains))
+            perf.count("source_bytes", line_source.size)
+            self.LogMessage(f"Decoded {'URL content' if source_is_url else 'file'} as {line_source.encoding} ({line_source.how}).", "grey")
+            if not HAS_CHARDET and line_source.how.startswith("fallback"): self.LogMessage("Install 'chardet' package for better encoding detection.", "orange")
+            content_hash = self._content_size_hash(line_source.text_length, line_source.line_count)
+            # Drop the source now so a buffered body is not kept alive for the whole apply
+            line_source = None
+            if not domains: self.ShowError("No valid domains were extracted from the source. Please check the list format."); self.UpdateStatusBar("Apply failed: No valid domains found."); self._set_apply_enabled(True); return
+            if len(domains) > TOTAL_DOMAIN_LIMIT: self.ShowError(f"The number of extracted domains ({len(domains):,}) exceeds the Cloudflare account limit of {TOTAL_DOMAIN_LIMIT:,} across all lists."); self.UpdateStatusBar("Apply failed: Domain limit exceeded."); self._set_apply_enabled(True); return
+            layout = "buckets" if self.bucket_layout else "sorted"
+            num_lists_needed = AccountOperator.lists_needed(len(domains), layout)
+            try:
+                self.LogMessage("Checking current account list count...")
+                self.UpdateStatusBar("Checking account limits...")
+                existing_lists_total = self.api_client.get_lists(timeout=30)
+                current_list_count = len(existing_lists_total)
+                self.LogMessage(f" -> Account currently has {current_list_count} lists.")
+                if num_lists_needed + current_list_count > MAX_LISTS: self.ShowError(f"Error: Creating {num_lists_needed} new list(s) would exceed the account limit of {MAX_LISTS} lists (currently have {current_list_count}).\nPlease delete some existing lists."); self.UpdateStatusBar("Apply failed: Account list limit exceeded."); self._set_apply_enabled(True); return
+                self.UpdateStatusBar("Account limits OK.")
+            except Exception as e: self.ShowError(f"Error checking current list count: {e}"); self.UpdateStatusBar("Apply failed: Error checking limits."); self._set_apply_enabled(True); return
+            self.LogMessage(f"Extracted {len(domains):,} valid domains. This will require creating {num_lists_needed} list(s). Account limit check passed.")
+            max_progress = num_lists_needed + 1; self.operation_cancelled.clear()
+            wx.CallAfter(self.progress_gauge.SetRange, max_progress)
+            wx.CallAfter(self.progress_gauge.SetValue, 0)
+            wx.CallAfter(self.progress_gauge.Show)
+            wx.CallAfter(self.custom_status_bar.Layout)
+            wx.CallAfter(self.UpdateStatusBar, "Applying Configuration...")
+            wx.CallAfter(self.EnableCancelButton, True)
+            source_url_for_worker = self.adblock_url if source_is_url else None
+            thread = threading.Thread(target=self._load_and_create_worker, args=(self.progress_gauge, self.operation_cancelled, domains, list_prefix, rule_name, source_url_for_worker, content_hash, None, perf, layout))
+            thread.start()
+        except Exception as e:
+            self.ShowError(f"Error during adblock preprocessing: {e}")
+            self.UpdateStatusBar("Apply failed: Preprocessing error.")
+            self.LogMessage(f"Preprocessing Traceback:\n{traceback.format_exc()}", "red")
+            self._set_apply_enabled(True)
+    def _set_apply_enabled(self, enabled):
+        toolbar = self.GetToolBar()
+        if toolbar: toolbar.EnableTool(ID_TOOLBAR_APPLY, enabled)
+        mb = self.GetMenuBar()
+        if mb: mb.Enable(ID_APPLY, enabled)
+    def EnableCancelButton(self, enable):
+        toolbar = self.GetToolBar()
+        if toolbar: toolbar.EnableTool(ID_TOOLBAR_CANCEL, enable)
+        mb = self.GetMenuBar()
+        if mb: mb.Enable(ID_CANCEL_OPERATION, enable)
+    def OnRefresh(self, event=None):
+        if not self.api_client: self.ShowError("API client is not initialized. Cannot refresh."); return
+        self.LogMessage("Refreshing Gateway Lists and Rules...")
+        self.UpdateStatusBar("Refreshing...")
+        # An explicit refresh always asks Cloudflare, whatever the client cached
+        self.api_client.invalidate_cache()
+        # The current rows stay visible (greyed) until the fetched data replaces them
+        self._mark_tables_stale()
+        self.operation_cancelled.clear()
+        wx.CallAfter(self.progress_gauge.SetRange, 2)
+        wx.CallAfter(self.progress_gauge.SetValue, 0)
+        wx.CallAfter(self.progress_gauge.Show)
+        wx.CallAfter(self.custom_status_bar.Layout)
+        wx.CallAfter(self.UpdateStatusBar, "Refreshing Items...")
+        wx.CallAfter(self.EnableCancelButton, True)
+        thread = threading.Thread(target=self._refresh_worker, args=(self.progress_gauge, self.operation_cancelled)); thread.start()
+    def _get_active_list_ctrl(self):
+        if not self.notebook: return None, None
+        selection = self.notebook.GetSelection()
+        if selection == 0: return self.list_ctrl_rules, self.list_item_data_rules
+        elif selection == 1: return self.list_ctrl_lists, self.list_item_data_lists
+        else: return None, None
+    def OnListKeyDown(self, event):
+        keycode = event.GetKeyCode()
+        # ListEvent doesn't have ControlDown(), so we need to use GetControl()
+        ctrl_key = wx.GetKeyState(wx.WXK_CONTROL)
+        if ctrl_key and keycode == ord('A'):
+            # Use Ctrl+A for Apply Adblock Configuration instead of Select All
+            self.OnApplyAdblock(event)
+        elif keycode == wx.WXK_ESCAPE:
+             self.OnCancelOperation(event)
+        else:
+            event.Skip()
+    def OnSelectAll(self, event):
+        active_list_ctrl, _ = self._get_active_list_ctrl()
+        if not active_list_ctrl: return
+        count = active_list_ctrl.GetItemCount()
+        if count == 0: self.LogMessage("Cannot select all: List is empty.", "grey"); return
+        for i in range(count): active_list_ctrl.Select(i)
+        self.LogMessage(f"Selected all {count} items.")
+        self.UpdateStatusBar(f"Selected {count} items.")
+        self._update_management_button_states()
+    def OnDeselectAll(self, event):
+        active_list_ctrl, _ = self._get_active_list_ctrl()
+        if not active_list_ctrl: return
+        count = active_list_ctrl.GetItemCount()
+        if count == 0: self.LogMessage("Cannot deselect all: List is empty.", "grey"); return
+        selected_idx = active_list_ctrl.GetFirstSelected()
+        num_deselected = 0
+        while selected_idx != -1:
+            active_list_ctrl.Select(selected_idx, False)
+            num_deselected += 1
+            selected_idx = active_list_ctrl.GetNextSelected(selected_idx)
+        self.LogMessage("Deselected all items.")
+        self.UpdateStatusBar(f"Deselected {num_deselected} items.")
+        self._update_management_button_states()
+    def _on_abandoned_requests_settled(self):
+        """Changes left running by a cancel have now reached Cloudflare (or failed), so the tables may be out of date"""
+        self.LogMessage("Requests still running when the operation was cancelled have finished; refreshing.", "grey")
+        self.OnRefresh()
+    def OnCancelOperation(self, event):
+        self.operation_cancelled.set()
+        self.LogMessage("Cancel requested by user.", "orange")
+        self.UpdateStatusBar("Cancel requested...")
+        self.EnableCancelButton(False)
+    def OnDeleteRuleAndLists(self, event):
+        if not self.api_client: self.ShowError("API client not initialized."); return
+        selected_indices = []
+        if not self.list_ctrl_rules: return
+        idx = self.list_ctrl_rules.GetFirstSelected()
+        while idx != -1: selected_indices.append(idx); idx = self.list_ctrl_rules.GetNextSelected(idx)
+        if not selected_indices: self.ShowError("Please select at least one rule to delete."); self.UpdateStatusBar("Select rule(s) to delete."); return
+        selected_rule_ids, selected_rule_names = [], []
+        for selected_idx in selected_indices:
+            rule_data_key = self.list_ctrl_rules.GetItemData(selected_idx); rule_data = self.list_item_data_rules.get(rule_data_key)
+            if isinstance(rule_data, dict) and rule_data.get('type') == 'rule':
+                rule_id = rule_data.get('id'); rule_name = rule_data.get('name', self.list_ctrl_rules.GetItemText(selected_idx))
+                if rule_id: selected_rule_ids.append(rule_id); selected_rule_names.append(rule_name)
+                else: self.LogMessage(f"Warning: Missing ID for rule data at index {selected_idx}, key {rule_data_key}", "orange")
+            else: self.ShowError(f"Could not retrieve valid rule data for selected rule at index {selected_idx}, key {rule_data_key}."); return
+        if not selected_rule_ids: self.ShowError("Failed to identify IDs for selected rules."); return
+        num_rules_to_delete = len(selected_rule_ids); self.LogMessage(f"Preparing deletion for {num_rules_to_delete} rule(s): {', '.join(selected_rule_names)}")
+        self.UpdateStatusBar("Fetching rule details...")
+        wx.BeginBusyCursor(); all_associated_list_uuids = set(); all_associated_list_names_map = {}; fetch_errors = []
+        try:
+            self.LogMessage(" -> Fetching rule details to identify associated lists...")
+            uuid_to_name_map = {}
+            try:
+                all_lists_for_naming = self.api_client.get_lists()
+                uuid_to_name_map = {lst.get('id'): lst.get('name', 'Unnamed List') for lst in all_lists_for_naming if lst.get('id')}
+            except Exception as name_err: self.LogMessage(f" -> Warning: Could not fetch all lists for naming: {name_err}", "orange")
+            for rule_id, rule_name in zip(selected_rule_ids, selected_rule_names):
+                try:
+                    self.LogMessage(f"   -> Fetching details for rule '{rule_name}' ({rule_id})...", "grey")
+                    rule_details_resp = self.api_client.get_rule_details(rule_id)
+                    if not rule_details_resp or not rule_details_resp.get("success"): raise ConnectionError(f"Failed to fetch details for rule '{rule_name}': {rule_details_resp}")
+                    rule_obj = rule_details_resp.get("result")
+                    if not rule_obj: raise ValueError(f"Rule details missing for '{rule_name}'.")
+                    traffic_expr = rule_obj.get("traffic", "")
+                    if not traffic_expr: self.LogMessage(f"   -> Rule '{rule_name}' has no traffic expression.", "grey"); continue
+                    extracted_uuids = set(LIST_UUID_PATTERN.findall(traffic_expr))
+                    if not extracted_uuids:
+                        extracted_vars = set(re.findall(r'\$([a-zA-Z0-9_]+)', traffic_expr))
+                        msg = f"   -> Could not parse list variables from expression for rule '{rule_name}'."
+                        if extracted_vars: msg = f"   -> Rule '{rule_name}' uses non-UUID variables: {', '.join(extracted_vars)}. Cannot reliably determine associated lists."
+                        self.LogMessage(msg, "orange"); continue
+                    self.LogMessage(f"   -> Found {len(extracted_uuids)} potential list UUID(s) for rule '{rule_name}'.", "grey")
+                    all_associated_list_uuids.update(extracted_uuids)
+                    for list_id in extracted_uuids:
+                        if list_id not in all_associated_list_names_map: all_associated_list_names_map[list_id] = uuid_to_name_map.get(list_id, f"Unknown List ({list_id[:8]}...)")
+                except Exception as e: fetch_errors.append(f"Rule '{rule_name}': {e}"); self.LogMessage(f"   -> Error fetching/parsing details for rule '{rule_name}': {e}", "red")
+            if fetch_errors: error_summary = "Errors occurred while fetching rule details:\n- " + "\n- ".join(fetch_errors); wx.MessageBox(error_summary, "Rule Detail Fetch Errors", wx.OK | wx.ICON_WARNING, self)
+            # Lists shared with rules that are not being deleted stay
+            try: references = build_list_reference_graph(self.api_client.get_rules())
+            except Exception as e: self.ShowError(f"Could not check which rules still use these lists: {e}"); self.UpdateStatusBar("Deletion cancelled."); return
+            for list_id in sorted(all_associated_list_uuids):
+                other_rules = [rule.get("name", rule.get("id")) for rule in references.get(list_id, []) if rule.get("id") not in selected_rule_ids]
+                if other_rules: all_associated_list_uuids.discard(list_id); self.LogMessage(f"   -> Keeping list '{all_associated_list_names_map.get(list_id, list_id)}': also used by {', '.join(other_rules)}.", "grey")
+        except Exception as e: self.ShowError(f"Error preparing deletion: {e}"); traceback.print_exc(); self.LogMessage(f"Error preparing deletion: {e}", "red"); self.UpdateStatusBar("Error preparing deletion.");
+        finally: wx.EndBusyCursor()
+        num_assoc_lists = len(all_associated_list_uuids); confirm_message = f"Delete {num_rules_to_delete} selected rule(s)?\n"
+        confirm_message += "\n".join([f"- {name}" for name in selected_rule_names]) if num_rules_to_delete <= 10 else "(Too many rule names to display)"
+        if num_assoc_lists > 0:
+            confirm_message += f"\n\nALSO delete {num_assoc_lists} uniquely associated list(s):\n"
+            display_list_names = [all_associated_list_names_map.get(list_id, f"ID: {list_id}") for list_id in sorted(list(all_associated_list_uuids))]
+            confirm_message += "\n".join([f"- {name}" for name in display_list_names]) if num_assoc_lists <= 10 else f"(Too many list names to display)"
+        else: confirm_message += "\n\nNo associated lists identified (or errors occurred during detection)."
+        confirm_message += "\n\nProceed with deletion?"
+        dialog_result = wx.MessageBox(confirm_message, "Confirm Delete Rule(s) and Associated Lists", wx.YES_NO | wx.ICON_WARNING | wx.NO_DEFAULT, self)
+        if dialog_result == wx.NO: self.LogMessage("Deletion cancelled by user."); self.UpdateStatusBar("Deletion cancelled."); return
+        self.LogMessage(f"Starting deletion worker for {num_rules_to_delete} rule(s) and {num_assoc_lists} associated list(s)...")
+        self.UpdateStatusBar(f"Deleting {num_rules_to_delete} rule(s) and {num_assoc_lists} list(s)...")
+        self.operation_cancelled.clear(); max_progress = num_rules_to_delete + num_assoc_lists
+        wx.CallAfter(self.progress_gauge.SetRange, max(1, max_progress))
+        wx.CallAfter(self.progress_gauge.SetValue, 0)
+        wx.CallAfter(self.progress_gauge.Show)
+        wx.CallAfter(self.custom_status_bar.Layout)
+        wx.CallAfter(self.UpdateStatusBar, f"Deleting Rule(s) and Lists...")
+        wx.CallAfter(self.EnableCancelButton, True)
+        thread = threading.Thread(target=self._delete_rule_and_lists_worker, args=(selected_rule_ids, selected_rule_names, list(all_associated_list_uuids), self.progress_gauge, self.operation_cancelled)); thread.start()
+    def OnUpdateSelectedRule(self, event):
+        if not self.list_ctrl_rules or self.list_ctrl_rules.GetSelectedItemCount() != 1: self.ShowError("Please select exactly one rule to update."); self.UpdateStatusBar("Select one rule to update."); return
+        selected_idx = self.list_ctrl_rules.GetFirstSelected()
+        if selected_idx == -1: return
+        rule_data_key = self.list_ctrl_rules.GetItemData(selected_idx); rule_data = self.list_item_data_rules.get(rule_data_key)
+        if not isinstance(rule_data, dict) or not rule_data.get("source_url") or not rule_data.get("list_prefix"): self.ShowError("The selected rule does not appear to be managed by this script or lacks source URL/prefix metadata."); self.UpdateStatusBar("Cannot update: Rule missing metadata."); return
+        rule_id = rule_data.get("id"); rule_name = rule_data.get("name"); source_url = rule_data.get("source_url"); list_prefix = rule_data.get("list_prefix")
+        if not all([rule_id, rule_name, source_url, list_prefix]): self.ShowError("Could not retrieve necessary information (ID, Name, URL, Prefix) for the selected rule."); self.UpdateStatusBar("Cannot update: Incomplete rule info."); return
+        msg = f"This will update the rule '{rule_name}' and its associated lists by:\n\n1. Fetching the latest list from:\n   {source_url}\n2. Deleting the existing rule and its current lists.\n3. Creating new lists (named '{list_prefix}...') and a new rule ('{rule_name}').\n\nProceed with update?"
+        dialog_result = wx.MessageBox(msg, "Confirm Rule Update from URL", wx.YES_NO | wx.ICON_QUESTION | wx.NO_DEFAULT, self)
+        if dialog_result == wx.NO: self.LogMessage("Rule update cancelled by user."); self.UpdateStatusBar("Rule update cancelled."); return
+        self.LogMessage(f"Starting update process for rule '{rule_name}' from {source_url}...")
+        self.UpdateStatusBar(f"Updating rule '{rule_name}'...")
+        self.operation_cancelled.clear()
+        wx.CallAfter(self.progress_gauge.Pulse)
+        wx.CallAfter(self.progress_gauge.Show)
+        wx.CallAfter(self.custom_status_bar.Layout)
+        wx.CallAfter(self.UpdateStatusBar, f"Updating Rule '{rule_name}'...")
+        wx.CallAfter(self.EnableCancelButton, True)
+        thread = threading.Thread(target=self._update_rule_worker, args=(rule_id, rule_name, source_url, list_prefix, self.progress_gauge, self.operation_cancelled)); thread.start()
+    def _update_rules_status(self, op_event=None):
+        """Update status of all rules in the list control - called after refresh"""
+        if not self.list_ctrl_rules or not self.api_client:
+            return
+        
+        wx.CallAfter(self.LogMessage, "Checking rules for updates...", "grey")
+        wx.CallAfter(self.UpdateStatusBar, "Checking rules for updates...")
+        
+        # Process in a separate thread to avoid freezing UI
+        thread = threading.Thread(target=self._update_rules_status_worker, args=(op_event,))
+        thread.daemon = True
+        thread.start()
+    
+    def _update_rules_status_worker(self, op_event=None):
+        """Worker thread for updating rule status"""
+        try:
+            if op_event:
+                self._check_cancel_request(op_event)
+                
+            # Get all rules from the list control
+            count = self.list_ctrl_rules.GetItemCount()
+            wx.CallAfter(self.LogMessage, f"Checking update status for {count} rules...", "grey")
+            
+            for i in range(count):
+                if op_event:
+                    self._check_cancel_request(op_event)
+                    
+                # Get rule data
+                rule_data_key = self.list_ctrl_rules.GetItemData(i)
+                rule_data = self.list_item_data_rules.get(rule_data_key)
+                
+                if not rule_data:
+                    continue
+                    
+                # Get rule name and ID for logging
+                rule_name = rule_data.get("name", f"Rule {i+1}")
+                rule_id = rule_data.get("id", "")
+                    
+                # Find and extract source URL
+                description = ""
+                source_url = ""
+                
+                try:
+                    # Get detailed rule information
+                    rule_details = self.api_client.get_rule_details(rule_id)
+                    if rule_details and rule_details.get("success"):
+                        rule_result = rule_details.get("result", {})
+                        if rule_result:
+                            description = rule_result.get("description", "")
+                            metadata = RuleMetadataCodec.decode(description); source_url, list_prefix = metadata.url, metadata.prefix
+                            
+                            # Store source URL in rule data if found
+                            if source_url:
+                                rule_data["source_url"] = source_url
+                                rule_data["list_prefix"] = list_prefix
+                            
+                    # Check update status if we have a source URL
+                    if source_url:
+                        wx.CallAfter(self.LogMessage, f"Checking updates for rule '{rule_name}'...", "grey")
+                        update_status = self._check_update_status(description, source_url)
+                        
+                        # Update the list control with status
+                        wx.CallAfter(self.list_ctrl_rules.SetItem, i, 4, update_status)
+                        
+                        # Update data map
+                        rule_data["update_status"] = update_status
+                        self.list_item_data_rules[rule_data_key] = rule_data
+                        if update_status != "Check failed":
+                            with self._snapshot_lock: self.snapshot.set_update_status(rule_id, update_status, description)
+                    else:
+                        # No source URL found
+                        wx.CallAfter(self.list_ctrl_rules.SetItem, i, 4, "No source URL")
+                        rule_data["update_status"] = "No source URL"
+                        self.list_item_data_rules[rule_data_key] = rule_data
+                        
+                except Exception as e:
+                    wx.CallAfter(self.LogMessage, f"Error checking rule '{rule_name}': {e}", "red")
+                    wx.CallAfter(self.list_ctrl_rules.SetItem, i, 4, "Check failed")
+                    rule_data["update_status"] = "Check failed"
+                    self.list_item_data_rules[rule_data_key] = rule_data
+                    
+            # Update the item data map for sorting
+            wx.CallAfter(lambda: self.list_ctrl_rules.SetItemDataMap(self.list_item_data_rules))
+            self._save_snapshot()
+            wx.CallAfter(self.LogMessage, "Update check complete.", "green")
+            wx.CallAfter(self.UpdateStatusBar, "Ready")
+            
+        except OperationCancelledError:
+            wx.CallAfter(self.LogMessage, "Update check cancelled.", "orange")
+            wx.CallAfter(self.UpdateStatusBar, "Ready")
+        except Exception as e:
+            wx.CallAfter(self.LogMessage, f"Error during update check: {e}", "red")
+            wx.CallAfter(self.UpdateStatusBar, "Update check failed")
+        
+    def _update_progress_task(self, gauge, progress, message):
+        def task():
+            if gauge and gauge.IsShown():
+                try:
+                    gauge.SetValue(progress)
+                    self.UpdateStatusBar(message)
+                except Exception as e: print(f"Error updating gauge/statusbar: {e}")
+        wx.CallAfter(task)
+    def _pulse_progress_task(self, gauge, message):
+        def task():
+            if gauge and gauge.IsShown():
+                try:
+                    gauge.Pulse()
+                    self.UpdateStatusBar(message)
+                except Exception as e: print(f"Error pulsing gauge/statusbar: {e}")
+        wx.CallAfter(task)
+    def _check_cancel_request(self, cancelled_event):
+        # Also binds the event to this worker thread, so its in-flight API requests are abandoned on Cancel
+        if self.api_client: self.api_client.bind_cancel_token(cancelled_event)
+        if cancelled_event.is_set(): raise OperationCancelledError("Operation cancelled by user.")
+    def _begin_perf(self, operation, recorder=None):
+        """Bind a recorder for a worker's operation to its thread on the API client, so every request it makes is timed"""
+        recorder = recorder or PerfRecorder(operation)
+        if self.api_client: self.api_client.bind_perf(recorder)
+        return recorder
+    def _finish_perf(self, recorder):
+        """Detach the recorder, log its timing table and save the trace when enabled"""
+        if self.api_client and self.api_client.perf is recorder: self.api_client.bind_perf(None)
+        recorder.finish()
+        wx.CallAfter(self.LogMessage, recorder.summary(), "grey")
+        if not self.perf_trace_export: return
+        try:
+            path = recorder.export(app_data_path("traces", f"{recorder.operation.replace(' ', '_')}-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"))
+            wx.CallAfter(self.LogMessage, f"Performance trace saved to {path}", "grey")
+        except OSError as e: wx.CallAfter(self.LogMessage, f"Could not save performance trace: {e}", "orange")
+    def _operator(self, op_event):
+        return AccountOperator(self.api_client, self.account_id, lambda message, color=None: wx.CallAfter(self.LogMessage, message, color), op_event)
+    def _phase(self, name):
+        """Time a worker phase on the attached recorder; a no-op outside an instrumented operation"""
+        perf = self.api_client.perf if self.api_client else None
+        return perf.span(name) if perf else contextlib.nullcontext({})
+    def _offer_resume_or_rollback(self, journal, reason):
+        msg = (f"The operation was interrupted:\n{reason}\n\n{journal.description}.\n\n"
+               "Resume: continue from the last completed list now.\n"
+               "Keep for Later: leave the created items in place; resume via Actions > Resume Interrupted Operation.\n"
+               "Roll Back: delete the items created so far.")
+        dlg = wx.MessageDialog(self, msg, "Operation Interrupted", wx.YES_NO | wx.CANCEL | wx.ICON_WARNING)
+        dlg.SetYesNoCancelLabels("&Resume", "&Keep for Later", "Roll &Back")
+        choice = dlg.ShowModal(); dlg.Destroy()
+        if choice == wx.ID_YES: self._start_journal_resume(journal)
+        elif choice == wx.ID_NO: self.LogMessage(f"Interrupted operation kept for later resume: {journal.description}.", "orange")
+        else:
+            self.LogMessage("Rolling back items created by the interrupted operation...")
+            threading.Thread(target=self._rollback_journal, args=(journal,)).start()
+    def _rollback_journal(self, journal):
+        if "rule_swapped" in journal.completed_steps:
+            # The rule already enforces the new lists, so deleting them would leave it empty
+            wx.CallAfter(self.LogMessage, f"Rule '{journal.plan.get('rule_name')}' already uses the new lists; nothing to roll back. Old lists not yet deleted were left in place.", "orange")
+        else: self._cleanup_items(journal.own_lists, [journal.rule_id] if journal.rule_id else [])
+        journal.finish("abort")
+        wx.CallAfter(self.OnRefresh)
+    def _check_pending_journals(self):
+        try: pending = OperationJournal.pending(self.account_id)
+        except OSError as e: self.LogMessage(f"Could not read operation journals: {e}", "orange"); return
+        if not pending: return
+        self.LogMessage(f"Found {len(pending)} interrupted operation(s) that can be resumed.", "orange")
+        if wx.MessageBox(f"{len(pending)} interrupted operation(s) were found:\n\n" + "\n".join(f"- {j.description}" for j in pending) + "\n\nResume now?", "Resume Interrupted Operation", wx.YES_NO | wx.ICON_QUESTION, self) == wx.YES:
+            self.OnResumeOperation(None)
+    def OnResumeOperation(self, event):
+        if not self.api_client: self.ShowError("API client not initialized."); return
+        try: pending = OperationJournal.pending(self.account_id)
+        except OSError as e: self.ShowError(f"Could not read operation journals: {e}"); return
+        if not pending: self.ShowInfo("There are no interrupted operations to resume."); return
+        journal = pending[0]
+        if len(pending) > 1:
+            dlg = wx.SingleChoiceDialog(self, "Select the operation to resume:", "Resume Interrupted Operation", [j.description for j in pending])
+            if dlg.ShowModal() != wx.ID_OK: dlg.Destroy(); return
+            journal = pending[dlg.GetSelection()]; dlg.Destroy()
+        self._start_journal_resume(journal)
+    def _start_journal_resume(self, journal):
+        self.LogMessage(f"Resuming: {journal.description}...")
+        self.operation_cancelled.clear()
+        wx.CallAfter(self.progress_gauge.SetRange, max(1, journal.plan.get("num_chunks", 0) + 1))
+        wx.CallAfter(self.progress_gauge.SetValue, 0)
+        wx.CallAfter(self.progress_gauge.Show)
+        wx.CallAfter(self.custom_status_bar.Layout)
+        wx.CallAfter(self.UpdateStatusBar, "Resuming interrupted operation...")
+        wx.CallAfter(self.EnableCancelButton, True)
+        plan = journal.plan
+        if journal.kind == "update": target, args = self._update_rule_worker, (plan.get("old_rule_id"), plan.get("rule_name"), plan.get("source_url"), plan.get("prefix"), self.progress_gauge, self.operation_cancelled, journal)
+        else: self._set_apply_enabled(False); target, args = self._load_and_create_worker, (self.progress_gauge, self.operation_cancelled, None, plan.get("prefix"), plan.get("rule_name"), plan.get("source_url"), None, journal)
+        threading.Thread(target=target, args=args).start()
+    def _load_and_create_worker(self, gauge, op_event, domains, prefix, rule_name, source_url=None, content_hash=None, journal=None, perf=None, layout=None):
+        perf = self._begin_perf("resume apply" if journal is not None else "apply", perf)
+        try:
+            if not self.api_client: raise RuntimeError("API client is not available in worker thread.")
+            self.api_client.bind_cancel_token(op_event)
+            operator = self._operator(op_event)
+            if journal is None: journal = operator.start_apply(domains, prefix, rule_name, source_url, content_hash, layout)
+            else: domains = journal.load_domains()
+            current_progress = 0
+            def list_progress(msg): nonlocal current_progress; current_progress += 1; wx.CallAfter(lambda step=current_progress: (self.LogMessage(msg), self._update_progress_task(gauge, step, msg)))
+            operator.apply(journal, domains, list_progress)
+            operator.commit(journal, domains); wx.CallAfter(self.LogMessage, "Adblock configuration applied successfully!", "green"); wx.CallAfter(self.UpdateStatusBar, "Configuration applied successfully."); wx.CallAfter(self.OnRefresh)
+        except OperationCancelledError as e:
+            wx.CallAfter(self.LogMessage, f"Operation cancelled by user: {e}", "orange"); wx.CallAfter(self.UpdateStatusBar, "Apply cancelled.")
+            self._handle_interrupted_journal(journal, e)
+            wx.CallAfter(self.OnRefresh)
+        except Exception as e:
+            wx.CallAfter(self.LogMessage, f"PROCESS FAILED: {e}", "red"); wx.CallAfter(self.UpdateStatusBar, "Apply failed.")
+            if not isinstance(e, RuntimeError) or "Pre-existing" not in str(e): wx.CallAfter(self.LogMessage, f"Traceback:\n{traceback.format_exc()}", "red")
+            if not self._handle_interrupted_journal(journal, e): wx.CallAfter(self.ShowError, f"Error during adblock application: {e}")
+            wx.CallAfter(self.OnRefresh)
+        finally:
+            self._finish_perf(perf)
+            wx.CallAfter(self._set_apply_enabled, True); wx.CallAfter(wx.EndBusyCursor)
+            wx.CallAfter(self.lbl_source_display.SetLabel, "Source: None")
+            wx.CallAfter(self.txt_list_prefix.SetValue, ""); wx.CallAfter(self.txt_rule_name.SetValue, "")
+            self.adblock_filepath, self.adblock_url = None, None
+            wx.CallAfter(gauge.Hide)
+            wx.CallAfter(self.custom_status_bar.Layout)
+            wx.CallAfter(gauge.SetValue, 0)
+            wx.CallAfter(self.EnableCancelButton, False)
+            wx.CallAfter(self.UpdateStatusBar, "Ready")
+    def _handle_interrupted_journal(self, journal, error):
+        """Offer resume/rollback when the interrupted run left items behind; returns True if the user was prompted"""
+        if journal is None: return False
+        if journal.has_changes:
+            wx.CallAfter(self._offer_resume_or_rollback, journal, str(error)); return True
+        journal.finish("abort"); return False
+    def _find_orphans(self, lists, rules):
+        try: protected_ids = OperationJournal.protected_list_ids(self.account_id)
+        except OSError as e: wx.CallAfter(self.LogMessage, f"Could not read operation journals, skipping orphan check: {e}", "orange"); return None
+        return find_orphaned_lists(lists, rules, protected_ids)
+    def _report_orphans(self, lists, rules):
+        orphans = self._find_orphans(lists, rules)
+        if not orphans: return
+        if self.auto_clean_orphans:
+            # Lists that already failed once are left for a manual cleanup so a persistent failure cannot loop refreshes
+            pending = [lst for lst in orphans if lst["id"] not in self._orphan_gc_attempted]
+            if pending:
+                self._orphan_gc_attempted.update(lst["id"] for lst in pending)
+                wx.CallAfter(self.LogMessage, f"Automatically deleting {len(pending)} orphaned managed list(s)...", "orange")
+                # Nested so it runs after the refresh worker's own gauge teardown
+                wx.CallAfter(wx.CallAfter, self._start_orphan_deletion, pending); return
+        wx.CallAfter(self.LogMessage, f"Found {len(orphans)} orphaned managed list(s) not used by any rule ({sum(lst.get('count', 0) for lst in orphans):,} domains). Use Actions > Clean Up Orphaned Lists to remove them.", "orange")
+    def OnToggleBucketLayout(self, event):
+        self.bucket_layout = self.bucket_layout_item.IsChecked()
+        self.LogMessage(f"New rules will use the {'bucket' if self.bucket_layout else 'sorted'} list layout.")
+    def OnToggleAutoCleanOrphans(self, event):
+        self.auto_clean_orphans = self.auto_clean_orphans_item.IsChecked()
+        self.LogMessage(f"Automatic orphaned list cleanup {'enabled' if self.auto_clean_orphans else 'disabled'}.")
+    def OnSaveProfile(self, event):
+        if not self.api_client: self.ShowError("API client not initialized."); return
+        with wx.TextEntryDialog(self, f"Profile name for account {self.account_id}:", "Save Account as Profile") as dlg:
+            if dlg.ShowModal() != wx.ID_OK or not dlg.GetValue().strip(): return
+            name = dlg.GetValue().strip()
+        profiles = AccountProfiles.load()
+        if name in profiles.profiles and wx.MessageBox(f"Replace the profile '{name}'?", "Save Account as Profile", wx.YES_NO | wx.ICON_QUESTION, self) != wx.YES: return
+        stored = profiles.add(name, self.account_id, self.api_client.api_token)
+        try: profiles.save()
+        except OSError as e: self.ShowError(f"Could not save profiles: {e}"); return
+        self.LogMessage(f"Saved profile '{name}'." + ("" if stored else " Its API token is kept for this session only (install the 'keyring' package to store it)."), "green" if stored else "orange")
+    def OnFanOut(self, event):
+        if not self._validate_naming_options(): return
+        source = self.adblock_url or self.adblock_filepath
+        if not source: self.ShowError("No adblock list source (file or URL) has been loaded."); return
+        profiles = AccountProfiles.load(); names = profiles.names()
+        if not names: self.ShowInfo("No profiles saved yet. Use Actions > Save Account as Profile while logged in to each account."); return
+        with wx.MultiChoiceDialog(self, "Apply the loaded source to these accounts (an existing rule with the same name is updated):", "Apply to Profiles", [f"{name} ({profiles.account_id(name)})" for name in names]) as dlg:
+            if dlg.ShowModal() != wx.ID_OK: return
+            selected = [names[i] for i in dlg.GetSelections()]
+        if not selected: return
+        clients = {}
+        for name in selected:
+            if not profiles.token(name):
+                with wx.PasswordEntryDialog(self, f"API token for profile '{name}':", "Apply to Profiles") as dlg:
+                    if dlg.ShowModal() != wx.ID_OK or not dlg.GetValue().strip(): self.LogMessage(f"Skipping profile '{name}': no API token.", "orange"); continue
+                    profiles.set_token(name, dlg.GetValue())
+            clients[name] = profiles.client(name)
+        if not clients: return
+        prefix, rule_name = self.txt_list_prefix.GetValue().strip(), self.txt_rule_name.GetValue().strip()
+        self._set_apply_enabled(False); self.operation_cancelled.clear()
+        wx.CallAfter(self.progress_gauge.Show)
+        wx.CallAfter(self.custom_status_bar.Layout)
+        wx.CallAfter(self.UpdateStatusBar, f"Applying to {len(clients)} account(s)...")
+        wx.CallAfter(self.EnableCancelButton, True)
+        threading.Thread(target=self._fan_out_worker, args=(source, clients, prefix, rule_name, self.progress_gauge, self.operation_cancelled)).start()
+    def _fan_out_worker(self, source, clients, prefix, rule_name, gauge, op_event):
+        perf = PerfRecorder("fan-out")
+        try:
+            wx.CallAfter(self._pulse_progress_task, gauge, "Reading source...")
+            with perf.span("fetch source"): line_source = open_blocklist_source(source, self.source_cache)
+            with perf.span("parse"): domains, _, _ = parse_blocklist_lines(line_source)
+            source_url = source if source == self.adblock_url else None
+            content_hash = str(line_source.text_length) if line_source.text_length else None
+            wx.CallAfter(self.LogMessage, f"Parsed {len(domains):,} domains once; syncing rule '{rule_name}' to {len(clients)} account(s): {', '.join(clients)}")
+            wx.CallAfter(self._pulse_progress_task, gauge, f"Applying to {len(clients)} account(s)...")
+            results = fan_out_sync(clients, domains, prefix, rule_name, source_url, content_hash, log=lambda message, color=None: wx.CallAfter(self.LogMessage, message, color), cancel_event=op_event, perf=perf, layout="buckets" if self.bucket_layout else None)
+            failed = {name: error for name, error in results.items() if isinstance(error, Exception)}
+            for name in clients: wx.CallAfter(self.LogMessage, f"{name}: {'failed: ' + str(failed[name]) if name in failed else results[name]}", "red" if name in failed else "green")
+            wx.CallAfter(self.UpdateStatusBar, f"Applied to {len(results) - len(failed)}/{len(results)} account(s).")
+            if failed: wx.CallAfter(self.ShowError, f"{len(failed)} of {len(results)} account(s) failed: {', '.join(failed)}. See the log; interrupted runs can be resumed while logged in to that account.")
+            if any(client.account_id == self.account_id for client in clients.values()): wx.CallAfter(self.OnRefresh)
+        except Exception as e:
+            wx.CallAfter(self.LogMessage, f"Fan-out failed: {e}", "red"); wx.CallAfter(self.ShowError, f"Error applying to profiles: {e}"); wx.CallAfter(self.UpdateStatusBar, "Fan-out failed.")
+        finally:
+            self._finish_perf(perf)
+            wx.CallAfter(self._set_apply_enabled, True)
+            wx.CallAfter(gauge.Hide)
+            wx.CallAfter(self.custom_status_bar.Layout)
+            wx.CallAfter(gauge.SetValue, 0)
+            wx.CallAfter(self.EnableCancelButton, False)
+    def OnCleanOrphans(self, event):
+        if not self.api_client: self.ShowError("API client not initialized."); return
+        self.UpdateStatusBar("Looking for orphaned lists..."); wx.BeginBusyCursor()
+        try: orphans = self._find_orphans(self.api_client.get_lists(), self.api_client.get_rules())
+        except Exception as e: self.ShowError(f"Error looking for orphaned lists: {e}"); self.UpdateStatusBar("Orphan check failed."); return
+        finally: wx.EndBusyCursor()
+        if orphans is None: return
+        if not orphans: self.ShowInfo("No orphaned managed lists were found."); self.UpdateStatusBar("No orphaned lists."); return
+        names = sorted(lst.get("name", lst["id"]) for lst in orphans)
+        msg = f"{len(orphans)} list(s) created by {APP_NAME} are not used by any rule:\n\n"
+        msg += "\n".join(f"- {name}" for name in names[:15]) + (f"\n(and {len(names) - 15} more)" if len(names) > 15 else "")
+        msg += "\n\nDelete them now?"
+        self.LogMessage(f"Orphaned managed lists: {', '.join(names)}", "grey")
+        if wx.MessageBox(msg, "Clean Up Orphaned Lists", wx.YES_NO | wx.ICON_WARNING | wx.NO_DEFAULT, self) != wx.YES: self.UpdateStatusBar("Orphan cleanup cancelled."); return
+        self._start_orphan_deletion(orphans)
+    def OnRuleHistory(self, event):
+        try: histories = RuleHistory.all(self.account_id)
+        except (OSError, ValueError) as e: self.ShowError(f"Could not read rule histories: {e}"); return
+        if not histories: self.ShowInfo("No rule history yet. A version is saved every time a rule is applied or updated."); return
+        rule_name = None
+        if self.list_ctrl_rules and self.list_ctrl_rules.GetSelectedItemCount() == 1:
+            rule_data = self.list_item_data_rules.get(self.list_ctrl_rules.GetItemData(self.list_ctrl_rules.GetFirstSelected()))
+            if isinstance(rule_data, dict) and rule_data.get("name") in histories: rule_name = rule_data.get("name")
+        if rule_name is None:
+            names = sorted(histories)
+            with wx.SingleChoiceDialog(self, "Show the history of which rule?", "Rule History", [f"{name} ({len(histories[name].records)} version(s))" for name in names]) as dlg:
+                if dlg.ShowModal() != wx.ID_OK: return
+                rule_name = names[dlg.GetSelection()]
+        dlg = RuleHistoryDialog(self, histories[rule_name])
+        result, version = dlg.ShowModal(), dlg.rollback_version
+        dlg.Destroy()
+        if result != wx.ID_OK or version is None: return
+        self.LogMessage(f"Rolling back rule '{rule_name}' to version {version}...")
+        self._start_task(f"Rolling back rule '{rule_name}'...", self._rollback_rule_worker, rule_name, version)
+    def _rollback_rule_worker(self, rule_name, version, gauge, op_event):
+        perf = self._begin_perf("rollback")
+        try:
+            outcome = self._operator(op_event).rollback_rule(rule_name, version, progress=lambda message: wx.CallAfter(lambda: (self.LogMessage(message), self._pulse_progress_task(gauge, message))))
+            wx.CallAfter(self.LogMessage, f"Rule '{rule_name}' rolled back to version {version} ({outcome}).", "green"); wx.CallAfter(self.UpdateStatusBar, f"Rule '{rule_name}' rolled back.")
+        except OperationCancelledError as e: wx.CallAfter(self.LogMessage, f"Rollback cancelled: {e}", "orange"); wx.CallAfter(self.UpdateStatusBar, "Rollback cancelled.")
+        except Exception as e: wx.CallAfter(self.LogMessage, f"Rollback of rule '{rule_name}' failed: {e}", "red"); wx.CallAfter(self.ShowError, f"Error rolling back rule '{rule_name}': {e}\n\nIf it was interrupted, it can be resumed via Actions > Resume Interrupted Operation."); wx.CallAfter(self.UpdateStatusBar, "Rollback failed.")
+        finally:
+            self._finish_task(perf, gauge)
+            wx.CallAfter(self.OnRefresh)
+    def OnVerifyLists(self, event):
+        if not self.api_client: self.ShowError("API client not initialized."); return
+        self._start_task("Verifying lists...", self._verify_lists_worker)
+    def _start_task(self, status, target, *args):
+        self._set_apply_enabled(False); self.operation_cancelled.clear()
+        wx.CallAfter(self.progress_gauge.Show)
+        wx.CallAfter(self.custom_status_bar.Layout)
+        wx.CallAfter(self.UpdateStatusBar, status)
+        wx.CallAfter(self.EnableCancelButton, True)
+        threading.Thread(target=target, args=(*args, self.progress_gauge, self.operation_cancelled)).start()
+    def _finish_task(self, perf, gauge):
+        self._finish_perf(perf)
+        wx.CallAfter(self._set_apply_enabled, True)
+        wx.CallAfter(gauge.Hide)
+        wx.CallAfter(self.custom_status_bar.Layout)
+        wx.CallAfter(gauge.SetValue, 0)
+        wx.CallAfter(self.EnableCancelButton, False)
+    def _verify_lists_worker(self, gauge, op_event):
+        perf = self._begin_perf("verify lists")
+        try:
+            wx.CallAfter(self._pulse_progress_task, gauge, "Checking list metadata...")
+            report = self._operator(op_event).verify_lists(progress=lambda message: wx.CallAfter(self._pulse_progress_task, gauge, message))
+            for entry in report.drifted: wx.CallAfter(self.LogMessage, DriftReport.describe_entry(entry), "orange")
+            if report.untracked: wx.CallAfter(self.LogMessage, f"Not recorded yet (created elsewhere or before drift checks; recorded on their next update): {', '.join(report.untracked)}", "grey")
+            wx.CallAfter(self.LogMessage, report.describe(), "orange" if report.drifted else "green")
+            wx.CallAfter(self.UpdateStatusBar, f"{len(report.drifted)} list(s) changed outside {APP_NAME}." if report.drifted else "All recorded lists match.")
+            if report.drifted: wx.CallAfter(self._offer_drift_repair, report)
+        except OperationCancelledError as e: wx.CallAfter(self.LogMessage, f"List verification cancelled: {e}", "orange"); wx.CallAfter(self.UpdateStatusBar, "Verification cancelled.")
+        except Exception as e: wx.CallAfter(self.LogMessage, f"List verification failed: {e}", "red"); wx.CallAfter(self.ShowError, f"Error verifying lists: {e}"); wx.CallAfter(self.UpdateStatusBar, "Verification failed.")
+        finally: self._finish_task(perf, gauge)
+    def _offer_drift_repair(self, report):
+        choices = [f"{entry['name']}: {'; '.join(entry['reasons'])}" for entry in report.drifted]
+        with wx.MultiChoiceDialog(self, f"{len(report.drifted)} list(s) were changed outside {APP_NAME} (details in the log).\nRestore the selected lists to what was last written?", "Verify Lists", choices) as dlg:
+            dlg.SetSelections([i for i, entry in enumerate(report.drifted) if entry["unexpected"] is not None])
+            if dlg.ShowModal() != wx.ID_OK: return
+            list_ids = {report.drifted[i]["id"] for i in dlg.GetSelections()}
+        if list_ids: self._start_task(f"Repairing {len(list_ids)} list(s)...", self._repair_drift_worker, report, list_ids)
+    def _repair_drift_worker(self, report, list_ids, gauge, op_event):
+        perf = self._begin_perf("repair lists")
+        try:
+            self._operator(op_event).repair_drift(report, list_ids, progress=lambda message: wx.CallAfter(self._pulse_progress_task, gauge, message))
+            wx.CallAfter(self.LogMessage, report.describe(), "orange" if report.failed else "green")
+            wx.CallAfter(self.UpdateStatusBar, f"Repaired {len(report.repaired)} list(s).")
+            if report.failed: wx.CallAfter(self.ShowError, f"{len(report.failed)} list(s) could not be repaired. See the log.")
+            wx.CallAfter(self.OnRefresh)
+        except OperationCancelledError as e: wx.CallAfter(self.LogMessage, f"List repair cancelled: {e}", "orange"); wx.CallAfter(self.UpdateStatusBar, "Repair cancelled.")
+        except Exception as e: wx.CallAfter(self.LogMessage, f"List repair failed: {e}", "red"); wx.CallAfter(self.ShowError, f"Error repairing lists: {e}"); wx.CallAfter(self.UpdateStatusBar, "Repair failed.")
+        finally: self._finish_task(perf, gauge)
+    def _start_orphan_deletion(self, orphans):
+        self.operation_cancelled.clear()
+        wx.CallAfter(self.progress_gauge.SetRange, max(1, len(orphans)))
+        wx.CallAfter(self.progress_gauge.SetValue, 0)
+        wx.CallAfter(self.progress_gauge.Show)
+        wx.CallAfter(self.custom_status_bar.Layout)
+        wx.CallAfter(self.UpdateStatusBar, f"Deleting {len(orphans)} orphaned list(s)...")
+        wx.CallAfter(self.EnableCancelButton, True)
+        items = [{"type": "list", "id": lst["id"], "name": lst.get("name", lst["id"])} for lst in orphans]
+        threading.Thread(target=self._delete_items_worker, args=(items, self.progress_gauge, self.operation_cancelled)).start()
+    def _refresh_worker(self, gauge, op_event):
+        fetched_lists, fetched_rules = [], []
+        perf = self._begin_perf("refresh")
+        try:
+            if not self.api_client: raise ConnectionError("API Client not initialized.")
+            def log_and_progress(prog, msg, color=None): wx.CallAfter(lambda: (self.LogMessage(msg, color), self._update_progress_task(gauge, prog, msg)))
+            msg = "Fetching Gateway Lists..."; log_and_progress(1, msg, "grey"); self._check_cancel_request(op_event)
+            lists_ok = rules_ok = True
+            try: fetched_lists = self.api_client.get_lists(); wx.CallAfter(self.LogMessage, f"Found {len(fetched_lists)} lists.", "grey")
+            except Exception as e: lists_ok = False; wx.CallAfter(self.LogMessage, f"Error fetching lists: {e}", "orange")
+            msg = "Fetching Gateway Rules..."; log_and_progress(2, msg, "grey"); self._check_cancel_request(op_event)
+            try: fetched_rules = self.api_client.get_rules(); wx.CallAfter(self.LogMessage, f"Found {len(fetched_rules)} rules.", "grey")
+            except Exception as e: rules_ok = False; wx.CallAfter(self.LogMessage, f"Error fetching rules: {e}", "orange")
+            fetched_ok = lists_ok and rules_ok
+
+            # Whatever could not be fetched keeps its last known (stale) value instead of emptying the table
+            with self._snapshot_lock:
+                if lists_ok: self.snapshot.set_lists(fetched_lists)
+                if rules_ok: self.snapshot.set_rules(fetched_rules)
+                display_lists, display_rules = (fetched_lists if lists_ok else self.snapshot.lists), (fetched_rules if rules_ok else self.snapshot.rules)
+            if lists_ok or rules_ok: self._save_snapshot()
+            # Populate the lists, then immediately check for updates
+            wx.CallAfter(self._populate_list_ctrl, display_lists, display_rules)
+            if not fetched_ok: wx.CallAfter(self._mark_tables_stale)
+            wx.CallAfter(self._update_rules_status, op_event)
+            wx.CallAfter(self.LogMessage, "Refresh complete - checking for updates.") 
+            wx.CallAfter(self.UpdateStatusBar, "Refresh complete." if fetched_ok else "Refresh incomplete - some data is cached.")
+            # Without both lists and rules every managed list would look orphaned
+            if fetched_ok:
+                with perf.span("orphan check"): self._report_orphans(fetched_lists, fetched_rules)
+        except OperationCancelledError as e: wx.CallAfter(self.LogMessage, f"Refresh operation cancelled: {e}", "orange"); wx.CallAfter(self.UpdateStatusBar, "Refresh cancelled.")
+        except ConnectionError as e: wx.CallAfter(self.ShowError, f"Refresh Error: Could not connect to Cloudflare API.\n{e}"); wx.CallAfter(self.UpdateStatusBar, "Refresh failed: Connection error.")
+        except Exception as e: wx.CallAfter(self.ShowError, f"An unexpected error occurred during refresh: {e}"); wx.CallAfter(self.LogMessage, f"Refresh Traceback:\n{traceback.format_exc()}", "red"); wx.CallAfter(self.UpdateStatusBar, "Refresh failed: Unexpected error.")
+        finally:
+            self._finish_perf(perf)
+            wx.CallAfter(gauge.Hide)
+            wx.CallAfter(self.custom_status_bar.Layout)
+            wx.CallAfter(gauge.SetValue, 0)
+            wx.CallAfter(self.EnableCancelButton, False)
+            wx.CallAfter(self.UpdateStatusBar, "Ready")
+    def _delete_items_worker(self, items_to_delete, gauge, op_event):
+        failed_items, total_items = [], len(items_to_delete)
+        perf = self._begin_perf("delete items")
+        try:
+            if not self.api_client: raise RuntimeError("API client is not available in worker thread.")
+            bulk_items = []
+            for item in items_to_delete:
+                item_type = item.get("type", "unknown"); item_id = item.get("id"); item_name = item.get("name", f"Unnamed {item_type}")
+                if not item_id: wx.CallAfter(self.LogMessage, f"Skipping item '{item_name}' - No ID found.", "orange"); failed_items.append(f"{item_name} (Missing ID)"); continue
+                bulk_items.append(BulkDeleteItem(item_type.lower(), item_id, item_name))
+            def on_result(item, error, done, total):
+                if error: wx.CallAfter(self.LogMessage, f"FAILED to delete {item.kind} '{item.name}': {error}", "orange")
+                else: wx.CallAfter(self.LogMessage, f"Successfully deleted '{item.name}'.")
+                wx.CallAfter(self._update_progress_task, gauge, done, f"Deleted {done}/{total} item(s)...")
+            summary = BulkDeleter(self.api_client, cancel_event=op_event, on_result=on_result).run(bulk_items)
+            if summary.cancelled: raise OperationCancelledError(summary.describe())
+            failed_items += [f"'{item.name}' ({item.kind})" for item, _ in summary.failed]
+            deleted_count = len(summary.deleted)
+            final_color = "green" if not failed_items else "orange"
+            final_msg = f"Deletion process finished. {summary.describe()}"
+            status_msg = f"Deleted {deleted_count}/{total_items} items."
+            if failed_items: final_msg += f" Failed to delete {len(failed_items)} item(s)."; status_msg += f" ({len(failed_items)} failed)"
+            wx.CallAfter(self.LogMessage, final_msg, final_color); wx.CallAfter(self.UpdateStatusBar, status_msg)
+            if failed_items: error_summary = f"Failed to delete the following items:\n - " + "\n - ".join(failed_items); wx.CallAfter(self.ShowError, error_summary)
+            wx.CallAfter(self.OnRefresh)
+        except OperationCancelledError as e: wx.CallAfter(self.LogMessage, f"Deletion operation cancelled: {e}", "orange"); wx.CallAfter(self.UpdateStatusBar, "Deletion cancelled."); wx.CallAfter(self.OnRefresh)
+        except Exception as e: error_msg = f"An unexpected error occurred during item deletion: {e}"; wx.CallAfter(self.ShowError, error_msg); wx.CallAfter(self.LogMessage, f"Deletion Process FAILED: {e}\n{traceback.format_exc()}", "red"); wx.CallAfter(self.UpdateStatusBar, "Deletion failed: Unexpected error."); wx.CallAfter(self.OnRefresh)
+        finally:
+            self._finish_perf(perf)
+            wx.CallAfter(gauge.Hide)
+            wx.CallAfter(self.custom_status_bar.Layout)
+            wx.CallAfter(gauge.SetValue, 0)
+            wx.CallAfter(self.EnableCancelButton, False)
+            wx.CallAfter(self.UpdateStatusBar, "Ready")
+    def _delete_rule_and_lists_worker(self, rule_ids, rule_names, list_uuids, gauge, op_event):
+        total_rules, total_lists = len(rule_ids), len(list_uuids)
+        perf = self._begin_perf("delete rules")
+        try:
+            if not self.api_client: raise RuntimeError("API client is not available in worker thread.")
+            wx.CallAfter(self.LogMessage, f"Deleting {total_rules} rule(s), then {total_lists} associated list(s)...")
+            bulk_items = [BulkDeleteItem("rule", rule_id, rule_name) for rule_id, rule_name in zip(rule_ids, rule_names)]
+            bulk_items += [BulkDeleteItem("list", list_uuid, f"{list_uuid[:8]}..." if len(list_uuid) > 8 else list_uuid) for list_uuid in list_uuids]
+            def on_result(item, error, done, total):
+                if error: wx.CallAfter(self.LogMessage, f"FAILED to delete {'rule' if item.kind == 'rule' else 'associated list ID'} {item.name if item.kind == 'rule' else item.item_id}: {error}", "red" if item.kind == "rule" else "orange")
+                elif item.kind == "rule": wx.CallAfter(self.LogMessage, f"Successfully deleted rule '{item.name}'.")
+                wx.CallAfter(self._update_progress_task, gauge, done, f"Deleted {done}/{total} item(s)...")
+            summary = BulkDeleter(self.api_client, cancel_event=op_event, on_result=on_result).run(bulk_items)
+            if summary.cancelled: raise OperationCancelledError(summary.describe())
+            failed_rules = [item.name for item, _ in summary.failed if item.kind == "rule"]
+            failed_lists = [item.item_id for item, _ in summary.failed if item.kind == "list"]
+            deleted_rules_count = sum(1 for item in summary.deleted if item.kind == "rule"); deleted_lists_count = len(summary.deleted) - deleted_rules_count
+            final_color = "green" if not failed_rules and not failed_lists else "orange"
+            final_message = f"Deletion process finished. Rules: {deleted_rules_count}/{total_rules} deleted"; final_message += f" ({len(failed_rules)} failed)." if failed_rules else "."
+            final_message += f" Lists: {deleted_lists_count}/{total_lists} deleted"; final_message += f" ({len(failed_lists)} failed)." if failed_lists else "."
+            final_message += f" {summary.describe()}"
+            status_msg = f"Deleted {deleted_rules_count} rule(s), {deleted_lists_count} list(s)."
+            if failed_rules or failed_lists: status_msg += f" ({len(failed_rules) + len(failed_lists)} failed)"
+            wx.CallAfter(self.LogMessage, final_message, final_color); wx.CallAfter(self.UpdateStatusBar, status_msg)
+            if failed_rules or failed_lists:
+                error_summary = f"Deletion completed with errors:\n";
+                if failed_rules: error_summary += f"- Failed Rules:\n   - " + "\n   - ".join(failed_rules) + "\n"
+                if failed_lists: error_summary += f"- Failed Lists (UUIDs):\n   - " + "\n   - ".join(failed_lists)
+                wx.CallAfter(self.ShowError, error_summary)
+            wx.CallAfter(self.OnRefresh)
+        except OperationCancelledError as e: wx.CallAfter(self.LogMessage, f"Deletion operation cancelled: {e}", "orange"); wx.CallAfter(self.UpdateStatusBar, "Deletion cancelled."); wx.CallAfter(self.OnRefresh)
+        except Exception as e: error_msg = f"An unexpected error occurred during rule/list deletion: {e}"; wx.CallAfter(self.ShowError, error_msg); wx.CallAfter(self.LogMessage, f"Deletion Process FAILED: {e}\n{traceback.format_exc()}", "red"); wx.CallAfter(self.UpdateStatusBar, "Deletion failed: Unexpected error."); wx.CallAfter(self.OnRefresh)
+        finally:
+            self._finish_perf(perf)
+            wx.CallAfter(gauge.Hide)
+            wx.CallAfter(self.custom_status_bar.Layout)
+            wx.CallAfter(gauge.SetValue, 0)
+            wx.CallAfter(self.EnableCancelButton, False)
+            wx.CallAfter(self.UpdateStatusBar, "Ready")
+    def _prepare_update_plan(self, old_rule_id, rule_name, source_url, list_prefix, update_gauge):
+        """Fetch and parse the source, resolve the old rule's lists and journal the update plan"""
+        update_gauge("Fetching updated list from URL..."); wx.CallAfter(self.LogMessage, f"Fetching updated content from {source_url}...")
+        try:
+            with self._phase("fetch source"): line_source = fetch_blocklist_url(source_url, timeout=60, cache=self.source_cache)
+            note = self._source_cache_note(line_source)
+            if note: wx.CallAfter(self.LogMessage, *note)
+            wx.CallAfter(self.LogMessage, "Successfully fetched updated content." if not line_source.compression else f"Streaming {line_source.compression}-compressed updated content.")
+        except Exception as e: raise RuntimeError(f"Failed to fetch updated content from URL: {e}") from e
+        update_gauge("Processing updated domain list..."); wx.CallAfter(self.LogMessage, "Processing updated domain list...")
+        try:
+            with self._phase("parse") as info: new_domains = self._process_adblock_lines(line_source); info.update(lines=line_source.line_count, domains=len(new_domains))
+        except SOURCE_READ_ERRORS as e: raise RuntimeError(f"Failed to read updated content from URL: {e}") from e
+        wx.CallAfter(self.LogMessage, f"Decoded content as {line_source.encoding} ({line_source.how}).", "grey")
+        if not new_domains: raise RuntimeError("No valid domains found in the updated list content.")
+        wx.CallAfter(self.LogMessage, f"Found {len(new_domains):,} valid domains in updated list.")
+        update_gauge("Fetching details of existing rule..."); wx.CallAfter(self.LogMessage, f"Fetching details for old rule ID: {old_rule_id}...")
+        try:
+            rule_details_resp = self.api_client.get_rule_details(old_rule_id)
+            if not rule_details_resp or not rule_details_resp.get("success"): raise ConnectionError(f"Failed to fetch details for rule '{rule_name}': {rule_details_resp}")
+            rule_obj = rule_details_resp.get("result")
+            if not rule_obj: raise ValueError(f"Rule details missing for '{rule_name}'.")
+        except Exception as e: raise RuntimeError(f"Error getting details or parsing old rule '{rule_name}': {e}") from e
+        content_hash = self._content_size_hash(line_source.text_length, line_source.line_count)
+        wx.CallAfter(self.LogMessage, f"Calculated content hash for update: {content_hash}", "grey")
+        journal = self._operator(self.operation_cancelled).start_update({**rule_obj, "id": old_rule_id, "name": rule_name}, new_domains, source_url, list_prefix, content_hash)
+        return new_domains, journal
+    def _update_rule_worker(self, old_rule_id, rule_name, source_url, list_prefix, gauge, op_event, journal=None):
+        progress_step = 0
+        perf = self._begin_perf("resume update" if journal is not None else "update")
+        def update_gauge(message): nonlocal progress_step; progress_step += 1; wx.CallAfter(self._pulse_progress_task, gauge, message)
+        try:
+            if not self.api_client: raise RuntimeError("API client not available.")
+            self.api_client.bind_cancel_token(op_event)
+            if journal is not None: wx.CallAfter(self.LogMessage, f"Resuming update from journal {journal.op_id}..."); new_domains = journal.load_domains()
+            else: new_domains, journal = self._prepare_update_plan(old_rule_id, rule_name, source_url, list_prefix, update_gauge)
+            def list_progress(msg): update_gauge(msg); wx.CallAfter(self.LogMessage, msg)
+            operator = self._operator(op_event)
+            operator.update(journal, new_domains, update_gauge, list_progress)
+            operator.commit(journal, new_domains); wx.CallAfter(self.LogMessage, f"Rule '{rule_name}' updated successfully!", "green"); wx.CallAfter(self.UpdateStatusBar, f"Rule '{rule_name}' updated.")
+        except OperationCancelledError as e:
+            wx.CallAfter(self.LogMessage, f"Rule update cancelled: {e}", "orange"); wx.CallAfter(self.UpdateStatusBar, "Rule update cancelled.")
+            self._handle_interrupted_journal(journal, e)
+        except Exception as e:
+            wx.CallAfter(self.LogMessage, f"UPDATE FAILED for rule '{rule_name}': {e}", "red"); wx.CallAfter(self.LogMessage, f"Traceback:\n{traceback.format_exc()}", "red"); wx.CallAfter(self.UpdateStatusBar, "Rule update failed.")
+            if not self._handle_interrupted_journal(journal, e): wx.CallAfter(self.ShowError, f"Error during rule update: {e}")
+        finally:
+            self._finish_perf(perf)
+            wx.CallAfter(self.OnRefresh)
+            wx.CallAfter(gauge.Hide)
+            wx.CallAfter(self.custom_status_bar.Layout)
+            wx.CallAfter(gauge.SetValue, 0)
+            wx.CallAfter(self.EnableCancelButton, False)
+            wx.CallAfter(self.UpdateStatusBar, "Ready")
+    def _delete_all_worker(self, lists_to_delete, rules_to_delete, gauge, op_event):
+        failed_rules, failed_lists = [], []
+        total_items = len(lists_to_delete) + len(rules_to_delete)
+        perf = self._begin_perf("delete all")
+        try:
+            if not self.api_client: raise RuntimeError("API client unavailable.")
+            def log_and_progress(prog, msg, color=None): wx.CallAfter(lambda: (self.LogMessage(msg, color), self._update_progress_task(gauge, prog, msg)))
+            start_msg = f"Starting 'Delete All (Legacy)' for {total_items} item(s)..."; log_and_progress(1, start_msg); self._check_cancel_request(op_event)
+            bulk_items = []
+            for kind, items, failed in (("rule", rules_to_delete, failed_rules), ("list", lists_to_delete, failed_lists)):
+                for entry in items:
+                    item_id, item_name = entry.get("id"), entry.get("name", f"Unknown {kind.title()}")
+                    if item_id: bulk_items.append(BulkDeleteItem(kind, item_id, item_name))
+                    else: wx.CallAfter(self.LogMessage, f"SKIPPED {kind} '{item_name}' (No ID).", "orange"); failed.append(f"'{item_name}' (No ID)")
+            def on_result(item, error, done, total):
+                if error: wx.CallAfter(self.LogMessage, f"FAILED delete {item.kind} '{item.name}': {error}", "orange")
+                else: wx.CallAfter(self.LogMessage, f"Deleted {item.kind} '{item.name}'.")
+                wx.CallAfter(self._update_progress_task, gauge, done + 1, f"Deleted {done}/{total} item(s)...")
+            summary = BulkDeleter(self.api_client, cancel_event=op_event, on_result=on_result).run(bulk_items)
+            if summary.cancelled: raise OperationCancelledError(summary.describe())
+            for item, _ in summary.failed: (failed_rules if item.kind == "rule" else failed_lists).append(f"'{item.name}'")
+            total_deleted, total_failed = len(summary.deleted), len(failed_lists) + len(failed_rules)
+            final_color = "green" if total_failed == 0 else "orange"
+            completion_msg = f"'Delete All (Legacy)' finished. Deleted: {total_deleted}. Failed: {total_failed}. ({summary.elapsed:.1f}s)"; wx.CallAfter(self.LogMessage, completion_msg, final_color); wx.CallAfter(self.UpdateStatusBar, f"Delete All finished: {total_deleted} deleted, {total_failed} failed.")
+            if total_failed > 0:
+                errors = []
+                if failed_rules: errors.append(f"Failed Rules:\n   - " + "\n   - ".join(failed_rules))
+                if failed_lists: errors.append(f"Failed Lists:\n   - " + "\n   - ".join(failed_lists))
+                wx.CallAfter(self.ShowError, f"Failed to delete {total_failed} items:\n\n" + "\n".join(errors))
+            wx.CallAfter(self.OnRefresh)
+        except OperationCancelledError as e: wx.CallAfter(self.LogMessage, f"'Delete All (Legacy)' operation cancelled: {e}", "orange"); wx.CallAfter(self.UpdateStatusBar, "Delete All cancelled."); wx.CallAfter(self.OnRefresh)
+        except Exception as e: error_msg = f"Unexpected error during 'Delete All (Legacy)': {e}"; wx.CallAfter(self.ShowError, error_msg); wx.CallAfter(self.LogMessage, f"'Delete All (Legacy)' FAILED: {e}\n{traceback.format_exc()}", "red"); wx.CallAfter(self.UpdateStatusBar, "Delete All failed: Unexpected error."); wx.CallAfter(self.OnRefresh)
+        finally:
+            self._finish_perf(perf)
+            wx.CallAfter(gauge.Hide)
+            wx.CallAfter(self.custom_status_bar.Layout)
+            wx.CallAfter(gauge.SetValue, 0)
+            wx.CallAfter(self.EnableCancelButton, False)
+            wx.CallAfter(self.UpdateStatusBar, "Ready")
+    def _process_adblock_lines(self, lines, total_lines=None):
+        """Extract domains from an iterable of lines; total_lines is only used for progress messages"""
+        # Log progress for large lists
+        if total_lines is None:
+            wx.CallAfter(self.LogMessage, "Processing lines...")
+        elif total_lines > 100:
+            wx.CallAfter(self.LogMessage, f"Processing {total_lines:,} lines...")
+            wx.CallAfter(self.UpdateStatusBar, f"Processing {total_lines:,} lines...")
+        def progress(line_num):
+            wx.YieldIfNeeded() # Allow UI updates
+            wx.CallAfter(self.UpdateStatusBar, f"Processing line {line_num:,}/{total_lines:,}..." if total_lines else f"Processing line {line_num:,}...")
+        domains, processed_lines, line_count = parse_blocklist_lines(lines, progress if total_lines is None or total_lines > 5000 else None)
+
+        # Log results
+        if not domains:
+            wx.CallAfter(self.LogMessage, "Warning: No valid domains were extracted from the provided content.", "orange")
+            wx.CallAfter(self.UpdateStatusBar, "Warning: No valid domains extracted.")
+        else:
+             final_count = len(domains)
+             wx.CallAfter(self.LogMessage, f"Successfully extracted {final_count:,} unique domains from {processed_lines:,} processed lines (out of {line_count:,} total).")
+             wx.CallAfter(self.UpdateStatusBar, f"Processed {final_count:,} domains.")
+             
+        return domains
+    def _cleanup_items(self, list_ids_to_delete, rule_ids_to_delete):
+        if not list_ids_to_delete and not rule_ids_to_delete: wx.CallAfter(self.LogMessage, "Cleanup: No items specified for cleanup.", "grey"); return
+        temp_api_client = None
+        try: temp_api_client = CloudflareAPI(self.api_token, self.account_id)
+        except Exception as api_err: wx.CallAfter(self.LogMessage, f"Cleanup Error: Failed to initialize API client for cleanup: {api_err}", "red"); return
+        num_rules, num_lists = len(rule_ids_to_delete), len(list_ids_to_delete)
+        wx.CallAfter(self.LogMessage, f"Cleanup: Attempting to delete {num_rules} rule(s) and {num_lists} list(s)...", "grey")
+        wx.CallAfter(self.UpdateStatusBar, f"Cleaning up {num_rules + num_lists} items...")
+        def on_result(item, error, done, total):
+            if error: wx.CallAfter(self.LogMessage, f"Cleanup WARNING: Failed to delete {item.kind} {item.item_id}: {error}", "orange")
+            else: wx.CallAfter(self.LogMessage, f"Cleanup: Successfully deleted {item.kind} {item.item_id}.", "grey")
+        bulk_items = [BulkDeleteItem("rule", rule_id, rule_id) for rule_id in rule_ids_to_delete if rule_id] + [BulkDeleteItem("list", list_id, list_id) for list_id in list_ids_to_delete if list_id]
+        # Cleanup runs after a cancel, so it deliberately does not share the operation's cancel event
+        summary = BulkDeleter(temp_api_client, on_result=on_result).run(bulk_items)
+        deleted_rules = sum(1 for item in summary.deleted if item.kind == "rule"); deleted_lists = len(summary.deleted) - deleted_rules
+        wx.CallAfter(self.LogMessage, f"Cleanup finished. Deleted {deleted_rules}/{num_rules} rules, {deleted_lists}/{num_lists} lists.", "grey")
+        wx.CallAfter(self.UpdateStatusBar, f"Cleanup finished.")
+    def _populate_list_ctrl(self, fetched_lists, fetched_rules):
+        if not self.list_ctrl_lists or not self.list_ctrl_rules: print("Error: List controls not available during UI population."); self.LogMessage("Internal Error: UI List controls not ready.", "red"); return
+        try:
+            self.list_ctrl_lists.Freeze(); self.list_ctrl_lists.DeleteAllItems(); self.list_item_data_lists = {}; list_idx_counter = 0
+            valid_lists = fetched_lists if isinstance(fetched_lists, list) else []
+            list_data_to_display = [{"id": l.get("id"), "name": l.get("name"), "count": l.get("count", 0)} for l in valid_lists if l.get("id") and l.get("name") is not None]
+            list_data_to_display.sort(key=lambda x: x.get('name', '').lower())
+            for list_data in list_data_to_display:
+                list_id = list_data["id"]; list_name = list_data["name"]; item_count = list_data.get("count", 0)
+                idx = self.list_ctrl_lists.InsertItem(list_idx_counter, list_name); self.list_ctrl_lists.SetItem(idx, 1, list_id); self.list_ctrl_lists.SetItem(idx, 2, f"{item_count:,}")
+                item_tuple = ("list", list_id); self.list_ctrl_lists.SetItemData(idx, list_idx_counter); self.list_item_data_lists[list_idx_counter] = item_tuple; list_idx_counter += 1
+            self.list_ctrl_lists.SetItemDataMap(self.list_item_data_lists)
+        except Exception as e: print(f"Error populating lists tab: {e}"); traceback.print_exc(); self.LogMessage(f"Error updating lists tab display: {e}", "red")
+        finally:
+            if self.list_ctrl_lists: self.list_ctrl_lists.Thaw()
+        try:
+            self.list_ctrl_rules.Freeze(); self.list_ctrl_rules.DeleteAllItems(); self.list_item_data_rules = {}; rule_idx_counter = 0
+            valid_rules = fetched_rules if isinstance(fetched_rules, list) else []
+            rule_data_to_display = [{"id": r.get("id"), "name": r.get("name"), "enabled": r.get("enabled", False), "description": r.get("description","")} for r in valid_rules if r.get("id") and r.get("name") is not None]
+            rule_data_to_display.sort(key=lambda x: x.get('name', '').lower())
+            for rule_data in rule_data_to_display:
+                rule_id = rule_data["id"]; rule_name = rule_data["name"]; enabled_status = "Yes" if rule_data.get("enabled", False) else "No"; description = rule_data.get("description", "")
+                metadata = RuleMetadataCodec.decode(description); source_url, list_prefix = metadata.url, metadata.prefix; source_display = "URL" if source_url else "Manual"
+                idx = self.list_ctrl_rules.InsertItem(rule_idx_counter, rule_name); self.list_ctrl_rules.SetItem(idx, 1, rule_id); self.list_ctrl_rules.SetItem(idx, 2, enabled_status); self.list_ctrl_rules.SetItem(idx, 3, source_display)
+                item_dict = {"type": "rule", "id": rule_id, "name": rule_name, "enabled": rule_data.get("enabled", False), "source_url": source_url, "list_prefix": list_prefix}
+                # The last check's result stands in (marked cached) until the background update check reports
+                cached_status = self.snapshot.update_status(rule_id, description)
+                if cached_status: self.list_ctrl_rules.SetItem(idx, 4, f"{cached_status} (cached)"); item_dict["update_status"] = cached_status
+                self.list_ctrl_rules.SetItemData(idx, rule_idx_counter); self.list_item_data_rules[rule_idx_counter] = item_dict; rule_idx_counter += 1
+            self.list_ctrl_rules.SetItemDataMap(self.list_item_data_rules)
+        except Exception as e: print(f"Error populating rules tab: {e}"); traceback.print_exc(); self.LogMessage(f"Error updating rules tab display: {e}", "red")
+        finally:
+            if self.list_ctrl_rules: self.list_ctrl_rules.Thaw()
+            self._update_management_button_states()
+    def _validate_naming_options(self):
+        if not all(hasattr(self, ctrl) and getattr(self, ctrl) for ctrl in ['txt_list_prefix', 'txt_rule_name']): print("Error: Naming UI elements not initialized during validation."); self.ShowError("Internal UI Error: Naming fields are not ready."); return False
+        prefix = self.txt_list_prefix.GetValue().strip(); rule_name = self.txt_rule_name.GetValue().strip()
+        if not prefix: self.ShowError("Please enter a 'List Name Prefix' before applying."); self.txt_list_prefix.SetFocus(); return False
+        if not rule_name: self.ShowError("Please enter a 'Rule Name' before applying."); self.txt_rule_name.SetFocus(); return False
+        return True
+    def LogMessage(self, message, color=None):
+        if not hasattr(self, 'log_ctrl') or not self.log_ctrl: print(f"LOG (UI Not Ready): {message}"); return
+        wx.CallAfter(self._do_log, message, color)
+    def _do_log(self, message, color):
+        if not self.log_ctrl: return
+        try:
+            timestamp = time.strftime("%Y-%m-%d %H:%M:%S"); log_entry = f"[{timestamp}] {message}\n"
+            insertion_point = self.log_ctrl.GetLastPosition(); self.log_ctrl.AppendText(log_entry); end_point = self.log_ctrl.GetLastPosition()
+            if color:
+                color_map = {"red": wx.RED, "green": wx.Colour(0, 128, 0), "blue": wx.BLUE, "orange": wx.Colour(255, 165, 0), "grey": wx.Colour(128, 128, 128), "gray": wx.Colour(128, 128, 128)}
+                text_color = color_map.get(str(color).lower())
+                if text_color: style = wx.TextAttr(text_color); self.log_ctrl.SetStyle(insertion_point, end_point, style)
+            self.log_ctrl.ShowPosition(end_point)
+        except Exception as e: print(f"Error writing to log control: {e}\nOriginal Message: {message}"); traceback.print_exc()
+    def UpdateStatusBar(self, text):
+        if self.status_text:
+             wx.CallAfter(self.status_text.SetLabel, text)
+    def ShowError(self, message):
+        def show_and_log(): wx.MessageBox(message, "Error", wx.OK | wx.ICON_ERROR, self); self.LogMessage(f"ERROR: {message}", "red")
+        if wx.IsMainThread(): show_and_log()
+        else: wx.CallAfter(show_and_log)
+    def ShowInfo(self, message):
+        def show_and_log(): wx.MessageBox(message, "Information", wx.OK | wx.ICON_INFORMATION, self); self.LogMessage(f"INFO: {message}", "grey")
+        if wx.IsMainThread(): show_and_log()
+        else: wx.CallAfter(show_and_log)
+def main():
+    app = wx.App(redirect=False)
+    app.SetAppName(APP_NAME)
+    app.SetAppDisplayName(APP_NAME)
+    login_dialog = LoginDialog(None)
+    result = login_dialog.ShowModal()
+    account_id, api_token = login_dialog.account_id, login_dialog.api_token
+    login_dialog.Destroy()
+    if result == wx.ID_OK: frame = MainFrame(None, account_id=account_id, api_token=api_token); app.MainLoop()
+    else: print("Login cancelled or failed. Exiting application.")
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+import requests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gateway_guardian import CloudflareAPI, CancelToken, OperationCancelledError
+
+POST_SECONDS = 0.5
+class FakeGateway:
+    """Stands in for requests.request: GET /lists returns the stored lists, POST /lists stores one after POST_SECONDS"""
+    def __init__(self): self.lists, self.lock = [], threading.Lock()
+    def __call__(self, method, url, headers=None, timeout=None, **kwargs):
+        if method == "POST":
+            time.sleep(POST_SECONDS); body = json.loads(kwargs["data"])
+            with self.lock: self.lists.append({"id": f"list-{len(self.lists)}", "name": body["name"]}); result = self.lists[-1]
+        else:
+            with self.lock: result = list(self.lists)
+        response = requests.Response()
+        response.status_code, response.headers["Content-Type"] = 200, "application/json"
+        response._content = json.dumps({"success": True, "result": result}).encode("utf-8")
+        return response
+class AbandonedMutationCacheTest(unittest.TestCase):
+    """A mutation abandoned by Cancel still lands later; the GET cache must not keep serving what was read before that"""
+    def setUp(self):
+        self.gateway = FakeGateway()
+        patcher = mock.patch.object(requests, "request", self.gateway); patcher.start(); self.addCleanup(patcher.stop)
+        self.client = CloudflareAPI("token", "account")
+    def test_get_after_abandoned_create_sees_the_list_once_it_lands(self):
+        token = CancelToken(); self.client.bind_cancel_token(token)
+        threading.Timer(0.1, token.set).start()
+        start = time.perf_counter()
+        with self.assertRaises(OperationCancelledError): self.client.create_list("ads_1", ["example.com"])
+        self.assertLess(time.perf_counter() - start, POST_SECONDS)
+        self.client.bind_cancel_token(None)
+        # Read while the POST is still in flight: the server has no list yet
+        self.assertEqual(self.client.get_lists(), [])
+        time.sleep(POST_SECONDS)
+        self.assertEqual([lst["name"] for lst in self.client.get_lists()], ["ads_1"])
+    def test_get_during_uncancelled_create_is_not_cached(self):
+        worker = threading.Thread(target=self.client.create_list, args=("ads_1", ["example.com"])); worker.start()
+        time.sleep(0.1)
+        self.assertEqual(self.client.get_lists(), [])
+        worker.join()
+        self.assertEqual([lst["name"] for lst in self.client.get_lists()], ["ads_1"])
+    def test_settled_callback_runs_once_after_the_last_abandoned_mutation(self):
+        settled = []
+        self.client.on_abandoned_settled = lambda: settled.append((self.client.abandoned_mutations, len(self.gateway.lists)))
+        token = CancelToken()
+        def create(name):
+            self.client.bind_cancel_token(token)
+            with self.assertRaises(OperationCancelledError): self.client.create_list(name, ["example.com"])
+        workers = [threading.Thread(target=create, args=(f"ads_{i}",)) for i in range(3)]
+        for worker in workers: worker.start()
+        time.sleep(0.1); token.set()
+        for worker in workers: worker.join()
+        self.assertEqual((self.client.abandoned_mutations, settled), (3, []))
+        time.sleep(POST_SECONDS)
+        self.assertEqual(settled, [(0, 3)])
+        self.assertEqual(len(self.client.get_lists()), 3)
+    def test_mutation_cancelled_before_sending_is_not_tracked(self):
+        settled, token = [], CancelToken(); token.set()
+        self.client.on_abandoned_settled = lambda: settled.append(True)
+        self.client.bind_cancel_token(token)
+        with self.assertRaises(OperationCancelledError): self.client.create_list("ads_1", ["example.com"])
+        time.sleep(0.1)
+        self.assertEqual((self.client.abandoned_mutations, settled, self.gateway.lists), (0, [], []))
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+import requests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gateway_guardian import CloudflareAPI, PerfRecorder, BulkDeleter, BulkDeleteItem
+
+def slow_delete(method, url, headers=None, timeout=None, **kwargs):
+    """Stands in for requests.request: every call is a DELETE answered with 204 after a short delay"""
+    time.sleep(0.05)
+    response = requests.Response(); response.status_code, response._content = 204, b""
+    return response
+class PerfBindingTest(unittest.TestCase):
+    """Overlapping operations on one client each time only their own requests, including those sent from pool threads"""
+    def setUp(self):
+        patcher = mock.patch.object(requests, "request", slow_delete); patcher.start(); self.addCleanup(patcher.stop)
+        self.client = CloudflareAPI("token", "account")
+    def operation(self, recorder, count):
+        self.client.bind_perf(recorder)
+        try: BulkDeleter(self.client, rate_per_second=0).run(BulkDeleteItem("list", f"{recorder.operation}-{i}", str(i)) for i in range(count))
+        finally: self.client.bind_perf(None)
+    def test_overlapping_operations_keep_their_own_timings(self):
+        recorders = [PerfRecorder("first"), PerfRecorder("second")]
+        workers = [threading.Thread(target=self.operation, args=(recorder, count)) for recorder, count in zip(recorders, (3, 5))]
+        for worker in workers: worker.start()
+        for worker in workers: worker.join()
+        self.assertEqual([recorder.counters.get("api_requests") for recorder in recorders], [3, 5])
+        self.assertIsNone(self.client.perf)
+    def test_unbound_thread_has_no_recorder(self):
+        self.client.bind_perf(PerfRecorder("main")); seen = []
+        worker = threading.Thread(target=lambda: seen.append(self.client.perf)); worker.start(); worker.join()
+        self.assertEqual(seen, [None])
+        self.assertEqual(self.client.perf.operation, "main")
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import random
+import sys
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gateway_guardian import RuleMetadataCodec, METADATA_BLOCK_PATTERN
+
+# Characters the V1 syntax and the V2 field separator give meaning to, plus non-ASCII text
+SPECIAL_CHARS = [":", "=", "[", "]", "\n", "\\", " ", "é", "ü", "字", "\U0001F6AB"]
+SPECIAL_WORDS = ["URL=", "PREFIX=", "HASH=", "MODE=", "https://", "[CF_ADBLOCK_MGR_V1:", "[CF_ADBLOCK_MGR_V2:", "\\n"]
+SAFE_CHARS = "abcdefghijklmnopqrstuvwxyz0123456789-_./"
+ITERATIONS = 3000
+class RuleMetadataCodecRoundTripTest(unittest.TestCase):
+    """Randomized round trips through encode/decode/compose_description (seeded, so failures reproduce)"""
+    def setUp(self):
+        self.rng = random.Random(20261019)
+        RuleMetadataCodec.decode.cache_clear()
+    def text(self, max_len=40, safe=False):
+        pieces = []
+        for _ in range(self.rng.randint(1, max_len)):
+            roll = self.rng.random()
+            if safe or roll < 0.7: pieces.append(self.rng.choice(SAFE_CHARS))
+            elif roll < 0.9: pieces.append(self.rng.choice(SPECIAL_CHARS))
+            else: pieces.append(self.rng.choice(SPECIAL_WORDS))
+        return "".join(pieces)
+    def fields(self, safe=False):
+        url = None if self.rng.random() < 0.1 else ("https://" if self.rng.random() < 0.5 else "") + self.text(120, safe)
+        prefix = self.text(20, safe)
+        content_hash = None if self.rng.random() < 0.2 else self.text(40, safe)
+        mode = None if self.rng.random() < 0.5 else self.rng.choice(["buckets", "sorted"] if safe else ["buckets", "sorted", self.text(10)])
+        return url, prefix, content_hash, mode
+    def assertDecodesTo(self, description, url, prefix, content_hash, mode):
+        decoded = RuleMetadataCodec.decode(description)
+        self.assertEqual((decoded.url, decoded.prefix, decoded.content_hash, decoded.mode), (url, prefix, content_hash, mode), repr(description))
+        return decoded
+    def test_encode_round_trips_any_field_values(self):
+        for _ in range(ITERATIONS):
+            url, prefix, content_hash, mode = self.fields()
+            marker = RuleMetadataCodec.encode(url, prefix, content_hash, max_len=10000, mode=mode)
+            self.assertIn(self.assertDecodesTo(marker, url, prefix, content_hash, mode).version, (1, 2))
+    def test_v1_round_trips_plain_values(self):
+        for _ in range(ITERATIONS):
+            url, prefix, content_hash, mode = self.fields(safe=True)
+            marker = RuleMetadataCodec.encode_v1(url, prefix, content_hash, mode)
+            self.assertEqual(self.assertDecodesTo(marker, url, prefix, content_hash, mode).version, 1)
+            self.assertEqual(RuleMetadataCodec.encode(url, prefix, content_hash, max_len=10000, mode=mode), marker)
+    def test_v2_round_trips_any_field_values(self):
+        for _ in range(ITERATIONS):
+            url, prefix, content_hash, mode = self.fields()
+            marker = RuleMetadataCodec.encode_v2(url, prefix, content_hash, mode)
+            self.assertEqual(self.assertDecodesTo(marker, url, prefix, content_hash, mode).version, 2)
+    def test_compose_description_truncates_to_max_len(self):
+        for _ in range(ITERATIONS):
+            url, prefix, content_hash, mode = self.fields()
+            if url is None and mode is None: mode = "buckets"
+            base = self.text(300) if self.rng.random() < 0.8 else ""
+            max_len = self.rng.randint(0, 600)
+            description = RuleMetadataCodec.compose_description(base, url, prefix, content_hash, max_len=max_len, mode=mode)
+            self.assertLessEqual(len(description), max_len)
+            clean_base = base
+            while METADATA_BLOCK_PATTERN.search(clean_base): clean_base = METADATA_BLOCK_PATTERN.sub("", clean_base)
+            clean_base = clean_base.strip()
+            shortest = RuleMetadataCodec.encode(url, prefix, content_hash, max_len=0, mode=mode)
+            if len(shortest) > max_len:
+                self.assertEqual(description, clean_base[:max_len])
+                self.assertIsNone(RuleMetadataCodec.decode(description).version)
+                continue
+            decoded = self.assertDecodesTo(description, url, prefix, content_hash, mode)
+            self.assertTrue(clean_base.startswith(decoded.base_description), repr((base, description)))
+            if len(clean_base) + 1 + len(shortest) <= max_len: self.assertEqual(decoded.base_description, clean_base)
+    def test_metadata_in_base_description_is_not_decoded(self):
+        quoted = RuleMetadataCodec.encode("https://other.example/list.txt", "other_", "1", mode="buckets")
+        for base in (quoted, f"see {quoted} for details", quoted[:-5]):
+            description = RuleMetadataCodec.compose_description(base, "https://example.com/hosts.txt", "ads_", "2")
+            self.assertDecodesTo(description, "https://example.com/hosts.txt", "ads_", "2", None)
+            self.assertIsNone(RuleMetadataCodec.decode(RuleMetadataCodec.compose_description(base, None, "ads_")).version)
+    def test_v2_keeps_newlines_in_fields(self):
+        url = "https://example.com/a\nb" + "x" * 600
+        description = RuleMetadataCodec.compose_description("Ads", url, "ads_", "3\n4", mode="buckets")
+        self.assertEqual(self.assertDecodesTo(description, url, "ads_", "3\n4", "buckets").version, 2)
+if __name__ == '__main__':
+    unittest.main()